@@ -27,6 +27,7 @@ RATE_LIMIT_RULES = {
     "/storage/recent": "60/minute",
     "/storage/concept": "30/minute",
     "/export/process": "50/hour",
+    "/export/package": "20/hour",
 }
 
 # Define endpoints that need multiple rate limits
@@ -17,15 +17,17 @@ from app.api.dependencies import CommonDependencies
 # Import specific API errors
 from app.api.errors import InternalServerError, ResourceNotFoundError, ServiceUnavailableError, TaskNotFoundError
 from app.core.config import settings
-from app.core.constants import TASK_STATUS_FAILED, TASK_STATUS_PENDING, TASK_STATUS_PROCESSING, TASK_TYPE_GENERATION
+from app.core.constants import TASK_STATUS_FAILED, TASK_STATUS_PENDING, TASK_TYPE_GENERATION
 
 # Import domain/application error types for catching
-from app.core.exceptions import ApplicationError, AuthenticationError, ConceptCreationError, ImageProcessingError, JigsawStackError, RateLimitError
+from app.core.exceptions import ApplicationError, AuthenticationError, ConceptCreationError, ImageProcessingError, JigsawStackCircuitOpenError, JigsawStackError, RateLimitError
 from app.core.exceptions import ValidationError as AppValidationError
 from app.models.concept.request import PromptRequest
 from app.models.concept.response import GenerationResponse
 from app.models.task.response import TaskResponse
+from app.services.jigsawstack.circuit import check_provider_availability
 from app.services.task.service import TaskError
+from app.utils.api_limits import refund_applied_rate_limits
 from app.utils.security.mask import mask_id, mask_path
 
 # Configure logging
@@ -137,7 +139,7 @@ async def generate_concept(
         image_url = concept_response["image_url"]
         image_data = concept_response.get("image_data")
 
-        if not image_url:
+        if not image_url and not image_data:
             raise JigsawStackError(message="Failed to generate base concept")
 
         logger.debug(f"Generated base concept with image URL: {mask_id(image_url)}")
@@ -147,33 +149,17 @@ async def generate_concept(
             # If not, we need to download it - this is a fallback for backward compatibility
             logger.debug("Image data not provided in concept response, downloading from URL")
             try:
-                # Check if the image_url is a file path
-                if image_url.startswith("file://"):
-                    import os
+                # For remote URLs, use httpx to download, capping the size of the image
+                import httpx
 
-                    # Extract the file path from the URL
-                    file_path = image_url[7:]  # Remove the "file://" prefix
+                from app.services.jigsawstack.transport import CappedTransport
 
-                    # Check if the file exists
-                    if not os.path.exists(file_path):
-                        logger.error(f"Local file not found: {mask_id(file_path)}")
-                        raise JigsawStackError(message="Image file not found")
+                async with httpx.AsyncClient(transport=CappedTransport()) as client:
+                    httpx_response = await client.get(image_url)
+                    httpx_response.raise_for_status()
+                    image_data = httpx_response.content
 
-                    # Read the file
-                    with open(file_path, "rb") as f:
-                        image_data = f.read()
-
-                    logger.debug(f"Read image data from local file: {mask_id(file_path)}")
-                else:
-                    # For remote URLs, use httpx to download
-                    import httpx
-
-                    async with httpx.AsyncClient() as client:
-                        httpx_response = await client.get(image_url)
-                        httpx_response.raise_for_status()
-                        image_data = httpx_response.content
-
-                    logger.debug(f"Downloaded image data from remote URL: {mask_id(image_url)}")
+                logger.debug(f"Downloaded image data from remote URL: {mask_id(image_url)}")
 
                 if not image_data:
                     logger.error(f"No image data obtained from: {mask_id(image_url)}")
@@ -335,92 +321,46 @@ async def generate_concept_with_palettes(
             "num_palettes": num_palettes,
         }
 
-        # Check for existing active tasks for this user
+        # Refuse the task, or tell the user it will wait, while the image provider is failing
         try:
-            # Look for any pending or processing tasks of type concept_generation
-            active_tasks = await commons.task_service.get_tasks_by_user(user_id=user_id, status=TASK_STATUS_PENDING)
-            processing_tasks = await commons.task_service.get_tasks_by_user(user_id=user_id, status=TASK_STATUS_PROCESSING)
-
-            # Combine the task lists
-            all_active_tasks = active_tasks + processing_tasks
-
-            # Filter for concept_generation tasks
-            active_generation_tasks = [task for task in all_active_tasks if task.get("type") == TASK_TYPE_GENERATION]
-
-            if active_generation_tasks:
-                # Return the existing task instead of creating a new one
-                existing_task = active_generation_tasks[0]
-                logger.info(f"Found existing active task {mask_id(existing_task['id'])} for user {mask_id(user_id)}")
-
-                # --- REFUND LOGIC for 409 Conflict ---
-                # Check if there are applied rate limits that need to be refunded
-                applied_limits_to_refund = getattr(req.state, "applied_rate_limits_for_refund", [])
-                if applied_limits_to_refund:
-                    logger.info(f"Attempting to refund rate limits for user {mask_id(user_id)} due to 409 conflict")
-
-                    # Get Redis store instance - try different ways to access it
-                    redis_store_instance = None
-
-                    # First, check if there's a RedisStore in _storage
-                    if hasattr(req.app.state, "limiter") and hasattr(req.app.state.limiter, "_storage") and hasattr(req.app.state.limiter._storage, "decrement_specific_limit"):
-                        redis_store_instance = req.app.state.limiter._storage
-                        logger.debug("Using limiter._storage for rate limit refund")
-                    # Second, check for _redis_client attribute (how it's actually configured)
-                    elif hasattr(req.app.state, "limiter") and hasattr(req.app.state.limiter, "_redis_client"):
-                        from app.core.limiter.redis_store import RedisStore
-
-                        redis_client = req.app.state.limiter._redis_client
-                        redis_store_instance = RedisStore(redis_client)
-                        logger.debug("Created RedisStore from limiter._redis_client for rate limit refund")
-
-                    if redis_store_instance:
-                        for limit_to_refund in applied_limits_to_refund:
-                            try:
-                                # Call the decrement method on the RedisStore
-                                logger.info(f"Refunding: endpoint={limit_to_refund['endpoint_rule']}, limit={limit_to_refund['limit_string_rule']}")
-
-                                refund_success = redis_store_instance.decrement_specific_limit(
-                                    user_id=limit_to_refund["user_id"],
-                                    endpoint_rule=limit_to_refund["endpoint_rule"],
-                                    limit_string_rule=limit_to_refund["limit_string_rule"],
-                                    amount=limit_to_refund["amount"],
-                                )
-
-                                if refund_success:
-                                    logger.info(f"Successfully refunded rate limit for {limit_to_refund['endpoint_rule']} for user {mask_id(user_id)}")
-                                else:
-                                    logger.warning(f"Failed to refund rate limit for {limit_to_refund['endpoint_rule']} for user {mask_id(user_id)}")
-                            except Exception as e:
-                                logger.error(f"Error refunding rate limit for {limit_to_refund['endpoint_rule']} (user: {mask_id(user_id)}): {e}")
-                    else:
-                        logger.error(f"Could not obtain RedisStore instance to refund rate limit for 409 conflict for user {mask_id(user_id)}")
-                else:
-                    logger.debug(f"No applied rate limits found for user {mask_id(user_id)} during 409 conflict. No refund attempted.")
-                # --- END REFUND LOGIC ---
-
-                # Return HTTP 409 Conflict with details of the existing task
-                response.status_code = status.HTTP_409_CONFLICT
-                return TaskResponse(
-                    task_id=existing_task["id"],
-                    status=existing_task["status"],
-                    message="A concept generation task is already in progress",
-                    type=TASK_TYPE_GENERATION,
-                    created_at=existing_task.get("created_at"),
-                    updated_at=existing_task.get("updated_at", None),
-                    completed_at=existing_task.get("completed_at", None),
-                    metadata=existing_task.get("metadata", task_metadata),
-                    result_id=existing_task.get("result_id", None),
-                    image_url=existing_task.get("image_url", None),
-                    error_message=existing_task.get("error_message", None),
-                )
-        except Exception as e:
-            # Log the error but continue with creating a new task
-            logger.warning(f"Error checking for existing tasks: {str(e)}")
-
-        # Create a new task in the database
+            provider_message = await check_provider_availability(user_id, "generate_image")
+        except JigsawStackCircuitOpenError as e:
+            # The request did not consume a task, so give back the rate limits it was charged
+            refund_applied_rate_limits(req, user_id)
+            raise ServiceUnavailableError(detail=e.message, retry_after=e.retry_after)
+
+        # Create the task unless one is already in progress; the service takes the
+        # per-user active task lock together with creation
         try:
-            task = await commons.task_service.create_task(user_id=user_id, task_type=TASK_TYPE_GENERATION, metadata=task_metadata)
+            task, created = await commons.task_service.create_task_if_no_active(user_id=user_id, task_type=TASK_TYPE_GENERATION, metadata=task_metadata)
+        except TaskError as e:
+            logger.error(f"Error creating task: {str(e)}")
+            raise ServiceUnavailableError(detail=f"Error creating task: {str(e)}")
+
+        if not created:
+            existing_task = task
+            logger.info(f"Found existing active task {mask_id(existing_task['id'])} for user {mask_id(user_id)}")
 
+            # The request did not consume a generation, so give back the rate limits it was charged
+            refund_applied_rate_limits(req, user_id)
+
+            # Return HTTP 409 Conflict with details of the existing task
+            response.status_code = status.HTTP_409_CONFLICT
+            return TaskResponse(
+                task_id=existing_task["id"],
+                status=existing_task["status"],
+                message="A concept generation task is already in progress",
+                type=TASK_TYPE_GENERATION,
+                created_at=existing_task.get("created_at"),
+                updated_at=existing_task.get("updated_at", None),
+                completed_at=existing_task.get("completed_at", None),
+                metadata=existing_task.get("metadata", task_metadata),
+                result_id=existing_task.get("result_id", None),
+                image_url=existing_task.get("image_url", None),
+                error_message=existing_task.get("error_message", None),
+            )
+
+        try:
             task_id = task["id"]
             logger.info(f"Created task {mask_id(task_id)} for concept generation with palettes")
 
@@ -456,7 +396,7 @@ async def generate_concept_with_palettes(
             return TaskResponse(
                 task_id=task_id,
                 status=TASK_STATUS_PENDING,
-                message="Concept generation task created and queued for processing",
+                message=provider_message or "Concept generation task created and queued for processing",
                 type=TASK_TYPE_GENERATION,
                 created_at=task.get("created_at"),
                 updated_at=task.get("updated_at", None),
@@ -471,8 +411,8 @@ async def generate_concept_with_palettes(
             logger.error(f"Error creating task: {str(e)}")
             raise ServiceUnavailableError(detail=f"Error creating task: {str(e)}")
 
-    except (AuthenticationError, AppValidationError):
-        # Let the middleware handle these familiar error types
+    except (AuthenticationError, AppValidationError, ServiceUnavailableError):
+        # Let the middleware handle these familiar error types (keeping Retry-After headers)
         raise
     except Exception as e:
         # Log unexpected errors and wrap them in our API error format
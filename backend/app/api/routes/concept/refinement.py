@@ -19,12 +19,14 @@ from app.api.errors import ServiceUnavailableError
 
 # Constants
 from app.core.config import settings
-from app.core.constants import TASK_STATUS_FAILED, TASK_STATUS_PENDING, TASK_STATUS_PROCESSING, TASK_TYPE_REFINEMENT
-from app.core.exceptions import ResourceNotFoundError, TaskError
+from app.core.constants import TASK_STATUS_FAILED, TASK_STATUS_PENDING, TASK_TYPE_REFINEMENT
+from app.core.exceptions import JigsawStackCircuitOpenError, ResourceNotFoundError, TaskError
 from app.models.concept.request import RefinementRequest
 from app.models.task.response import TaskResponse
 
 # Import for masking sensitive values in logs
+from app.services.jigsawstack.circuit import check_provider_availability
+from app.utils.api_limits import refund_applied_rate_limits
 from app.utils.security.mask import mask_id
 
 # Configure logger
@@ -73,91 +75,46 @@ async def refine_concept(
             "theme_description": request.theme_description or "",
         }
 
-        # Check for existing active tasks for this user
+        # Refuse the task, or tell the user it will wait, while the image provider is failing
         try:
-            # Look for any pending or processing tasks of type concept_refinement
-            active_tasks = await commons.task_service.get_tasks_by_user(user_id=user_id, status=TASK_STATUS_PENDING)
-            processing_tasks = await commons.task_service.get_tasks_by_user(user_id=user_id, status=TASK_STATUS_PROCESSING)
-
-            # Combine the task lists
-            all_active_tasks = active_tasks + processing_tasks
-
-            # Filter for concept_refinement tasks
-            active_refinement_tasks = [task for task in all_active_tasks if task.get("type") == TASK_TYPE_REFINEMENT]
-
-            if active_refinement_tasks:
-                # Return the existing task instead of creating a new one
-                existing_task = active_refinement_tasks[0]
-                logger.info(f"Found existing active task {mask_id(existing_task['id'])} for user {mask_id(user_id)}")
-
-                # --- REFUND LOGIC for 409 Conflict ---
-                # Check if there are applied rate limits that need to be refunded
-                applied_limits_to_refund = getattr(req.state, "applied_rate_limits_for_refund", [])
-                if applied_limits_to_refund:
-                    logger.info(f"Attempting to refund rate limits for user {mask_id(user_id)} due to 409 conflict")
-
-                    # Get Redis store instance - try different ways to access it
-                    redis_store_instance = None
-
-                    # First, check if there's a RedisStore in _storage
-                    if hasattr(req.app.state, "limiter") and hasattr(req.app.state.limiter, "_storage") and hasattr(req.app.state.limiter._storage, "decrement_specific_limit"):
-                        redis_store_instance = req.app.state.limiter._storage
-                        logger.debug("Using limiter._storage for rate limit refund")
-                    # Second, check for _redis_client attribute (how it's actually configured)
-                    elif hasattr(req.app.state, "limiter") and hasattr(req.app.state.limiter, "_redis_client"):
-                        from app.core.limiter.redis_store import RedisStore
-
-                        redis_client = req.app.state.limiter._redis_client
-                        redis_store_instance = RedisStore(redis_client)
-                        logger.debug("Created RedisStore from limiter._redis_client for rate limit refund")
-
-                    if redis_store_instance:
-                        for limit_to_refund in applied_limits_to_refund:
-                            try:
-                                # Call the decrement method on the RedisStore
-                                logger.info(f"Refunding: endpoint={limit_to_refund['endpoint_rule']}, limit={limit_to_refund['limit_string_rule']}")
-
-                                refund_success = redis_store_instance.decrement_specific_limit(
-                                    user_id=limit_to_refund["user_id"],
-                                    endpoint_rule=limit_to_refund["endpoint_rule"],
-                                    limit_string_rule=limit_to_refund["limit_string_rule"],
-                                    amount=limit_to_refund["amount"],
-                                )
-
-                                if refund_success:
-                                    logger.info(f"Successfully refunded rate limit for {limit_to_refund['endpoint_rule']} for user {mask_id(user_id)}")
-                                else:
-                                    logger.warning(f"Failed to refund rate limit for {limit_to_refund['endpoint_rule']} for user {mask_id(user_id)}")
-                            except Exception as e:
-                                logger.error(f"Error refunding rate limit for {limit_to_refund['endpoint_rule']} (user: {mask_id(user_id)}): {e}")
-                    else:
-                        logger.error(f"Could not obtain RedisStore instance to refund rate limit for 409 conflict for user {mask_id(user_id)}")
-                else:
-                    logger.debug(f"No applied rate limits found for user {mask_id(user_id)} during 409 conflict. No refund attempted.")
-                # --- END REFUND LOGIC ---
-
-                # Return HTTP 409 Conflict with details of the existing task
-                response.status_code = status.HTTP_409_CONFLICT
-                return TaskResponse(
-                    task_id=existing_task["id"],
-                    status=existing_task["status"],
-                    message="A concept refinement task is already in progress",
-                    type=TASK_TYPE_REFINEMENT,
-                    created_at=existing_task.get("created_at"),
-                    updated_at=existing_task.get("updated_at", None),
-                    completed_at=existing_task.get("completed_at", None),
-                    metadata=existing_task.get("metadata", task_metadata),
-                    result_id=existing_task.get("result_id", None),
-                    image_url=existing_task.get("image_url", None),
-                    error_message=existing_task.get("error_message", None),
-                )
-        except Exception as e:
-            # Log the error but continue with creating a new task
-            logger.warning(f"Error checking for existing tasks: {str(e)}")
-
+            provider_message = await check_provider_availability(user_id, "refine_image")
+        except JigsawStackCircuitOpenError as e:
+            # The request did not consume a task, so give back the rate limits it was charged
+            refund_applied_rate_limits(req, user_id)
+            raise ServiceUnavailableError(detail=e.message, retry_after=e.retry_after)
+
+        # Create the task unless one is already in progress; the service takes the
+        # per-user active task lock together with creation
         try:
-            task = await commons.task_service.create_task(user_id=user_id, task_type=TASK_TYPE_REFINEMENT, metadata=task_metadata)
+            task, created = await commons.task_service.create_task_if_no_active(user_id=user_id, task_type=TASK_TYPE_REFINEMENT, metadata=task_metadata)
+        except TaskError as e:
+            logger.error(f"Error creating task: {str(e)}")
+            raise ServiceUnavailableError(detail=f"Error creating task: {str(e)}")
+
+        if not created:
+            existing_task = task
+            logger.info(f"Found existing active task {mask_id(existing_task['id'])} for user {mask_id(user_id)}")
+
+            # The request did not consume a refinement, so give back the rate limits it was charged
+            refund_applied_rate_limits(req, user_id)
 
+            # Return HTTP 409 Conflict with details of the existing task
+            response.status_code = status.HTTP_409_CONFLICT
+            return TaskResponse(
+                task_id=existing_task["id"],
+                status=existing_task["status"],
+                message="A concept refinement task is already in progress",
+                type=TASK_TYPE_REFINEMENT,
+                created_at=existing_task.get("created_at"),
+                updated_at=existing_task.get("updated_at", None),
+                completed_at=existing_task.get("completed_at", None),
+                metadata=existing_task.get("metadata", task_metadata),
+                result_id=existing_task.get("result_id", None),
+                image_url=existing_task.get("image_url", None),
+                error_message=existing_task.get("error_message", None),
+            )
+
+        try:
             task_id = task["id"]
             logger.info(f"Created task {mask_id(task_id)} for concept refinement")
 
@@ -202,7 +159,7 @@ async def refine_concept(
             return TaskResponse(
                 task_id=task_id,
                 status=TASK_STATUS_PENDING,
-                message="Concept refinement task created and queued for processing",
+                message=provider_message or "Concept refinement task created and queued for processing",
                 type=TASK_TYPE_REFINEMENT,
                 created_at=task.get("created_at"),
                 updated_at=task.get("updated_at", None),
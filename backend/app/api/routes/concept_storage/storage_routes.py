@@ -12,9 +12,11 @@ from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from pydantic import HttpUrl
 
 from app.api.dependencies import CommonDependencies
+from app.core.config import settings
 from app.core.exceptions import ResourceNotFoundError, ServiceUnavailableError
 from app.models.concept.request import PromptRequest
 from app.models.concept.response import ConceptDetail, ConceptSummary, GenerationResponse
+from app.services.image.delivery import attach_image_sources
 
 # Utility function to get current user ID from request
 from app.utils.auth.user import get_current_user_id
@@ -187,6 +189,11 @@ async def get_recent_concepts(
                 # Log after processing all variations
                 logger.info(f"Processed {len(concept['color_variations'])} variations for concept {concept['id']}")
 
+        # Add srcsets of the pre-rendered siblings in the format the client accepts
+        if settings.IMAGE_DELIVERY_ENABLED:
+            attach_image_sources(concepts, req.headers.get("accept"), commons.image_persistence_service)
+            response.headers["Vary"] = "Accept"
+
         return concepts
     except Exception as e:
         logger.error(f"Error fetching recent concepts: {str(e)}")
@@ -235,6 +242,10 @@ async def get_concept_detail(
                 if variation.get("image_path") and not variation.get("image_url"):
                     variation["image_url"] = commons.image_persistence_service.get_image_url(variation["image_path"])
 
+        if settings.IMAGE_DELIVERY_ENABLED:
+            attach_image_sources([concept], req.headers.get("accept"), commons.image_persistence_service)
+            response.headers["Vary"] = "Accept"
+
         return concept
     except ResourceNotFoundError:
         # Re-raise our custom errors directly
@@ -9,13 +9,15 @@ from typing import Any, Dict, Optional
 from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import StreamingResponse
 
-from app.models.export.request import ExportRequest
+from app.core.exceptions import ResourceNotFoundError
+from app.models.export.request import ConceptPackageExportRequest, ExportRequest
 from app.services.export import get_export_service
 from app.services.export.interface import ExportServiceInterface
+from app.services.export.service import ExportError
 from app.services.persistence import get_image_persistence_service
 from app.services.persistence.interface import ImagePersistenceServiceInterface
 from app.utils.auth.user import get_current_user
-from app.utils.security.mask import mask_path
+from app.utils.security.mask import mask_id, mask_path
 
 # Configure logger
 logger = logging.getLogger(__name__)
@@ -35,7 +37,9 @@ async def export_action(
     """Process an export request and return the file.
 
     This endpoint handles converting images to different formats (PNG, JPEG, SVG)
-    and resizing them according to the requested parameters.
+    and resizing them according to the requested parameters. With a byte
+    budget or quality floor, raster exports are searched for the smallest
+    encoding meeting it, possibly in another format when allowed.
 
     Args:
         request_data: Export request parameters
@@ -122,14 +126,19 @@ async def export_action(
             size=size,
             quality=90 if request_data.target_format == "jpg" else None,
             user_id=user_id,
+            max_bytes=request_data.max_bytes,
+            min_quality=request_data.min_quality,
+            allow_format_change=request_data.allow_format_change,
         )
 
         # Return a streaming response with the file
         headers = {"Content-Disposition": f'attachment; filename="{export_result.get("filename", "export."+request_data.target_format)}"'}
 
         logger.info(f"Successfully processed export request for {masked_image_id}, returning {export_result.get('size', 0)} bytes")
+        # Cached exports are streamed straight from disk
+        content = export_result.get("stream") or iter([export_result.get("data", b"")])
         return StreamingResponse(
-            iter([export_result.get("data", b"")]),
+            content,
             media_type=export_result.get("content_type", f"image/{request_data.target_format}"),
             headers=headers,
         )
@@ -139,3 +148,51 @@ async def export_action(
     except Exception as e:
         logger.error(f"Export processing error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Export processing failed: {str(e)}")
+
+
+@router.post("/package")
+async def export_concept_package(
+    request_data: ConceptPackageExportRequest,
+    req: Request,
+    current_user: Dict[str, Any] = Depends(get_current_user),
+    export_service: ExportServiceInterface = Depends(get_export_service),
+) -> StreamingResponse:
+    """Export a concept with all of its palette variations as one ZIP file.
+
+    The archive contains the base image and every variation in each requested
+    format, a swatch image per palette and a manifest. It is streamed as the
+    entries finish converting rather than built in memory first.
+
+    Args:
+        request_data: Package export parameters
+        req: FastAPI request object
+        current_user: Current authenticated user
+        export_service: Service for handling exports
+
+    Returns:
+        A streaming response with the ZIP archive
+    """
+    user_id = current_user.get("id")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Authentication required")
+
+    try:
+        package = await export_service.export_concept_package(
+            concept_id=request_data.concept_id,
+            user_id=user_id,
+            formats=list(request_data.formats),
+            include_palettes=request_data.include_palettes,
+            target_size=request_data.target_size,
+        )
+    except ResourceNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Concept not found: {request_data.concept_id}")
+    except ExportError as e:
+        logger.error(f"Package export error: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+    logger.info(f"Streaming package for concept {mask_id(request_data.concept_id)} with {package.get('entry_count', 0)} entries")
+    return StreamingResponse(
+        package["stream"],
+        media_type=package.get("content_type", "application/zip"),
+        headers={"Content-Disposition": f'attachment; filename="{package["filename"]}"'},
+    )
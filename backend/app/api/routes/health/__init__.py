@@ -23,4 +23,5 @@ NON_COUNTING_ENDPOINTS = [
     "/api/health/ping",
     "/api/health/status",
     "/api/health/config",
+    "/api/health/metrics",
 ]
@@ -6,12 +6,13 @@ and provide non-sensitive configuration data to the frontend.
 
 import logging
 from datetime import datetime
-from typing import Dict
+from typing import Any, Dict
 
 from fastapi import APIRouter
 from pydantic import BaseModel
 
 from app.core.config import settings
+from app.core.metrics import metrics
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -24,6 +25,16 @@ async def ping() -> Dict[str, str]:
     return {"status": "ok", "timestamp": datetime.now().isoformat()}
 
 
+@router.get("/metrics")
+async def get_metrics() -> Dict[str, Any]:
+    """Get the in-process counters, timings and histograms of this instance.
+
+    Returns:
+        Dict containing the counters (e.g. export cache hits and misses), timings and histograms
+    """
+    return metrics.snapshot()
+
+
 class StorageBucketsConfig(BaseModel):
     """Storage bucket names for frontend use."""
 
@@ -3,16 +3,21 @@
 This module provides endpoints for managing background tasks.
 """
 
+import json
 import logging
 import traceback
-from typing import List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 
 from app.api.dependencies import CommonDependencies
 from app.api.errors import ResourceNotFoundError, ServiceUnavailableError
 from app.core.config import settings
-from app.models.task.response import TaskResponse
+from app.core.constants import TASK_STATUS_COMPLETED, TASK_STATUS_FAILED
+from app.models.task.response import TaskProgress, TaskResponse
+from app.services.task.events import get_task_event_bus
+from app.services.task.interface import TaskServiceInterface
 from app.services.task.service import TaskNotFoundError
 from app.utils.security.mask import mask_id
 
@@ -22,6 +27,35 @@ logger = logging.getLogger("task_api")
 router = APIRouter()
 
 
+def _build_task_response(task: Dict[str, Any]) -> TaskResponse:
+    """Convert a task record into a response, including partial results.
+
+    While a task is running, its progress record carries the current stage and
+    whatever is already available (base image URL, finished palette variations).
+
+    Args:
+        task: Task record from the task service
+
+    Returns:
+        TaskResponse for the task
+    """
+    progress = task.get("progress") or None
+    return TaskResponse(
+        task_id=task["id"],
+        status=task["status"],
+        message=f"Task is {task['status']}",
+        type=str(task.get("type", "")),  # Ensure type is always a string
+        created_at=task.get("created_at"),
+        updated_at=task.get("updated_at"),
+        completed_at=task.get("completed_at"),
+        result_id=task.get("result_id"),
+        image_url=task.get("image_url") or (progress or {}).get("image_url"),
+        error_message=task.get("error_message"),
+        metadata=task.get("metadata", {}),
+        progress=TaskProgress(**progress) if progress else None,
+    )
+
+
 @router.get("", response_model=List[TaskResponse])
 async def get_tasks(
     request: Request,
@@ -54,22 +88,7 @@ async def get_tasks(
         tasks = await commons.task_service.get_tasks_by_user(user_id=user_id, status=status, limit=limit)
 
         # Convert task data to response model format
-        return [
-            TaskResponse(
-                task_id=task["id"],
-                status=task["status"],
-                message=f"Task is {task['status']}",
-                type=str(task.get("type", "")),  # Ensure type is always a string
-                created_at=task.get("created_at"),
-                updated_at=task.get("updated_at"),
-                completed_at=task.get("completed_at"),
-                result_id=task.get("result_id"),
-                image_url=task.get("image_url"),
-                error_message=task.get("error_message"),
-                metadata=task.get("metadata", {}),
-            )
-            for task in tasks
-        ]
+        return [_build_task_response(task) for task in tasks]
     except Exception as e:
         logger.error(f"Error retrieving tasks: {str(e)}")
         if settings.ENVIRONMENT == "development":
@@ -79,6 +98,128 @@ async def get_tasks(
         raise ServiceUnavailableError(detail=f"Error retrieving tasks: {str(e)}")
 
 
+def _format_task_event(task: Dict[str, Any]) -> str:
+    """Format a task as a server-sent event frame.
+
+    Args:
+        task: Task record or task event
+
+    Returns:
+        SSE frame carrying the task response as JSON
+    """
+    payload = _build_task_response(task).model_dump()
+    return f"event: task\nid: {task['id']}:{task.get('updated_at', '')}\ndata: {json.dumps(payload, default=str)}\n\n"
+
+
+async def _load_stream_tasks(task_service: TaskServiceInterface, user_id: str, task_id: Optional[str], limit: int) -> List[Dict[str, Any]]:
+    """Load the tasks a stream reports on.
+
+    Args:
+        task_service: Task service to read from
+        user_id: ID of the user who owns the tasks
+        task_id: Optional single task to report on
+        limit: Maximum number of recent tasks when no task ID is given
+
+    Returns:
+        Task records
+    """
+    if task_id:
+        return [await task_service.get_task(task_id, user_id)]
+    return await task_service.get_tasks_by_user(user_id=user_id, limit=limit)
+
+
+@router.get("/events")
+async def stream_task_events(
+    request: Request,
+    task_id: Optional[str] = Query(None, description="Only stream changes of this task"),
+    limit: int = Query(10, ge=1, le=50, description="Number of recent tasks sent when the stream opens"),
+    commons: CommonDependencies = Depends(),
+) -> StreamingResponse:
+    """Stream status and progress changes of the user's tasks as server-sent events.
+
+    The stream opens with the current state of the requested tasks, then pushes
+    every change published on the task change bus. When a single task is
+    requested the stream ends once that task completes or fails.
+
+    Args:
+        request: The FastAPI request object
+        task_id: Optional ID of a single task to follow
+        limit: Number of recent tasks sent when the stream opens
+        commons: Common dependencies including services
+
+    Returns:
+        text/event-stream response of task events
+
+    Raises:
+        HTTPException: If user is not authenticated (401)
+        ResourceNotFoundError: If the requested task is not found
+        ServiceUnavailableError: If the requested task cannot be loaded
+    """
+    user_id = commons.user_id
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Authentication required")
+
+    task_service = commons.task_service
+    bus = get_task_event_bus()
+    keepalive_seconds = float(settings.TASK_EVENTS_KEEPALIVE_SECONDS)
+    terminal_statuses = (TASK_STATUS_COMPLETED, TASK_STATUS_FAILED)
+
+    if task_id:
+        # Check the task exists before streaming starts so a missing task gets a 404
+        try:
+            await task_service.get_task(task_id, user_id)
+        except TaskNotFoundError:
+            raise ResourceNotFoundError(detail=f"Task with ID {mask_id(task_id)} not found")
+        except Exception as e:
+            logger.error(f"Error opening task event stream: {str(e)}")
+            raise ServiceUnavailableError(detail=f"Error retrieving task: {str(e)}")
+
+    async def event_stream() -> AsyncIterator[str]:
+        async with bus.subscribe(user_id) as subscription:
+            # Snapshot after subscribing so no change falls between the two
+            last_sent: Dict[str, Any] = {}
+            tasks = await _load_stream_tasks(task_service, user_id, task_id, limit)
+            for task in tasks:
+                last_sent[task["id"]] = task.get("updated_at")
+                yield _format_task_event(task)
+            if task_id and tasks and tasks[0]["status"] in terminal_statuses:
+                return
+
+            while not await request.is_disconnected():
+                event = await subscription.get(timeout=keepalive_seconds)
+                if event is None:
+                    if bus.shared:
+                        yield ": keepalive\n\n"
+                        continue
+                    # The in-process bus misses worker changes, so re-read the tasks instead
+                    try:
+                        changed = [task for task in await _load_stream_tasks(task_service, user_id, task_id, limit) if last_sent.get(task["id"]) != task.get("updated_at")]
+                    except Exception as e:
+                        logger.warning(f"Error refreshing task event stream: {str(e)}")
+                        changed = []
+                    if not changed:
+                        yield ": keepalive\n\n"
+                        continue
+                else:
+                    if task_id and event.get("id") != task_id:
+                        continue
+                    if last_sent.get(event.get("id")) == event.get("updated_at"):
+                        continue
+                    changed = [event]
+
+                for task in changed:
+                    last_sent[task["id"]] = task.get("updated_at")
+                    yield _format_task_event(task)
+                    if task_id and task["status"] in terminal_statuses:
+                        return
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/{task_id}", response_model=TaskResponse)
 async def get_task(
     task_id: str,
@@ -111,19 +252,7 @@ async def get_task(
             task = await commons.task_service.get_task(task_id, user_id)
 
             # Convert task data to response model
-            return TaskResponse(
-                task_id=task["id"],
-                status=task["status"],
-                message=f"Task is {task['status']}",
-                type=str(task.get("type", "")),  # Ensure type is always a string
-                created_at=task.get("created_at"),
-                updated_at=task.get("updated_at"),
-                completed_at=task.get("completed_at"),
-                result_id=task.get("result_id"),
-                image_url=task.get("image_url"),
-                error_message=task.get("error_message"),
-                metadata=task.get("metadata", {}),
-            )
+            return _build_task_response(task)
         except TaskNotFoundError:
             # If not found in task service, return not found
             raise ResourceNotFoundError(detail=f"Task with ID {mask_id(task_id)} not found")
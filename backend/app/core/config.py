@@ -50,6 +50,67 @@ class Settings(BaseSettings):
         PUB_SUB_TOPIC_ID: Topic ID for Google Cloud Pub/Sub
         PUB_SUB_PROJECT_ID: Project ID for Google Cloud Pub/Sub
         SIGNED_URL_EXPIRY_SECONDS: Signed URL expiration time in seconds
+        TASK_MAX_ATTEMPTS: Maximum worker attempts per task before it is marked failed
+        TASK_EVENTS_REDIS_ENABLED: Flag to publish task changes over Redis pub/sub
+        TASK_EVENTS_KEEPALIVE_SECONDS: Idle interval before a task event stream sends a keepalive
+        TASK_ACTIVE_LOCK_ENABLED: Flag to guard task submission with a per-user Redis lock
+        TASK_ACTIVE_LOCK_TTL_SECONDS: Expiry of the per-user active task lock in seconds
+        EXPORT_PACKAGE_CONCURRENCY: Concept package entries fetched and converted at once
+        EXPORT_CACHE_ENABLED: Flag to cache export results by source digest and parameters
+        EXPORT_CACHE_DIR: Directory of the local export cache (defaults to a temp directory)
+        EXPORT_CACHE_MAX_BYTES: Total size of the local export cache before eviction
+        EXPORT_CACHE_TTL_SECONDS: Age after which a cached export is no longer served
+        EXPORT_CACHE_BUCKET: Optional storage bucket shared by all instances as a second cache tier
+        EXPORT_PROCESS_WORKERS: Worker processes for CPU-bound export work (0 runs it in a thread instead)
+        EXPORT_PROCESS_TIMEOUT_SECONDS: Maximum duration of one export job (e.g. an SVG trace)
+        EXPORT_SVG_TRACE_MAX_DIMENSION: Longest side images are downscaled to before tracing (0 disables)
+        EXPORT_PRERENDER_ENABLED: Flag to render the standard export sizes when images are generated
+        IMAGE_DELIVERY_ENABLED: Flag to render WebP/AVIF siblings of generated images and list them as srcsets
+        JIGSAWSTACK_COALESCING_ENABLED: Flag to share one JigsawStack call between identical requests in flight
+        JIGSAWSTACK_COALESCING_LOCK_TTL_SECONDS: Expiry of the cross-instance lock of the instance making a coalesced call
+        JIGSAWSTACK_COALESCING_RESULT_TTL_SECONDS: How long a coalesced result is kept for identical requests arriving just after it
+        JIGSAWSTACK_COALESCING_WAIT_TIMEOUT_SECONDS: Longest wait for another instance's result before calling JigsawStack directly
+        JIGSAWSTACK_RETRY_MAX_ATTEMPTS: Attempts of a JigsawStack request, including the first
+        JIGSAWSTACK_RETRY_BASE_DELAY_SECONDS: Smallest delay before retrying a JigsawStack request
+        JIGSAWSTACK_RETRY_MAX_DELAY_SECONDS: Largest jittered delay before retrying a JigsawStack request
+        JIGSAWSTACK_RETRY_MAX_RETRY_AFTER_SECONDS: Longest Retry-After waited for; longer ones fail the request
+        JIGSAWSTACK_RETRY_BUDGET_RATIO: Retries allowed per JigsawStack request, across all requests of a process
+        JIGSAWSTACK_RETRY_BUDGET_MAX_TOKENS: Retries that can be saved up for a burst of failures
+        JIGSAWSTACK_CALL_DEADLINE_SECONDS: Time for all attempts of one JigsawStack call
+        WORKER_TASK_DEADLINE_SECONDS: Time for the JigsawStack calls of one worker task, below the function timeout
+        JIGSAWSTACK_HEDGING_ENABLED: Flag to send a second image generation request when the first is slower than usual
+        JIGSAWSTACK_HEDGING_PERCENTILE: Percentile of recent image generation latencies after which a request is hedged
+        JIGSAWSTACK_HEDGING_MIN_SAMPLES: Latencies recorded before requests are hedged
+        JIGSAWSTACK_HEDGING_MIN_DELAY_SECONDS: Shortest wait before hedging, whatever the percentile
+        JIGSAWSTACK_HEDGING_BUDGET_RATIO: Hedged requests allowed per image generation request
+        JIGSAWSTACK_HEDGING_BUDGET_MAX_TOKENS: Hedged requests that can be saved up for a burst of slow requests
+        JIGSAWSTACK_CIRCUIT_BREAKER_ENABLED: Flag to fail JigsawStack calls fast while an endpoint keeps failing
+        JIGSAWSTACK_CIRCUIT_FAILURE_THRESHOLD: Consecutive failed calls to an endpoint that open its circuit
+        JIGSAWSTACK_CIRCUIT_WINDOW_SECONDS: Time within which those failures must happen
+        JIGSAWSTACK_CIRCUIT_OPEN_SECONDS: How long a circuit stays open before one probe call is let through
+        JIGSAWSTACK_CIRCUIT_PROBE_TIMEOUT_SECONDS: Expiry of the probe slot of a half-open circuit
+        JIGSAWSTACK_CIRCUIT_OPEN_ACTION: What the API does with new tasks while their endpoint's circuit is open ("queue" or "refuse")
+        JIGSAWSTACK_GOVERNOR_ENABLED: Flag to limit the JigsawStack calls of all instances together
+        JIGSAWSTACK_GOVERNOR_IMAGE_CONCURRENCY: Image generation, refinement and variation calls in flight at once (0 for no limit)
+        JIGSAWSTACK_GOVERNOR_IMAGE_RATE_PER_MINUTE: Image calls started per minute (0 for no limit)
+        JIGSAWSTACK_GOVERNOR_TEXT_CONCURRENCY: Palette generation calls in flight at once (0 for no limit)
+        JIGSAWSTACK_GOVERNOR_TEXT_RATE_PER_MINUTE: Palette generation calls started per minute (0 for no limit)
+        JIGSAWSTACK_GOVERNOR_LEASE_SECONDS: Expiry of a call slot, bounding how long a crashed instance holds it
+        JIGSAWSTACK_GOVERNOR_MAX_WAIT_SECONDS: Longest wait for a call slot before the call fails
+        JIGSAWSTACK_MAX_RESPONSE_BYTES: Largest JigsawStack response body read (e.g. a generated image)
+        PALETTE_CACHE_ENABLED: Flag to cache generated palettes by normalized descriptions
+        PALETTE_CACHE_TTL_SECONDS: Age up to which cached palettes are served without a refresh
+        PALETTE_CACHE_STALE_SECONDS: Grace period after the TTL during which stale palettes are served while refreshing
+        PALETTE_CACHE_STRIP_STOP_WORDS: Flag to also ignore punctuation and stop words in palette cache keys
+        PALETTE_CACHE_LOCAL_MAX_ENTRIES: Palette responses kept in each process in front of Redis
+        PALETTE_LOCAL_FALLBACK_ENABLED: Flag to use locally derived palettes when the palette API is slow, unavailable or failing
+        PALETTE_API_LATENCY_BUDGET_SECONDS: Longest wait for generated palettes before falling back to local ones (0, the default, waits indefinitely)
+        PALETTE_PREVIEW_ENABLED: Flag to expose locally derived palettes in task progress while generated ones are pending
+        PALETTE_EXTRA_CANDIDATES: Palettes requested beyond the number needed, the lowest contrast ones being dropped
+        IMAGE_MAX_BYTES: Largest encoded image accepted for storage or processing
+        IMAGE_MAX_PIXELS: Largest pixel count accepted, checked from the header before decoding
+        IMAGE_MAX_DECODED_BYTES: Largest decoded size accepted, estimated from the header before decoding
+        IMAGE_PROCESSING_MAX_PIXELS: Pixel count images are downscaled to before palette extraction and application
     """
 
     # API settings
@@ -105,6 +166,140 @@ class Settings(BaseSettings):
     # - Powerful servers (8GB+ RAM, 4+ CPU): CONCURRENCY_LIMIT=4-6, TIMEOUT=90s
     PALETTE_PROCESSING_CONCURRENCY_LIMIT: int = 1  # Max concurrent palette variations to process (1=sequential, better for Cloud Run)
     PALETTE_PROCESSING_TIMEOUT_SECONDS: int = 180  # Timeout for individual palette processing in seconds
+    PALETTE_PNG_OPTIMIZE: bool = True  # Spend extra CPU on lossless PNG compression of palette variations
+
+    # Worker task settings
+    # A failed attempt releases the task back to pending and lets Pub/Sub redeliver it;
+    # the retry resumes from the stage checkpoints stored on the task row.
+    TASK_MAX_ATTEMPTS: int = 3
+
+    # Task event stream settings
+    # Without Redis, changes made by the worker are not published to API instances,
+    # so streams fall back to re-reading their tasks every keepalive interval.
+    TASK_EVENTS_REDIS_ENABLED: bool = True
+    TASK_EVENTS_KEEPALIVE_SECONDS: int = 15
+
+    # Active task lock settings
+    # The lock is released when a task completes or fails; the TTL only bounds how long
+    # a lost release (e.g. a crashed worker) can block the user's next submission.
+    TASK_ACTIVE_LOCK_ENABLED: bool = True
+    TASK_ACTIVE_LOCK_TTL_SECONDS: int = 1800
+
+    # Export settings
+    # Also bounds memory: at most this many converted package entries are held at once.
+    EXPORT_PACKAGE_CONCURRENCY: int = 4
+    EXPORT_CACHE_ENABLED: bool = True
+    EXPORT_CACHE_DIR: str = ""
+    EXPORT_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+    EXPORT_CACHE_TTL_SECONDS: int = 86400
+    EXPORT_CACHE_BUCKET: str = ""
+    # SVG traces and pre-rendered export sizes are CPU bound and can take seconds on
+    # large images, so they run in worker processes; a job exceeding the timeout has
+    # its workers terminated.
+    EXPORT_PROCESS_WORKERS: int = 2
+    EXPORT_PROCESS_TIMEOUT_SECONDS: float = 60.0
+    EXPORT_SVG_TRACE_MAX_DIMENSION: int = 0
+    # Pre-rendered export sizes are stored next to each generated image and
+    # recorded in the export_derivatives column (migration 010).
+    EXPORT_PRERENDER_ENABLED: bool = False
+
+    # Image delivery settings
+    # Siblings are pre-rendered like export sizes (migration 010); concepts listed
+    # before they were enabled keep only their PNG image_url.
+    IMAGE_DELIVERY_ENABLED: bool = False
+
+    # JigsawStack request coalescing settings
+    # Identical generate_image / generate_multiple_palettes calls share one upstream call,
+    # in process and across instances through Redis. Results (including image bytes)
+    # are kept in Redis for the result TTL so a Pub/Sub redelivery arriving just after
+    # the first call finished is served too.
+    JIGSAWSTACK_COALESCING_ENABLED: bool = True
+    JIGSAWSTACK_COALESCING_LOCK_TTL_SECONDS: int = 120
+    JIGSAWSTACK_COALESCING_RESULT_TTL_SECONDS: int = 60
+    JIGSAWSTACK_COALESCING_WAIT_TIMEOUT_SECONDS: float = 120.0
+
+    # JigsawStack retry settings
+    # Every client method retries 429s, 5xx responses, timeouts and failed connections
+    # with decorrelated jitter, honoring Retry-After. Retries stop when the call deadline
+    # or the task deadline (set by the worker per message) leaves no time for another
+    # attempt, and when the per-process retry budget is spent.
+    JIGSAWSTACK_RETRY_MAX_ATTEMPTS: int = 3
+    JIGSAWSTACK_RETRY_BASE_DELAY_SECONDS: float = 1.0
+    JIGSAWSTACK_RETRY_MAX_DELAY_SECONDS: float = 20.0
+    JIGSAWSTACK_RETRY_MAX_RETRY_AFTER_SECONDS: float = 60.0
+    JIGSAWSTACK_RETRY_BUDGET_RATIO: float = 0.2
+    JIGSAWSTACK_RETRY_BUDGET_MAX_TOKENS: float = 10.0
+    JIGSAWSTACK_CALL_DEADLINE_SECONDS: float = 170.0
+    WORKER_TASK_DEADLINE_SECONDS: float = 520.0
+
+    # JigsawStack hedging settings
+    # Each hedged request is a second billed generation, so hedging is off by default
+    # and capped by a budget; latencies are learned per process.
+    JIGSAWSTACK_HEDGING_ENABLED: bool = False
+    JIGSAWSTACK_HEDGING_PERCENTILE: float = 0.95
+    JIGSAWSTACK_HEDGING_MIN_SAMPLES: int = 20
+    JIGSAWSTACK_HEDGING_MIN_DELAY_SECONDS: float = 5.0
+    JIGSAWSTACK_HEDGING_BUDGET_RATIO: float = 0.05
+    JIGSAWSTACK_HEDGING_BUDGET_MAX_TOKENS: float = 5.0
+
+    # JigsawStack circuit breaker settings
+    # Circuits are per endpoint and shared by API and worker instances through Redis.
+    # Failures are counted after retries. While a circuit is open, workers leave tasks
+    # pending for Pub/Sub to redeliver, and the API either accepts new tasks as queued
+    # ("queue") or refuses them with 503 and Retry-After ("refuse").
+    JIGSAWSTACK_CIRCUIT_BREAKER_ENABLED: bool = True
+    JIGSAWSTACK_CIRCUIT_FAILURE_THRESHOLD: int = 5
+    JIGSAWSTACK_CIRCUIT_WINDOW_SECONDS: int = 60
+    JIGSAWSTACK_CIRCUIT_OPEN_SECONDS: int = 30
+    JIGSAWSTACK_CIRCUIT_PROBE_TIMEOUT_SECONDS: int = 120
+    JIGSAWSTACK_CIRCUIT_OPEN_ACTION: str = "queue"
+
+    # JigsawStack governor settings
+    # Limits apply to all API and worker instances together, through Redis, and should
+    # sit just under the provider's limits for the plan. Callers wait in arrival order.
+    JIGSAWSTACK_GOVERNOR_ENABLED: bool = True
+    JIGSAWSTACK_GOVERNOR_IMAGE_CONCURRENCY: int = 8
+    JIGSAWSTACK_GOVERNOR_IMAGE_RATE_PER_MINUTE: float = 60.0
+    JIGSAWSTACK_GOVERNOR_TEXT_CONCURRENCY: int = 16
+    JIGSAWSTACK_GOVERNOR_TEXT_RATE_PER_MINUTE: float = 120.0
+    JIGSAWSTACK_GOVERNOR_LEASE_SECONDS: float = 300.0
+    JIGSAWSTACK_GOVERNOR_MAX_WAIT_SECONDS: float = 120.0
+
+    # JigsawStack response size limit
+    # Bodies are counted as they stream in and kept in memory, never written to disk;
+    # a larger body fails the call instead of filling the memory of a worker.
+    JIGSAWSTACK_MAX_RESPONSE_BYTES: int = 20 * 1024 * 1024
+
+    # Palette cache settings
+    # Keys fold case and whitespace of the logo and theme descriptions; entries are shared
+    # by API and worker instances through Redis, with a per-process tier in front.
+    PALETTE_CACHE_ENABLED: bool = True
+    PALETTE_CACHE_TTL_SECONDS: int = 86400
+    PALETTE_CACHE_STALE_SECONDS: int = 86400
+    PALETTE_CACHE_STRIP_STOP_WORDS: bool = False
+    PALETTE_CACHE_LOCAL_MAX_ENTRIES: int = 256
+
+    # Local palette settings
+    # Palettes derived from the base image's colors and the theme keywords without an API
+    # call. The budget is off by default: a budget under the client's 40s palette timeout
+    # replaces slow but successful LLM answers, and the call over the budget is cancelled.
+    PALETTE_LOCAL_FALLBACK_ENABLED: bool = True
+    PALETTE_API_LATENCY_BUDGET_SECONDS: float = 0.0
+    PALETTE_PREVIEW_ENABLED: bool = True
+
+    # Palette ranking settings
+    # Extra palettes are requested from the API and all candidates scored by contrast and
+    # distinctness, so only the best ones are rendered, uploaded and stored; 0 disables ranking.
+    PALETTE_EXTRA_CANDIDATES: int = 2
+
+    # Image size limits
+    # Images over the first three are rejected without being decoded; images over the
+    # processing resolution are decoded and downscaled, which bounds the memory of the
+    # palette pipeline (float32 LAB copies, k-means labels and masks) per image.
+    IMAGE_MAX_BYTES: int = 25 * 1024 * 1024
+    IMAGE_MAX_PIXELS: int = 50_000_000
+    IMAGE_MAX_DECODED_BYTES: int = 256 * 1024 * 1024
+    IMAGE_PROCESSING_MAX_PIXELS: int = 2048 * 2048
 
     # Configure Pydantic to use environment variables
     model_config = SettingsConfigDict(
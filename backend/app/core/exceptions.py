@@ -174,6 +174,41 @@ class JigsawStackConnectionError(JigsawStackError):
         super().__init__(message, details=details)
 
 
+class JigsawStackDeadlineError(JigsawStackConnectionError):
+    """Exception raised when the time left for a JigsawStack call runs out before it is made."""
+
+    def __init__(
+        self,
+        message: str = "No time left for the JigsawStack API call",
+        details: Optional[Dict[str, Any]] = None,
+    ):
+        """Initialize with deadline error details."""
+        super().__init__(message, details=details)
+
+
+class JigsawStackCircuitOpenError(JigsawStackConnectionError):
+    """Exception raised when a JigsawStack endpoint is failing and calls to it are refused."""
+
+    def __init__(
+        self,
+        message: str = "JigsawStack API is unavailable",
+        retry_after: Optional[int] = None,
+        details: Optional[Dict[str, Any]] = None,
+    ):
+        """Initialize with circuit breaker details.
+
+        Args:
+            message: Human-readable error message
+            retry_after: Seconds until the endpoint is tried again
+            details: Additional error details
+        """
+        self.retry_after = retry_after
+        error_details = details or {}
+        if retry_after is not None:
+            error_details["retry_after"] = retry_after
+        super().__init__(message, details=error_details)
+
+
 class JigsawStackAuthenticationError(JigsawStackError):
     """Exception raised when authentication with JigsawStack API fails."""
 
@@ -218,6 +253,29 @@ class JigsawStackGenerationError(JigsawStackError):
         super().__init__(message, details=error_details)
 
 
+class JigsawStackResponseTooLargeError(JigsawStackGenerationError):
+    """Exception raised when a JigsawStack response body exceeds the size limit."""
+
+    def __init__(
+        self,
+        message: str = "JigsawStack response is too large",
+        max_bytes: Optional[int] = None,
+        details: Optional[Dict[str, Any]] = None,
+    ):
+        """Initialize with the size limit.
+
+        Args:
+            message: Human-readable error message
+            max_bytes: Largest response body accepted
+            details: Additional error details
+        """
+        self.max_bytes = max_bytes
+        error_details = details or {}
+        if max_bytes is not None:
+            error_details["max_bytes"] = max_bytes
+        super().__init__(message, details=error_details)
+
+
 # Rate Limiting Exceptions
 class RateLimitError(ApplicationError):
     """Exception raised when internal rate limiting is exceeded."""
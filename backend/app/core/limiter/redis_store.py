@@ -5,6 +5,7 @@ This module provides a Redis-based rate limiter for API rate limiting.
 
 import logging
 import time
+from functools import lru_cache
 from typing import Any, Dict, Optional, Tuple, cast
 
 import redis
@@ -29,6 +30,15 @@ def mask_key(key: str) -> str:
     return f"{key[:3]}***{key[-3:]}"
 
 
+def get_redis_url() -> str:
+    """Build the Upstash Redis URL from application settings.
+
+    Returns:
+        Redis connection URL (rediss:// for TLS connection)
+    """
+    return f"rediss://:{settings.UPSTASH_REDIS_PASSWORD}@{settings.UPSTASH_REDIS_ENDPOINT}:{settings.UPSTASH_REDIS_PORT}"
+
+
 def get_redis_client() -> Optional[Redis]:
     """Create Redis client using application settings.
 
@@ -37,7 +47,7 @@ def get_redis_client() -> Optional[Redis]:
     """
     try:
         # Build Redis URL for Upstash (using rediss:// for TLS connection)
-        redis_url = f"rediss://:{settings.UPSTASH_REDIS_PASSWORD}@{settings.UPSTASH_REDIS_ENDPOINT}:{settings.UPSTASH_REDIS_PORT}"
+        redis_url = get_redis_url()
         logger.debug(f"Connecting to Redis at: {mask_key(settings.UPSTASH_REDIS_ENDPOINT)}")
 
         # Create client using connection URL with enhanced cold start resilience
@@ -66,6 +76,21 @@ def get_redis_client() -> Optional[Redis]:
         return None
 
 
+@lru_cache()
+def get_shared_redis_client() -> Optional[Redis]:
+    """Get the process-wide Redis client for coordination features.
+
+    Task events, task locks and caches share one connection pool instead of
+    each opening their own.
+
+    Returns:
+        Redis client instance, or None if Redis is not configured or unreachable
+    """
+    if not settings.UPSTASH_REDIS_ENDPOINT:
+        return None
+    return get_redis_client()
+
+
 class RedisStore:
     """Redis-based rate limiter store."""
 
@@ -0,0 +1,119 @@
+"""In-process metrics.
+
+This module provides a small registry of counters, timings and histograms
+that services record to (cache hits and misses, wait times, latencies, ...).
+Values are per process and reset on restart; they are exposed by the
+/api/health/metrics endpoint.
+"""
+
+import threading
+from typing import Any, Dict, Sequence
+
+# Default histogram bucket bounds, suited to API latencies in seconds
+DEFAULT_LATENCY_BUCKETS = (0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 45.0, 60.0, 90.0, 120.0)
+
+
+class MetricsRegistry:
+    """Thread-safe registry of named counters, timings and histograms."""
+
+    def __init__(self) -> None:
+        """Initialize an empty registry."""
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._timings: Dict[str, Dict[str, float]] = {}
+        self._histograms: Dict[str, Dict[str, Any]] = {}
+
+    def increment(self, name: str, amount: float = 1.0) -> None:
+        """Add to a counter.
+
+        Args:
+            name: Dotted counter name (e.g. "export_cache.hit.disk")
+            amount: Amount to add
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0.0) + amount
+
+    def observe(self, name: str, value: float) -> None:
+        """Record one observation of a timing or size.
+
+        Args:
+            name: Dotted timing name (e.g. "jigsawstack.wait_seconds")
+            value: Observed value
+        """
+        with self._lock:
+            timing = self._timings.setdefault(name, {"count": 0.0, "total": 0.0, "max": 0.0})
+            timing["count"] += 1
+            timing["total"] += value
+            timing["max"] = max(timing["max"], value)
+
+    def observe_histogram(self, name: str, value: float, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> None:
+        """Record one observation in a histogram.
+
+        Buckets are cumulative: each counts the observations up to its bound,
+        and "+Inf" counts them all. The bounds of a histogram are fixed by its
+        first observation.
+
+        Args:
+            name: Dotted histogram name (e.g. "jigsawstack.latency_seconds.generate_image")
+            value: Observed value
+            buckets: Ascending upper bounds of the buckets
+        """
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = {"buckets": {**{f"{bound:g}": 0 for bound in buckets}, "+Inf": 0}, "count": 0, "total": 0.0}
+                self._histograms[name] = histogram
+            for bound in histogram["buckets"]:
+                if bound == "+Inf" or value <= float(bound):
+                    histogram["buckets"][bound] += 1
+            histogram["count"] += 1
+            histogram["total"] += value
+
+    def get_histogram(self, name: str) -> Dict[str, Any]:
+        """Get a copy of a histogram.
+
+        Args:
+            name: Histogram name
+
+        Returns:
+            Dictionary with the cumulative "buckets", "count" and "total", empty if nothing was observed
+        """
+        with self._lock:
+            histogram = self._histograms.get(name)
+            return {"buckets": dict(histogram["buckets"]), "count": histogram["count"], "total": histogram["total"]} if histogram else {}
+
+    def get_counter(self, name: str) -> float:
+        """Get the current value of a counter.
+
+        Args:
+            name: Counter name
+
+        Returns:
+            Counter value, 0 if it was never incremented
+        """
+        with self._lock:
+            return self._counters.get(name, 0.0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get a copy of all counters, timings and histograms.
+
+        Returns:
+            Dictionary with "counters", "timings" and "histograms"
+        """
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "timings": {name: dict(timing) for name, timing in self._timings.items()},
+                "histograms": {name: {**histogram, "buckets": dict(histogram["buckets"])} for name, histogram in self._histograms.items()},
+            }
+
+    def reset(self) -> None:
+        """Clear all counters, timings and histograms."""
+        with self._lock:
+            self._counters.clear()
+            self._timings.clear()
+            self._histograms.clear()
+
+
+# Process-wide registry
+metrics = MetricsRegistry()
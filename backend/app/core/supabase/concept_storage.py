@@ -7,6 +7,7 @@ import logging
 from typing import Any, Dict, List, Optional, TypeVar, cast
 
 from ...core.config import settings
+from ...core.exceptions import DatabaseTransactionError
 from ...utils.security.mask import mask_id, mask_path
 from .client import SupabaseClient
 
@@ -17,6 +18,9 @@ logger = logging.getLogger(__name__)
 T = TypeVar("T")
 APIResponse = Dict[str, Any]  # Supabase API response has a 'data' attribute
 
+# Database function that inserts a concept and its variations in one transaction
+CREATE_CONCEPT_FUNCTION = "create_concept_with_variations"
+
 
 class ConceptStorage:
     """Handles concept-related operations in Supabase."""
@@ -31,6 +35,8 @@ class ConceptStorage:
         self.logger = logging.getLogger("supabase_concept")
         self.concepts_table = settings.DB_TABLE_CONCEPTS
         self.palettes_table = settings.DB_TABLE_PALETTES
+        # Cleared once the database reports the function is not deployed
+        self.create_concept_function_available = True
 
     def store_concept(self, concept_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Store a new concept.
@@ -73,6 +79,10 @@ class ConceptStorage:
             if "image_url" in concept_data and concept_data["image_url"]:
                 insert_data["image_url"] = concept_data["image_url"]
 
+            # Only sent when present, so databases without the column keep working
+            if concept_data.get("export_derivatives"):
+                insert_data["export_derivatives"] = concept_data["export_derivatives"]
+
             # Explicitly remove any ID field to let the database generate it
             if "id" in insert_data:
                 self.logger.warning("Removing ID field from concept data to let database generate it")
@@ -275,6 +285,83 @@ class ConceptStorage:
             self.logger.error(f"Error storing color variations with service role: {e}")
             return None
 
+    def store_concept_with_variations(self, concept_data: Dict[str, Any], variations: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Store a concept and its color variations in a single transaction.
+
+        Calls the create_concept_with_variations database function with the
+        service role key, so either the concept and all variations are stored
+        or nothing is.
+
+        Args:
+            concept_data: Concept fields as accepted by store_concept
+            variations: Color variation fields as accepted by store_color_variations,
+                without concept_id (the function links them to the new concept)
+
+        Returns:
+            Created concept data with its variations under "color_variations",
+            or None if the function is not available
+
+        Raises:
+            DatabaseTransactionError: If the function call failed; the transaction
+                may still have committed (e.g. after a timeout), so the caller must
+                not retry with separate inserts
+        """
+        if not self.create_concept_function_available:
+            return None
+
+        try:
+            service_role_key = settings.SUPABASE_SERVICE_ROLE
+            if not service_role_key:
+                self.logger.warning("No service role key available, cannot call concept creation function")
+                return None
+
+            masked_user_id = mask_id(concept_data.get("user_id", "unknown"))
+            self.logger.info(f"Storing concept with {len(variations)} color variations in one transaction for user: {masked_user_id}")
+
+            import requests
+
+            response = requests.post(
+                f"{settings.SUPABASE_URL}/rest/v1/rpc/{CREATE_CONCEPT_FUNCTION}",
+                headers={
+                    "apikey": service_role_key,
+                    "Authorization": f"Bearer {service_role_key}",
+                    "Content-Type": "application/json",
+                },
+                json={
+                    "p_concepts_table": self.concepts_table,
+                    "p_variations_table": self.palettes_table,
+                    "p_concept": {key: value for key, value in concept_data.items() if key != "id"},
+                    "p_variations": [{key: value for key, value in variation.items() if key not in ("id", "concept_id")} for variation in variations],
+                },
+            )
+
+            if response.status_code == 200:
+                return cast(Dict[str, Any], response.json())
+
+            if response.status_code == 404 or "PGRST202" in response.text:
+                # Migration 009 has not been applied; stop trying for this instance
+                self.logger.warning(f"Concept creation function not found, falling back to separate inserts: {response.text}")
+                self.create_concept_function_available = False
+                return None
+
+            self.logger.error(f"Concept creation function failed: {response.status_code}, {response.text}")
+            raise DatabaseTransactionError(
+                message=f"Concept creation function failed with status {response.status_code}",
+                operation=CREATE_CONCEPT_FUNCTION,
+                table=self.concepts_table,
+                details={"status_code": response.status_code, "response": response.text[:200]},
+            )
+
+        except DatabaseTransactionError:
+            raise
+        except Exception as e:
+            self.logger.error(f"Error calling concept creation function: {e}")
+            raise DatabaseTransactionError(
+                message=f"Error calling concept creation function: {str(e)}",
+                operation=CREATE_CONCEPT_FUNCTION,
+                table=self.concepts_table,
+            )
+
     def get_recent_concepts(self, user_id: str, limit: int = 10) -> List[Dict[str, Any]]:
         """Get recent concepts for a user.
 
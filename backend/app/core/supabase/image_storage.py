@@ -408,6 +408,7 @@ class ImageStorage:
         user_id: str,
         is_palette: bool = False,
         metadata: Optional[Dict[str, Any]] = None,
+        upsert: bool = False,
     ) -> bool:
         """Upload an image to Supabase Storage with direct HTTP request.
 
@@ -421,6 +422,7 @@ class ImageStorage:
             user_id: User ID for authentication (REQUIRED for RLS)
             is_palette: Whether to use the palette bucket
             metadata: Optional metadata to store with the image
+            upsert: Whether to overwrite an existing object at the path
 
         Returns:
             True if upload successful, False otherwise
@@ -448,6 +450,8 @@ class ImageStorage:
                 "apikey": api_key,
                 "Content-Type": content_type,
             }
+            if upsert:
+                headers["x-upsert"] = "true"
 
             # Upload using httpx for async
             import httpx
@@ -594,3 +598,52 @@ class ImageStorage:
         except Exception as e:
             self.logger.error(f"Error creating signed URL: {str(e)}")
             return None
+
+    def create_signed_urls(self, paths: List[str], bucket_name: str, expires_in: int = settings.SIGNED_URL_EXPIRY_SECONDS) -> Dict[str, str]:
+        """Create signed URLs for several files of one user in a single request.
+
+        Args:
+            paths: Storage paths of the files, all starting with the same user ID segment
+            bucket_name: Storage bucket name
+            expires_in: Seconds until the URLs expire (default: 31 days)
+
+        Returns:
+            Signed URLs by path; paths that could not be signed (e.g. missing files) are left out
+        """
+        if not paths:
+            return {}
+
+        user_ids = {path.split("/")[0] for path in paths if "/" in path}
+        if len(user_ids) != 1:
+            self.logger.warning(f"Signed URL batch must cover exactly one user, got {len(user_ids)}")
+            return {}
+
+        try:
+            # Create JWT with the user's ID - critical for RLS policies
+            token = create_supabase_jwt(user_ids.pop())
+            api_url = self.client.url
+
+            response = requests.post(
+                f"{api_url}/storage/v1/object/sign/{bucket_name}",
+                headers={"Authorization": f"Bearer {token}", "apikey": self.client.key},
+                json={"expiresIn": expires_in, "paths": paths},
+            )
+            if response.status_code != 200:
+                self.logger.warning(f"Failed to sign {len(paths)} URLs: {response.status_code}")
+                return {}
+
+            signed_urls: Dict[str, str] = {}
+            for entry in response.json():
+                signed_url = entry.get("signedUrl") or entry.get("signedURL")
+                if entry.get("error") or not signed_url:
+                    continue
+                if signed_url.startswith("/"):
+                    signed_url = f"{api_url}{signed_url}"
+                if "/object/sign/" in signed_url and "/storage/v1/object/sign/" not in signed_url:
+                    signed_url = signed_url.replace("/object/sign/", "/storage/v1/object/sign/")
+                signed_urls[entry["path"]] = signed_url
+            return signed_urls
+
+        except Exception as e:
+            self.logger.error(f"Error creating signed URLs: {str(e)}")
+            return {}
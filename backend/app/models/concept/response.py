@@ -4,7 +4,7 @@ This module defines Pydantic models for structuring responses from
 concept generation and refinement endpoints.
 """
 
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from pydantic import Field, HttpUrl
 
@@ -22,6 +22,15 @@ class ColorPalette(APIBaseModel):
     additional_colors: List[str] = Field(default=[], description="Additional color options")
 
 
+class ImageSources(APIBaseModel):
+    """Responsive sources of an image in the format negotiated from the Accept header."""
+
+    format: str = Field(..., description="Image format of the sources (avif, webp or png)")
+    content_type: str = Field(..., description="Content type of the sources")
+    srcset: str = Field(..., description="srcset attribute value listing each size with its width")
+    urls: Dict[str, HttpUrl] = Field(..., description="URL of each size (thumb, small, medium)")
+
+
 class PaletteVariation(APIBaseModel):
     """Model for a color palette variation with its own image."""
 
@@ -29,6 +38,7 @@ class PaletteVariation(APIBaseModel):
     colors: List[str] = Field(..., description="List of hex color codes")
     description: Optional[str] = Field(None, description="Description of the palette")
     image_url: HttpUrl = Field(..., description="URL of the image with this palette")
+    image_sources: Optional[ImageSources] = Field(None, description="Responsive sources of the image, if pre-rendered")
 
 
 class GenerationResponse(APIBaseModel):
@@ -70,6 +80,7 @@ class ConceptSummary(APIBaseModel):
     logo_description: str = Field(..., description="The logo description prompt")
     theme_description: str = Field(..., description="The theme description prompt")
     image_url: HttpUrl = Field(..., description="URL of the concept image")
+    image_sources: Optional[ImageSources] = Field(None, description="Responsive sources of the concept image, if pre-rendered")
     has_variations: bool = Field(default=True, description="Whether the concept has color variations")
     variations_count: int = Field(default=0, description="Number of available color variations")
     is_refinement: bool = Field(default=False, description="Whether this is a refinement of another concept")
@@ -1,7 +1,8 @@
 """Export models package containing export-related data models."""
 
-from .request import ExportRequest
+from .request import ConceptPackageExportRequest, ExportRequest
 
 __all__ = [
     "ExportRequest",
+    "ConceptPackageExportRequest",
 ]
@@ -3,9 +3,9 @@
 This module defines the request models for image export functionality.
 """
 
-from typing import Dict, Literal, Optional
+from typing import Dict, List, Literal, Optional
 
-from pydantic import Field, field_validator
+from pydantic import Field, field_validator, model_validator
 
 from ..common.base import APIBaseModel
 
@@ -27,6 +27,21 @@ class ExportRequest(APIBaseModel):
         "concept-images",
         description="Storage bucket where the image is stored (concept-images or palette-images)",
     )
+    max_bytes: Optional[int] = Field(
+        None,
+        gt=0,
+        description="Optional byte budget: the quality (and format, if allowed) is searched for the best PNG/JPEG export that fits",
+    )
+    min_quality: Optional[float] = Field(
+        None,
+        gt=0,
+        le=1,
+        description="Optional perceptual-quality floor (SSIM against the resized source): the smallest PNG/JPEG export reaching it is returned",
+    )
+    allow_format_change: bool = Field(
+        False,
+        description="Whether a budgeted export may be encoded as WebP, JPEG or PNG, whichever is smallest",
+    )
 
     @classmethod
     @field_validator("image_identifier")
@@ -45,3 +60,19 @@ class ExportRequest(APIBaseModel):
         if v not in valid_buckets:
             raise ValueError(f"storage_bucket must be one of: {', '.join(valid_buckets)}")
         return v
+
+    @model_validator(mode="after")
+    def validate_optimization(self) -> "ExportRequest":
+        """Reject byte budgets and quality floors on SVG exports."""
+        if self.target_format == "svg" and (self.max_bytes is not None or self.min_quality is not None):
+            raise ValueError("max_bytes and min_quality only apply to raster exports")
+        return self
+
+
+class ConceptPackageExportRequest(APIBaseModel):
+    """Request model for exporting a concept and its variations as a ZIP package."""
+
+    concept_id: str = Field(..., description="ID of the concept to export")
+    formats: List[Literal["png", "jpg", "svg"]] = Field(["png"], min_length=1, description="Formats each image is included in")
+    target_size: Literal["small", "medium", "large", "original"] = Field("original", description="Target size of the exported images")
+    include_palettes: bool = Field(True, description="Whether to include a swatch image per palette")
@@ -1,7 +1,9 @@
 """Task models package containing task-related data models."""
 
-from .response import TaskResponse
+from .response import TaskProgress, TaskResponse, TaskVariationProgress
 
 __all__ = [
+    "TaskProgress",
     "TaskResponse",
+    "TaskVariationProgress",
 ]
@@ -4,13 +4,41 @@ This module defines Pydantic models for structuring responses from
 task management endpoints.
 """
 
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 from pydantic import Field
 
 from ..common.base import APIBaseModel
 
 
+class TaskVariationProgress(APIBaseModel):
+    """A palette variation that finished before its task completed."""
+
+    index: int = Field(..., description="Position of the palette in the generated palette list")
+    name: Optional[str] = Field(None, description="Palette name")
+    colors: List[str] = Field(default=[], description="Palette colors as hex codes")
+    image_path: Optional[str] = Field(None, description="Storage path of the variation image")
+    image_url: Optional[str] = Field(None, description="URL of the variation image")
+
+
+class TaskPalettePreview(APIBaseModel):
+    """A palette derived locally from the base image, shown until the generated ones are ready."""
+
+    name: Optional[str] = Field(None, description="Palette name")
+    colors: List[str] = Field(default=[], description="Palette colors as hex codes")
+    description: Optional[str] = Field(None, description="Palette description")
+
+
+class TaskProgress(APIBaseModel):
+    """Progress of a task that is still running, including partial results."""
+
+    stage: Optional[str] = Field(None, description="Name of the stage currently running")
+    percent: int = Field(0, ge=0, le=100, description="Estimated completion percentage")
+    image_url: Optional[str] = Field(None, description="URL of the base image once it has been stored")
+    variations: List[TaskVariationProgress] = Field(default=[], description="Palette variations finished so far")
+    preview_palettes: List[TaskPalettePreview] = Field(default=[], description="Locally derived palettes shown while the generated ones are pending")
+
+
 class TaskResponse(APIBaseModel):
     """Response model for task creation and status updates."""
 
@@ -33,3 +61,5 @@ class TaskResponse(APIBaseModel):
     image_url: Optional[str] = Field(None, description="URL of the generated image (for completed tasks)")
 
     error_message: Optional[str] = Field(None, description="Error message if the task failed")
+
+    progress: Optional[TaskProgress] = Field(default=None, description="Progress and partial results while the task is running")
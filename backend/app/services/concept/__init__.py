@@ -8,6 +8,7 @@ from functools import lru_cache
 from fastapi import Depends
 
 from app.services.concept.interface import ConceptServiceInterface
+from app.services.concept.palette_cache import get_palette_cache
 from app.services.concept.service import ConceptService
 from app.services.image import get_image_service
 from app.services.image.interface import ImageServiceInterface
@@ -42,4 +43,5 @@ def get_concept_service(
         image_service=image_service,
         concept_persistence_service=concept_persistence_service,
         image_persistence_service=image_persistence_service,
+        palette_cache=get_palette_cache(),
     )
@@ -52,12 +52,12 @@ class ConceptGenerator:
                 model="stable-diffusion-xl",
             )
 
-            # Make sure we have a valid image URL
-            if not isinstance(image_result, dict) or "url" not in image_result:
+            # Make sure we have a valid image URL, or the image bytes returned by the API
+            if not isinstance(image_result, dict) or not ("url" in image_result or "binary_data" in image_result):
                 raise ConceptError("Invalid image response from JigsawStack client")
 
-            # Extract the image URL from the response
-            image_url = image_result["url"]
+            # Extract the image URL from the response (none when the API returned the bytes)
+            image_url = image_result.get("url", "")
 
             # Generate color palette based on theme description using multiple palettes
             palettes = await self.client.generate_multiple_palettes(
@@ -1,7 +1,7 @@
 """Interface for the concept generation and refinement service."""
 
 import abc
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Awaitable, Dict, List, Optional, Tuple
 
 
 class ConceptServiceInterface(abc.ABC):
@@ -95,6 +95,8 @@ class ConceptServiceInterface(abc.ABC):
         theme_description: str,
         logo_description: Optional[str] = None,
         num_palettes: int = 7,
+        base_image: Optional[bytes] = None,
+        local_palettes: Optional[Awaitable[Optional[List[Dict[str, Any]]]]] = None,
     ) -> List[Dict[str, Any]]:
         """Generate multiple color palettes based on a theme description.
 
@@ -102,6 +104,10 @@ class ConceptServiceInterface(abc.ABC):
             theme_description: Description of the theme/color scheme
             logo_description: Optional description of the logo to help contextualize
             num_palettes: Number of palettes to generate
+            base_image: Optional image the palettes are for, used by the local
+                fallback when the API is slow or unavailable
+            local_palettes: Optional palettes already being derived locally,
+                used by the fallback instead of deriving them again
 
         Returns:
             List of palette dictionaries, each containing name, colors, and description
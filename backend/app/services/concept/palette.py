@@ -3,23 +3,48 @@
 This module provides functionality for generating and manipulating color palettes.
 """
 
+import asyncio
 import logging
-from typing import Any, Dict, List, Optional
+from functools import partial
+from typing import Any, Awaitable, Dict, List, Optional
 
-from app.core.exceptions import ConceptError, JigsawStackError
+from app.core.config import settings
+from app.core.exceptions import ConceptError, JigsawStackConnectionError, JigsawStackError, JigsawStackGenerationError
+from app.core.metrics import metrics
+from app.services.concept.palette_cache import PaletteCache
+from app.services.image.contrast import rank_palettes
+from app.services.image.harmony import generate_local_palettes, generate_palettes_from_image
 from app.services.jigsawstack.client import JigsawStackClient
 
 
 class PaletteGenerator:
     """Component responsible for generating color palettes."""
 
-    def __init__(self, client: JigsawStackClient):
+    def __init__(
+        self,
+        client: JigsawStackClient,
+        cache: Optional[PaletteCache] = None,
+        local_fallback: Optional[bool] = None,
+        latency_budget_seconds: Optional[float] = None,
+        extra_candidates: Optional[int] = None,
+    ):
         """Initialize the palette generator.
 
         Args:
             client: The JigsawStack API client
+            cache: Optional cache of generated palettes; the API is always called when None
+            local_fallback: Whether to return locally derived palettes when the API is
+                over its latency budget, unavailable or failing, PALETTE_LOCAL_FALLBACK_ENABLED if not given
+            latency_budget_seconds: Longest wait for the API before falling back,
+                PALETTE_API_LATENCY_BUDGET_SECONDS if not given; 0 waits indefinitely
+            extra_candidates: Palettes requested beyond the number needed, the worst
+                scoring ones being dropped, PALETTE_EXTRA_CANDIDATES if not given
         """
         self.client = client
+        self.cache = cache
+        self.local_fallback = local_fallback if local_fallback is not None else settings.PALETTE_LOCAL_FALLBACK_ENABLED
+        self.latency_budget_seconds = latency_budget_seconds if latency_budget_seconds is not None else settings.PALETTE_API_LATENCY_BUDGET_SECONDS
+        self.extra_candidates = max(0, extra_candidates if extra_candidates is not None else settings.PALETTE_EXTRA_CANDIDATES)
         self.logger = logging.getLogger("concept_service.palette")
 
     async def generate_palettes(
@@ -27,13 +52,36 @@ class PaletteGenerator:
         theme_description: str,
         logo_description: Optional[str] = None,
         num_palettes: int = 7,
+        base_image: Optional[bytes] = None,
+        local_palettes: Optional[Awaitable[Optional[List[Dict[str, Any]]]]] = None,
     ) -> List[Dict[str, Any]]:
         """Generate multiple color palettes based on a theme description.
 
+        With a cache, palettes previously generated for the same normalized
+        descriptions and count are reused, and stale ones refreshed in the
+        background.
+
+        With extra candidates, more palettes than needed are requested and only
+        the best ones by contrast and color distinctness are returned, so
+        palettes that would be discarded are never rendered.
+
+        With the local fallback, palettes derived locally from the base image's
+        colors and the descriptions are returned instead when the API is
+        unavailable or, with a latency budget, takes longer than the budget. A
+        call over the budget is cancelled.
+
+        When the API answers with an error or an invalid response, or with fewer
+        palettes than needed, local palettes (or without the local fallback, the
+        client's default palettes) fill in after ranking; they are never cached.
+
         Args:
             theme_description: Description of the theme/color scheme
             logo_description: Optional description of the logo to help contextualize
             num_palettes: Number of palettes to generate
+            base_image: Optional image the palettes are for, whose dominant colors
+                the local palettes are derived from
+            local_palettes: Optional palettes already being derived locally (the
+                worker's preview), returned by the fallback instead of deriving them again
 
         Returns:
             List of palette dictionaries, each containing name, colors, and description
@@ -47,15 +95,52 @@ class PaletteGenerator:
         self.logger.info(f"Generating {num_palettes} color palettes for: {theme_description}")
 
         try:
-            # Generate palettes using the multiple palettes endpoint
-            palettes = await self.client.generate_multiple_palettes(
+            # Generate palettes using the multiple palettes endpoint, with candidates to drop;
+            # only palettes the API returned are cached and ranked, fallbacks being filled in here
+            candidates = num_palettes + self.extra_candidates
+            generate = partial(
+                self.client.generate_multiple_palettes,
                 logo_description=logo_description or "",
                 theme_description=theme_description,
-                num_palettes=num_palettes,
+                num_palettes=candidates,
+                min_palettes=0,
+                use_defaults=False,
             )
+            if self.cache is not None:
+                pending = self.cache.get_or_generate(logo_description or "", theme_description, candidates, generate)
+            else:
+                pending = generate()
+
+            if self.local_fallback and self.latency_budget_seconds > 0:
+                palettes = await self._within_budget(pending)
+                if palettes is None:
+                    self.logger.warning(f"Palette generation exceeded its {self.latency_budget_seconds}s budget, using local palettes")
+                    metrics.increment("palettes.local_fallback.timeout")
+                    return await self.generate_local_palettes(theme_description, logo_description, num_palettes, base_image, local_palettes)
+            else:
+                palettes = await pending
+
+            if len(palettes) > num_palettes:
+                metrics.increment("palettes.candidates_dropped", len(palettes) - num_palettes)
+                palettes = rank_palettes(palettes, num_palettes)
+            elif len(palettes) < num_palettes:
+                # Filled in after ranking, so fallback palettes never outrank returned ones
+                metrics.increment("palettes.padded", num_palettes - len(palettes))
+                palettes = palettes + await self._fallback_palettes(theme_description, logo_description, num_palettes - len(palettes), base_image, local_palettes)
 
             self.logger.info(f"Successfully generated {len(palettes)} palettes")
             return palettes
+        except JigsawStackConnectionError:
+            if not self.local_fallback:
+                self.logger.error("JigsawStack API error during palette generation", exc_info=True)
+                raise
+            self.logger.warning("JigsawStack API unavailable for palette generation, using local palettes", exc_info=True)
+            metrics.increment("palettes.local_fallback.unavailable")
+            return await self.generate_local_palettes(theme_description, logo_description, num_palettes, base_image, local_palettes)
+        except JigsawStackGenerationError:
+            self.logger.warning("JigsawStack API failed to generate palettes, using fallback palettes", exc_info=True)
+            metrics.increment("palettes.local_fallback.failed" if self.local_fallback else "palettes.default_fallback.failed")
+            return await self._fallback_palettes(theme_description, logo_description, num_palettes, base_image, local_palettes)
         except JigsawStackError:
             # Re-raise specific JigsawStack errors
             self.logger.error("JigsawStack API error during palette generation", exc_info=True)
@@ -71,6 +156,72 @@ class PaletteGenerator:
                 },
             )
 
+    async def _within_budget(self, pending: Awaitable[List[Dict[str, Any]]]) -> Optional[List[Dict[str, Any]]]:
+        """Wait for palettes up to the latency budget.
+
+        Args:
+            pending: The API (or cache) call
+
+        Returns:
+            The palettes, or None if the call was still running at the end of the
+            budget and was cancelled
+        """
+        try:
+            return await asyncio.wait_for(pending, self.latency_budget_seconds)
+        except asyncio.TimeoutError:
+            return None
+
+    async def _fallback_palettes(
+        self,
+        theme_description: str,
+        logo_description: Optional[str],
+        num_palettes: int,
+        base_image: Optional[bytes],
+        local_palettes: Optional[Awaitable[Optional[List[Dict[str, Any]]]]],
+    ) -> List[Dict[str, Any]]:
+        """Get the palettes used in place of ones the API failed to return.
+
+        Returns:
+            Locally derived palettes with the local fallback, the client's default
+            palettes otherwise
+        """
+        if self.local_fallback:
+            return await self.generate_local_palettes(theme_description, logo_description, num_palettes, base_image, local_palettes)
+        return self.client.get_default_palettes(num_palettes, logo_description or "", theme_description)
+
+    async def generate_local_palettes(
+        self,
+        theme_description: str,
+        logo_description: Optional[str] = None,
+        num_palettes: int = 7,
+        base_image: Optional[bytes] = None,
+        local_palettes: Optional[Awaitable[Optional[List[Dict[str, Any]]]]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Derive palettes locally, without calling the API.
+
+        Args:
+            theme_description: Description of the theme/color scheme
+            logo_description: Optional description of the logo
+            num_palettes: Number of palettes to derive
+            base_image: Optional image whose dominant colors the palettes are built on
+            local_palettes: Optional palettes already being derived, returned when
+                they succeed instead of deriving them again
+
+        Returns:
+            List of palette dictionaries, each containing name, colors, and description
+        """
+        if local_palettes is not None:
+            palettes = await local_palettes
+            if palettes:
+                return palettes[:num_palettes]
+        descriptions = f"{logo_description or ''} {theme_description}"
+        if base_image is not None:
+            try:
+                return await generate_palettes_from_image(base_image, num_palettes, descriptions)
+            except Exception as e:
+                self.logger.warning(f"Could not derive palettes from the base image: {str(e)}")
+        return generate_local_palettes(num_palettes, theme_description=descriptions)
+
     async def generate_single_palette(self, theme_description: str, num_colors: int = 8) -> List[str]:
         """Generate a single color palette with the specified number of colors.
 
@@ -0,0 +1,294 @@
+"""Palette response cache.
+
+This module caches the palettes generated by the prompt engine, keyed by the
+normalized logo and theme descriptions and the number of palettes, so a
+resubmitted (or nearly resubmitted) pair skips the LLM round trip. Entries are
+kept in a small in-process tier and optionally in Redis, shared by API and
+worker instances. Entries are fresh for a TTL, then served stale for a grace
+period while a single background request refreshes them.
+"""
+
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Bump when the palette prompt or response parsing changes
+PALETTE_CACHE_VERSION = 2
+
+# Words dropped from the descriptions for the stop-word-stripped key
+PALETTE_STOP_WORDS = frozenset("a an and are as at be but by for from has have in into is it its of on or that the their this to with".split())
+
+# Words of a description once case-folded (punctuation is dropped)
+_WORD_PATTERN = re.compile(r"[^\W_]+(?:['-][^\W_]+)*")
+
+
+def normalize_description(text: str, strip_stop_words: bool = False) -> str:
+    """Normalize a description for use in a cache key.
+
+    Args:
+        text: Logo or theme description
+        strip_stop_words: Whether to also drop punctuation and common stop words
+
+    Returns:
+        The case-folded description with whitespace collapsed
+    """
+    folded = text.casefold()
+    if not strip_stop_words:
+        return " ".join(folded.split())
+    return " ".join(word for word in _WORD_PATTERN.findall(folded) if word not in PALETTE_STOP_WORDS)
+
+
+@dataclass
+class CachedPalettes:
+    """Palettes read from the cache."""
+
+    palettes: List[Dict[str, Any]]
+    created_at: float
+    tier: str
+
+    def age(self, now: Optional[float] = None) -> float:
+        """Get the age of the entry in seconds."""
+        return (now if now is not None else time.time()) - self.created_at
+
+
+class PaletteCache:
+    """Two-tier cache of generated palettes with stale-while-revalidate."""
+
+    def __init__(
+        self,
+        redis_client: Any = None,
+        ttl_seconds: int = 86400,
+        stale_seconds: int = 86400,
+        strip_stop_words: bool = False,
+        local_max_entries: int = 256,
+        key_prefix: str = "palettes:",
+    ):
+        """Initialize the cache.
+
+        Args:
+            redis_client: Optional synchronous Redis client of the shared tier
+            ttl_seconds: Age up to which entries are served without a refresh
+            stale_seconds: Grace period after the TTL during which entries are served while refreshing
+            strip_stop_words: Whether keys ignore punctuation and stop words, not just case and whitespace
+            local_max_entries: Entries kept in the in-process tier before the least recently used is evicted
+            key_prefix: Prefix of the Redis keys
+        """
+        self.redis = redis_client
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.strip_stop_words = strip_stop_words
+        self.local_max_entries = local_max_entries
+        self.key_prefix = key_prefix
+        self._lock = threading.Lock()
+        # (created_at, palettes) by key, in least recently used order
+        self._local: "OrderedDict[str, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._refreshing: Set[str] = set()
+        self._refresh_tasks: Set["asyncio.Task[None]"] = set()
+
+    def make_key(self, logo_description: str, theme_description: str, num_palettes: int) -> str:
+        """Build the cache key of a palette request.
+
+        Args:
+            logo_description: Description of the logo
+            theme_description: Description of the theme
+            num_palettes: Number of palettes requested
+
+        Returns:
+            Hex digest identifying the request
+        """
+        encoded = json.dumps(
+            [
+                normalize_description(logo_description, self.strip_stop_words),
+                normalize_description(theme_description, self.strip_stop_words),
+                num_palettes,
+            ]
+        )
+        return hashlib.sha256(f"{PALETTE_CACHE_VERSION}:{encoded}".encode("utf-8")).hexdigest()
+
+    def _get_local(self, key: str) -> Optional[CachedPalettes]:
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            self._local.move_to_end(key)
+        return CachedPalettes(copy.deepcopy(entry[1]), entry[0], "local")
+
+    def _put_local(self, key: str, palettes: List[Dict[str, Any]], created_at: float) -> None:
+        with self._lock:
+            self._local[key] = (created_at, copy.deepcopy(palettes))
+            self._local.move_to_end(key)
+            while len(self._local) > self.local_max_entries:
+                self._local.popitem(last=False)
+
+    def _get_redis(self, key: str) -> Optional[CachedPalettes]:
+        value = self.redis.get(f"{self.key_prefix}{key}")
+        if value is None:
+            return None
+        entry = json.loads(value)
+        return CachedPalettes(entry["palettes"], float(entry["created_at"]), "redis")
+
+    def _put_redis(self, key: str, palettes: List[Dict[str, Any]], created_at: float) -> None:
+        value = json.dumps({"palettes": palettes, "created_at": created_at})
+        self.redis.set(f"{self.key_prefix}{key}", value, ex=self.ttl_seconds + self.stale_seconds)
+
+    async def get(self, key: str) -> Optional[CachedPalettes]:
+        """Look up palettes, filling the local tier from Redis.
+
+        Redis is only read when the local entry is missing or stale. Entries
+        past the stale grace period are treated as misses.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            The cached palettes (fresh or stale), or None on a miss
+        """
+        entry = self._get_local(key)
+        if entry is not None and entry.age() < self.ttl_seconds:
+            return entry
+
+        # A stale or missing local entry may have been refreshed by another instance
+        if self.redis is not None:
+            try:
+                shared = await asyncio.to_thread(self._get_redis, key)
+            except Exception as e:
+                logger.warning(f"Error reading palette cache from Redis: {str(e)}")
+                shared = None
+            if shared is not None and (entry is None or shared.created_at > entry.created_at):
+                self._put_local(key, shared.palettes, shared.created_at)
+                entry = shared
+
+        if entry is not None and entry.age() < self.ttl_seconds + self.stale_seconds:
+            return entry
+        return None
+
+    async def put(self, key: str, palettes: List[Dict[str, Any]]) -> None:
+        """Store palettes in every tier.
+
+        Errors are logged rather than raised; the palettes have been generated.
+
+        Args:
+            key: Cache key
+            palettes: Generated palettes
+        """
+        created_at = time.time()
+        self._put_local(key, palettes, created_at)
+        if self.redis is not None:
+            try:
+                await asyncio.to_thread(self._put_redis, key, palettes, created_at)
+            except Exception as e:
+                logger.warning(f"Error writing palette cache to Redis: {str(e)}")
+
+    async def get_or_generate(
+        self,
+        logo_description: str,
+        theme_description: str,
+        num_palettes: int,
+        generate: Callable[[], Awaitable[List[Dict[str, Any]]]],
+    ) -> List[Dict[str, Any]]:
+        """Get palettes from the cache, generating them on a miss.
+
+        Stale entries are returned at once, and refreshed by one background
+        call of generate per key.
+
+        Args:
+            logo_description: Description of the logo
+            theme_description: Description of the theme
+            num_palettes: Number of palettes requested
+            generate: Coroutine function calling the prompt engine
+
+        Returns:
+            The palettes
+        """
+        key = self.make_key(logo_description, theme_description, num_palettes)
+        entry = await self.get(key)
+
+        if entry is not None and entry.age() < self.ttl_seconds:
+            metrics.increment(f"palette_cache.hit.{entry.tier}")
+            return entry.palettes
+
+        if entry is not None:
+            metrics.increment(f"palette_cache.stale.{entry.tier}")
+            self._schedule_refresh(key, generate)
+            return entry.palettes
+
+        metrics.increment("palette_cache.miss")
+        palettes = await generate()
+        if palettes:
+            await self.put(key, palettes)
+        return palettes
+
+    def _schedule_refresh(self, key: str, generate: Callable[[], Awaitable[List[Dict[str, Any]]]]) -> None:
+        """Start a background refresh of a stale entry unless one is running."""
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        task = asyncio.create_task(self._refresh(key, generate))
+        # Keep a reference so the task is not garbage collected while running
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+
+    async def wait_for_refreshes(self) -> None:
+        """Wait for the background refreshes started in this process to finish.
+
+        The worker runs each message in its own event loop, whose tasks are
+        cancelled when it closes, so it waits for refreshes before returning.
+        """
+        if self._refresh_tasks:
+            await asyncio.gather(*self._refresh_tasks, return_exceptions=True)
+
+    async def _refresh(self, key: str, generate: Callable[[], Awaitable[List[Dict[str, Any]]]]) -> None:
+        try:
+            palettes = await generate()
+            if palettes:
+                await self.put(key, palettes)
+                metrics.increment("palette_cache.refreshed")
+        except Exception as e:
+            # The stale entry keeps being served until it expires
+            metrics.increment("palette_cache.refresh_failed")
+            logger.warning(f"Error refreshing cached palettes: {str(e)}")
+        finally:
+            self._refreshing.discard(key)
+
+
+@lru_cache()
+def get_palette_cache() -> Optional[PaletteCache]:
+    """Get the palette cache for this process.
+
+    Returns:
+        PaletteCache configured from settings, with a Redis tier when Redis is
+        configured and reachable, or None if caching is disabled
+    """
+    if not settings.PALETTE_CACHE_ENABLED:
+        return None
+
+    redis_client = None
+    if settings.UPSTASH_REDIS_ENDPOINT:
+        # Imported here so palette generation has no hard Redis dependency
+        from app.core.limiter.redis_store import get_shared_redis_client
+
+        redis_client = get_shared_redis_client()
+        if redis_client is None:
+            logger.warning("Redis unavailable, palettes will only be cached in this process")
+
+    return PaletteCache(
+        redis_client,
+        ttl_seconds=settings.PALETTE_CACHE_TTL_SECONDS,
+        stale_seconds=settings.PALETTE_CACHE_STALE_SECONDS,
+        strip_stop_words=settings.PALETTE_CACHE_STRIP_STOP_WORDS,
+        local_max_entries=settings.PALETTE_CACHE_LOCAL_MAX_ENTRIES,
+    )
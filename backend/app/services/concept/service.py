@@ -4,10 +4,8 @@ This module implements the ConceptService class which integrates the specialized
 concept generation, refinement, and palette generation modules.
 """
 
-import os
-import uuid
 from io import BytesIO
-from typing import Any, Dict, List, Optional, Tuple, Union
+from typing import Any, Awaitable, Dict, List, Optional, Tuple, Union
 
 import httpx
 from fastapi import UploadFile
@@ -16,9 +14,11 @@ from app.core.exceptions import ConceptError
 from app.services.concept.generation import ConceptGenerator
 from app.services.concept.interface import ConceptServiceInterface
 from app.services.concept.palette import PaletteGenerator
+from app.services.concept.palette_cache import PaletteCache
 from app.services.concept.refinement import ConceptRefiner
 from app.services.image.interface import ImageServiceInterface
 from app.services.jigsawstack.client import JigsawStackClient
+from app.services.jigsawstack.transport import CappedTransport
 from app.services.persistence.interface import ConceptPersistenceServiceInterface, ImagePersistenceServiceInterface
 from app.utils.logging import get_logger
 from app.utils.security.mask import mask_id
@@ -33,6 +33,7 @@ class ConceptService(ConceptServiceInterface):
         image_service: ImageServiceInterface,
         concept_persistence_service: ConceptPersistenceServiceInterface,
         image_persistence_service: ImagePersistenceServiceInterface,
+        palette_cache: Optional[PaletteCache] = None,
     ):
         """Initialize the concept service with specialized components.
 
@@ -41,6 +42,7 @@ class ConceptService(ConceptServiceInterface):
             image_service: Service for image processing
             concept_persistence_service: Service for concept persistence
             image_persistence_service: Service for image persistence
+            palette_cache: Optional cache of generated palettes
         """
         self.client = client
         self.image_service = image_service
@@ -51,7 +53,7 @@ class ConceptService(ConceptServiceInterface):
         # Initialize specialized components
         self.generator = ConceptGenerator(client)
         self.refiner = ConceptRefiner(client)
-        self.palette_generator = PaletteGenerator(client)
+        self.palette_generator = PaletteGenerator(client, cache=palette_cache)
 
     async def generate_concept(
         self,
@@ -80,62 +82,51 @@ class ConceptService(ConceptServiceInterface):
             # Generate the image using the JigsawStack client - only use logo_description for image generation
             image_response = await self.client.generate_image(prompt=logo_description, width=256, height=256)
 
-            # Extract the image URL from the response - handling different response formats
+            # Extract the image URL or bytes from the response - handling different response formats
             image_url = None
+            image_content: Optional[bytes] = None
 
             if image_response:
+                # Binary responses are kept in memory, with no URL until the image is stored
+                if image_response.get("binary_data"):
+                    image_content = image_response["binary_data"]
                 # Direct url in the response
-                if "url" in image_response:
+                elif "url" in image_response:
                     image_url = image_response.get("url")
                 # Check for nested output structure
                 elif "output" in image_response and isinstance(image_response["output"], dict):
                     if "image_url" in image_response["output"]:
                         image_url = image_response["output"]["image_url"]
-                # Check for binary_data
-                elif "binary_data" in image_response:
-                    # If we have binary data but no URL, we could create a local file and reference it
-                    import os
-                    import tempfile
-                    import uuid
-
-                    # Generate a temporary filename
-                    filename = f"temp_image_{uuid.uuid4()}.png"
-                    temp_path = os.path.join(tempfile.gettempdir(), filename)
-
-                    # Save the image data
-                    with open(temp_path, "wb") as f:
-                        f.write(image_response["binary_data"])
-
-                    # Set the URL to the local file path
-                    image_url = f"file://{temp_path}"
-                    self.logger.info(f"Created local file for binary data: {temp_path}")
-
-            # Check if we have a valid URL
-            if not image_url:
+
+            # Check if we have a valid URL or the image itself
+            if not image_url and image_content is None:
                 self.logger.error(f"No image URL returned from image generation service. Response: {str(image_response)}")
                 raise ConceptError("No image URL returned from image generation service")
 
-            self.logger.info(f"Image generated successfully: {image_url}")
+            if image_url:
+                self.logger.info(f"Image generated successfully: {image_url}")
+            else:
+                self.logger.info(f"Image generated successfully, {len(image_content or b'')} bytes in memory")
 
             # Initialize variables
             image_path = None
             concept_id = None
             stored_image_url = None
-            image_content = None
 
             # If a user ID is provided, download the image
             if user_id:
                 try:
                     # Always download the image content if user_id is provided,
                     # regardless of skip_persistence flag
-                    self.logger.info(f"Downloading image from URL: {image_url}")
-                    image_content = await self._download_image(image_url)
+                    if image_content is None:
+                        self.logger.info(f"Downloading image from URL: {image_url}")
+                        image_content = await self._download_image(image_url)
 
                     # Check if image_content is None before using it
                     if image_content is None:
                         raise ConceptError("Failed to download image content")
 
-                    self.logger.info(f"Successfully downloaded image, size: {len(image_content)} bytes")
+                    self.logger.info(f"Got image content, size: {len(image_content)} bytes")
 
                     # Only store the image and concept if not skipping persistence
                     if not skip_persistence:
@@ -189,7 +180,7 @@ class ConceptService(ConceptServiceInterface):
                 "theme_description": theme_description,
             }
 
-            # Include the image data if it was downloaded (useful for background tasks)
+            # Include the image data if it was returned or downloaded (useful for background tasks)
             if image_content:
                 response["image_data"] = image_content
 
@@ -236,6 +227,7 @@ class ConceptService(ConceptServiceInterface):
             theme_description=theme_description,
             logo_description=logo_description,
             num_palettes=num_palettes,
+            base_image=base_concept_data.get("image_data"),
         )
 
         # Initialize empty variation images list
@@ -244,10 +236,10 @@ class ConceptService(ConceptServiceInterface):
         # Get the image URL from the base concept
         base_image_url = base_concept_data.get("image_url")
 
-        if base_image_url and self.image_service:
+        if (base_image_url or base_concept_data.get("image_data")) and self.image_service:
             try:
-                # Download the base image
-                base_image_data = await self._download_image(base_image_url)
+                # Use the base image returned in memory, or download it
+                base_image_data = base_concept_data.get("image_data") or await self._download_image(base_image_url)
 
                 # Generate variations for each palette
                 if base_image_data is not None and palettes:
@@ -411,6 +403,8 @@ class ConceptService(ConceptServiceInterface):
         theme_description: str,
         logo_description: Optional[str] = None,
         num_palettes: int = 7,
+        base_image: Optional[bytes] = None,
+        local_palettes: Optional[Awaitable[Optional[List[Dict[str, Any]]]]] = None,
     ) -> List[Dict[str, Any]]:
         """Generate multiple color palettes based on a theme description.
 
@@ -418,6 +412,10 @@ class ConceptService(ConceptServiceInterface):
             theme_description: Description of the theme/color scheme
             logo_description: Optional description of the logo to help contextualize
             num_palettes: Number of palettes to generate
+            base_image: Optional image the palettes are for, used by the local
+                fallback when the API is slow or unavailable
+            local_palettes: Optional palettes already being derived locally,
+                used by the fallback instead of deriving them again
 
         Returns:
             List of palette dictionaries, each containing name, colors, and description
@@ -435,6 +433,8 @@ class ConceptService(ConceptServiceInterface):
             theme_description=theme_description,
             logo_description=logo_description,
             num_palettes=num_palettes,
+            base_image=base_image,
+            local_palettes=local_palettes,
         )
 
     async def apply_palette_to_concept(
@@ -449,14 +449,14 @@ class ConceptService(ConceptServiceInterface):
         Args:
             concept_image_url: URL of the concept image
             palette_colors: List of color hex codes
-            user_id: Optional user ID for persistence
+            user_id: ID of the user the recolored image is stored for
             blend_strength: How strongly to apply the new palette (0.0-1.0)
 
         Returns:
             Tuple of (image_path, image_url)
 
         Raises:
-            ConceptError: If palette application fails
+            ConceptError: If palette application fails, or no user ID is given
         """
         try:
             # 1. Download the concept image
@@ -472,39 +472,33 @@ class ConceptService(ConceptServiceInterface):
                 blend_strength=blend_strength,
             )
 
-            # 3. Store the image if user_id is provided
-            if user_id:
-                path, url = await self.image_persistence.store_image(
-                    image_data=colorized_image,
-                    user_id=user_id,
-                    metadata={"palette_colors": ",".join(palette_colors)},
-                )
-                # Add type annotations to fix mypy errors
-                image_path: str = path
-                image_url: str = url
-                return image_path, image_url
-            else:
-                # If no user_id, create a temporary file for testing
-                temp_file = f"temp_palette_{uuid.uuid4()}.png"
-                with open(temp_file, "wb") as f:
-                    f.write(colorized_image)
-                self.logger.warning(f"No user_id provided, saving to temp file: {temp_file}")
-                return temp_file, f"file://{os.path.abspath(temp_file)}"
+            # 3. Store the image; without a user there is nowhere to store it
+            if not user_id:
+                raise ConceptError("A user ID is required to store the recolored image")
+            path, url = await self.image_persistence.store_image(
+                image_data=colorized_image,
+                user_id=user_id,
+                metadata={"palette_colors": ",".join(palette_colors)},
+            )
+            # Add type annotations to fix mypy errors
+            image_path: str = path
+            image_url: str = url
+            return image_path, image_url
         except Exception as e:
             self.logger.error(f"Error applying palette to concept: {str(e)}")
             raise ConceptError(f"Failed to apply palette to concept: {str(e)}")
 
     async def _download_image(self, image_url: Optional[str]) -> Optional[bytes]:
-        """Download an image from a URL or read from a local file path.
+        """Download an image from a URL.
 
         Args:
-            image_url: URL of the image to download, or file:// URL for local files
+            image_url: URL of the image to download
 
         Returns:
             Image data as bytes or None if the URL is None
 
         Raises:
-            IOError: If the download fails or the file doesn't exist
+            IOError: If the download fails
             ValueError: If the downloaded content is empty
         """
         if image_url is None:
@@ -512,33 +506,8 @@ class ConceptService(ConceptServiceInterface):
             return None
 
         try:
-            # Handle local file:// URLs by reading the file directly
-            if image_url.startswith("file://"):
-                # Extract the file path from the URL
-                file_path = image_url[7:]  # Remove the "file://" prefix
-
-                # Check if the file exists
-                if not os.path.exists(file_path):
-                    self.logger.error(f"Local file not found: {file_path}")
-                    raise FileNotFoundError(f"Local image file not found: {file_path}")
-
-                # Read the file
-                with open(file_path, "rb") as f:
-                    image_data = f.read()
-
-                self.logger.info("Read image data from local file")
-
-                # Clean up the temporary file after reading if needed
-                try:
-                    os.remove(file_path)
-                    self.logger.info(f"Removed temporary file: {file_path}")
-                except Exception as rm_err:
-                    self.logger.warning(f"Could not remove temporary file {file_path}: {rm_err}")
-
-                return image_data
-
-            # For remote URLs, use httpx to download
-            async with httpx.AsyncClient() as client:
+            # Download with httpx, capping the size of the image
+            async with httpx.AsyncClient(transport=CappedTransport()) as client:
                 response = await client.get(image_url)
                 response.raise_for_status()  # Raises an exception for 4xx/5xx responses
 
@@ -0,0 +1,393 @@
+"""Export result cache.
+
+This module caches the output of image exports, keyed by a hash of the source
+image content and the export parameters, so repeating an export skips the
+resize, re-encode or vectorization. Results are kept in a local disk tier
+(bounded by total size and per-entry TTL) and optionally in a storage bucket
+shared by all instances.
+"""
+
+import abc
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Bump when the export pipeline changes output for the same parameters
+EXPORT_CACHE_VERSION = 1
+
+
+@dataclass
+class CacheHit:
+    """A cached export result, either as an open file or as bytes."""
+
+    tier: str
+    size: int
+    data: Optional[bytes] = None
+    file: Optional[BinaryIO] = None
+
+    def iter_chunks(self, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """Iterate over the cached bytes, closing the file when done.
+
+        Args:
+            chunk_size: Size of the chunks read from disk
+
+        Yields:
+            Chunks of the cached export
+        """
+        if self.file is None:
+            yield self.data or b""
+            return
+        try:
+            while chunk := self.file.read(chunk_size):
+                yield chunk
+        finally:
+            self.file.close()
+
+    def read(self) -> bytes:
+        """Read the whole cached export.
+
+        Returns:
+            The cached bytes
+        """
+        return b"".join(self.iter_chunks())
+
+
+class ExportCacheTier(abc.ABC):
+    """A storage tier of the export cache."""
+
+    name: str = "tier"
+
+    @abc.abstractmethod
+    def get(self, key: str) -> Optional[CacheHit]:
+        """Look up a cached export.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            The cached export, or None on a miss
+        """
+        pass
+
+    @abc.abstractmethod
+    def put(self, key: str, data: bytes) -> None:
+        """Store an export result.
+
+        Args:
+            key: Cache key
+            data: Exported bytes
+        """
+        pass
+
+
+class DiskExportCacheTier(ExportCacheTier):
+    """Export cache tier on the local disk with size and TTL eviction."""
+
+    name = "disk"
+
+    def __init__(self, directory: str, max_bytes: int, ttl_seconds: int):
+        """Initialize the disk tier.
+
+        Args:
+            directory: Directory the cached files are written to
+            max_bytes: Total size above which the least recently used entries are evicted
+            ttl_seconds: Age after which an entry is no longer served
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # Entry sizes and write times by key, in least recently used order
+        self._entries: Dict[str, Tuple[int, float]] = {}
+        self._total_bytes = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load_entries()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.bin")
+
+    def _load_entries(self) -> None:
+        """Index the files left by an earlier process, oldest first."""
+        found: List[Tuple[float, str, int]] = []
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(".bin"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, filename))
+            except OSError:
+                continue
+            found.append((stat.st_mtime, filename[: -len(".bin")], stat.st_size))
+        for written_at, key, size in sorted(found):
+            self._entries[key] = (size, written_at)
+            self._total_bytes += size
+
+    def _remove(self, key: str) -> None:
+        size, _ = self._entries.pop(key, (0, 0.0))
+        self._total_bytes -= size
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Error removing cached export {key}: {str(e)}")
+
+    def get(self, key: str) -> Optional[CacheHit]:
+        """Open a cached export if it exists and has not expired.
+
+        The file is opened before returning, so a concurrent eviction cannot
+        remove it from under a response that is still streaming it.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            The cached export as an open file, or None on a miss
+        """
+        path = self._path(key)
+        with self._lock:
+            try:
+                handle = open(path, "rb")
+            except FileNotFoundError:
+                self._remove(key)
+                return None
+            stat = os.fstat(handle.fileno())
+            # Mark as most recently used, keeping the recorded write time; a file written by
+            # another process sharing the directory is indexed with its modification time
+            size, written_at = self._entries.pop(key, (0, stat.st_mtime))
+            self._entries[key] = (stat.st_size, written_at)
+            self._total_bytes += stat.st_size - size
+            if time.time() - written_at > self.ttl_seconds:
+                handle.close()
+                self._remove(key)
+                metrics.increment("export_cache.expired.disk")
+                return None
+            return CacheHit(tier=self.name, size=stat.st_size, file=handle)
+
+    def put(self, key: str, data: bytes) -> None:
+        """Write an export result and evict entries over the size budget.
+
+        Args:
+            key: Cache key
+            data: Exported bytes
+        """
+        if len(data) > self.max_bytes:
+            return
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as temp_file:
+                temp_file.write(data)
+            # Atomic, so readers never see a partial file
+            os.replace(temp_path, self._path(key))
+        except Exception:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+
+        with self._lock:
+            self._total_bytes -= self._entries.pop(key, (0, 0.0))[0]
+            self._entries[key] = (len(data), time.time())
+            self._total_bytes += len(data)
+            self._evict()
+
+    def _evict(self) -> None:
+        """Drop least recently used entries while they are expired or the tier is over budget.
+
+        Works from the in-memory record, so a write costs no more than the
+        entries it removes; an expired entry that is not least recently used
+        is dropped when it is next read.
+        """
+        cutoff = time.time() - self.ttl_seconds
+        while self._entries:
+            oldest = next(iter(self._entries))
+            if self._entries[oldest][1] < cutoff:
+                self._remove(oldest)
+                metrics.increment("export_cache.expired.disk")
+            elif self._total_bytes > self.max_bytes:
+                self._remove(oldest)
+                metrics.increment("export_cache.evicted.disk")
+            else:
+                break
+
+    @property
+    def total_bytes(self) -> int:
+        """Total size of the cached files."""
+        return self._total_bytes
+
+
+class BucketExportCacheTier(ExportCacheTier):
+    """Export cache tier in a storage bucket shared by all instances.
+
+    Expiry of bucket objects is left to the bucket's lifecycle rules (or the
+    scheduled cleanup); entries are only ever read by their content key.
+    """
+
+    name = "bucket"
+
+    def __init__(self, storage_client: Any, bucket: str, prefix: str = "exports"):
+        """Initialize the bucket tier.
+
+        Args:
+            storage_client: Supabase client with service role access
+            bucket: Name of the bucket
+            prefix: Folder the cached exports are written to
+        """
+        self.storage_client = storage_client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def _path(self, key: str) -> str:
+        return f"{self.prefix}/{key[:2]}/{key}"
+
+    def get(self, key: str) -> Optional[CacheHit]:
+        """Download a cached export.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            The cached export as bytes, or None on a miss
+        """
+        try:
+            data = self.storage_client.storage.from_(self.bucket).download(self._path(key))
+        except Exception:
+            # The storage API reports a missing object as an error
+            return None
+        if not data:
+            return None
+        return CacheHit(tier=self.name, size=len(data), data=bytes(data))
+
+    def put(self, key: str, data: bytes) -> None:
+        """Upload an export result.
+
+        Args:
+            key: Cache key
+            data: Exported bytes
+        """
+        self.storage_client.storage.from_(self.bucket).upload(
+            path=self._path(key),
+            file=data,
+            file_options={"content-type": "application/octet-stream", "upsert": "true"},
+        )
+
+
+class ExportCache:
+    """Two-tier cache of export results."""
+
+    def __init__(self, disk: Optional[DiskExportCacheTier] = None, bucket: Optional[ExportCacheTier] = None):
+        """Initialize the cache.
+
+        Args:
+            disk: Local disk tier, checked first
+            bucket: Optional shared tier, checked on a disk miss
+        """
+        self.disk = disk
+        self.bucket = bucket
+
+    @staticmethod
+    def make_key(source_data: bytes, **params: Any) -> str:
+        """Build the cache key of an export.
+
+        Args:
+            source_data: Source image bytes
+            **params: Export parameters (format, size, color mode, SVG parameters, ...)
+
+        Returns:
+            Hex digest identifying the export result
+        """
+        source_digest = hashlib.sha256(source_data).hexdigest()
+        encoded_params = json.dumps(params, sort_keys=True, default=str)
+        return hashlib.sha256(f"{EXPORT_CACHE_VERSION}:{source_digest}:{encoded_params}".encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[CacheHit]:
+        """Look up an export, filling the disk tier from the bucket tier.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            The cached export, or None on a miss
+        """
+        for tier in (self.disk, self.bucket):
+            if tier is None:
+                continue
+            try:
+                hit = await asyncio.to_thread(tier.get, key)
+            except Exception as e:
+                logger.warning(f"Error reading export cache tier {tier.name}: {str(e)}")
+                continue
+            if hit is None:
+                continue
+
+            metrics.increment(f"export_cache.hit.{tier.name}")
+            if tier is self.bucket and self.disk is not None and hit.data is not None:
+                await self._put_tier(self.disk, key, hit.data)
+            return hit
+
+        metrics.increment("export_cache.miss")
+        return None
+
+    async def put(self, key: str, data: bytes) -> None:
+        """Store an export result in every tier.
+
+        Errors are logged rather than raised; the export itself has succeeded.
+
+        Args:
+            key: Cache key
+            data: Exported bytes
+        """
+        for tier in (self.disk, self.bucket):
+            if tier is not None:
+                await self._put_tier(tier, key, data)
+
+    @staticmethod
+    async def _put_tier(tier: ExportCacheTier, key: str, data: bytes) -> None:
+        try:
+            await asyncio.to_thread(tier.put, key, data)
+        except Exception as e:
+            logger.warning(f"Error writing export cache tier {tier.name}: {str(e)}")
+
+
+@lru_cache()
+def get_export_cache() -> Optional[ExportCache]:
+    """Get the export cache for this process.
+
+    Returns:
+        ExportCache configured from settings, or None if caching is disabled
+    """
+    if not settings.EXPORT_CACHE_ENABLED:
+        return None
+
+    directory = settings.EXPORT_CACHE_DIR or os.path.join(tempfile.gettempdir(), "concept_export_cache")
+    try:
+        disk: Optional[DiskExportCacheTier] = DiskExportCacheTier(
+            directory,
+            max_bytes=settings.EXPORT_CACHE_MAX_BYTES,
+            ttl_seconds=settings.EXPORT_CACHE_TTL_SECONDS,
+        )
+    except OSError as e:
+        logger.warning(f"Export cache directory unavailable, disk tier disabled: {str(e)}")
+        disk = None
+
+    bucket: Optional[ExportCacheTier] = None
+    bucket_name = settings.EXPORT_CACHE_BUCKET
+    if bucket_name:
+        from app.core.supabase.client import get_supabase_client
+
+        bucket = BucketExportCacheTier(get_supabase_client().get_service_role_client(), bucket_name)
+
+    return ExportCache(disk=disk, bucket=bucket)
@@ -0,0 +1,219 @@
+"""Pre-rendered export derivatives.
+
+This module renders the standard export sizes and formats of an image when it
+is generated, so that the common exports become a storage read. Derivatives
+are stored next to the original at deterministic paths (see
+derivative_path), which lets the export service find them without a
+database lookup. The same mechanism renders the smaller WebP/AVIF siblings
+served to browsers (see app.services.image.delivery).
+"""
+
+import asyncio
+import logging
+import os
+from io import BytesIO
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from PIL import Image, features
+
+from app.services.export.pool import ExportProcessPool
+from app.services.image.encoding import encode_png
+from app.utils.security.mask import mask_path
+
+logger = logging.getLogger(__name__)
+
+# Longest side of each named export size
+STANDARD_EXPORT_SIZES: Dict[str, int] = {"small": 500, "medium": 1000, "large": 2000}
+
+# Formats pre-rendered for each size
+DERIVATIVE_FORMATS: Tuple[str, ...] = ("png", "jpg")
+
+# Longest side of each size served to browsers
+DELIVERY_SIZES: Dict[str, int] = {"thumb": 256, "small": 500, "medium": 1000}
+
+# Formats served to browsers, most preferred first; AVIF needs a Pillow built with libavif
+DELIVERY_FORMATS: Tuple[str, ...] = ("avif", "webp", "png") if features.check("avif") else ("webp", "png")
+
+DERIVATIVE_CONTENT_TYPES = {"png": "image/png", "jpg": "image/jpeg", "webp": "image/webp", "avif": "image/avif"}
+
+# Encoder options of the lossy delivery formats
+_LOSSY_SAVE_OPTIONS: Dict[str, Dict[str, int]] = {"webp": {"quality": 80, "method": 4}, "avif": {"quality": 60, "speed": 6}}
+
+
+def derivative_key(target_size: str, target_format: str) -> str:
+    """Get the key of a derivative in an image's export_derivatives record.
+
+    Args:
+        target_size: Named export size
+        target_format: Export format
+
+    Returns:
+        Key such as "small.png"
+    """
+    return f"{target_size}.{target_format}"
+
+
+def derivative_path(image_path: str, target_size: str, target_format: str) -> str:
+    """Get the storage path of a pre-rendered derivative.
+
+    Args:
+        image_path: Storage path of the original image (e.g. "user/20240101_abc.png")
+        target_size: Named export size
+        target_format: Export format
+
+    Returns:
+        Path next to the original (e.g. "user/20240101_abc/export_small.png")
+    """
+    return f"{os.path.splitext(image_path)[0]}/export_{target_size}.{target_format}"
+
+
+def fit_size(width: int, height: int, box: int) -> Tuple[int, int]:
+    """Get the size of an image scaled to fit a square box.
+
+    Same fit as ImageProcessingService.resize_image: the longest side becomes
+    the box size, even when that scales the image up.
+
+    Args:
+        width: Source width
+        height: Source height
+        box: Longest side of the result
+
+    Returns:
+        Width and height of the scaled image
+    """
+    aspect = width / height
+    fitted = (box, int(box / aspect)) if aspect > 1 else (int(box * aspect), box)
+    return max(1, fitted[0]), max(1, fitted[1])
+
+
+def render_export_derivatives(image_data: bytes, sizes: Dict[str, int], formats: Iterable[str]) -> Dict[str, bytes]:
+    """Render an image at the given sizes and formats.
+
+    Runs in the export process pool. Output matches the on-demand export:
+    the image is scaled to fit the size box (LANCZOS) and JPEGs are written
+    on white at quality 90. PNGs are written as PNG8 when they have few
+    enough colors.
+
+    Args:
+        image_data: Encoded source image
+        sizes: Longest side by named size
+        formats: Formats ("png", "jpg", "webp", "avif")
+
+    Returns:
+        Encoded derivatives by derivative key
+    """
+    with Image.open(BytesIO(image_data)) as source:
+        source.load()
+        image = source.copy()
+
+    rendered: Dict[str, bytes] = {}
+    for target_size, box in sizes.items():
+        resized = image.resize(fit_size(image.width, image.height, box), resample=Image.Resampling.LANCZOS)
+        for target_format in formats:
+            rendered[derivative_key(target_size, target_format)] = _encode(resized, target_format)
+    return rendered
+
+
+def render_derivative_grids(image_data: bytes, grids: Iterable[Tuple[Dict[str, int], Tuple[str, ...]]]) -> Dict[str, bytes]:
+    """Render several size-by-format grids of an image in one job.
+
+    Args:
+        image_data: Encoded source image
+        grids: Pairs of (longest side by named size, formats)
+
+    Returns:
+        Encoded derivatives by derivative key; keys shared by grids are rendered once
+    """
+    rendered: Dict[str, bytes] = {}
+    for sizes, formats in grids:
+        missing = {key: box for key, box in sizes.items() if any(derivative_key(key, fmt) not in rendered for fmt in formats)}
+        if missing:
+            for key, data in render_export_derivatives(image_data, missing, formats).items():
+                rendered.setdefault(key, data)
+    return rendered
+
+
+def _encode(image: Image.Image, target_format: str) -> bytes:
+    output = BytesIO()
+    if target_format == "jpg":
+        flattened = image
+        if image.mode in ("RGBA", "LA", "P"):
+            flattened = Image.new("RGB", image.size, (255, 255, 255))
+            rgba = image.convert("RGBA")
+            flattened.paste(rgba, mask=rgba.split()[3])
+        flattened.convert("RGB").save(output, format="JPEG", quality=90, optimize=True)
+    elif target_format in _LOSSY_SAVE_OPTIONS:
+        image.save(output, format=target_format.upper(), **_LOSSY_SAVE_OPTIONS[target_format])
+    else:
+        return encode_png(image, optimize=True)
+    return output.getvalue()
+
+
+class ExportDerivativeRenderer:
+    """Renders and uploads the standard export derivatives of generated images."""
+
+    def __init__(
+        self,
+        image_persistence_service: Any,
+        pool: ExportProcessPool,
+        sizes: Optional[Dict[str, int]] = None,
+        formats: Iterable[str] = DERIVATIVE_FORMATS,
+        delivery_sizes: Optional[Dict[str, int]] = None,
+        delivery_formats: Iterable[str] = (),
+    ):
+        """Initialize the renderer.
+
+        Args:
+            image_persistence_service: Service used to upload the derivatives
+            pool: Process pool the rendering runs in
+            sizes: Longest side by named size, defaults to STANDARD_EXPORT_SIZES
+            formats: Export formats to render
+            delivery_sizes: Longest side by named size of the browser siblings, defaults to DELIVERY_SIZES
+            delivery_formats: Formats of the browser siblings, none by default
+        """
+        self.image_persistence_service = image_persistence_service
+        self.pool = pool
+        self.sizes = dict(sizes or STANDARD_EXPORT_SIZES)
+        self.formats = tuple(formats)
+        self.delivery_sizes = dict(delivery_sizes or DELIVERY_SIZES)
+        self.delivery_formats = tuple(delivery_formats)
+
+    async def prerender(self, image_data: bytes, image_path: str, user_id: str, is_palette: bool = False) -> Dict[str, Dict[str, Any]]:
+        """Render the derivatives of an image and store them next to it.
+
+        Args:
+            image_data: Encoded image
+            image_path: Storage path of the image
+            user_id: ID of the user who owns the image
+            is_palette: Whether the image is in the palette bucket
+
+        Returns:
+            Record of the stored derivatives by key (e.g. {"small.png": {"path": ..., "bytes": ..., "width": ..., "height": ...}})
+        """
+        grids = [(self.sizes, self.formats)]
+        if self.delivery_formats:
+            grids.append((self.delivery_sizes, self.delivery_formats))
+        rendered = await self.pool.run(render_derivative_grids, image_data, grids)
+
+        # Only the header is read; the dimensions are recorded for srcset width descriptors
+        with Image.open(BytesIO(image_data)) as source:
+            source_width, source_height = source.size
+        # Sizes shared by both grids were rendered with the export box
+        boxes = {**self.delivery_sizes, **self.sizes}
+
+        async def _upload(key: str, data: bytes) -> Tuple[str, Dict[str, Any]]:
+            target_size, target_format = key.split(".", 1)
+            path = derivative_path(image_path, target_size, target_format)
+            width, height = fit_size(source_width, source_height, boxes[target_size])
+            await self.image_persistence_service.store_image_at_path(
+                image_data=data,
+                path=path,
+                user_id=user_id,
+                content_type=DERIVATIVE_CONTENT_TYPES[target_format],
+                is_palette=is_palette,
+            )
+            return key, {"path": path, "bytes": len(data), "width": width, "height": height}
+
+        stored = dict(await asyncio.gather(*(_upload(key, data) for key, data in rendered.items())))
+        logger.info(f"Stored {len(stored)} export derivatives of {mask_path(image_path)}")
+        return stored
@@ -20,6 +20,9 @@ class ExportServiceInterface(abc.ABC):
         user_id: Optional[str] = None,
         include_original: bool = False,
         color_mode: str = "color",
+        max_bytes: Optional[int] = None,
+        min_quality: Optional[float] = None,
+        allow_format_change: bool = False,
     ) -> Dict[str, Any]:
         """Export an image with specified format and parameters.
 
@@ -31,6 +34,9 @@ class ExportServiceInterface(abc.ABC):
             user_id: Optional user ID for tracking exports
             include_original: Whether to include the original image
             color_mode: Color mode of the export (color, grayscale, etc.)
+            max_bytes: Optional byte budget of a raster export
+            min_quality: Optional lowest SSIM of a raster export against the source (0-1)
+            allow_format_change: Whether a budgeted export may be encoded as WebP/JPEG/PNG instead of the requested format
 
         Returns:
             Dictionary containing the exported image data and metadata
@@ -70,6 +76,7 @@ class ExportServiceInterface(abc.ABC):
         user_id: str,
         formats: List[str],
         include_palettes: bool = True,
+        target_size: str = "original",
     ) -> Dict[str, Any]:
         """Export a complete concept package with multiple formats.
 
@@ -78,9 +85,11 @@ class ExportServiceInterface(abc.ABC):
             user_id: User ID owning the concept
             formats: List of formats to include
             include_palettes: Whether to include palette images
+            target_size: Size of the exported images (small, medium, large, original)
 
         Returns:
-            Dictionary with paths to exported files
+            Dictionary with the package filename, content type and an async
+            iterator of ZIP bytes under "stream"
 
         Raises:
             ExportError: If export fails
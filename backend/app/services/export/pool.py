@@ -0,0 +1,128 @@
+"""Export process pool.
+
+This module provides the bounded pool of worker processes that CPU-bound
+export work (SVG traces, pre-rendered export sizes) runs in, so that it
+neither blocks the event loop nor holds the GIL for other requests. Each job
+has a timeout; a job that exceeds it has the pool's worker processes
+terminated.
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import threading
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from typing import Any, Callable, Optional, TypeVar
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class ExportJobError(Exception):
+    """Raised when a job cannot be run in the export process pool."""
+
+
+class ExportJobTimeoutError(ExportJobError):
+    """Raised when a job exceeds its timeout."""
+
+
+class ExportProcessPool:
+    """Runs functions in a bounded process pool with per-job timeouts."""
+
+    def __init__(self, max_workers: int, timeout_seconds: float):
+        """Initialize the pool.
+
+        Args:
+            max_workers: Number of worker processes; 0 runs jobs in a thread of this process instead
+            timeout_seconds: Default maximum duration of one job
+        """
+        self.max_workers = max_workers
+        self.timeout_seconds = timeout_seconds
+        self._executor: Optional[concurrent.futures.ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> concurrent.futures.ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # Workers are started on first use, not at import
+                self._executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    def _recycle(self, executor: concurrent.futures.ProcessPoolExecutor) -> None:
+        """Terminate the workers of an executor and start a fresh one on next use.
+
+        A running job cannot be cancelled, so the only way to stop a job that
+        exceeded its timeout is to terminate its worker process.
+
+        Args:
+            executor: Executor whose workers to terminate
+        """
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        processes = getattr(executor, "_processes", None) or {}
+        for process in list(processes.values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, func: Callable[..., T], *args: Any, timeout: Optional[float] = None) -> T:
+        """Run a function in a worker process.
+
+        Args:
+            func: Module-level function to run (it is pickled by reference)
+            *args: Picklable arguments of the function
+            timeout: Maximum duration in seconds, defaults to the pool's timeout
+
+        Returns:
+            The function's return value
+
+        Raises:
+            ExportJobTimeoutError: If the job exceeds the timeout
+            ExportJobError: If the worker processes stopped
+        """
+        timeout = timeout or self.timeout_seconds
+        if self.max_workers <= 0:
+            try:
+                return await asyncio.wait_for(asyncio.to_thread(func, *args), timeout=timeout)
+            except asyncio.TimeoutError:
+                raise ExportJobTimeoutError(f"{func.__name__} exceeded {timeout}s")
+
+        loop = asyncio.get_running_loop()
+        # One retry covers jobs whose pool was recycled because of another job's timeout
+        for attempt in range(2):
+            executor = self._get_executor()
+            try:
+                return await asyncio.wait_for(loop.run_in_executor(executor, func, *args), timeout=timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"{func.__name__} exceeded {timeout}s, terminating export workers")
+                self._recycle(executor)
+                raise ExportJobTimeoutError(f"{func.__name__} exceeded {timeout}s")
+            except BrokenProcessPool as e:
+                self._recycle(executor)
+                if attempt == 1:
+                    raise ExportJobError(f"Export workers stopped: {str(e)}")
+        raise ExportJobError("Export workers stopped")
+
+    def shutdown(self) -> None:
+        """Stop the worker processes."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+@lru_cache()
+def get_export_process_pool() -> ExportProcessPool:
+    """Get the export process pool for this process.
+
+    Returns:
+        ExportProcessPool configured from settings
+    """
+    return ExportProcessPool(
+        max_workers=settings.EXPORT_PROCESS_WORKERS,
+        timeout_seconds=settings.EXPORT_PROCESS_TIMEOUT_SECONDS,
+    )
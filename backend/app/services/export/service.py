@@ -3,19 +3,34 @@
 This module provides services for exporting images in different formats.
 """
 
+import asyncio
+import io
+import json
 import logging
 import os
-import tempfile
+import re
+import zipfile
+from dataclasses import dataclass
 from io import BytesIO
-from typing import Any, BinaryIO, Dict, List, Literal, Optional, Tuple, Union
+from typing import Any, AsyncIterator, BinaryIO, Dict, List, Literal, Optional, Tuple, Union, cast
 
-import vtracer
 from fastapi import Depends
 from PIL import Image
 
+from app.core.config import settings
+from app.core.exceptions import ResourceNotFoundError
+from app.services.export.cache import ExportCache, get_export_cache
+from app.services.export.derivatives import DERIVATIVE_FORMATS, STANDARD_EXPORT_SIZES, derivative_path
 from app.services.export.interface import ExportServiceInterface
+from app.services.export.vectorize import SvgVectorizer, get_svg_vectorizer
 from app.services.image import get_image_processing_service, get_image_service
+from app.services.image.conversion import detect_image_format
 from app.services.image.interface import ImageProcessingServiceInterface, ImageServiceInterface
+from app.services.image.optimization import OPTIMIZATION_FORMATS
+from app.services.persistence import get_concept_persistence_service
+from app.services.persistence.concept_persistence_service import NotFoundError as PersistenceNotFoundError
+from app.services.persistence.interface import ConceptPersistenceServiceInterface
+from app.utils.security.mask import mask_id
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -34,6 +49,50 @@ class ExportError(Exception):
         super().__init__(self.message)
 
 
+# Formats a concept package can contain
+PACKAGE_FORMATS = ("png", "jpg", "svg")
+
+
+def _slugify(name: str) -> str:
+    """Turn a palette or file name into a safe archive file name."""
+    slug = re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+    return slug or "image"
+
+
+@dataclass
+class _PackageEntry:
+    """A file of a concept package archive."""
+
+    name: str
+    source_path: Optional[str]
+    is_palette: bool
+    format: str
+    target_size: str
+    colors: Optional[List[str]] = None
+
+
+class _ZipChunkBuffer(io.RawIOBase):
+    """Write-only, non-seekable sink that collects ZIP output until it is drained."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        return len(chunk)
+
+    def drain(self) -> bytes:
+        """Return and forget everything written since the last drain."""
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
 class ExportService(ExportServiceInterface):
     """Service for exporting images in different formats."""
 
@@ -41,15 +100,24 @@ class ExportService(ExportServiceInterface):
         self,
         image_service: ImageServiceInterface = Depends(get_image_service),
         processing_service: ImageProcessingServiceInterface = Depends(get_image_processing_service),
+        concept_persistence_service: Optional[ConceptPersistenceServiceInterface] = None,
+        export_cache: Optional[ExportCache] = None,
+        svg_vectorizer: Optional[SvgVectorizer] = None,
     ) -> None:
         """Initialize export service with required dependencies.
 
         Args:
             image_service: Service for image operations
             processing_service: Service for image processing operations
+            concept_persistence_service: Optional service for loading concepts (needed for package export)
+            export_cache: Optional cache of export results; exports are always processed when None
+            svg_vectorizer: Optional vectorizer for SVG exports; defaults to the process-wide one
         """
         self.image_service = image_service
         self.processing_service = processing_service
+        self.concept_persistence_service = concept_persistence_service
+        self.export_cache = export_cache
+        self.svg_vectorizer = svg_vectorizer or get_svg_vectorizer()
         self.logger = logging.getLogger("export_service")
 
     async def export_image(
@@ -61,6 +129,9 @@ class ExportService(ExportServiceInterface):
         user_id: Optional[str] = None,
         include_original: bool = False,
         color_mode: str = "color",
+        max_bytes: Optional[int] = None,
+        min_quality: Optional[float] = None,
+        allow_format_change: bool = False,
     ) -> Dict[str, Any]:
         """Export an image with specified format and parameters.
 
@@ -72,9 +143,13 @@ class ExportService(ExportServiceInterface):
             user_id: Optional user ID for tracking exports
             include_original: Whether to include the original image
             color_mode: Color mode of the export (color, grayscale, etc.)
+            max_bytes: Optional byte budget of a raster export
+            min_quality: Optional lowest SSIM of a raster export against the source (0-1)
+            allow_format_change: Whether a budgeted export may be encoded as WebP/JPEG/PNG instead of the requested format
 
         Returns:
-            Dictionary containing the exported image data and metadata
+            Dictionary containing the exported image data and metadata. Results
+            served from the disk cache carry a "stream" chunk iterator instead of "data".
 
         Raises:
             ExportError: If export fails
@@ -83,6 +158,42 @@ class ExportService(ExportServiceInterface):
         try:
             self.logger.info(f"Exporting image: {os.path.basename(image_path)} to format: {format}")
 
+            # Prepare size parameters for processing
+            target_size = "original"
+            if size:
+                # Map size to a named size if it matches standard dimensions
+                width = size.get("width")
+                height = size.get("height")
+
+                if width == 500 and height == 500:
+                    target_size = "small"
+                elif width == 1000 and height == 1000:
+                    target_size = "medium"
+                elif width == 2000 and height == 2000:
+                    target_size = "large"
+
+            # Process the export based on format
+            target_format = format.lower()
+            svg_params = {"mode": color_mode} if target_format == "svg" else None
+
+            # Make sure target_format and target_size are valid literals
+            if target_format not in ("png", "jpg", "svg"):
+                target_format = "png"  # Default to PNG if invalid format
+
+            if target_size not in ("small", "medium", "large", "original"):
+                target_size = "original"  # Default to original if invalid size
+
+            # A byte budget or quality floor searches the encoding of raster exports
+            optimize_params: Dict[str, Any] = {}
+            if target_format != "svg" and (max_bytes is not None or min_quality is not None):
+                optimize_params = {"max_bytes": max_bytes, "min_quality": min_quality, "allow_format_change": allow_format_change}
+
+            # Standard sizes may have been rendered when the image was generated
+            if settings.EXPORT_PRERENDER_ENABLED and not optimize_params:
+                prerendered = await self._get_prerendered_export(image_path, target_format, target_size)
+                if prerendered is not None:
+                    return prerendered
+
             # Determine if this is from the concept or palette bucket based on path
             is_palette = False
             if "palette" in image_path.lower():
@@ -121,39 +232,65 @@ class ExportService(ExportServiceInterface):
                     self.logger.error(f"Failed to get image with either method: {str(e)}, {str(inner_e)}")
                     raise ExportError(f"Image not found: {image_path}")
 
-            # Prepare size parameters for processing
-            target_size = "original"
-            if size:
-                # Map size to a named size if it matches standard dimensions
-                width = size.get("width")
-                height = size.get("height")
-
-                if width == 500 and height == 500:
-                    target_size = "small"
-                elif width == 1000 and height == 1000:
-                    target_size = "medium"
-                elif width == 2000 and height == 2000:
-                    target_size = "large"
-
-            # Process the export based on format
-            target_format = format.lower()
-            svg_params = {"mode": color_mode} if target_format == "svg" else None
-
-            # Make sure target_format and target_size are valid literals
-            if target_format not in ("png", "jpg", "svg"):
-                target_format = "png"  # Default to PNG if invalid format
+            # Identical source bytes and parameters always produce the same export
+            cache_key = None
+            if self.export_cache is not None:
+                cache_key = self.export_cache.make_key(
+                    image_data,
+                    format=target_format,
+                    size=target_size,
+                    color_mode=color_mode if target_format == "svg" else None,
+                    svg_params=svg_params,
+                    trace_max_dimension=self.svg_vectorizer.max_dimension if target_format == "svg" else None,
+                    **optimize_params,
+                )
+                cached = await self.export_cache.get(cache_key)
+                if cached is not None:
+                    cached_format = target_format
+                    cached_data = None
+                    if optimize_params and allow_format_change:
+                        # The search may have chosen another format; budgeted exports are small enough to read
+                        cached_data = cached.read()
+                        cached_format = detect_image_format(cached_data)
+                    filename, content_type = self._export_file_info(image_path, cached_format)
+                    self.logger.info(f"Serving export of {os.path.basename(image_path)} from the {cached.tier} cache")
+                    result: Dict[str, Any] = {
+                        "filename": filename,
+                        "content_type": content_type,
+                        "size": cached.size,
+                        "format": cached_format,
+                    }
+                    if cached_data is not None:
+                        result["data"] = cached_data
+                    elif cached.file is not None:
+                        result["stream"] = cached.iter_chunks()
+                    else:
+                        result["data"] = cached.data
+                    return result
 
-            if target_size not in ("small", "medium", "large", "original"):
-                target_size = "original"  # Default to original if invalid size
+            if optimize_params:
+                processed_bytes, filename, content_type = await self._optimize_raster_image(
+                    image_data,
+                    image_path,
+                    target_format,
+                    target_size,
+                    max_bytes=max_bytes,
+                    min_quality=min_quality,
+                    allow_format_change=allow_format_change,
+                )
+                target_format = os.path.splitext(filename)[1].lstrip(".")
+            else:
+                # Use the existing process_export function
+                processed_bytes, filename, content_type = await self.process_export(
+                    image_data=image_data,
+                    original_filename=image_path,
+                    target_format=target_format,  # type: ignore
+                    target_size=target_size,  # type: ignore
+                    svg_params=svg_params,
+                )
 
-            # Use the existing process_export function
-            processed_bytes, filename, content_type = await self.process_export(
-                image_data=image_data,
-                original_filename=image_path,
-                target_format=target_format,  # type: ignore
-                target_size=target_size,  # type: ignore
-                svg_params=svg_params,
-            )
+            if self.export_cache is not None and cache_key is not None:
+                await self.export_cache.put(cache_key, processed_bytes)
 
             # Return the result
             return {
@@ -230,26 +367,193 @@ class ExportService(ExportServiceInterface):
         user_id: str,
         formats: List[str],
         include_palettes: bool = True,
+        target_size: str = "original",
     ) -> Dict[str, Any]:
         """Export a complete concept package with multiple formats.
 
+        The concept is loaded up front so a missing concept fails before any
+        response is sent; the ZIP itself is produced lazily by the returned stream.
+
         Args:
             concept_id: ID of the concept to export
             user_id: User ID owning the concept
-            formats: List of formats to include
-            include_palettes: Whether to include palette images
+            formats: List of formats to include (png, jpg, svg)
+            include_palettes: Whether to include palette swatch images
+            target_size: Size of the exported images (small, medium, large, original)
 
         Returns:
-            Dictionary with paths to exported files
+            Dictionary with the package filename, content type and an async
+            iterator of ZIP bytes under "stream"
 
         Raises:
             ExportError: If export fails
             ResourceNotFoundError: If the concept is not found
         """
-        # NOTE: This is a placeholder implementation
-        # A full implementation would require concept service integration
-        self.logger.warning("export_concept_package is not fully implemented")
-        return {"status": "not_implemented", "message": "This feature is not fully implemented yet", "concept_id": concept_id, "formats": formats}
+        target_formats = list(dict.fromkeys(fmt.lower() for fmt in formats))
+        unsupported = [fmt for fmt in target_formats if fmt not in PACKAGE_FORMATS]
+        if not target_formats or unsupported:
+            raise ExportError(f"Unsupported package formats: {', '.join(unsupported) or 'none requested'}")
+        if target_size not in ("small", "medium", "large", "original"):
+            raise ExportError(f"Unsupported package size: {target_size}")
+        if self.concept_persistence_service is None:
+            raise ExportError("Concept package export requires the concept persistence service")
+
+        try:
+            concept = await self.concept_persistence_service.get_concept_detail(concept_id, user_id)
+        except PersistenceNotFoundError:
+            raise ResourceNotFoundError(resource_type="Concept", resource_id=concept_id)
+        except Exception as e:
+            self.logger.error(f"Error loading concept {mask_id(concept_id)} for package export: {str(e)}")
+            raise ExportError(f"Failed to load concept: {str(e)}")
+
+        entries = self._build_package_entries(concept, target_formats, target_size, include_palettes)
+        self.logger.info(f"Exporting concept {mask_id(concept_id)} package with {len(entries)} entries in formats {target_formats}")
+
+        return {
+            "filename": f"concept-{concept_id}.zip",
+            "content_type": "application/zip",
+            "entry_count": len(entries),
+            "stream": self._stream_package(concept, entries),
+        }
+
+    def _build_package_entries(self, concept: Dict[str, Any], formats: List[str], target_size: str, include_palettes: bool) -> List["_PackageEntry"]:
+        """List the files of a concept package.
+
+        Args:
+            concept: Concept data including color variations
+            formats: Formats each image is exported in
+            target_size: Size of the exported images
+            include_palettes: Whether to add a swatch image per variation
+
+        Returns:
+            Package entries in archive order
+        """
+        entries: List[_PackageEntry] = []
+        base_path = concept.get("image_path")
+        if base_path:
+            for fmt in formats:
+                entries.append(_PackageEntry(f"concept/{_slugify(os.path.splitext(os.path.basename(base_path))[0])}.{fmt}", base_path, False, fmt, target_size))
+
+        for index, variation in enumerate(concept.get("color_variations") or [], start=1):
+            stem = f"{index:02d}_{_slugify(variation.get('palette_name') or 'variation')}"
+            if variation.get("image_path"):
+                for fmt in formats:
+                    entries.append(_PackageEntry(f"variations/{stem}.{fmt}", variation["image_path"], True, fmt, target_size))
+            if include_palettes and variation.get("colors"):
+                entries.append(_PackageEntry(f"palettes/{stem}.png", None, True, "png", target_size, colors=list(variation["colors"])))
+
+        return entries
+
+    async def _stream_package(self, concept: Dict[str, Any], entries: List["_PackageEntry"]) -> AsyncIterator[bytes]:
+        """Build the ZIP archive of a concept package, yielding bytes as entries finish.
+
+        Entries are fetched and converted concurrently. At most
+        EXPORT_PACKAGE_CONCURRENCY converted entries are held in memory at a
+        time: a slot is only freed once its entry has been written out. Each
+        source image is downloaded once and dropped when its last entry is done.
+
+        Args:
+            concept: Concept data including color variations
+            entries: Entries to include in the archive
+
+        Yields:
+            Chunks of the ZIP archive
+        """
+        limit = max(1, settings.EXPORT_PACKAGE_CONCURRENCY)
+        slots = asyncio.Semaphore(limit)
+        finished: "asyncio.Queue[Tuple[_PackageEntry, Optional[bytes], Optional[Exception]]]" = asyncio.Queue()
+        sources: Dict[Tuple[str, bool], "asyncio.Task[bytes]"] = {}
+        source_users: Dict[Tuple[str, bool], int] = {}
+        for entry in entries:
+            if entry.source_path:
+                key = (entry.source_path, entry.is_palette)
+                source_users[key] = source_users.get(key, 0) + 1
+
+        async def _source(entry: _PackageEntry) -> bytes:
+            key = (cast(str, entry.source_path), entry.is_palette)
+            if key not in sources:
+                sources[key] = asyncio.ensure_future(self._get_package_source(entry.source_path or "", entry.is_palette))
+            try:
+                return await asyncio.shield(sources[key])
+            finally:
+                source_users[key] -= 1
+                if source_users[key] == 0:
+                    sources.pop(key, None)
+
+        async def _produce(entry: _PackageEntry) -> None:
+            await slots.acquire()
+            try:
+                if entry.colors is not None:
+                    data = await self.export_palette(entry.colors, format="png")
+                else:
+                    source = await _source(entry)
+                    svg_params = {"mode": "color"} if entry.format == "svg" else None
+                    data, _, _ = await self.process_export(source, entry.name, entry.format, entry.target_size, svg_params)  # type: ignore[arg-type]
+            except Exception as e:
+                slots.release()
+                await finished.put((entry, None, e))
+                return
+            # The slot is released by the consumer once the entry has been written
+            await finished.put((entry, data, None))
+
+        buffer = _ZipChunkBuffer()
+        archive = zipfile.ZipFile(buffer, mode="w")
+        producers = [asyncio.ensure_future(_produce(entry)) for entry in entries]
+        written: List[str] = []
+        failed: List[Dict[str, str]] = []
+        try:
+            for _ in range(len(producers)):
+                entry, data, error = await finished.get()
+                if error is not None or data is None:
+                    self.logger.warning(f"Skipping package entry {entry.name}: {str(error)}")
+                    failed.append({"name": entry.name, "error": str(error)})
+                    continue
+                try:
+                    # Raster images and swatches are already compressed
+                    compress_type = zipfile.ZIP_DEFLATED if entry.format == "svg" else zipfile.ZIP_STORED
+                    archive.writestr(entry.name, data, compress_type=compress_type)
+                    written.append(entry.name)
+                finally:
+                    slots.release()
+                chunk = buffer.drain()
+                if chunk:
+                    yield chunk
+
+            if not written:
+                raise ExportError("No package entries could be exported")
+
+            manifest = {
+                "concept_id": concept.get("id"),
+                "logo_description": concept.get("logo_description"),
+                "theme_description": concept.get("theme_description"),
+                "palettes": [
+                    {"name": variation.get("palette_name"), "colors": variation.get("colors"), "description": variation.get("description")} for variation in concept.get("color_variations") or []
+                ],
+                "files": sorted(written),
+                "failed": failed,
+            }
+            archive.writestr("manifest.json", json.dumps(manifest, indent=2), compress_type=zipfile.ZIP_DEFLATED)
+            archive.close()
+            yield buffer.drain()
+        finally:
+            for producer in producers:
+                producer.cancel()
+            for source in sources.values():
+                source.cancel()
+
+    async def _get_package_source(self, image_path: str, is_palette: bool) -> bytes:
+        """Download a source image of a concept package.
+
+        Args:
+            image_path: Storage path of the image
+            is_palette: Whether the image is stored in the palette bucket
+
+        Returns:
+            Image data as bytes
+        """
+        if hasattr(self.image_service, "get_image_data"):
+            return cast(bytes, await self.image_service.get_image_data(image_path, is_palette=is_palette))
+        return await self.image_service.get_image_async(image_path)
 
     async def generate_thumbnail(
         self,
@@ -293,6 +597,7 @@ class ExportService(ExportServiceInterface):
                     "width": width,
                     "height": height,
                     "preserve_aspect_ratio": True,
+                    "fast": True,
                 }
             ]
 
@@ -382,15 +687,9 @@ class ExportService(ExportServiceInterface):
                 - Content type for the exported file
         """
         try:
-            # Define size mapping (max dimensions for each size)
-            size_mapping = {
-                "small": (500, 500),
-                "medium": (1000, 1000),
-                "large": (2000, 2000),
-                "original": None,
-            }
-
-            target_dimensions = size_mapping.get(target_size)
+            # Max dimensions for each size
+            box = STANDARD_EXPORT_SIZES.get(target_size)
+            target_dimensions = (box, box) if box else None
 
             # Convert format if needed
             output_format = target_format.lower()
@@ -423,21 +722,62 @@ class ExportService(ExportServiceInterface):
                     quality=90 if output_format == "jpeg" else 95,
                 )
 
-            # Generate appropriate filename
-            base_name = os.path.basename(original_filename)
-            name_without_ext = os.path.splitext(base_name)[0]
-            new_filename = f"{name_without_ext}.{target_format.lower()}"
-
-            # Set content type
-            content_type = f"image/{target_format.lower()}"
-            if target_format.lower() == "jpg":
-                content_type = "image/jpeg"
+            new_filename, content_type = self._export_file_info(original_filename, target_format)
 
             return processed_bytes, new_filename, content_type
         except Exception as e:
             self.logger.error(f"Error processing raster image: {str(e)}")
             raise ExportError(f"Error processing image: {str(e)}")
 
+    async def _optimize_raster_image(
+        self,
+        image_data: bytes,
+        original_filename: str,
+        target_format: str,
+        target_size: str,
+        max_bytes: Optional[int] = None,
+        min_quality: Optional[float] = None,
+        allow_format_change: bool = False,
+    ) -> Tuple[bytes, str, str]:
+        """Export a raster image as the smallest encoding meeting a byte budget or quality floor.
+
+        Args:
+            image_data: Original image bytes
+            original_filename: Original filename
+            target_format: Requested format (png, jpg)
+            target_size: Target size (small, medium, large, original)
+            max_bytes: Optional byte budget of the export
+            min_quality: Optional lowest SSIM of the export against the resized source (0-1)
+            allow_format_change: Whether WebP, JPEG and PNG may all be tried
+
+        Returns:
+            Tuple containing:
+                - Optimized image bytes
+                - Filename for the exported file, with the extension of the chosen format
+                - Content type for the exported file
+        """
+        try:
+            box = STANDARD_EXPORT_SIZES.get(target_size)
+            operation: Dict[str, Any] = {
+                "type": "optimize",
+                "max_bytes": max_bytes,
+                "min_quality": min_quality,
+                "formats": list(OPTIMIZATION_FORMATS) if allow_format_change else [target_format],
+            }
+            if box:
+                operation.update({"max_width": box, "max_height": box})
+
+            processed_bytes = await self.processing_service.process_image(image_data, [operation])
+            output_format = detect_image_format(processed_bytes)
+            if max_bytes is not None and len(processed_bytes) > max_bytes:
+                self.logger.warning(f"No {target_size} encoding of {os.path.basename(original_filename)} fits {max_bytes} bytes, returning {len(processed_bytes)} bytes")
+
+            new_filename, content_type = self._export_file_info(original_filename, output_format)
+            return processed_bytes, new_filename, content_type
+        except Exception as e:
+            self.logger.error(f"Error optimizing raster image: {str(e)}")
+            raise ExportError(f"Error optimizing image: {str(e)}")
+
     async def _convert_to_svg(
         self,
         image_data: bytes,
@@ -460,99 +800,85 @@ class ExportService(ExportServiceInterface):
         try:
             # Default SVG conversion parameters
             mode = svg_params.get("mode", "color") if svg_params else "color"
+            filter_speckle = int(svg_params["filter_speckle"]) if svg_params and "filter_speckle" in svg_params else 4
+
+            # Traced in memory in the vectorizer's worker processes
+            svg_data = await self.svg_vectorizer.vectorize(image_data, mode=mode, filter_speckle=filter_speckle)
 
-            # Process the image
-            image = Image.open(BytesIO(image_data))
-
-            # Use temporary files for input/output with vtracer
-            with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as temp_input:
-                with tempfile.NamedTemporaryFile(suffix=".svg", delete=False) as temp_output:
-                    try:
-                        # Save input image to temporary file
-                        input_path = temp_input.name
-                        output_path = temp_output.name
-
-                        if mode == "color":
-                            # Save as PNG for best color fidelity
-                            image.save(input_path, format="PNG")
-
-                            # Use vtracer for color vectorization with direct parameters
-                            filter_speckle = 4
-                            path_precision = 3
-
-                            # Setup from SVG params if provided
-                            if svg_params and "filter_speckle" in svg_params:
-                                filter_speckle = int(svg_params["filter_speckle"])
-
-                            # Run the tracer with parameters directly
-                            vtracer.convert_image_to_svg_py(
-                                input_path, output_path, colormode="color", hierarchical="stacked", mode="spline", filter_speckle=filter_speckle, path_precision=path_precision
-                            )
-                        else:
-                            # Use a simpler approach for monochrome/simplified
-                            self._create_simple_svg_from_image(image, output_path)
-
-                        # Read the generated SVG file
-                        with open(output_path, "rb") as svg_file:
-                            svg_data = svg_file.read()
-
-                        # Generate appropriate filename
-                        base_name = os.path.basename(original_filename)
-                        name_without_ext = os.path.splitext(base_name)[0]
-                        new_filename = f"{name_without_ext}.svg"
-
-                        return svg_data, new_filename, "image/svg+xml"
-                    finally:
-                        # Clean up temporary files
-                        try:
-                            os.unlink(input_path)
-                            os.unlink(output_path)
-                        except (OSError, PermissionError) as e:
-                            # Just log errors during cleanup, don't fail the operation
-                            self.logger.warning(f"Error cleaning up temp files: {str(e)}")
+            new_filename, content_type = self._export_file_info(original_filename, "svg")
+
+            return svg_data, new_filename, content_type
         except Exception as e:
             self.logger.error(f"Error converting to SVG: {str(e)}")
             raise ExportError(f"Error converting to SVG: {str(e)}")
 
-    def _create_simple_svg_from_image(self, image: Image.Image, output_path: str) -> None:
-        """Create a simplified SVG from an image.
+    async def _get_prerendered_export(self, image_path: str, target_format: str, target_size: str) -> Optional[Dict[str, Any]]:
+        """Get an export that was pre-rendered when the image was generated.
 
         Args:
-            image: PIL Image to convert
-            output_path: Path where the SVG should be saved
+            image_path: Storage path of the original image
+            target_format: Export format
+            target_size: Named export size
+
+        Returns:
+            Export result like export_image's, or None if no derivative was stored
         """
-        # Convert to grayscale for simpler processing
-        gray_image = image.convert("L")
-        # Use vtracer with simplified settings
-        # First save the grayscale image to a temporary PNG
-        temp_gray_path = output_path + ".temp.png"
+        if target_format not in DERIVATIVE_FORMATS or target_size not in STANDARD_EXPORT_SIZES or image_path.startswith(("http://", "https://")):
+            return None
+        path = derivative_path(image_path, target_size, target_format)
         try:
-            gray_image.save(temp_gray_path, format="PNG")
-
-            # Run the tracer with binary mode parameters
-            vtracer.convert_image_to_svg_py(
-                temp_gray_path, output_path, colormode="binary", hierarchical="stacked", mode="spline", filter_speckle=4, path_precision=8, corner_threshold=60, length_threshold=4.0
-            )
-        finally:
-            # Clean up
+            data = await self.image_service.get_image_async(path)
+        except Exception:
+            # Derivatives of palette variations live in the palette bucket
             try:
-                if os.path.exists(temp_gray_path):
-                    os.unlink(temp_gray_path)
-            except OSError:
-                pass
+                if not hasattr(self.image_service, "get_image_data"):
+                    return None
+                data = await self.image_service.get_image_data(path, is_palette=True)
+            except Exception:
+                # Images generated before pre-rendering was enabled have no derivatives
+                return None
+        if not data:
+            return None
+
+        self.logger.info(f"Serving pre-rendered {target_size} {target_format} export of {os.path.basename(image_path)}")
+        filename, content_type = self._export_file_info(image_path, target_format)
+        return {"data": data, "filename": filename, "content_type": content_type, "size": len(data), "format": target_format}
+
+    @staticmethod
+    def _export_file_info(original_filename: str, target_format: str) -> Tuple[str, str]:
+        """Get the filename and content type of an export.
+
+        Args:
+            original_filename: Original filename or path
+            target_format: Target format (png, jpg, svg)
+
+        Returns:
+            Tuple of the export filename and its content type
+        """
+        target_format = target_format.lower()
+        name_without_ext = os.path.splitext(os.path.basename(original_filename))[0]
+        content_types = {"jpg": "image/jpeg", "svg": "image/svg+xml"}
+        return f"{name_without_ext}.{target_format}", content_types.get(target_format, f"image/{target_format}")
 
 
 async def get_export_service(
     image_service: ImageServiceInterface = Depends(get_image_service),
     processing_service: ImageProcessingServiceInterface = Depends(get_image_processing_service),
+    concept_persistence_service: ConceptPersistenceServiceInterface = Depends(get_concept_persistence_service),
 ) -> ExportService:
     """Create and configure an export service instance.
 
     Args:
         image_service: Image service dependency
         processing_service: Image processing service dependency
+        concept_persistence_service: Concept persistence service dependency
 
     Returns:
         Configured ExportService instance
     """
-    return ExportService(image_service=image_service, processing_service=processing_service)
+    return ExportService(
+        image_service=image_service,
+        processing_service=processing_service,
+        concept_persistence_service=concept_persistence_service,
+        export_cache=get_export_cache(),
+    )
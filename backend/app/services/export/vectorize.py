@@ -0,0 +1,127 @@
+"""SVG vectorization.
+
+This module traces raster images to SVG with vtracer. Images are encoded and
+traced entirely in memory, in the export process pool so that a large trace
+neither blocks the event loop nor holds the GIL for other requests.
+"""
+
+import re
+from functools import lru_cache
+from io import BytesIO
+from typing import Optional
+
+import vtracer
+from PIL import Image
+
+from app.core.config import settings
+from app.services.export.pool import ExportJobError, ExportJobTimeoutError, ExportProcessPool, get_export_process_pool
+
+# Matches the width and height attributes of the <svg> root written by vtracer
+_SVG_SIZE_PATTERN = re.compile(rb'<svg([^>]*?) width="\d+" height="\d+"')
+
+
+class VectorizationError(Exception):
+    """Raised when an image cannot be traced to SVG."""
+
+
+class VectorizationTimeoutError(VectorizationError):
+    """Raised when tracing an image exceeds the job timeout."""
+
+
+def trace_image(image_data: bytes, mode: str = "color", filter_speckle: int = 4, max_dimension: Optional[int] = None) -> bytes:
+    """Trace an image to SVG in memory.
+
+    Runs in the worker processes, so it only depends on PIL and vtracer.
+
+    Args:
+        image_data: Encoded source image
+        mode: "color" for a color trace, anything else for a binary trace of the grayscale image
+        filter_speckle: Size in pixels of the speckles discarded by a color trace
+        max_dimension: Optional size of the longest side the image is downscaled to before tracing
+
+    Returns:
+        SVG document bytes, sized like the source image
+    """
+    with Image.open(BytesIO(image_data)) as image:
+        original_size = image.size
+        traced = image.convert("RGBA" if mode == "color" else "L")
+
+    if max_dimension and max(original_size) > max_dimension:
+        traced.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+
+    buffer = BytesIO()
+    # Fast compression: the PNG only exists to hand pixels to vtracer
+    traced.save(buffer, format="PNG", compress_level=1)
+
+    svg: str
+    if mode == "color":
+        svg = vtracer.convert_raw_image_to_svg(buffer.getvalue(), img_format="png", colormode="color", hierarchical="stacked", mode="spline", filter_speckle=filter_speckle, path_precision=3)
+    else:
+        svg = vtracer.convert_raw_image_to_svg(
+            buffer.getvalue(),
+            img_format="png",
+            colormode="binary",
+            hierarchical="stacked",
+            mode="spline",
+            filter_speckle=4,
+            path_precision=8,
+            corner_threshold=60,
+            length_threshold=4.0,
+        )
+    svg_data = svg.encode("utf-8")
+
+    if traced.size != original_size:
+        # Paths are in traced coordinates; scale them back up with a viewBox
+        width, height = original_size
+        svg_data = _SVG_SIZE_PATTERN.sub(
+            lambda match: b'<svg%s width="%d" height="%d" viewBox="0 0 %d %d"' % (match.group(1), width, height, traced.width, traced.height),
+            svg_data,
+            count=1,
+        )
+    return svg_data
+
+
+class SvgVectorizer:
+    """Traces images to SVG in the export process pool."""
+
+    def __init__(self, pool: ExportProcessPool, max_dimension: Optional[int] = None):
+        """Initialize the vectorizer.
+
+        Args:
+            pool: Process pool the traces run in
+            max_dimension: Optional size of the longest side images are downscaled to before tracing
+        """
+        self.pool = pool
+        self.max_dimension = max_dimension or None
+
+    async def vectorize(self, image_data: bytes, mode: str = "color", filter_speckle: int = 4) -> bytes:
+        """Trace an image to SVG.
+
+        Args:
+            image_data: Encoded source image
+            mode: "color" for a color trace, anything else for a binary trace
+            filter_speckle: Size in pixels of the speckles discarded by a color trace
+
+        Returns:
+            SVG document bytes
+
+        Raises:
+            VectorizationTimeoutError: If the trace exceeds the pool's timeout
+            VectorizationError: If the trace fails
+        """
+        try:
+            return await self.pool.run(trace_image, image_data, mode, filter_speckle, self.max_dimension)
+        except ExportJobTimeoutError:
+            raise VectorizationTimeoutError(f"SVG trace exceeded {self.pool.timeout_seconds}s")
+        except ExportJobError as e:
+            raise VectorizationError(str(e))
+
+
+@lru_cache()
+def get_svg_vectorizer() -> SvgVectorizer:
+    """Get the SVG vectorizer for this process.
+
+    Returns:
+        SvgVectorizer using the export process pool
+    """
+    return SvgVectorizer(get_export_process_pool(), max_dimension=settings.EXPORT_SVG_TRACE_MAX_DIMENSION)
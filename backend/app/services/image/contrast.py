@@ -0,0 +1,169 @@
+"""Palette contrast scoring.
+
+Scores color palettes by how usable they are for a logo: the WCAG contrast
+ratio of their best pair of colors (so there is a readable foreground and
+background), the share of pairs readable as large text or graphics, and how
+distinct the colors are from each other (CIE76 delta E in CIELAB). All
+candidate palettes are scored at once with numpy, as arrays of shape
+(palettes, colors, ...), so ranking a set takes well under a millisecond.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from app.services.image.harmony import srgb_to_lab
+
+_HEX_PATTERN = re.compile(r"^#?([0-9a-fA-F]{6}|[0-9a-fA-F]{3})$")
+
+# WCAG contrast ratios of normal text (AAA, from which the best pair scores fully) and of large text and graphics
+AAA_CONTRAST = 7.0
+LARGE_CONTRAST = 3.0
+
+# Delta E from which two colors count as fully distinct
+DISTINCT_DELTA_E = 20.0
+
+# Weights of the best contrast, readable pairs and distinctness in the score
+CONTRAST_WEIGHT = 0.5
+READABLE_PAIRS_WEIGHT = 0.2
+DISTINCTNESS_WEIGHT = 0.3
+
+
+@dataclass(frozen=True)
+class PaletteScore:
+    """Usability score of a palette.
+
+    Attributes:
+        score: Overall score from 0 to 1, higher is better
+        max_contrast: Contrast ratio of the best pair of colors
+        readable_pairs: Share of color pairs with at least LARGE_CONTRAST
+        min_delta_e: Delta E of the two closest colors
+    """
+
+    score: float
+    max_contrast: float
+    readable_pairs: float
+    min_delta_e: float
+
+
+def palettes_to_rgb(palettes: Sequence[Sequence[Any]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Convert the hex colors of palettes to one sRGB array.
+
+    Args:
+        palettes: Color lists, of any lengths; entries that are not hex codes are ignored
+
+    Returns:
+        sRGB values in [0, 1] of shape (palettes, most colors, 3), and the mask
+        of shape (palettes, most colors) of the entries holding a valid color
+    """
+    width = max((len(colors) for colors in palettes), default=0)
+    rgb = np.zeros((len(palettes), width, 3))
+    valid = np.zeros((len(palettes), width), dtype=bool)
+    for row, colors in enumerate(palettes):
+        for column, color in enumerate(colors):
+            match = _HEX_PATTERN.match(color.strip()) if isinstance(color, str) else None
+            if match is None:
+                continue
+            code = match.group(1)
+            if len(code) == 3:
+                code = "".join(digit * 2 for digit in code)
+            rgb[row, column] = [int(code[i : i + 2], 16) / 255.0 for i in (0, 2, 4)]
+            valid[row, column] = True
+    return rgb, valid
+
+
+def relative_luminance(rgb: np.ndarray) -> np.ndarray:
+    """Compute the WCAG relative luminance of sRGB colors.
+
+    Args:
+        rgb: sRGB values in [0, 1], of shape (..., 3)
+
+    Returns:
+        Luminance from 0 (black) to 1 (white), of shape (...)
+    """
+    linear = np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+    luminance: np.ndarray = linear @ np.array([0.2126, 0.7152, 0.0722])
+    return luminance
+
+
+def contrast_matrix(luminance: np.ndarray) -> np.ndarray:
+    """Compute the WCAG contrast ratios of all pairs of colors.
+
+    Args:
+        luminance: Relative luminance of shape (..., colors)
+
+    Returns:
+        Ratios from 1 to 21, of shape (..., colors, colors)
+    """
+    first = luminance[..., :, None]
+    second = luminance[..., None, :]
+    ratios: np.ndarray = (np.maximum(first, second) + 0.05) / (np.minimum(first, second) + 0.05)
+    return ratios
+
+
+def delta_e_matrix(lab: np.ndarray) -> np.ndarray:
+    """Compute the CIE76 delta E of all pairs of colors.
+
+    Args:
+        lab: CIELAB colors of shape (..., colors, 3)
+
+    Returns:
+        Distances of shape (..., colors, colors)
+    """
+    distances: np.ndarray = np.linalg.norm(lab[..., :, None, :] - lab[..., None, :, :], axis=-1)
+    return distances
+
+
+def score_palettes(palettes: Sequence[Dict[str, Any]]) -> List[PaletteScore]:
+    """Score palettes in one batch.
+
+    Palettes with fewer than two valid colors score 0; invalid colors lower
+    the score of their palette in proportion.
+
+    Args:
+        palettes: Palette dictionaries with a "colors" list of hex codes
+
+    Returns:
+        Scores in the order of the palettes
+    """
+    if not palettes:
+        return []
+    rgb, valid = palettes_to_rgb([palette.get("colors") or [] for palette in palettes])
+    count, width = valid.shape
+    if width < 2:
+        return [PaletteScore(0.0, 1.0, 0.0, 0.0) for _ in range(count)]
+
+    contrast = contrast_matrix(relative_luminance(rgb))
+    delta_e = delta_e_matrix(srgb_to_lab(rgb.reshape(-1, 3)).reshape(count, width, 3))
+
+    # Pairs of two different valid colors
+    pairs = valid[:, :, None] & valid[:, None, :] & ~np.eye(width, dtype=bool)
+    pair_counts = pairs.sum(axis=(1, 2))
+    has_pairs = pair_counts > 0
+
+    max_contrast = np.where(pairs, contrast, 1.0).max(axis=(1, 2))
+    readable_pairs = np.where(has_pairs, (pairs & (contrast >= LARGE_CONTRAST)).sum(axis=(1, 2)) / np.maximum(pair_counts, 1), 0.0)
+    min_delta_e = np.where(has_pairs, np.where(pairs, delta_e, np.inf).min(axis=(1, 2)), 0.0)
+
+    score = CONTRAST_WEIGHT * np.minimum(max_contrast / AAA_CONTRAST, 1.0) + READABLE_PAIRS_WEIGHT * readable_pairs + DISTINCTNESS_WEIGHT * np.minimum(min_delta_e / DISTINCT_DELTA_E, 1.0)
+    color_counts = np.array([max(len(palette.get("colors") or []), 1) for palette in palettes])
+    score = np.where(has_pairs, score * valid.sum(axis=1) / color_counts, 0.0)
+
+    return [PaletteScore(float(s), float(c), float(r), float(d)) for s, c, r, d in zip(score, max_contrast, readable_pairs, min_delta_e)]
+
+
+def rank_palettes(palettes: Sequence[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+    """Keep the best scoring palettes.
+
+    Args:
+        palettes: Candidate palette dictionaries
+        limit: Number of palettes to keep
+
+    Returns:
+        The best palettes, best first; ties keep their original order
+    """
+    scores = score_palettes(palettes)
+    order = sorted(range(len(palettes)), key=lambda index: -scores[index].score)
+    return [palettes[index] for index in order[:limit]]
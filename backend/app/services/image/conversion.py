@@ -4,15 +4,24 @@ This module provides functions for converting images between formats,
 generating thumbnails, and other image transformation operations.
 """
 
-import imghdr
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
 
 from PIL import Image as PILImage
 
+from app.services.image.optimization import OPTIMIZATION_FORMATS, search_optimized_encoding
+from app.services.image.probe import probe_image
+
 logger = logging.getLogger(__name__)
 
+# Fast thumbnails keep the image this many times the target size before the final resample
+THUMBNAIL_REDUCING_GAP = 2.0
+
+# Threads used by generate_thumbnails
+THUMBNAIL_BATCH_WORKERS = 4
+
 
 class ConversionError(Exception):
     """Exception raised for errors during image conversion."""
@@ -33,11 +42,12 @@ def detect_image_format(image_data: bytes) -> str:
         ConversionError: If format detection fails
     """
     try:
-        # Try using imghdr first
-        image_format = imghdr.what(None, h=image_data)
+        # Read the container header first, without decoding
+        probe = probe_image(image_data)
+        image_format = probe.format if probe else None
 
         if not image_format:
-            # Fall back to PIL if imghdr doesn't work
+            # Fall back to PIL for other formats; open() only parses the header
             img = PILImage.open(BytesIO(image_data))
             image_format = img.format.lower() if img.format else None
 
@@ -107,12 +117,65 @@ def convert_image_format(image_data: bytes, target_format: str = "png", quality:
         raise ConversionError(error_msg)
 
 
+def fit_within(width: int, height: int, box: Tuple[int, int]) -> Tuple[int, int]:
+    """Get the dimensions of an image scaled down to fit a box, keeping its aspect ratio.
+
+    Args:
+        width: Image width
+        height: Image height
+        box: Maximum (width, height)
+
+    Returns:
+        Scaled dimensions; images already fitting keep their size
+    """
+    scale = min(box[0] / width, box[1] / height, 1.0)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def fast_downscale(
+    img: PILImage.Image,
+    size: Tuple[int, int],
+    resample: PILImage.Resampling = PILImage.Resampling.LANCZOS,
+    reducing_gap: float = THUMBNAIL_REDUCING_GAP,
+) -> PILImage.Image:
+    """Downscale an image, shrinking it cheaply before the final resample.
+
+    JPEG sources that are not loaded yet are decoded at a reduced DCT scale
+    (draft), and large integer factors are then taken with reduce() (box
+    averaging), so the final resample only runs on an image at most
+    reducing_gap times the target size.
+
+    Args:
+        img: Image to downscale, ideally just opened
+        size: Target (width, height)
+        resample: Filter of the final resample
+        reducing_gap: How much larger than the target the image is kept before the final resample
+
+    Returns:
+        Image resized to exactly size
+    """
+    target_width, target_height = max(1, size[0]), max(1, size[1])
+    floor_width, floor_height = int(target_width * reducing_gap), int(target_height * reducing_gap)
+
+    if img.format == "JPEG":
+        # Only takes effect before the pixels are loaded
+        img.draft(None, (floor_width, floor_height))
+    if img.mode in ("P", "1"):
+        img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+
+    factor = min(img.width // floor_width, img.height // floor_height)
+    if factor >= 2:
+        img = img.reduce(factor)
+    return img.resize((target_width, target_height), resample=resample)
+
+
 def generate_thumbnail(
     image_data: bytes,
     size: Tuple[int, int] = (128, 128),
     format: str = "png",
     preserve_aspect_ratio: bool = True,
     quality: int = 85,
+    fast: bool = True,
 ) -> bytes:
     """Generate a thumbnail from an image.
 
@@ -122,6 +185,7 @@ def generate_thumbnail(
         format: Output format
         preserve_aspect_ratio: Whether to preserve the aspect ratio
         quality: Quality for lossy formats (0-100)
+        fast: Whether to use draft decoding and reduce() before the final resample
 
     Returns:
         Thumbnail image as bytes
@@ -133,16 +197,24 @@ def generate_thumbnail(
         # Open the image
         img: PILImage.Image = PILImage.open(BytesIO(image_data))
 
-        # Convert to RGB if necessary
-        if img.mode not in ("RGB", "RGBA"):
-            img = img.convert("RGB")
-
-        if preserve_aspect_ratio:
-            # Create a thumbnail that fits within the size, preserving aspect ratio
-            img.thumbnail(size, PILImage.Resampling.LANCZOS)
+        if fast:
+            # Downscale before any conversion, so JPEGs can still be draft-decoded
+            target_size = fit_within(img.width, img.height, size) if preserve_aspect_ratio else size
+            if target_size != img.size:
+                img = fast_downscale(img, target_size)
+            if img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGB")
         else:
-            # Resize to exact dimensions
-            img = img.resize(size, PILImage.Resampling.LANCZOS)
+            # Convert to RGB if necessary
+            if img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGB")
+
+            if preserve_aspect_ratio:
+                # Create a thumbnail that fits within the size, preserving aspect ratio
+                img.thumbnail(size, PILImage.Resampling.LANCZOS)
+            else:
+                # Resize to exact dimensions
+                img = img.resize(size, PILImage.Resampling.LANCZOS)
 
         # Save to BytesIO
         output = BytesIO()
@@ -169,6 +241,48 @@ def generate_thumbnail(
         raise ConversionError(error_msg)
 
 
+def generate_thumbnails(
+    images: Sequence[bytes],
+    size: Tuple[int, int] = (128, 128),
+    format: str = "png",
+    preserve_aspect_ratio: bool = True,
+    quality: int = 85,
+    max_workers: Optional[int] = None,
+) -> List[Optional[bytes]]:
+    """Generate thumbnails of many images on the fast path.
+
+    Decoding, resampling and encoding release the GIL, so the images are
+    thumbnailed concurrently in a thread pool.
+
+    Args:
+        images: Binary image data of each image
+        size: Thumbnail size as (width, height)
+        format: Output format
+        preserve_aspect_ratio: Whether to preserve the aspect ratio
+        quality: Quality for lossy formats (0-100)
+        max_workers: Optional number of threads, THUMBNAIL_BATCH_WORKERS by default
+
+    Returns:
+        Thumbnail bytes in input order, None for images that failed
+    """
+
+    def _thumbnail(image_data: bytes) -> Optional[bytes]:
+        try:
+            return generate_thumbnail(image_data, size=size, format=format, preserve_aspect_ratio=preserve_aspect_ratio, quality=quality)
+        except ConversionError:
+            return None
+
+    if not images:
+        return []
+    workers = max(1, min(len(images), max_workers or THUMBNAIL_BATCH_WORKERS))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnail") as executor:
+        results = list(executor.map(_thumbnail, images))
+    failed = sum(result is None for result in results)
+    if failed:
+        logger.warning(f"Failed to generate {failed} of {len(results)} thumbnails")
+    return results
+
+
 def get_image_metadata(image_data: bytes) -> Dict[str, Any]:
     """Extract metadata from an image.
 
@@ -182,33 +296,44 @@ def get_image_metadata(image_data: bytes) -> Dict[str, Any]:
         ConversionError: If metadata extraction fails
     """
     try:
-        img: PILImage.Image = PILImage.open(BytesIO(image_data))
+        image_format: Optional[str]
+        mode: Optional[str]
+        probe = probe_image(image_data)
+        if probe is not None:
+            image_format, mode, width, height, has_alpha = probe.format.upper(), probe.mode, probe.width, probe.height, probe.has_alpha
+            exif = PILImage.Exif()
+            if probe.exif:
+                exif.load(probe.exif)
+        else:
+            # Formats the probe does not parse; PIL reads the header lazily without decoding
+            img: PILImage.Image = PILImage.open(BytesIO(image_data))
+            image_format, mode, width, height = img.format, img.mode, img.width, img.height
+            has_alpha = img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info
+            exif = img.getexif()
 
         metadata: Dict[str, Any] = {
-            "format": img.format,
-            "mode": img.mode,
-            "width": img.width,
-            "height": img.height,
-            "aspect_ratio": round(img.width / img.height, 2) if img.height > 0 else 0,
+            "format": image_format,
+            "mode": mode,
+            "width": width,
+            "height": height,
+            "aspect_ratio": round(width / height, 2) if height > 0 else 0,
+            "has_alpha": has_alpha,
             "size_bytes": len(image_data),
             "exif": {},
         }
 
-        # Extract EXIF data if available
-        if hasattr(img, "_getexif") and img._getexif():
-            exif = img._getexif()
-            if exif:
-                # Common EXIF tags
-                exif_tags = {
-                    271: "make",
-                    272: "model",
-                    306: "datetime",
-                    36867: "date_taken",
-                }
-
-                for tag_id, tag_name in exif_tags.items():
-                    if tag_id in exif:
-                        metadata["exif"][tag_name] = str(exif[tag_id])
+        # Common EXIF tags
+        exif_tags = {
+            271: "make",
+            272: "model",
+            306: "datetime",
+            36867: "date_taken",
+        }
+        exif_ifd = exif.get_ifd(0x8769) if exif else {}
+        for tag_id, tag_name in exif_tags.items():
+            value = exif.get(tag_id, exif_ifd.get(tag_id))
+            if value is not None:
+                metadata["exif"][tag_name] = str(value)
 
         return metadata
 
@@ -218,13 +343,28 @@ def get_image_metadata(image_data: bytes) -> Dict[str, Any]:
         raise ConversionError(error_msg)
 
 
-def optimize_image(image_data: bytes, quality: int = 85, max_size: Optional[Tuple[int, int]] = None) -> bytes:
+def optimize_image(
+    image_data: bytes,
+    quality: int = 85,
+    max_size: Optional[Tuple[int, int]] = None,
+    max_bytes: Optional[int] = None,
+    min_quality: Optional[float] = None,
+    formats: Optional[Iterable[str]] = None,
+) -> bytes:
     """Optimize an image for web delivery.
 
+    By default the image is saved once at the given quality. Given a byte
+    budget and/or a perceptual-quality floor, the quality and format are
+    searched instead for the smallest output meeting them (see
+    app.services.image.optimization).
+
     Args:
         image_data: Binary image data
         quality: Quality setting for compression (0-100)
         max_size: Optional maximum dimensions (width, height)
+        max_bytes: Optional byte budget of the output
+        min_quality: Optional lowest SSIM of the output against the source (0-1)
+        formats: Formats the search may produce (jpeg, webp, png), all by default
 
     Returns:
         Optimized image as bytes
@@ -237,8 +377,20 @@ def optimize_image(image_data: bytes, quality: int = 85, max_size: Optional[Tupl
 
         # Resize if necessary
         original_format = img.format
+        resized = False
         if max_size and (img.width > max_size[0] or img.height > max_size[1]):
             img.thumbnail(max_size, PILImage.Resampling.LANCZOS)
+            resized = True
+
+        if max_bytes is not None or min_quality is not None:
+            allowed_formats = ["jpeg" if fmt.lower() == "jpg" else fmt.lower() for fmt in (formats or OPTIMIZATION_FORMATS)]
+            result = search_optimized_encoding(img, max_bytes=max_bytes, min_ssim=min_quality, formats=allowed_formats)
+            # The untouched original already has perfect quality
+            keep_original = not resized and (original_format or "").lower() in allowed_formats
+            if keep_original and len(image_data) <= result.size and (max_bytes is None or len(image_data) <= max_bytes):
+                logger.info("Original image is smaller than any optimized encoding, returning original")
+                return image_data
+            return result.data
 
         # Determine best format
         if img.mode == "RGBA" or original_format == "PNG" and "transparency" in img.info:
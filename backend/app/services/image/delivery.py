@@ -0,0 +1,143 @@
+"""Responsive image delivery.
+
+This module builds srcset-style sources for concept and variation images from
+the browser siblings pre-rendered when they were generated (see
+app.services.export.derivatives), in the format negotiated from the
+request's Accept header.
+"""
+
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.services.export.derivatives import DELIVERY_FORMATS, DELIVERY_SIZES, DERIVATIVE_CONTENT_TYPES, derivative_key
+
+logger = logging.getLogger(__name__)
+
+# Served to clients that list no modern format explicitly
+FALLBACK_FORMAT = "png"
+
+
+def _parse_accept(accept: Optional[str]) -> Dict[str, float]:
+    """Parse an Accept header into quality values by media type.
+
+    Args:
+        accept: Accept header value
+
+    Returns:
+        Quality value by lowercased media type
+    """
+    qualities: Dict[str, float] = {}
+    for part in (accept or "").split(","):
+        media_type, *params = [item.strip() for item in part.split(";")]
+        if not media_type:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[media_type.lower()] = quality
+    return qualities
+
+
+def negotiate_image_format(accept: Optional[str], available: Iterable[str] = DELIVERY_FORMATS) -> str:
+    """Choose the image format to serve from an Accept header.
+
+    Modern formats are only chosen when the client lists them explicitly;
+    wildcards (image/*, */*) are sent by API clients and older browsers that
+    may not decode them, so they only select the PNG fallback.
+
+    Args:
+        accept: Accept header value
+        available: Formats that can be served, most preferred first
+
+    Returns:
+        Format with the highest quality value, ties going to the most preferred
+    """
+    qualities = _parse_accept(accept)
+    best, best_quality = FALLBACK_FORMAT, 0.0
+    for fmt in available:
+        quality = qualities.get(DERIVATIVE_CONTENT_TYPES.get(fmt, f"image/{fmt}"), 0.0)
+        if quality > best_quality:
+            best, best_quality = fmt, quality
+    return best
+
+
+def _source_paths(export_derivatives: Optional[Dict[str, Any]], fmt: str) -> Dict[str, Dict[str, Any]]:
+    """Get the stored delivery sizes of an image in one format.
+
+    Args:
+        export_derivatives: The image's record of pre-rendered derivatives
+        fmt: Image format
+
+    Returns:
+        Derivative records by size name, smallest first
+    """
+    if not export_derivatives:
+        return {}
+    entries = {size: export_derivatives.get(derivative_key(size, fmt)) for size in DELIVERY_SIZES}
+    return {size: entry for size, entry in entries.items() if entry and entry.get("path")}
+
+
+def _image_sources(export_derivatives: Optional[Dict[str, Any]], fmt: str) -> Tuple[str, Dict[str, Dict[str, Any]]]:
+    """Get the delivery sizes of an image in the negotiated format, or the fallback format.
+
+    Args:
+        export_derivatives: The image's record of pre-rendered derivatives
+        fmt: Negotiated format
+
+    Returns:
+        Format served and its derivative records by size name, empty if the image has no siblings
+    """
+    for candidate in (fmt, FALLBACK_FORMAT):
+        sources = _source_paths(export_derivatives, candidate)
+        if sources:
+            return candidate, sources
+    return fmt, {}
+
+
+def attach_image_sources(concepts: List[Dict[str, Any]], accept: Optional[str], image_persistence_service: Any) -> str:
+    """Add responsive image sources to concepts and their color variations.
+
+    Each image with pre-rendered siblings gets an "image_sources" entry with
+    its format, content type, a srcset string and the URL of each size. All
+    URLs are signed with one storage request per bucket.
+
+    Args:
+        concepts: Concepts of one user, with their "color_variations"
+        accept: Accept header of the request
+        image_persistence_service: Service used to sign the URLs
+
+    Returns:
+        The negotiated format
+    """
+    fmt = negotiate_image_format(accept)
+
+    # (image, (format, sources)) per bucket
+    concept_images = [(concept, _image_sources(concept.get("export_derivatives"), fmt)) for concept in concepts]
+    variation_images = [(variation, _image_sources(variation.get("export_derivatives"), fmt)) for concept in concepts for variation in concept.get("color_variations") or []]
+
+    for images, is_palette in ((concept_images, False), (variation_images, True)):
+        paths = [entry["path"] for _, (_, sources) in images for entry in sources.values()]
+        if not paths:
+            continue
+        try:
+            signed_urls = image_persistence_service.get_signed_urls(paths, is_palette=is_palette)
+        except Exception as e:
+            logger.warning(f"Error signing image sources: {str(e)}")
+            continue
+
+        for image, (source_format, sources) in images:
+            urls = {size: signed_urls[entry["path"]] for size, entry in sources.items() if entry["path"] in signed_urls}
+            if not urls:
+                continue
+            image["image_sources"] = {
+                "format": source_format,
+                "content_type": DERIVATIVE_CONTENT_TYPES[source_format],
+                "srcset": ", ".join(f"{urls[size]} {sources[size].get('width') or DELIVERY_SIZES[size]}w" for size in urls),
+                "urls": urls,
+            }
+    return fmt
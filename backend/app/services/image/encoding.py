@@ -0,0 +1,68 @@
+"""Output encoding for generated images.
+
+This module encodes processed images for storage. Palette variations are flat
+logos recolored with a handful of palette colors, so many of them fit in an
+indexed-color PNG (PNG8), which is several times smaller than the 24-bit PNG
+PIL writes by default.
+"""
+
+from io import BytesIO
+from typing import Optional
+
+import numpy as np
+from PIL import Image
+
+# Largest number of colors an indexed PNG can hold
+PNG8_MAX_COLORS = 256
+
+
+def palettize(image: Image.Image, max_colors: int = PNG8_MAX_COLORS) -> Optional[Image.Image]:
+    """Convert an image with few distinct colors to an exact palette image.
+
+    Unlike quantization, no color is changed: every pixel is mapped to its
+    own palette entry, so the PNG8 decodes to the same pixels as the source.
+
+    Args:
+        image: RGB or RGBA image
+        max_colors: Largest palette to build
+
+    Returns:
+        Palette ("P" mode) image, or None if the image has more colors than max_colors
+    """
+    if image.mode not in ("RGB", "RGBA"):
+        return None
+    # getcolors stops counting once max_colors is exceeded, so photos bail out early
+    colors = image.getcolors(maxcolors=max_colors)
+    if colors is None:
+        return None
+
+    channels = len(image.mode)
+    pixels = np.asarray(image, dtype=np.uint32).reshape(-1, channels)
+    palette = np.array([color for _, color in colors], dtype=np.uint32).reshape(-1, channels)
+
+    # Pack each pixel into one integer so pixels map to palette indices by search
+    shifts = np.array([8 * (channels - 1 - channel) for channel in range(channels)], dtype=np.uint32)
+    pixel_keys = (pixels << shifts).sum(axis=1, dtype=np.uint32)
+    palette_keys = (palette << shifts).sum(axis=1, dtype=np.uint32)
+    order = np.argsort(palette_keys)
+    indices = np.searchsorted(palette_keys[order], pixel_keys)
+
+    indexed = Image.fromarray(indices.astype(np.uint8).reshape(image.height, image.width), mode="L").convert("P")
+    indexed.putpalette(palette[order].astype(np.uint8).tobytes(), rawmode=image.mode)
+    return indexed
+
+
+def encode_png(image: Image.Image, optimize: bool = False) -> bytes:
+    """Encode an image as PNG, as PNG8 when it has few enough colors.
+
+    Args:
+        image: Image to encode
+        optimize: Whether to spend extra CPU on lossless compression
+
+    Returns:
+        PNG bytes
+    """
+    indexed = palettize(image)
+    output = BytesIO()
+    (indexed or image).save(output, format="PNG", optimize=optimize)
+    return output.getvalue()
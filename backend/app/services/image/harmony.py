@@ -0,0 +1,376 @@
+"""Local color palette engine.
+
+Derives harmonious palettes (complementary, analogous, triadic, monochrome
+and high-contrast schemes) from a few base colors, without calling an API:
+the dominant colors of a base image, and hues and moods named in the theme
+description. Colors are computed in CIELAB (as lightness, chroma and hue)
+and fitted back into the sRGB gamut, all vectorized with numpy, so a set of
+palettes takes a few milliseconds. They serve as a preview while the
+generated palettes are pending and as the fallback when the API is too slow.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.image.processing import extract_dominant_colors
+
+# sRGB (D65) to CIE XYZ matrix, and the D65 reference white
+_RGB_TO_XYZ = np.array(
+    [
+        [0.4124564, 0.3575761, 0.1804375],
+        [0.2126729, 0.7151522, 0.0721750],
+        [0.0193339, 0.1191920, 0.9503041],
+    ]
+)
+_XYZ_TO_RGB = np.linalg.inv(_RGB_TO_XYZ)
+_WHITE = np.array([0.95047, 1.0, 1.08883])
+_EPSILON = 6.0 / 29.0
+
+# Colors with less chroma are treated as neutrals, not as base hues
+NEUTRAL_CHROMA = 12.0
+
+# Base color of palettes when neither the image nor the theme gives a hue
+DEFAULT_BASE_COLOR = "#4F46E5"
+
+# Dominant colors extracted from a base image, and the size it is reduced to first
+IMAGE_BASE_COLORS = 6
+IMAGE_MAX_DIMENSION = 96
+
+# Most base colors used; palettes beyond one per scheme and base color repeat
+MAX_BASE_COLORS = 4
+
+SCHEMES = ["complementary", "analogous", "triadic", "monochrome", "high_contrast"]
+
+_SCHEME_TEXT = {
+    "complementary": "{hue} paired with its complementary hue for strong accents",
+    "analogous": "Neighboring hues around {hue} for a cohesive, calm look",
+    "triadic": "Three evenly spaced hues starting from {hue}, balanced by light and dark neutrals",
+    "monochrome": "Shades and tints of {hue}",
+    "high_contrast": "{hue} with near-black and near-white for maximum legibility",
+}
+
+# Upper bounds of the hue angle (in degrees) of each hue name
+_HUE_NAMES = [(15, "Pink"), (50, "Red"), (75, "Orange"), (105, "Gold"), (165, "Green"), (215, "Teal"), (300, "Blue"), (335, "Purple"), (360, "Pink")]
+
+
+@dataclass(frozen=True)
+class ThemeBias:
+    """Effect of a theme keyword on the palettes.
+
+    Attributes:
+        hue: Hue angle the keyword names, added as a base color
+        lightness: Added to the lightness of the colors
+        chroma_scale: Multiplies the chroma of the colors
+    """
+
+    hue: Optional[float] = None
+    lightness: float = 0.0
+    chroma_scale: float = 1.0
+
+
+THEME_KEYWORDS: Dict[str, ThemeBias] = {
+    # Hues
+    "red": ThemeBias(hue=40),
+    "crimson": ThemeBias(hue=30, lightness=-8),
+    "coral": ThemeBias(hue=35, lightness=10),
+    "orange": ThemeBias(hue=65),
+    "autumn": ThemeBias(hue=60, chroma_scale=0.85),
+    "gold": ThemeBias(hue=85),
+    "golden": ThemeBias(hue=85),
+    "yellow": ThemeBias(hue=95),
+    "sunny": ThemeBias(hue=90, lightness=8),
+    "green": ThemeBias(hue=140),
+    "forest": ThemeBias(hue=145, lightness=-10),
+    "nature": ThemeBias(hue=135, chroma_scale=0.8),
+    "teal": ThemeBias(hue=190),
+    "cyan": ThemeBias(hue=200),
+    "ocean": ThemeBias(hue=230),
+    "blue": ThemeBias(hue=270),
+    "navy": ThemeBias(hue=270, lightness=-18),
+    "purple": ThemeBias(hue=310),
+    "violet": ThemeBias(hue=300),
+    "magenta": ThemeBias(hue=335),
+    "pink": ThemeBias(hue=355),
+    "brown": ThemeBias(hue=60, lightness=-15, chroma_scale=0.6),
+    "warm": ThemeBias(hue=55),
+    "cool": ThemeBias(hue=230),
+    # Moods
+    "pastel": ThemeBias(lightness=18, chroma_scale=0.45),
+    "soft": ThemeBias(lightness=10, chroma_scale=0.7),
+    "light": ThemeBias(lightness=10),
+    "bright": ThemeBias(lightness=6, chroma_scale=1.2),
+    "dark": ThemeBias(lightness=-18),
+    "night": ThemeBias(lightness=-18),
+    "midnight": ThemeBias(lightness=-22),
+    "vibrant": ThemeBias(chroma_scale=1.35),
+    "neon": ThemeBias(chroma_scale=1.5),
+    "bold": ThemeBias(chroma_scale=1.3),
+    "energetic": ThemeBias(chroma_scale=1.3),
+    "playful": ThemeBias(chroma_scale=1.2),
+    "muted": ThemeBias(chroma_scale=0.55),
+    "earthy": ThemeBias(chroma_scale=0.6),
+    "natural": ThemeBias(chroma_scale=0.7),
+    "vintage": ThemeBias(chroma_scale=0.6),
+    "rustic": ThemeBias(chroma_scale=0.6),
+    "corporate": ThemeBias(chroma_scale=0.8),
+    "professional": ThemeBias(chroma_scale=0.8),
+    "minimal": ThemeBias(chroma_scale=0.5),
+    "minimalist": ThemeBias(chroma_scale=0.5),
+}
+
+
+def hex_to_rgb(hex_colors: Sequence[str]) -> np.ndarray:
+    """Convert hex color codes to an array of sRGB values in [0, 1].
+
+    Args:
+        hex_colors: Color codes like '#FF5733'
+
+    Returns:
+        Array of shape (n, 3)
+    """
+    values = [[int(code.lstrip("#")[i : i + 2], 16) for i in (0, 2, 4)] for code in hex_colors]
+    return np.array(values, dtype=np.float64).reshape(-1, 3) / 255.0
+
+
+def rgb_to_hex(rgb: np.ndarray) -> List[str]:
+    """Convert sRGB values in [0, 1] to hex color codes.
+
+    Args:
+        rgb: Array of shape (n, 3)
+
+    Returns:
+        Upper-case color codes like '#FF5733'
+    """
+    values = np.clip(np.round(rgb * 255.0), 0, 255).astype(int)
+    return [f"#{r:02X}{g:02X}{b:02X}" for r, g, b in values]
+
+
+def srgb_to_lab(rgb: np.ndarray) -> np.ndarray:
+    """Convert sRGB values in [0, 1] to CIELAB (D65).
+
+    Args:
+        rgb: Array of shape (n, 3)
+
+    Returns:
+        Array of (L, a, b) rows
+    """
+    linear = np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+    xyz = linear @ _RGB_TO_XYZ.T / _WHITE
+    f = np.where(xyz > _EPSILON**3, np.cbrt(xyz), xyz / (3 * _EPSILON**2) + 4.0 / 29.0)
+    return np.stack([116.0 * f[:, 1] - 16.0, 500.0 * (f[:, 0] - f[:, 1]), 200.0 * (f[:, 1] - f[:, 2])], axis=1)
+
+
+def lab_to_srgb(lab: np.ndarray) -> np.ndarray:
+    """Convert CIELAB (D65) to sRGB values, not clipped to [0, 1].
+
+    Args:
+        lab: Array of (L, a, b) rows
+
+    Returns:
+        Array of shape (n, 3); values outside [0, 1] are out of gamut
+    """
+    fy = (lab[:, 0] + 16.0) / 116.0
+    f = np.stack([fy + lab[:, 1] / 500.0, fy, fy - lab[:, 2] / 200.0], axis=1)
+    xyz = np.where(f > _EPSILON, f**3, 3 * _EPSILON**2 * (f - 4.0 / 29.0)) * _WHITE
+    linear = xyz @ _XYZ_TO_RGB.T
+    rgb: np.ndarray = np.where(linear <= 0.0031308, linear * 12.92, 1.055 * np.abs(linear) ** (1 / 2.4) - 0.055)
+    return rgb
+
+
+def lab_to_lch(lab: np.ndarray) -> np.ndarray:
+    """Convert CIELAB to lightness, chroma and hue angle in degrees."""
+    return np.stack([lab[:, 0], np.hypot(lab[:, 1], lab[:, 2]), np.degrees(np.arctan2(lab[:, 2], lab[:, 1])) % 360.0], axis=1)
+
+
+def lch_to_lab(lch: np.ndarray) -> np.ndarray:
+    """Convert lightness, chroma and hue angle in degrees to CIELAB."""
+    hue = np.radians(lch[:, 2])
+    return np.stack([lch[:, 0], lch[:, 1] * np.cos(hue), lch[:, 1] * np.sin(hue)], axis=1)
+
+
+def lch_to_hex(lch: np.ndarray, steps: int = 12) -> List[str]:
+    """Convert LCh colors to hex codes, reducing chroma to fit the sRGB gamut.
+
+    Out-of-gamut colors keep their lightness and hue; their chroma is
+    binary searched (for all colors at once) down to the largest that fits.
+
+    Args:
+        lch: Array of (lightness, chroma, hue) rows
+        steps: Binary search steps
+
+    Returns:
+        Color codes
+    """
+    lch = lch.astype(np.float64)
+    lch[:, 0] = np.clip(lch[:, 0], 0.0, 100.0)
+    lch[:, 1] = np.maximum(lch[:, 1], 0.0)
+
+    def in_gamut(scale: np.ndarray) -> np.ndarray:
+        scaled = np.column_stack([lch[:, 0], lch[:, 1] * scale, lch[:, 2]])
+        rgb = lab_to_srgb(lch_to_lab(scaled))
+        inside: np.ndarray = np.all((rgb >= -1e-4) & (rgb <= 1 + 1e-4), axis=1)
+        return inside
+
+    low = np.zeros(len(lch))
+    high = np.ones(len(lch))
+    fits = in_gamut(high)
+    low[fits] = 1.0
+    for _ in range(steps):
+        middle = (low + high) / 2
+        ok = in_gamut(middle) & ~fits
+        low = np.where(ok, middle, low)
+        high = np.where(ok | fits, high, middle)
+
+    fitted = np.column_stack([lch[:, 0], lch[:, 1] * low, lch[:, 2]])
+    return rgb_to_hex(np.clip(lab_to_srgb(lch_to_lab(fitted)), 0.0, 1.0))
+
+
+def hue_name(lch: np.ndarray) -> str:
+    """Get a readable name of the hue of an LCh color."""
+    if lch[1] < NEUTRAL_CHROMA:
+        return "Gray"
+    return next(name for bound, name in _HUE_NAMES if lch[2] % 360.0 < bound)
+
+
+def parse_theme(text: str) -> Tuple[List[float], ThemeBias]:
+    """Find the hues and mood a description names.
+
+    Args:
+        text: Theme (and logo) description
+
+    Returns:
+        The hue angles named, in order, and the combined lightness and chroma bias
+    """
+    hues: List[float] = []
+    lightness = 0.0
+    chroma_scale = 1.0
+    for word in re.findall(r"[a-z]+", text.lower()):
+        bias = THEME_KEYWORDS.get(word)
+        if bias is None:
+            continue
+        if bias.hue is not None and bias.hue not in hues:
+            hues.append(bias.hue)
+        lightness += bias.lightness
+        chroma_scale *= bias.chroma_scale
+    return hues, ThemeBias(lightness=float(np.clip(lightness, -30, 30)), chroma_scale=float(np.clip(chroma_scale, 0.3, 1.8)))
+
+
+def _base_colors(base_colors: Sequence[str], theme_hues: Sequence[float]) -> List[Tuple[np.ndarray, str]]:
+    """Choose the base colors of the palettes and where each came from.
+
+    Chromatic image colors come first, skipping ones close to a color
+    already chosen, then the hues named by the theme.
+    """
+    chosen: List[Tuple[np.ndarray, str]] = []
+
+    def add(color: np.ndarray, source: str) -> None:
+        for existing, _ in chosen:
+            hue_gap = abs((color[2] - existing[2] + 180.0) % 360.0 - 180.0)
+            if hue_gap < 20.0 and abs(color[0] - existing[0]) < 15.0:
+                return
+        chosen.append((color, source))
+
+    if base_colors:
+        for color in lab_to_lch(srgb_to_lab(hex_to_rgb(base_colors))):
+            if color[1] >= NEUTRAL_CHROMA:
+                add(color, "the logo's dominant colors")
+    for hue in theme_hues:
+        add(np.array([55.0, 55.0, hue]), "the theme description")
+    if not chosen:
+        chosen.append((lab_to_lch(srgb_to_lab(hex_to_rgb([DEFAULT_BASE_COLOR])))[0], "a default base color"))
+    return chosen[:MAX_BASE_COLORS]
+
+
+def scheme_colors(scheme: str, base: np.ndarray) -> np.ndarray:
+    """Compute the five LCh colors of a scheme around a base color.
+
+    Args:
+        scheme: One of SCHEMES
+        base: Base (lightness, chroma, hue)
+
+    Returns:
+        Array of five (lightness, chroma, hue) rows
+    """
+    lightness = float(np.clip(base[0], 35.0, 70.0))
+    chroma = float(np.clip(base[1], 35.0, 110.0))
+    hue = float(base[2])
+    if scheme == "complementary":
+        hues = [0, 0, 180, 180, 0]
+        lightnesses = [lightness, min(lightness + 25, 92), lightness, max(lightness - 20, 15), 96]
+        chromas = [1.0, 0.6, 1.0, 0.8, 0.08]
+    elif scheme == "analogous":
+        hues = [-30, -15, 0, 15, 30]
+        lightnesses = [lightness - 10, lightness + 8, lightness, lightness + 16, lightness - 22]
+        chromas = [0.9, 1.0, 1.0, 0.8, 0.9]
+    elif scheme == "triadic":
+        hues = [0, 120, 240, 0, 0]
+        lightnesses = [lightness, lightness, lightness, 94, 18]
+        chromas = [1.0, 1.0, 1.0, 0.12, 0.35]
+    elif scheme == "monochrome":
+        hues = [0, 0, 0, 0, 0]
+        lightnesses = [22, 40, lightness, 78, 95]
+        chromas = [0.7, 0.9, 1.0, 0.6, 0.15]
+    elif scheme == "high_contrast":
+        hues = [0, 0, 0, 180, 180]
+        lightnesses = [lightness, 12, 97, 75, 30]
+        chromas = [1.0, 0.3, 0.05, 0.8, 0.9]
+    else:
+        raise ValueError(f"Unknown palette scheme: {scheme}")
+    return np.column_stack([lightnesses, chroma * np.array(chromas), (hue + np.array(hues)) % 360.0])
+
+
+def generate_local_palettes(num_palettes: int, base_colors: Sequence[str] = (), theme_description: str = "") -> List[Dict[str, Any]]:
+    """Generate harmonious palettes locally.
+
+    Palettes cycle through the schemes for each base color in turn, so the
+    first five use the first base color.
+
+    Args:
+        num_palettes: Number of palettes to generate
+        base_colors: Hex codes to build on, most important first (e.g. the dominant colors of the logo)
+        theme_description: Description whose hue and mood keywords bias the palettes
+
+    Returns:
+        Palettes in the format of the generated ones: name, five colors and description
+    """
+    theme_hues, bias = parse_theme(theme_description)
+    bases = _base_colors(base_colors, theme_hues)
+    if num_palettes <= 0:
+        return []
+
+    # Compute the colors of all palettes at once, then split them up
+    chosen = [(SCHEMES[index % len(SCHEMES)], *bases[(index // len(SCHEMES)) % len(bases)]) for index in range(num_palettes)]
+    colors = np.concatenate([scheme_colors(scheme, base) for scheme, base, _ in chosen])
+    colors[:, 0] = np.clip(colors[:, 0] + bias.lightness, 5.0, 98.0)
+    colors[:, 1] *= bias.chroma_scale
+    codes = lch_to_hex(colors)
+
+    palettes: List[Dict[str, Any]] = []
+    for index, (scheme, base, source) in enumerate(chosen):
+        name = hue_name(base)
+        palettes.append(
+            {
+                "name": f"{scheme.replace('_', ' ').title()} {name}",
+                "colors": codes[index * 5 : index * 5 + 5],
+                "description": f"{_SCHEME_TEXT[scheme].format(hue=name)}, derived from {source}.",
+            }
+        )
+    return palettes
+
+
+async def generate_palettes_from_image(image_data: bytes, num_palettes: int, theme_description: str = "") -> List[Dict[str, Any]]:
+    """Generate harmonious palettes locally from the dominant colors of an image.
+
+    Args:
+        image_data: Binary image data, e.g. the generated logo
+        num_palettes: Number of palettes to generate
+        theme_description: Description whose hue and mood keywords bias the palettes
+
+    Returns:
+        Palettes in the format of the generated ones: name, five colors and description
+    """
+    dominant_colors = await extract_dominant_colors(image_data, IMAGE_BASE_COLORS, max_dimension=IMAGE_MAX_DIMENSION)
+    return generate_local_palettes(num_palettes, dominant_colors, theme_description)
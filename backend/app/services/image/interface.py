@@ -2,7 +2,7 @@
 
 import abc
 from io import BytesIO
-from typing import Any, BinaryIO, Dict, List, Optional, Tuple, Union
+from typing import Any, Awaitable, BinaryIO, Callable, Dict, List, Optional, Tuple, Union
 
 from fastapi import UploadFile
 
@@ -120,6 +120,8 @@ class ImageServiceInterface(abc.ABC):
         palettes: List[Dict[str, Any]],
         user_id: str,
         blend_strength: float = 0.75,
+        on_variation_created: Optional[Callable[[int, Dict[str, Any]], Awaitable[None]]] = None,
+        on_variation_image: Optional[Callable[[bytes, Dict[str, Any]], Awaitable[Dict[str, Any]]]] = None,
     ) -> List[Dict[str, Any]]:
         """Create variations of an image with different color palettes.
 
@@ -128,6 +130,10 @@ class ImageServiceInterface(abc.ABC):
             palettes: List of color palette dictionaries
             user_id: Current user ID
             blend_strength: How strongly to apply the new colors (0.0-1.0)
+            on_variation_created: Optional coroutine called with (palette index, variation)
+                as soon as each variation has been stored
+            on_variation_image: Optional coroutine called with (variation image bytes, variation)
+                once each variation is stored; the fields it returns are added to the variation
 
         Returns:
             List of palettes with added image_path and image_url fields
@@ -235,6 +241,7 @@ class ImageProcessingServiceInterface(abc.ABC):
         width: int,
         height: Optional[int] = None,
         maintain_aspect_ratio: bool = True,
+        fast: bool = False,
     ) -> bytes:
         """Resize an image to specified dimensions.
 
@@ -243,6 +250,7 @@ class ImageProcessingServiceInterface(abc.ABC):
             width: Target width
             height: Optional target height (calculated from width if None)
             maintain_aspect_ratio: Whether to maintain aspect ratio
+            fast: Whether to shrink with draft decoding and reduce() first (for thumbnails)
 
         Returns:
             Resized image as bytes
@@ -278,6 +286,29 @@ class ImageProcessingServiceInterface(abc.ABC):
         """
         pass
 
+    @abc.abstractmethod
+    async def generate_thumbnails(
+        self,
+        images: List[bytes],
+        width: int,
+        height: int,
+        preserve_aspect_ratio: bool = True,
+        format: str = "png",
+    ) -> List[Optional[bytes]]:
+        """Generate thumbnails of many images in one call.
+
+        Args:
+            images: Binary data of each image
+            width: Target width
+            height: Target height
+            preserve_aspect_ratio: Whether to preserve the aspect ratio
+            format: Output format ('png', 'jpg', etc.)
+
+        Returns:
+            Thumbnail bytes in input order, None for images that failed
+        """
+        pass
+
     @abc.abstractmethod
     async def extract_color_palette(self, image_data: bytes, num_colors: int = 5) -> List[str]:
         """Extract a color palette from an image.
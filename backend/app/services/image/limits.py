@@ -0,0 +1,188 @@
+"""Size limits for images entering the processing pipeline.
+
+Decoding an image costs its pixel count times its bytes per pixel regardless
+of the encoded size, and the palette pipeline multiplies that again (RGB and
+BGR copies, float32 LAB pixels, k-means labels and masks). These limits are
+checked from the header probe before anything is decoded: images that could
+not be decoded within the memory budget are rejected, and images that can be
+decoded but are larger than the processing resolution are downscaled right
+after decoding.
+"""
+
+import logging
+import math
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Optional, Tuple
+
+from PIL import Image as PILImage
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.services.image.conversion import fast_downscale
+from app.services.image.probe import ImageProbe, probe_image
+
+logger = logging.getLogger(__name__)
+
+# Bytes per pixel of the single-band modes; every other mode takes 4
+_DECODED_BYTES_PER_PIXEL = {"1": 1, "L": 1, "P": 1, "I;16": 2, "I": 4, "F": 4}
+
+
+class ImageLimitError(Exception):
+    """Exception raised for images exceeding the size limits."""
+
+    def __init__(self, message: str, limit: str):
+        """Initialize with the limit that was exceeded.
+
+        Args:
+            message: Human-readable error message
+            limit: Exceeded limit ("bytes", "pixels" or "memory")
+        """
+        self.limit = limit
+        super().__init__(message)
+
+
+@dataclass(frozen=True)
+class ImageLimits:
+    """Limits applied to images before decoding."""
+
+    max_bytes: int = 25 * 1024 * 1024
+    max_pixels: int = 50_000_000
+    max_decoded_bytes: int = 256 * 1024 * 1024
+    processing_max_pixels: int = 2048 * 2048
+
+    @classmethod
+    def from_settings(cls) -> "ImageLimits":
+        """Read the limits from the application settings.
+
+        Returns:
+            The configured limits
+        """
+        return cls(
+            max_bytes=settings.IMAGE_MAX_BYTES,
+            max_pixels=settings.IMAGE_MAX_PIXELS,
+            max_decoded_bytes=settings.IMAGE_MAX_DECODED_BYTES,
+            processing_max_pixels=settings.IMAGE_PROCESSING_MAX_PIXELS,
+        )
+
+
+def estimate_decoded_bytes(width: int, height: int, mode: Optional[str]) -> int:
+    """Estimate the memory an image takes once decoded.
+
+    Args:
+        width: Width in pixels
+        height: Height in pixels
+        mode: PIL mode the image decodes to, None if unknown (counted as RGBA)
+
+    Returns:
+        Size of the decoded pixels in bytes
+    """
+    if mode in _DECODED_BYTES_PER_PIXEL:
+        return width * height * _DECODED_BYTES_PER_PIXEL[mode]
+    # Pillow stores multi-band pixels in 32 bits
+    return width * height * 4
+
+
+def _read_header(image_data: bytes) -> Optional[ImageProbe]:
+    """Probe the header, letting PIL read it for formats the probe does not parse."""
+    probe = probe_image(image_data)
+    if probe is not None:
+        return probe
+    try:
+        # Only reads the header; the pixels are loaded on first access
+        img = PILImage.open(BytesIO(image_data))
+        has_alpha = img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info
+        return ImageProbe((img.format or "").lower(), img.width, img.height, has_alpha, img.mode)
+    except PILImage.DecompressionBombError as e:
+        raise _reject(str(e), "pixels")
+    except Exception:
+        # Not an image; decoding will fail with the usual error
+        return None
+
+
+def _reject(message: str, limit: str) -> ImageLimitError:
+    """Count a rejection and build its error."""
+    metrics.increment(f"image_limits.rejected.{limit}")
+    logger.warning(f"Rejected image: {message}")
+    return ImageLimitError(message, limit)
+
+
+def check_image_limits(image_data: bytes, limits: Optional[ImageLimits] = None) -> Optional[ImageProbe]:
+    """Check an image against the limits without decoding it.
+
+    Args:
+        image_data: Encoded image bytes
+        limits: Limits to apply, the configured ones by default
+
+    Returns:
+        The image header, or None if it could not be read (the data is not an image)
+
+    Raises:
+        ImageLimitError: If the encoded size, pixel count or decoded size exceeds the limits
+    """
+    limits = limits or ImageLimits.from_settings()
+
+    if len(image_data) > limits.max_bytes:
+        raise _reject(f"{len(image_data)} bytes exceeds the limit of {limits.max_bytes}", "bytes")
+
+    header = _read_header(image_data)
+    if header is None:
+        return None
+
+    pixels = header.width * header.height
+    if pixels > limits.max_pixels:
+        raise _reject(f"{header.width}x{header.height} exceeds the limit of {limits.max_pixels} pixels", "pixels")
+
+    decoded_bytes = estimate_decoded_bytes(header.width, header.height, header.mode)
+    if decoded_bytes > limits.max_decoded_bytes:
+        raise _reject(f"{header.width}x{header.height} {header.mode} decodes to {decoded_bytes} bytes, over the limit of {limits.max_decoded_bytes}", "memory")
+
+    return header
+
+
+def processing_size(width: int, height: int, limits: Optional[ImageLimits] = None) -> Optional[Tuple[int, int]]:
+    """Get the size an image is downscaled to for processing.
+
+    Args:
+        width: Width in pixels
+        height: Height in pixels
+        limits: Limits to apply, the configured ones by default
+
+    Returns:
+        The largest size with the same aspect ratio within the processing resolution,
+        or None if the image is already within it
+    """
+    limits = limits or ImageLimits.from_settings()
+    if width * height <= limits.processing_max_pixels:
+        return None
+    scale = math.sqrt(limits.processing_max_pixels / (width * height))
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+def open_image(image_data: bytes, limits: Optional[ImageLimits] = None) -> PILImage.Image:
+    """Open an image for processing, enforcing the limits.
+
+    The header is checked before decoding, and images over the processing
+    resolution are decoded at a reduced scale where the format allows it
+    (JPEG) and downscaled.
+
+    Args:
+        image_data: Encoded image bytes
+        limits: Limits to apply, the configured ones by default
+
+    Returns:
+        The image, within the processing resolution
+
+    Raises:
+        ImageLimitError: If the image exceeds the limits
+    """
+    limits = limits or ImageLimits.from_settings()
+    check_image_limits(image_data, limits)
+
+    img: PILImage.Image = PILImage.open(BytesIO(image_data))
+    target = processing_size(img.width, img.height, limits)
+    if target is not None:
+        metrics.increment("image_limits.downscaled")
+        logger.info(f"Downscaling {img.width}x{img.height} image to {target[0]}x{target[1]} for processing")
+        img = fast_downscale(img, target)
+    return img
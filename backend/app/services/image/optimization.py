@@ -0,0 +1,257 @@
+"""Constraint-driven image optimization.
+
+This module searches encoder settings for the smallest output that meets a
+constraint: a byte budget, a perceptual-quality floor (SSIM against the
+source), or both. JPEG and WebP quality and the PNG palette size are each
+searched by bisection, since the encoded size and SSIM both grow with them,
+and the best candidate across the allowed formats is returned.
+"""
+
+import logging
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, cast
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from app.services.image.encoding import encode_png
+
+logger = logging.getLogger(__name__)
+
+# Formats the search can produce, in the order ties are broken
+OPTIMIZATION_FORMATS = ("webp", "jpeg", "png")
+
+# Quality settings searched for the lossy formats
+LOSSY_QUALITY_RANGE = (5, 95)
+
+# PNG palette sizes searched, from smallest to lossless (0)
+PNG_COLOR_LEVELS = (2, 4, 8, 16, 32, 64, 128, 256, 0)
+
+# SSIM is computed on copies downscaled to this longest side
+SSIM_MAX_DIMENSION = 512
+
+
+@dataclass
+class OptimizationResult:
+    """Encoded image chosen by the search."""
+
+    data: bytes
+    format: str
+    setting: int
+    ssim: Optional[float]
+    constraints_met: bool
+
+    @property
+    def size(self) -> int:
+        """Number of encoded bytes."""
+        return len(self.data)
+
+
+def _luminance(image: Image.Image) -> np.ndarray:
+    """Get the luminance of an image flattened on white, downscaled for SSIM.
+
+    Args:
+        image: Image in any mode
+
+    Returns:
+        Float luminance array
+    """
+    if image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGBA")
+        background = Image.new("RGBA", image.size, (255, 255, 255, 255))
+        image = Image.alpha_composite(background, image)
+    gray = image.convert("L")
+    if max(gray.size) > SSIM_MAX_DIMENSION:
+        gray.thumbnail((SSIM_MAX_DIMENSION, SSIM_MAX_DIMENSION), Image.Resampling.BILINEAR)
+    return np.asarray(gray, dtype=np.float64)
+
+
+def structural_similarity(reference: np.ndarray, candidate: np.ndarray) -> float:
+    """Compute the mean SSIM of two luminance arrays.
+
+    Uses the usual 11x11 Gaussian window (sigma 1.5) and constants for
+    8-bit images.
+
+    Args:
+        reference: Luminance of the source image
+        candidate: Luminance of the encoded image, same shape
+
+    Returns:
+        SSIM between -1 and 1, 1 meaning identical
+    """
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+
+    def blur(values: np.ndarray) -> np.ndarray:
+        return cv2.GaussianBlur(values, (11, 11), 1.5)
+
+    mu_x, mu_y = blur(reference), blur(candidate)
+    sigma_x = blur(reference * reference) - mu_x * mu_x
+    sigma_y = blur(candidate * candidate) - mu_y * mu_y
+    sigma_xy = blur(reference * candidate) - mu_x * mu_y
+    ssim_map = ((2 * mu_x * mu_y + c1) * (2 * sigma_xy + c2)) / ((mu_x * mu_x + mu_y * mu_y + c1) * (sigma_x + sigma_y + c2))
+    return float(ssim_map.mean())
+
+
+def _has_transparency(image: Image.Image) -> bool:
+    """Check whether an image has any pixel that is not fully opaque."""
+    if image.mode == "P":
+        return "transparency" in image.info
+    if image.mode not in ("RGBA", "LA"):
+        return False
+    low, _ = cast(Tuple[int, int], image.getchannel("A").getextrema())
+    return low < 255
+
+
+def _encoder(image: Image.Image, fmt: str) -> Callable[[int], bytes]:
+    """Build the encoder of one format, taking its quality or palette size.
+
+    Args:
+        image: Image to encode
+        fmt: Output format (jpeg, webp or png)
+
+    Returns:
+        Function encoding the image at a given setting
+    """
+    if fmt == "png":
+        source = image if image.mode in ("RGB", "RGBA") else image.convert("RGBA")
+
+        def encode_png_level(colors: int) -> bytes:
+            if colors == 0:
+                return encode_png(source, optimize=True)
+            quantized = source.quantize(colors=colors, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE)
+            output = BytesIO()
+            quantized.save(output, format="PNG", optimize=True)
+            return output.getvalue()
+
+        return encode_png_level
+
+    if fmt == "jpeg":
+        rgba = image.convert("RGBA")
+        opaque = Image.alpha_composite(Image.new("RGBA", rgba.size, (255, 255, 255, 255)), rgba).convert("RGB")
+    else:
+        opaque = image if image.mode in ("RGB", "RGBA") else image.convert("RGBA")
+
+    def encode_lossy(quality: int) -> bytes:
+        output = BytesIO()
+        if fmt == "jpeg":
+            opaque.save(output, format="JPEG", quality=quality, optimize=True, progressive=True)
+        else:
+            opaque.save(output, format="WEBP", quality=quality, method=4)
+        return output.getvalue()
+
+    return encode_lossy
+
+
+def _bisect(levels: Sequence[int], accept: Callable[[int], bool], first: bool) -> Optional[int]:
+    """Find the boundary of a monotonic predicate over ordered levels.
+
+    Args:
+        levels: Settings from lowest to highest
+        accept: Predicate, false then true (first=True) or true then false (first=False)
+        first: Whether to find the first accepted level instead of the last
+
+    Returns:
+        The boundary level, or None if no level is accepted
+    """
+    low, high = 0, len(levels) - 1
+    found: Optional[int] = None
+    while low <= high:
+        middle = (low + high) // 2
+        if accept(levels[middle]):
+            found = levels[middle]
+            if first:
+                high = middle - 1
+            else:
+                low = middle + 1
+        elif first:
+            low = middle + 1
+        else:
+            high = middle - 1
+    return found
+
+
+def search_optimized_encoding(
+    image: Image.Image,
+    max_bytes: Optional[int] = None,
+    min_ssim: Optional[float] = None,
+    formats: Iterable[str] = OPTIMIZATION_FORMATS,
+) -> OptimizationResult:
+    """Find the smallest encoding of an image that meets the constraints.
+
+    With a quality floor, each format is searched for its lowest setting
+    reaching min_ssim and the smallest of those that fits max_bytes wins.
+    With only a byte budget, each format is searched for its highest setting
+    that fits and the candidate with the best SSIM wins. When nothing meets
+    the constraints, the smallest encoding tried is returned with
+    constraints_met set to False.
+
+    Args:
+        image: Image to encode, already resized
+        max_bytes: Optional largest acceptable output size
+        min_ssim: Optional lowest acceptable SSIM against the image (0-1)
+        formats: Formats to consider (jpeg/jpg, webp, png); JPEG is skipped for transparent images unless it is the only one
+
+    Returns:
+        The chosen encoding
+
+    Raises:
+        ValueError: If no constraint or no usable format is given
+    """
+    if max_bytes is None and min_ssim is None:
+        raise ValueError("A byte budget or a quality floor is required")
+
+    transparent = _has_transparency(image)
+    candidates_formats = [fmt for fmt in dict.fromkeys("jpeg" if fmt.lower() == "jpg" else fmt.lower() for fmt in formats) if fmt in OPTIMIZATION_FORMATS]
+    if not candidates_formats:
+        raise ValueError("No usable output format to optimize into")
+    if transparent and candidates_formats != ["jpeg"]:
+        # JPEG would flatten the transparency, so it is only used when requested alone
+        candidates_formats = [fmt for fmt in candidates_formats if fmt != "jpeg"]
+    if not candidates_formats:
+        raise ValueError("No usable output format to optimize into")
+
+    reference = _luminance(image)
+    ssim_cache: Dict[Tuple[str, int], float] = {}
+    encoded: Dict[Tuple[str, int], bytes] = {}
+
+    def encode(fmt: str, setting: int) -> bytes:
+        key = (fmt, setting)
+        if key not in encoded:
+            encoded[key] = encoders[fmt](setting)
+        return encoded[key]
+
+    def ssim(fmt: str, setting: int) -> float:
+        key = (fmt, setting)
+        if key not in ssim_cache:
+            decoded = _luminance(Image.open(BytesIO(encode(fmt, setting))))
+            ssim_cache[key] = structural_similarity(reference, decoded)
+        return ssim_cache[key]
+
+    encoders = {fmt: _encoder(image, fmt) for fmt in candidates_formats}
+    chosen: List[Tuple[str, int]] = []
+    for fmt in candidates_formats:
+        levels: Sequence[int] = PNG_COLOR_LEVELS if fmt == "png" else range(LOSSY_QUALITY_RANGE[0], LOSSY_QUALITY_RANGE[1] + 1)
+        if min_ssim is not None:
+            floor = min_ssim
+            setting = _bisect(levels, lambda level: ssim(fmt, level) >= floor, first=True)
+        else:
+            budget = int(max_bytes or 0)
+            setting = _bisect(levels, lambda level: len(encode(fmt, level)) <= budget, first=False)
+        if setting is not None and (max_bytes is None or len(encode(fmt, setting)) <= max_bytes):
+            chosen.append((fmt, setting))
+
+    if chosen:
+        if min_ssim is not None:
+            fmt, setting = min(chosen, key=lambda item: len(encode(*item)))
+        else:
+            fmt, setting = max(chosen, key=lambda item: ssim(*item))
+        met = True
+    else:
+        fmt, setting = min(encoded, key=lambda item: len(encoded[item]))
+        met = False
+        logger.info(f"No encoding met the constraints (max_bytes={max_bytes}, min_ssim={min_ssim}), returning the smallest tried")
+
+    logger.debug(f"Optimized into {fmt} at {setting} after {len(encoded)} encodes")
+    return OptimizationResult(data=encode(fmt, setting), format=fmt, setting=setting, ssim=ssim_cache.get((fmt, setting)), constraints_met=met)
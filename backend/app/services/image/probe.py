@@ -0,0 +1,199 @@
+"""Header-only image probing.
+
+This module reads the container header of an image (PNG IHDR, JPEG SOF,
+WebP VP8/VP8L/VP8X, GIF screen descriptor, AVIF ispe) to learn its format,
+dimensions and whether it has alpha, without decoding any pixels. Use it
+instead of PIL (or the deprecated imghdr) when only metadata is needed.
+"""
+
+import logging
+import struct
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Content type of each probed format
+PROBE_CONTENT_TYPES: Dict[str, str] = {
+    "png": "image/png",
+    "jpeg": "image/jpeg",
+    "webp": "image/webp",
+    "gif": "image/gif",
+    "avif": "image/avif",
+}
+
+# Bytes of an image that are searched for headers; metadata always comes first
+PROBE_MAX_HEADER_BYTES = 256 * 1024
+
+# PNG color types: (PIL mode, has alpha)
+_PNG_COLOR_TYPES = {0: ("L", False), 2: ("RGB", False), 3: ("P", False), 4: ("LA", True), 6: ("RGBA", True)}
+
+# JPEG start-of-frame markers (SOF0-SOF15 except DHT, JPG and DAC)
+_JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+# JPEG component counts: PIL mode
+_JPEG_MODES = {1: "L", 3: "RGB", 4: "CMYK"}
+
+
+@dataclass
+class ImageProbe:
+    """Metadata read from an image header."""
+
+    format: str
+    width: int
+    height: int
+    has_alpha: bool
+    mode: Optional[str] = None
+    exif: Optional[bytes] = None
+
+    @property
+    def content_type(self) -> str:
+        """MIME type of the image format."""
+        return PROBE_CONTENT_TYPES.get(self.format, f"image/{self.format}")
+
+
+def _probe_png(data: bytes) -> Optional[ImageProbe]:
+    """Read the IHDR chunk, and scan the chunks before IDAT for tRNS and eXIf."""
+    if len(data) < 33 or data[12:16] != b"IHDR":
+        return None
+    width, height, bit_depth, color_type = struct.unpack(">IIBB", data[16:26])
+    mode, has_alpha = _PNG_COLOR_TYPES.get(color_type, (None, False))
+    if mode == "L" and bit_depth == 16:
+        mode = "I;16"
+    exif = None
+    offset = 33
+    while offset + 8 <= len(data):
+        length, chunk_type = struct.unpack(">I4s", data[offset : offset + 8])
+        if chunk_type in (b"IDAT", b"IEND"):
+            break
+        if chunk_type == b"tRNS":
+            has_alpha = True
+        elif chunk_type == b"eXIf":
+            exif = data[offset + 8 : offset + 8 + length]
+        offset += 12 + length
+    return ImageProbe("png", width, height, has_alpha, mode, exif)
+
+
+def _probe_jpeg(data: bytes) -> Optional[ImageProbe]:
+    """Walk the marker segments up to the first start-of-frame."""
+    exif = None
+    offset = 2
+    while offset + 4 <= len(data):
+        if data[offset] != 0xFF:
+            return None
+        marker = data[offset + 1]
+        if marker == 0xFF:
+            # Fill byte
+            offset += 1
+            continue
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:
+            offset += 2
+            continue
+        (length,) = struct.unpack(">H", data[offset + 2 : offset + 4])
+        if marker in _JPEG_SOF_MARKERS:
+            if offset + 10 > len(data):
+                return None
+            height, width, components = struct.unpack(">HHB", data[offset + 5 : offset + 10])
+            return ImageProbe("jpeg", width, height, False, _JPEG_MODES.get(components), exif)
+        if marker == 0xE1 and data[offset + 4 : offset + 10] == b"Exif\x00\x00":
+            exif = data[offset + 4 : offset + 2 + length]
+        if marker == 0xDA:
+            # Start of scan without a frame header
+            return None
+        offset += 2 + length
+    return None
+
+
+def _probe_webp(data: bytes) -> Optional[ImageProbe]:
+    """Read the first chunk of the RIFF container."""
+    if len(data) < 30:
+        return None
+    chunk = data[12:16]
+    if chunk == b"VP8 ":
+        # Lossy: key frame start code, then 14-bit dimensions
+        if data[23:26] != b"\x9d\x01\x2a":
+            return None
+        width, height = struct.unpack("<HH", data[26:30])
+        return ImageProbe("webp", width & 0x3FFF, height & 0x3FFF, False, "RGB")
+    if chunk == b"VP8L":
+        # Lossless: signature byte, then 14-bit width-1, 14-bit height-1 and the alpha hint
+        if data[20] != 0x2F:
+            return None
+        (bits,) = struct.unpack("<I", data[21:25])
+        has_alpha = bool(bits >> 28 & 1)
+        return ImageProbe("webp", (bits & 0x3FFF) + 1, (bits >> 14 & 0x3FFF) + 1, has_alpha, "RGBA" if has_alpha else "RGB")
+    if chunk == b"VP8X":
+        # Extended: flags, then 24-bit canvas width-1 and height-1
+        has_alpha = bool(data[20] & 0x10)
+        width = int.from_bytes(data[24:27], "little") + 1
+        height = int.from_bytes(data[27:30], "little") + 1
+        return ImageProbe("webp", width, height, has_alpha, "RGBA" if has_alpha else "RGB")
+    return None
+
+
+def _probe_gif(data: bytes) -> Optional[ImageProbe]:
+    """Read the logical screen descriptor and the extensions before the first frame."""
+    if len(data) < 13:
+        return None
+    width, height, flags = struct.unpack("<HHB", data[6:11])
+    offset = 13 + (3 * 2 ** ((flags & 0x07) + 1) if flags & 0x80 else 0)
+    has_alpha = False
+    while offset + 2 <= len(data) and data[offset] == 0x21:
+        if data[offset + 1] == 0xF9 and offset + 4 <= len(data):
+            # Graphic control extension with its transparency flag
+            has_alpha = bool(data[offset + 3] & 0x01)
+            break
+        offset += 2
+        while offset < len(data) and data[offset]:
+            offset += data[offset] + 1
+        offset += 1
+    return ImageProbe("gif", width, height, has_alpha, "P")
+
+
+def _probe_avif(data: bytes) -> Optional[ImageProbe]:
+    """Find the image spatial extents (ispe) property of the primary item."""
+    offset = data.find(b"ispe")
+    if offset < 0 or offset + 16 > len(data):
+        return None
+    # Box type, version/flags, then 32-bit width and height
+    width, height = struct.unpack(">II", data[offset + 8 : offset + 16])
+    has_alpha = b"urn:mpeg:mpegB:cicp:systems:auxiliary:alpha" in data or b"urn:mpeg:hevc:2015:auxid:1" in data
+    return ImageProbe("avif", width, height, has_alpha, "RGBA" if has_alpha else "RGB")
+
+
+def _sniff(data: bytes) -> Optional[Callable[[bytes], Optional[ImageProbe]]]:
+    """Pick the header parser from the magic bytes."""
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return _probe_png
+    if data.startswith(b"\xff\xd8"):
+        return _probe_jpeg
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return _probe_webp
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return _probe_gif
+    if data[4:8] == b"ftyp" and data[8:12] in (b"avif", b"avis"):
+        return _probe_avif
+    return None
+
+
+def probe_image(data: bytes) -> Optional[ImageProbe]:
+    """Read the format, dimensions and alpha of an image from its header.
+
+    Only the first PROBE_MAX_HEADER_BYTES are looked at and no pixel data is
+    decoded.
+
+    Args:
+        data: Image bytes, or at least their beginning
+
+    Returns:
+        The probed metadata, or None if the format is not recognized or the header is truncated
+    """
+    header = bytes(data[:PROBE_MAX_HEADER_BYTES])
+    parser = _sniff(header)
+    if parser is None:
+        return None
+    try:
+        return parser(header)
+    except (struct.error, IndexError) as e:
+        logger.debug(f"Truncated image header: {str(e)}")
+        return None
@@ -5,13 +5,14 @@ dominant color extraction, color masking, and palette application.
 """
 
 import logging
-from io import BytesIO
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
 import cv2
 import numpy as np
 import qrcode
-from PIL import Image
+
+from app.services.image.conversion import fast_downscale, fit_within
+from app.services.image.limits import open_image
 
 logger = logging.getLogger(__name__)
 
@@ -96,18 +97,22 @@ def find_dominant_colors(image: np.ndarray, num_colors: int = 5) -> List[Tuple[T
     return colors[:num_colors]
 
 
-async def extract_dominant_colors(image_data: bytes, num_colors: int = 8) -> List[str]:
+async def extract_dominant_colors(image_data: bytes, num_colors: int = 8, max_dimension: Optional[int] = None) -> List[str]:
     """Extract dominant colors from an image and return as hex codes.
 
     Args:
         image_data: Binary image data
         num_colors: Number of colors to extract
+        max_dimension: Optional longest side the image is reduced to before
+            clustering, trading accuracy for speed
 
     Returns:
         List of color hex codes
     """
-    # Load image into OpenCV format
-    img = Image.open(BytesIO(image_data))
+    # Load image into OpenCV format, at most at the processing resolution
+    img = open_image(image_data)
+    if max_dimension and max(img.size) > max_dimension:
+        img = fast_downscale(img, fit_within(img.width, img.height, (max_dimension, max_dimension)))
     img_rgb = np.array(img.convert("RGB"))
     img_bgr = cv2.cvtColor(img_rgb, cv2.COLOR_RGB2BGR)
 
@@ -4,12 +4,16 @@ This module provides a dedicated service for image processing operations,
 following the Single Responsibility Principle.
 """
 
+import asyncio
 import logging
 from io import BytesIO
 from typing import Any, BinaryIO, Dict, List, Optional, Union, cast
 
-from app.services.image.conversion import ConversionError, convert_image_format, generate_thumbnail, get_image_metadata, optimize_image
+from app.core.config import settings
+from app.services.image.conversion import ConversionError, convert_image_format, fast_downscale, generate_thumbnail, generate_thumbnails, get_image_metadata, optimize_image
+from app.services.image.encoding import encode_png
 from app.services.image.interface import ImageProcessingServiceInterface
+from app.services.image.limits import check_image_limits, open_image
 from app.services.image.processing import apply_palette_with_masking_optimized, extract_dominant_colors
 
 # Set up logging
@@ -64,6 +68,7 @@ class ImageProcessingService(ImageProcessingServiceInterface):
                     width = operation.get("width")
                     height = operation.get("height")
                     maintain_aspect_ratio = operation.get("maintain_aspect_ratio", True)
+                    fast = operation.get("fast", False)
 
                     if width is None and height is None:
                         continue  # Skip this operation
@@ -83,6 +88,7 @@ class ImageProcessingService(ImageProcessingServiceInterface):
                         width=width,
                         height=height,
                         maintain_aspect_ratio=maintain_aspect_ratio,
+                        fast=fast,
                     )
 
                 elif op_type == "thumbnail":
@@ -133,7 +139,21 @@ class ImageProcessingService(ImageProcessingServiceInterface):
                     else:
                         img_bytes = current_image
 
-                    current_image = optimize_image(img_bytes, quality=quality, max_size=max_size)
+                    # A byte budget or quality floor switches to the quality/format search
+                    max_bytes = operation.get("max_bytes")
+                    min_quality = operation.get("min_quality")
+                    if max_bytes is not None or min_quality is not None:
+                        current_image = await asyncio.to_thread(
+                            optimize_image,
+                            img_bytes,
+                            quality=quality,
+                            max_size=max_size,
+                            max_bytes=max_bytes,
+                            min_quality=min_quality,
+                            formats=operation.get("formats"),
+                        )
+                    else:
+                        current_image = optimize_image(img_bytes, quality=quality, max_size=max_size)
 
                 elif op_type == "apply_palette":
                     palette = operation.get("palette", [])
@@ -193,6 +213,7 @@ class ImageProcessingService(ImageProcessingServiceInterface):
         width: int,
         height: Optional[int] = None,
         maintain_aspect_ratio: bool = True,
+        fast: bool = False,
     ) -> bytes:
         """Resize an image to specified dimensions.
 
@@ -201,6 +222,7 @@ class ImageProcessingService(ImageProcessingServiceInterface):
             width: Target width in pixels
             height: Target height in pixels (optional if maintaining aspect ratio)
             maintain_aspect_ratio: Whether to preserve aspect ratio
+            fast: Whether to shrink with draft decoding and reduce() before the final resample (for thumbnails)
 
         Returns:
             Resized image as bytes
@@ -219,9 +241,10 @@ class ImageProcessingService(ImageProcessingServiceInterface):
             elif isinstance(image_data, BytesIO):
                 image_data = image_data.getvalue()
 
-            # Open as PIL Image
+            # Open as PIL Image, after checking the header against the size limits
             from PIL import Image
 
+            check_image_limits(image_data)
             img = Image.open(BytesIO(image_data))
 
             # Determine target size
@@ -261,7 +284,10 @@ class ImageProcessingService(ImageProcessingServiceInterface):
                 raise ValueError("Height must be provided for resizing")
 
             # Resize image using PIL.Image.Resampling.LANCZOS
-            resized_img = img.resize((width, height), resample=Image.Resampling.LANCZOS)
+            if fast:
+                resized_img = fast_downscale(img, (width, height))
+            else:
+                resized_img = img.resize((width, height), resample=Image.Resampling.LANCZOS)
 
             # Convert back to bytes
             output = BytesIO()
@@ -309,6 +335,34 @@ class ImageProcessingService(ImageProcessingServiceInterface):
             self.logger.error(error_msg)
             raise ImageProcessingError(error_msg)
 
+    async def generate_thumbnails(
+        self,
+        images: List[bytes],
+        width: int,
+        height: int,
+        preserve_aspect_ratio: bool = True,
+        format: str = "png",
+    ) -> List[Optional[bytes]]:
+        """Generate thumbnails of many images in one call.
+
+        Args:
+            images: Binary data of each image
+            width: Thumbnail width
+            height: Thumbnail height
+            preserve_aspect_ratio: Whether to preserve aspect ratio
+            format: Output format (png, jpg, etc.)
+
+        Returns:
+            Thumbnail bytes in input order, None for images that failed
+        """
+        return await asyncio.to_thread(
+            generate_thumbnails,
+            images,
+            size=(width, height),
+            format=format,
+            preserve_aspect_ratio=preserve_aspect_ratio,
+        )
+
     async def extract_color_palette(self, image_data: bytes, num_colors: int = 5) -> List[str]:
         """Extract dominant colors from an image.
 
@@ -402,7 +456,7 @@ class ImageProcessingService(ImageProcessingServiceInterface):
             blend_strength: How strongly to apply the palette (0.0-1.0)
 
         Returns:
-            Processed image as bytes
+            Processed image as PNG bytes, indexed-color (PNG8) when it has at most 256 colors
 
         Raises:
             ValueError: If palette_colors is empty
@@ -428,12 +482,12 @@ class ImageProcessingService(ImageProcessingServiceInterface):
 
             bgr_palette = [hex_to_bgr(color) for color in palette_colors]
 
-            # Open the image with PIL and convert to OpenCV format
+            # Open the image at most at the processing resolution and convert to OpenCV format
             import cv2
             import numpy as np
             from PIL import Image
 
-            img = Image.open(BytesIO(image_data))
+            img = open_image(image_data)
             img_rgb = np.array(img.convert("RGB"))
             img_bgr = cv2.cvtColor(img_rgb, cv2.COLOR_RGB2BGR)
 
@@ -462,9 +516,7 @@ class ImageProcessingService(ImageProcessingServiceInterface):
             processed_rgb = cv2.cvtColor(processed_img, cv2.COLOR_BGR2RGB)
             output_img = Image.fromarray(processed_rgb)
 
-            output = BytesIO()
-            output_img.save(output, format="PNG")
-            return output.getvalue()
+            return encode_png(output_img, optimize=settings.PALETTE_PNG_OPTIMIZE)
 
         except Exception as e:
             error_msg = f"Failed to apply color palette: {str(e)}"
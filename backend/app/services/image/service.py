@@ -11,7 +11,7 @@ import uuid
 from datetime import datetime
 from io import BytesIO
 from time import perf_counter
-from typing import Any, Dict, List, Optional, Tuple, Union, cast
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union, cast
 
 import httpx
 from fastapi import UploadFile
@@ -21,6 +21,7 @@ from app.core.exceptions import ImageStorageError
 
 # Fix circular import - import interfaces directly from their modules
 from app.services.image.interface import ImageProcessingServiceInterface, ImageServiceInterface
+from app.services.image.limits import ImageLimitError, open_image
 from app.services.persistence.interface import ImagePersistenceServiceInterface
 from app.utils.security.mask import mask_id
 
@@ -209,6 +210,8 @@ class ImageService(ImageServiceInterface):
         palettes: List[Dict[str, Any]],
         user_id: str,
         blend_strength: float = 0.75,
+        on_variation_created: Optional[Callable[[int, Dict[str, Any]], Awaitable[None]]] = None,
+        on_variation_image: Optional[Callable[[bytes, Dict[str, Any]], Awaitable[Dict[str, Any]]]] = None,
     ) -> List[Dict[str, Any]]:
         """Create variations of an image with different color palettes.
 
@@ -217,6 +220,10 @@ class ImageService(ImageServiceInterface):
             palettes: List of color palette dictionaries
             user_id: Current user ID
             blend_strength: How strongly to apply the new colors (0.0-1.0)
+            on_variation_created: Optional coroutine called with (palette index, variation)
+                as soon as each variation has been stored
+            on_variation_image: Optional coroutine called with (variation image bytes, variation)
+                once each variation is stored; the fields it returns are added to the variation
 
         Returns:
             List of palettes with added image_path and image_url fields
@@ -231,9 +238,10 @@ class ImageService(ImageServiceInterface):
             self.logger.info("Creating {} palette variations for user: {}".format(len(palettes), masked_user_id))
             start_time = datetime.now()
 
-            # Preprocess the base image to ensure it's valid
+            # Preprocess the base image to ensure it's valid, within the size limits
+            # and at most at the processing resolution
             try:
-                img: PILImage.Image = PILImage.open(BytesIO(base_image_data))
+                img: PILImage.Image = open_image(base_image_data)
                 if img.mode != "RGB":
                     img = img.convert("RGB")
 
@@ -243,6 +251,8 @@ class ImageService(ImageServiceInterface):
                 validated_image_data = buffer.getvalue()
                 self.logger.info("Successfully validated base image for processing, size: {} bytes".format(len(validated_image_data)))
 
+            except ImageLimitError:
+                raise
             except Exception as e:
                 self.logger.error("Error validating base image: {}".format(str(e)))
                 validated_image_data = base_image_data  # Fall back to original data
@@ -263,7 +273,9 @@ class ImageService(ImageServiceInterface):
             # Create async tasks for controlled parallel processing
             tasks = []
             for idx, palette in enumerate(palettes):
-                tasks.append(self._process_single_palette_variation_with_semaphore(semaphore, validated_image_data, palette, user_id, timestamp, idx, blend_strength))
+                tasks.append(
+                    self._process_single_palette_variation_with_semaphore(semaphore, validated_image_data, palette, user_id, timestamp, idx, blend_strength, on_variation_created, on_variation_image)
+                )
 
             # Execute all tasks with concurrency control
             self.logger.info("Starting controlled parallel processing of {} palette variations (max {} concurrent)".format(len(tasks), max_concurrent))
@@ -296,7 +308,16 @@ class ImageService(ImageServiceInterface):
             raise ImageError("Error creating palette variations: {}".format(str(e)))
 
     async def _process_single_palette_variation_with_semaphore(
-        self, semaphore: asyncio.Semaphore, base_image_data: bytes, palette: Dict[str, Any], user_id: str, timestamp: str, idx: int, blend_strength: float = 0.75
+        self,
+        semaphore: asyncio.Semaphore,
+        base_image_data: bytes,
+        palette: Dict[str, Any],
+        user_id: str,
+        timestamp: str,
+        idx: int,
+        blend_strength: float = 0.75,
+        on_variation_created: Optional[Callable[[int, Dict[str, Any]], Awaitable[None]]] = None,
+        on_variation_image: Optional[Callable[[bytes, Dict[str, Any]], Awaitable[Dict[str, Any]]]] = None,
     ) -> Optional[Dict[str, Any]]:
         """Process a single palette variation with concurrency control.
 
@@ -308,6 +329,8 @@ class ImageService(ImageServiceInterface):
             timestamp: Timestamp string for unique filenames
             idx: Index of the palette in the original list
             blend_strength: Strength of the palette application
+            on_variation_created: Optional coroutine notified once the variation is stored
+            on_variation_image: Optional coroutine adding fields derived from the variation image
 
         Returns:
             Dictionary with palette information and image URLs, or None if processing fails
@@ -321,8 +344,8 @@ class ImageService(ImageServiceInterface):
                 from app.core.config import settings
 
                 timeout_seconds = getattr(settings, "PALETTE_PROCESSING_TIMEOUT_SECONDS", 120)
-                return await asyncio.wait_for(
-                    self._process_single_palette_variation(base_image_data, palette, user_id, timestamp, idx, blend_strength),
+                variation = await asyncio.wait_for(
+                    self._process_single_palette_variation(base_image_data, palette, user_id, timestamp, idx, blend_strength, on_variation_image),
                     timeout=float(timeout_seconds),  # Configurable timeout per palette variation
                 )
             except asyncio.TimeoutError:
@@ -330,8 +353,24 @@ class ImageService(ImageServiceInterface):
                 self.logger.error("Timeout processing palette variation: {}".format(palette_name))
                 raise Exception(f"Timeout processing palette variation: {palette_name}")
 
+        # Notify outside the semaphore so a slow listener doesn't hold up the next variation
+        if variation is not None and on_variation_created is not None:
+            try:
+                await on_variation_created(idx, variation)
+            except Exception as e:
+                self.logger.warning("Error in variation listener for palette {}: {}".format(idx, str(e)))
+
+        return variation
+
     async def _process_single_palette_variation(
-        self, base_image_data: bytes, palette: Dict[str, Any], user_id: str, timestamp: str, idx: int, blend_strength: float = 0.75
+        self,
+        base_image_data: bytes,
+        palette: Dict[str, Any],
+        user_id: str,
+        timestamp: str,
+        idx: int,
+        blend_strength: float = 0.75,
+        on_variation_image: Optional[Callable[[bytes, Dict[str, Any]], Awaitable[Dict[str, Any]]]] = None,
     ) -> Optional[Dict[str, Any]]:
         """Process a single palette variation.
 
@@ -342,6 +381,7 @@ class ImageService(ImageServiceInterface):
             timestamp: Timestamp string for unique filenames
             idx: Index of the palette in the original list
             blend_strength: Strength of the palette application
+            on_variation_image: Optional coroutine adding fields derived from the variation image
 
         Returns:
             Dictionary with palette information and image URLs, or None if processing fails
@@ -407,14 +447,22 @@ class ImageService(ImageServiceInterface):
                 self.logger.error("Failed to store palette variation: {}".format(palette_name))
                 return None
 
-            # Return result
-            return {
+            variation: Dict[str, Any] = {
                 "name": palette_name,
                 "colors": palette_colors,
                 "description": palette_description,
                 "image_path": palette_path_str,
                 "image_url": palette_url_str,
             }
+
+            # Extra outputs are best effort; the variation itself is already stored
+            if on_variation_image is not None:
+                try:
+                    variation.update(await on_variation_image(colorized_image, variation))
+                except Exception as e:
+                    self.logger.warning("Error in variation image hook for palette {}: {}".format(palette_name, str(e)))
+
+            return variation
         except Exception as e:
             self.logger.error("Error processing palette {}: {}".format(palette.get("name", f"Palette {idx + 1}"), str(e)))
             raise e  # Re-raise to be caught by asyncio.gather
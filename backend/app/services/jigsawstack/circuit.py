@@ -0,0 +1,371 @@
+"""Circuit breaker for JigsawStack endpoints.
+
+When an endpoint keeps failing (5xx, 429 or no response, after retries),
+its circuit opens and calls to it fail fast instead of waiting on an API
+that is down. After a cool-down the circuit is half-open: one call is let
+through as a probe, and its outcome closes the circuit or opens it again.
+
+The state is kept in Redis so every API and worker instance sees the same
+circuit, with an in-process fallback when Redis is not configured or fails.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from enum import Enum
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Collection, Dict, Optional, Tuple
+
+import httpx
+
+from app.core.config import settings
+from app.core.exceptions import JigsawStackCircuitOpenError
+from app.core.metrics import metrics
+from app.utils.security.mask import mask_id
+
+logger = logging.getLogger(__name__)
+
+# Expiry of the marker that keeps a circuit half-open after its open state expired,
+# until a probe succeeds; it only bounds how long an endpoint nobody calls stays half-open
+_TRIPPED_TTL_SECONDS = 86400
+
+
+class CircuitState(str, Enum):
+    """States of a circuit."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+@dataclass(frozen=True)
+class CircuitStatus:
+    """State of a circuit, with the time until it is tried again when open."""
+
+    state: CircuitState
+    retry_after: Optional[int] = None
+
+
+class _LocalStore:
+    """In-process stand-in for the few Redis commands the breaker uses."""
+
+    def __init__(self) -> None:
+        """Initialize an empty store."""
+        self._values: Dict[str, Tuple[Any, Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key: str) -> Optional[Tuple[Any, Optional[float]]]:
+        """Get the entry of a key, dropping it if expired."""
+        entry = self._values.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+            del self._values[key]
+            return None
+        return entry
+
+    def get(self, key: str) -> Any:
+        """Get a value."""
+        with self._lock:
+            entry = self._live(key)
+            return None if entry is None else entry[0]
+
+    def set(self, key: str, value: Any, nx: bool = False, ex: Optional[int] = None) -> Optional[bool]:
+        """Set a value, only if absent with nx, expiring after ex seconds."""
+        with self._lock:
+            if nx and self._live(key) is not None:
+                return None
+            self._values[key] = (value, time.monotonic() + ex if ex is not None else None)
+            return True
+
+    def incr(self, key: str) -> int:
+        """Increment a counter, keeping its expiry."""
+        with self._lock:
+            entry = self._live(key)
+            value = int(entry[0]) + 1 if entry is not None else 1
+            self._values[key] = (value, entry[1] if entry is not None else None)
+            return value
+
+    def expire(self, key: str, seconds: int) -> bool:
+        """Set the expiry of a key."""
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                return False
+            self._values[key] = (entry[0], time.monotonic() + seconds)
+            return True
+
+    def ttl(self, key: str) -> int:
+        """Get the seconds left before a key expires (-1 without expiry, -2 if missing)."""
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                return -2
+            return -1 if entry[1] is None else int(entry[1] - time.monotonic())
+
+    def delete(self, *keys: str) -> int:
+        """Delete keys."""
+        with self._lock:
+            return sum(1 for key in keys if self._values.pop(key, None) is not None)
+
+
+class CircuitBreaker:
+    """Per-endpoint circuit breaker shared across instances through Redis."""
+
+    def __init__(
+        self,
+        redis_client: Any = None,
+        failure_threshold: int = 5,
+        window_seconds: int = 60,
+        open_seconds: int = 30,
+        probe_timeout_seconds: int = 120,
+        key_prefix: str = "jigsawstack:circuit:",
+    ):
+        """Initialize the breaker.
+
+        Args:
+            redis_client: Optional synchronous Redis client; without it the state is kept in this process
+            failure_threshold: Consecutive failed calls that open a circuit
+            window_seconds: Time after the first of them within which the failures must happen
+            open_seconds: How long a circuit stays open before a probe is let through
+            probe_timeout_seconds: Expiry of the probe slot, bounding the wait on a probe whose caller crashed
+            key_prefix: Prefix of the Redis keys
+        """
+        self.redis = redis_client
+        self.failure_threshold = failure_threshold
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.probe_timeout_seconds = probe_timeout_seconds
+        self.key_prefix = key_prefix
+        self._local = _LocalStore()
+
+    def _key(self, operation: str, name: str) -> str:
+        """Build the Redis key of one part of an endpoint's state."""
+        return f"{self.key_prefix}{operation}:{name}"
+
+    async def _run(self, function: Callable[..., Any], *args: Any) -> Any:
+        """Run a state update against Redis, or the local store if Redis is missing or fails."""
+        if self.redis is not None:
+            try:
+                return await asyncio.to_thread(function, self.redis, *args)
+            except Exception as e:
+                metrics.increment("jigsawstack.circuit.redis_errors")
+                logger.warning(f"Redis unavailable for the JigsawStack circuit breaker, using local state: {str(e)}")
+        return function(self._local, *args)
+
+    def _read_status(self, store: Any, operation: str) -> CircuitStatus:
+        ttl = store.ttl(self._key(operation, "open"))
+        if ttl is not None and ttl >= 0:
+            return CircuitStatus(CircuitState.OPEN, max(1, int(ttl)))
+        if ttl == -1:
+            # Open key without an expiry: treat it as a full open period
+            return CircuitStatus(CircuitState.OPEN, self.open_seconds)
+        if store.get(self._key(operation, "tripped")) is not None:
+            return CircuitStatus(CircuitState.HALF_OPEN)
+        return CircuitStatus(CircuitState.CLOSED)
+
+    def _admit(self, store: Any, operation: str) -> Tuple[CircuitStatus, bool]:
+        status = self._read_status(store, operation)
+        if status.state != CircuitState.HALF_OPEN:
+            return status, False
+        acquired = store.set(self._key(operation, "probe"), "1", nx=True, ex=self.probe_timeout_seconds)
+        return status, bool(acquired)
+
+    def _open(self, store: Any, operation: str) -> None:
+        store.set(self._key(operation, "open"), "1", ex=self.open_seconds)
+        store.set(self._key(operation, "tripped"), "1", ex=_TRIPPED_TTL_SECONDS)
+        store.delete(self._key(operation, "failures"), self._key(operation, "probe"))
+
+    def _failure(self, store: Any, operation: str, probe: bool) -> bool:
+        if not probe:
+            if self._read_status(store, operation).state == CircuitState.OPEN:
+                # A call started before the circuit opened
+                return False
+            failures_key = self._key(operation, "failures")
+            failures = int(store.incr(failures_key))
+            if failures == 1:
+                store.expire(failures_key, self.window_seconds)
+            if failures < self.failure_threshold:
+                return False
+        self._open(store, operation)
+        return True
+
+    def _success(self, store: Any, operation: str, probe: bool) -> None:
+        keys = [self._key(operation, "failures")]
+        if probe:
+            keys += [self._key(operation, "tripped"), self._key(operation, "probe")]
+        store.delete(*keys)
+
+    def _release(self, store: Any, operation: str) -> None:
+        store.delete(self._key(operation, "probe"))
+
+    async def status(self, operation: str) -> CircuitStatus:
+        """Get the state of the circuit of an endpoint.
+
+        Args:
+            operation: Name of the endpoint's client method
+
+        Returns:
+            The circuit's status
+        """
+        status: CircuitStatus = await self._run(self._read_status, operation)
+        return status
+
+    async def before_call(self, operation: str) -> bool:
+        """Check a call may be made.
+
+        Args:
+            operation: Name of the endpoint's client method
+
+        Returns:
+            Whether the call is the probe of a half-open circuit
+
+        Raises:
+            JigsawStackCircuitOpenError: If the circuit is open, or half-open with a probe in flight
+        """
+        admitted: Tuple[CircuitStatus, bool] = await self._run(self._admit, operation)
+        status, probe = admitted
+        if status.state == CircuitState.CLOSED or probe:
+            return probe
+        metrics.increment(f"jigsawstack.circuit.rejected.{operation}")
+        raise JigsawStackCircuitOpenError(
+            message=f"JigsawStack {operation} is unavailable after repeated failures",
+            retry_after=status.retry_after,
+            details={"operation": operation, "state": status.state.value},
+        )
+
+    async def record_success(self, operation: str, probe: bool = False) -> None:
+        """Record a successful call, closing the circuit after a successful probe.
+
+        Args:
+            operation: Name of the endpoint's client method
+            probe: Whether the call was the probe of a half-open circuit
+        """
+        await self._run(self._success, operation, probe)
+        if probe:
+            metrics.increment(f"jigsawstack.circuit.closed.{operation}")
+            logger.info(f"JigsawStack {operation} recovered, circuit closed")
+
+    async def record_failure(self, operation: str, probe: bool = False) -> None:
+        """Record a failed call, opening the circuit at the threshold or after a failed probe.
+
+        Args:
+            operation: Name of the endpoint's client method
+            probe: Whether the call was the probe of a half-open circuit
+        """
+        if await self._run(self._failure, operation, probe):
+            metrics.increment(f"jigsawstack.circuit.opened.{operation}")
+            logger.warning(f"JigsawStack {operation} is failing, circuit open for {self.open_seconds}s")
+
+    async def release_probe(self, operation: str) -> None:
+        """Free the probe slot of a call that ended without telling whether the endpoint works.
+
+        Args:
+            operation: Name of the endpoint's client method
+        """
+        await self._run(self._release, operation)
+
+    async def call(
+        self,
+        operation: str,
+        send: Callable[[], Awaitable[httpx.Response]],
+        failure_statuses: Collection[int],
+    ) -> httpx.Response:
+        """Make a call through the circuit of an endpoint.
+
+        Failed connections and failure statuses count as failures; any other
+        response counts as a success. Other errors (e.g. a task deadline) do
+        not count either way.
+
+        Args:
+            operation: Name of the endpoint's client method
+            send: Coroutine function making the call
+            failure_statuses: Response statuses counted as failures
+
+        Returns:
+            The response
+
+        Raises:
+            JigsawStackCircuitOpenError: If the circuit does not let the call through
+            httpx.TransportError: If the call failed to get a response
+        """
+        probe = await self.before_call(operation)
+        try:
+            response = await send()
+        except httpx.TransportError:
+            await self.record_failure(operation, probe)
+            raise
+        except BaseException:
+            # Includes cancellation, e.g. of a hedged call that lost its race
+            if probe:
+                await self.release_probe(operation)
+            raise
+
+        if response.status_code in failure_statuses:
+            await self.record_failure(operation, probe)
+        else:
+            await self.record_success(operation, probe)
+        return response
+
+
+@lru_cache()
+def get_circuit_breaker() -> Optional[CircuitBreaker]:
+    """Get the circuit breaker for this process.
+
+    Returns:
+        CircuitBreaker sharing its state through Redis when Redis is configured
+        and reachable, or None if the breaker is disabled
+    """
+    if not settings.JIGSAWSTACK_CIRCUIT_BREAKER_ENABLED:
+        return None
+
+    redis_client = None
+    if settings.UPSTASH_REDIS_ENDPOINT:
+        # Imported here so the client has no hard Redis dependency
+        from app.core.limiter.redis_store import get_shared_redis_client
+
+        redis_client = get_shared_redis_client()
+        if redis_client is None:
+            logger.warning("Redis unavailable, JigsawStack circuit state will be kept per process")
+
+    return CircuitBreaker(
+        redis_client,
+        failure_threshold=settings.JIGSAWSTACK_CIRCUIT_FAILURE_THRESHOLD,
+        window_seconds=settings.JIGSAWSTACK_CIRCUIT_WINDOW_SECONDS,
+        open_seconds=settings.JIGSAWSTACK_CIRCUIT_OPEN_SECONDS,
+        probe_timeout_seconds=settings.JIGSAWSTACK_CIRCUIT_PROBE_TIMEOUT_SECONDS,
+    )
+
+
+async def check_provider_availability(user_id: str, operation: str) -> Optional[str]:
+    """Check the JigsawStack endpoint a new task depends on is not failing.
+
+    While the endpoint's circuit is open, the task is either refused or
+    accepted and left pending until the endpoint recovers, depending on
+    JIGSAWSTACK_CIRCUIT_OPEN_ACTION.
+
+    Args:
+        user_id: ID of the user submitting the task
+        operation: Name of the JigsawStack client method the task depends on
+
+    Returns:
+        A message for the task response if the task will wait for the endpoint, None otherwise
+
+    Raises:
+        JigsawStackCircuitOpenError: If the circuit is open and new tasks are refused
+    """
+    breaker = get_circuit_breaker()
+    if breaker is None:
+        return None
+    circuit = await breaker.status(operation)
+    if circuit.state != CircuitState.OPEN:
+        return None
+
+    if settings.JIGSAWSTACK_CIRCUIT_OPEN_ACTION == "refuse":
+        logger.warning(f"Refusing {operation} task for user {mask_id(user_id)}: image provider unavailable")
+        raise JigsawStackCircuitOpenError(
+            message="The image generation provider is temporarily unavailable, please try again shortly",
+            retry_after=circuit.retry_after,
+        )
+    logger.info(f"Queueing {operation} task for user {mask_id(user_id)} until the image provider recovers")
+    return "The image generation provider is temporarily unavailable; the task is queued and will start once it recovers"
@@ -5,20 +5,31 @@ This module provides a client for interacting with the JigsawStack API.
 
 import json
 import logging
+import time
 import traceback
 import uuid
-from functools import lru_cache
-from typing import Any, Dict, List, Tuple, TypedDict
+from functools import lru_cache, partial
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypedDict
 
 import httpx
 
 from app.core.config import settings
 from app.core.exceptions import JigsawStackAuthenticationError, JigsawStackConnectionError, JigsawStackError, JigsawStackGenerationError
+from app.core.metrics import metrics
+from app.services.jigsawstack.circuit import CircuitBreaker, get_circuit_breaker
+from app.services.jigsawstack.coalescing import RequestCoalescer, get_request_coalescer
+from app.services.jigsawstack.governor import ConcurrencyGovernor, get_concurrency_governor
+from app.services.jigsawstack.hedging import RequestHedger, get_request_hedger
+from app.services.jigsawstack.retry import RetryEngine, get_retry_engine
+from app.services.jigsawstack.transport import CappedTransport, get_max_response_bytes
 from app.utils.security.mask import mask_id
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Operations whose attempts are hedged when a hedger is given
+HEDGED_OPERATIONS = frozenset({"generate_image"})
+
 
 # Define TypedDict for better type hints
 class PaletteColor(TypedDict):
@@ -46,15 +57,46 @@ class GenerationResponse(TypedDict):
 class JigsawStackClient:
     """Client for interacting with JigsawStack API for concept generation and refinement."""
 
-    def __init__(self, api_key: str, api_url: str):
+    def __init__(
+        self,
+        api_key: str,
+        api_url: str,
+        coalescer: Optional[RequestCoalescer] = None,
+        retry_engine: Optional[RetryEngine] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        hedger: Optional[RequestHedger] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        governor: Optional[ConcurrencyGovernor] = None,
+        max_response_bytes: Optional[int] = None,
+    ):
         """Initialize the JigsawStack API client.
 
         Args:
             api_key: The API key for authentication
             api_url: The base URL for the JigsawStack API
+            coalescer: Optional coalescer sharing one upstream call between identical
+                image generation and palette requests in flight
+            retry_engine: Retry engine all requests are sent through, one with the
+                default policy if not given
+            transport: Optional HTTP transport, e.g. a local fake of the API
+            hedger: Optional hedger sending a second image generation attempt when
+                the first is slower than usual
+            circuit_breaker: Optional circuit breaker failing API calls fast while
+                an endpoint keeps failing
+            governor: Optional governor limiting the API calls in flight and
+                started per minute across instances
+            max_response_bytes: Largest response body read, JIGSAWSTACK_MAX_RESPONSE_BYTES
+                if not given
         """
         self.api_key = api_key
         self.api_url = api_url
+        self.coalescer = coalescer
+        self.retry_engine = retry_engine or RetryEngine()
+        self.transport = transport
+        self.hedger = hedger
+        self.circuit_breaker = circuit_breaker
+        self.governor = governor
+        self.max_response_bytes = max_response_bytes if max_response_bytes is not None else get_max_response_bytes()
         self.headers = {
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json",
@@ -79,20 +121,115 @@ class JigsawStackClient:
             model: The model to use for generation
 
         Returns:
-            Dictionary containing image URL, ID, and optionally binary_data
+            Dictionary containing the image ID and either its URL or, when the API
+            returns the image itself, its binary_data
 
         Raises:
             JigsawStackConnectionError: If connection to the API fails
             JigsawStackAuthenticationError: If authentication fails
             JigsawStackGenerationError: If the image generation fails
         """
+        params = {"prompt": prompt, "width": width, "height": height, "model": model}
+        result: Dict[str, Any] = await self._coalesce("generate_image", params, partial(self._generate_image, prompt, width, height))
+        return result
+
+    async def _coalesce(self, operation: str, params: Dict[str, Any], call: Callable[[], Awaitable[Any]]) -> Any:
+        """Make a request, sharing the upstream call with identical requests in flight.
+
+        Args:
+            operation: Name of the client method
+            params: Request parameters identifying identical requests
+            call: Coroutine function making the request
+
+        Returns:
+            The response
+        """
+        if self.coalescer is None:
+            return await call()
+        return await self.coalescer.run(operation, params, call)
+
+    async def _post(self, operation: str, endpoint: str, payload: Dict[str, Any], timeout: float) -> httpx.Response:
+        """POST to the API through the circuit breaker, the governor, the retry engine and the hedger.
+
+        Args:
+            operation: Name of the client method, for logs and metrics
+            endpoint: The API endpoint to call
+            payload: The request payload
+            timeout: Longest duration of one attempt
+
+        Returns:
+            The response of the last attempt
+
+        Raises:
+            httpx.TransportError: If the last attempt failed to get a response
+            JigsawStackDeadlineError: If no time was left for the call, or to wait for the governor
+            JigsawStackCircuitOpenError: If the endpoint's circuit is open
+        """
+
+        async def attempt(attempt_timeout: float) -> httpx.Response:
+            started = time.monotonic()
+            async with httpx.AsyncClient(timeout=attempt_timeout, transport=CappedTransport(self.transport, self.max_response_bytes)) as client:
+                response = await client.post(endpoint, headers=self.headers, json=payload)
+            metrics.observe_histogram(f"jigsawstack.latency_seconds.{operation}", time.monotonic() - started)
+            return response
+
+        take_token = partial(self.governor.take_token, operation) if self.governor is not None else None
+        hedger = self.hedger if operation in HEDGED_OPERATIONS else None
+
+        async def send_attempt(attempt_timeout: float) -> httpx.Response:
+            if hedger is None:
+                return await attempt(attempt_timeout)
+            # Single attempts are hedged, inside the slot, so the hedger learns the provider's
+            # latency and a hedge never queues for a second slot; it takes its own rate token
+            return await hedger.run(operation, partial(attempt, attempt_timeout), before_hedge=take_token)
+
+        async def send() -> httpx.Response:
+            if self.governor is None:
+                return await self.retry_engine.send(operation, send_attempt, timeout)
+            # Retries keep the slot, so a burst of failures does not add calls in flight, but
+            # each takes a rate token, so retries after a 429 stay under the provider limit
+            async with self.governor.slot(operation):
+                return await self.retry_engine.send(operation, send_attempt, timeout, before_retry=take_token)
+
+        if self.circuit_breaker is None:
+            return await send()
+        # Failures are counted after retries, so one flaky attempt does not count
+        return await self.circuit_breaker.call(operation, send, self.retry_engine.policy.retry_statuses)
+
+    async def _get(self, operation: str, url: str, timeout: float) -> httpx.Response:
+        """GET a URL (e.g. a generated image) through the retry engine.
+
+        Args:
+            operation: Name of the request, for logs and metrics
+            url: URL to download
+            timeout: Longest duration of one attempt
+
+        Returns:
+            The response of the last attempt
+
+        Raises:
+            httpx.TransportError: If the last attempt failed to get a response
+            JigsawStackDeadlineError: If no time was left for the call
+        """
+
+        async def attempt(attempt_timeout: float) -> httpx.Response:
+            started = time.monotonic()
+            async with httpx.AsyncClient(timeout=attempt_timeout, transport=CappedTransport(self.transport, self.max_response_bytes)) as client:
+                response = await client.get(url)
+            metrics.observe_histogram(f"jigsawstack.latency_seconds.{operation}", time.monotonic() - started)
+            return response
+
+        return await self.retry_engine.send(operation, attempt, timeout)
+
+    async def _generate_image(self, prompt: str, width: int, height: int) -> Dict[str, Any]:
+        """Generate an image, without coalescing (see generate_image)."""
         try:
             logger.info(f"Generating image with prompt: {prompt}")
 
             # Prepare request data
             endpoint, payload = self._prepare_image_generation_request(prompt, width, height)
 
-            # Make the API request with retries
+            # Make the API request with retries, whose attempts are hedged when slower than usual
             response = await self._make_api_request_with_retry(endpoint, payload)
 
             # Process the response
@@ -160,7 +297,7 @@ Design requirements:
         return endpoint, payload
 
     async def _make_api_request_with_retry(self, endpoint: str, payload: Dict[str, Any]) -> httpx.Response:
-        """Make an API request with retry logic.
+        """Make an image generation request, retried by the retry engine.
 
         Args:
             endpoint: The API endpoint to call
@@ -174,96 +311,46 @@ Design requirements:
             JigsawStackAuthenticationError: If authentication fails
             JigsawStackGenerationError: If the API returns an error
         """
-        # Set up retry parameters
-        max_retries = 3
-        retry_count = 0
-        retry_statuses = [429, 500, 502, 503, 504]  # Status codes that should trigger a retry
-
-        # Use a longer timeout for image generation (90 seconds instead of 30)
-        while retry_count < max_retries:
-            try:
-                async with httpx.AsyncClient(timeout=90.0) as client:
-                    try:
-                        logger.debug(f"Attempt {retry_count + 1}/{max_retries} to generate image")
-                        response = await client.post(endpoint, headers=self.headers, json=payload)
-
-                        # If status code indicates we should retry, raise an exception to trigger retry logic
-                        if response.status_code in retry_statuses:
-                            retry_count += 1
-                            wait_time = min(2**retry_count, 60)  # Exponential backoff with a max of 60 seconds
-                            logger.warning(f"Received status {response.status_code}, retrying in {wait_time} seconds (attempt {retry_count}/{max_retries})")
-                            import asyncio
-
-                            await asyncio.sleep(wait_time)
-                            continue
-
-                    except httpx.ConnectError as e:
-                        error_detail = f"Failed to connect to JigsawStack API: {str(e)}"
-                        logger.error(error_detail)
-
-                        # Retry on connection errors
-                        retry_count += 1
-                        if retry_count < max_retries:
-                            wait_time = min(2**retry_count, 60)
-                            logger.warning(f"Connection error, retrying in {wait_time} seconds (attempt {retry_count}/{max_retries})")
-                            import asyncio
-
-                            await asyncio.sleep(wait_time)
-                            continue
-                        else:
-                            raise JigsawStackConnectionError(
-                                message=error_detail,
-                                details={"endpoint": endpoint},
-                            )
-
-                    except httpx.TimeoutException as e:
-                        error_detail = f"JigsawStack API timed out: {str(e)}"
-                        logger.error(error_detail)
-
-                        # Retry on timeouts
-                        retry_count += 1
-                        if retry_count < max_retries:
-                            wait_time = min(2**retry_count, 60)
-                            logger.warning(f"Timeout error, retrying in {wait_time} seconds (attempt {retry_count}/{max_retries})")
-                            import asyncio
-
-                            await asyncio.sleep(wait_time)
-                            continue
-                        else:
-                            raise JigsawStackConnectionError(
-                                message=error_detail,
-                                details={"endpoint": endpoint, "timeout": "90.0"},
-                            )
-
-                    # Handle authentication errors - don't retry these
-                    if response.status_code in (401, 403):
-                        error_detail = f"Authentication failed with JigsawStack API: {response.status_code}"
-                        logger.error(error_detail)
-                        raise JigsawStackAuthenticationError(
-                            message=error_detail,
-                            details={"status_code": response.status_code},
-                        )
-
-                    # Handle other error responses that we shouldn't retry
-                    if response.status_code != 200 and response.status_code not in retry_statuses:
-                        self._handle_error_response(response, endpoint, payload["prompt"])
-
-                    # If we got here, status is 200, break out of retry loop
-                    break
+        # Image generation takes longer than the other endpoints
+        timeout = 90.0
+        try:
+            response = await self._post("generate_image", endpoint, payload, timeout)
+        except httpx.TimeoutException as e:
+            error_detail = f"JigsawStack API timed out: {str(e)}"
+            logger.error(error_detail)
+            raise JigsawStackConnectionError(
+                message=error_detail,
+                details={"endpoint": endpoint, "timeout": str(timeout)},
+            )
+        except httpx.TransportError as e:
+            error_detail = f"Failed to connect to JigsawStack API: {str(e)}"
+            logger.error(error_detail)
+            raise JigsawStackConnectionError(
+                message=error_detail,
+                details={"endpoint": endpoint},
+            )
 
-            except (httpx.ConnectError, httpx.TimeoutException):
-                # These exceptions are already handled in the inner try/except
-                pass
+        # Handle authentication errors - don't retry these
+        if response.status_code in (401, 403):
+            error_detail = f"Authentication failed with JigsawStack API: {response.status_code}"
+            logger.error(error_detail)
+            raise JigsawStackAuthenticationError(
+                message=error_detail,
+                details={"status_code": response.status_code},
+            )
 
-        # If we exhausted all retries without breaking out of the loop
-        if retry_count >= max_retries and response.status_code in retry_statuses:
-            error_detail = f"Maximum retries ({max_retries}) exceeded with status code {response.status_code}"
+        # Retries were exhausted (attempts, time or budget) on a retryable status
+        if response.status_code in self.retry_engine.policy.retry_statuses:
+            error_detail = f"Maximum retries exceeded with status code {response.status_code}"
             logger.error(error_detail)
             raise JigsawStackConnectionError(
                 message=error_detail,
                 details={"endpoint": endpoint, "status_code": response.status_code},
             )
 
+        if response.status_code != 200:
+            self._handle_error_response(response, endpoint, payload["prompt"])
+
         return response
 
     def _handle_error_response(self, response: httpx.Response, endpoint: str, prompt: str) -> None:
@@ -435,32 +522,15 @@ Design requirements:
             response: The API response
 
         Returns:
-            Dictionary containing image URL, ID and binary_data
+            Dictionary containing the image ID and binary_data
 
         Raises:
             JigsawStackGenerationError: If processing the response fails
         """
         try:
-            # Create a temporary file or directly pass bytes to caller
+            # The bytes are passed on in memory; callers store or process them directly
             logger.info("Image generation successful (binary response)")
-            import os
-            import tempfile
-            import uuid
-
-            # Generate a temporary filename
-            filename = f"temp_image_{uuid.uuid4()}.png"
-            temp_path = os.path.join(tempfile.gettempdir(), filename)
-
-            # Save the image data
-            with open(temp_path, "wb") as f:
-                f.write(response.content)
-
-            # Return the local path as URL for now
-            return {
-                "url": f"file://{temp_path}",
-                "id": str(uuid.uuid4()),
-                "binary_data": response.content,
-            }
+            return {"id": str(uuid.uuid4()), "binary_data": response.content}
         except Exception as binary_error:
             logger.error(f"Failed to process binary image data: {str(binary_error)}")
             raise JigsawStackGenerationError(
@@ -490,25 +560,7 @@ Design requirements:
         # Try to determine if it's binary data based on content
         if response.content and len(response.content) > 4 and response.content[0:4] == b"\x89PNG":
             logger.info("Detected PNG image data in response")
-            # Handle as PNG binary data
-            import os
-            import tempfile
-            import uuid
-
-            # Generate a temporary filename
-            filename = f"temp_image_{uuid.uuid4()}.png"
-            temp_path = os.path.join(tempfile.gettempdir(), filename)
-
-            # Save the image data
-            with open(temp_path, "wb") as f:
-                f.write(response.content)
-
-            # Return the local path as URL for now
-            return {
-                "url": f"file://{temp_path}",
-                "id": str(uuid.uuid4()),
-                "binary_data": response.content,
-            }
+            return {"id": str(uuid.uuid4()), "binary_data": response.content}
 
         # Try to parse as JSON anyways in case the content-type is wrong
         try:
@@ -577,18 +629,17 @@ Design requirements:
             }
 
             try:
-                async with httpx.AsyncClient() as client:
-                    response = await client.post(endpoint, headers=self.headers, json=payload, timeout=30.0)
-            except httpx.ConnectError as e:
-                raise JigsawStackConnectionError(
-                    message=f"Failed to connect to JigsawStack API: {str(e)}",
-                    details={"endpoint": endpoint},
-                )
+                response = await self._post("refine_image", endpoint, payload, 30.0)
             except httpx.TimeoutException as e:
                 raise JigsawStackConnectionError(
                     message=f"JigsawStack API timed out: {str(e)}",
                     details={"endpoint": endpoint, "timeout": "30.0"},
                 )
+            except httpx.TransportError as e:
+                raise JigsawStackConnectionError(
+                    message=f"Failed to connect to JigsawStack API: {str(e)}",
+                    details={"endpoint": endpoint},
+                )
 
             if response.status_code == 401 or response.status_code == 403:
                 raise JigsawStackAuthenticationError(
@@ -629,13 +680,24 @@ Design requirements:
                 prompt=prompt,
             )
 
-    async def generate_multiple_palettes(self, logo_description: str, theme_description: str, num_palettes: int = 7) -> List[Dict[str, Any]]:
+    async def generate_multiple_palettes(
+        self,
+        logo_description: str,
+        theme_description: str,
+        num_palettes: int = 7,
+        min_palettes: Optional[int] = None,
+        use_defaults: bool = True,
+    ) -> List[Dict[str, Any]]:
         """Generate multiple color palettes in a single LLM call.
 
         Args:
             logo_description: Text description of the logo
             theme_description: Text description of the desired theme
             num_palettes: Number of palettes to generate
+            min_palettes: Fewest palettes to return, default palettes filling in when the
+                API returns fewer; num_palettes if not given
+            use_defaults: Whether to return default palettes when the API answers with an
+                error or an invalid response, rather than raising JigsawStackGenerationError
 
         Returns:
             List[Dict[str, Any]]: List of palette dictionaries with name, colors, and description
@@ -643,8 +705,26 @@ Design requirements:
         Raises:
             JigsawStackConnectionError: If connection to the API fails
             JigsawStackAuthenticationError: If authentication fails
-            JigsawStackGenerationError: If palette generation fails
+            JigsawStackGenerationError: If palette generation fails and use_defaults is False
         """
+        min_palettes = num_palettes if min_palettes is None else min(min_palettes, num_palettes)
+        params = {"logo_description": logo_description, "theme_description": theme_description, "num_palettes": num_palettes, "min_palettes": min_palettes}
+        try:
+            palettes: List[Dict[str, Any]] = await self._coalesce(
+                "generate_multiple_palettes",
+                params,
+                partial(self._generate_multiple_palettes, logo_description, theme_description, num_palettes, min_palettes),
+            )
+        except JigsawStackGenerationError:
+            if not use_defaults:
+                raise
+            # Use fallback palettes instead of failing
+            logger.info("Using default color palettes as fallback")
+            return self.get_default_palettes(min_palettes, logo_description, theme_description)
+        return palettes
+
+    async def _generate_multiple_palettes(self, logo_description: str, theme_description: str, num_palettes: int, min_palettes: int) -> List[Dict[str, Any]]:
+        """Generate multiple color palettes, without coalescing (see generate_multiple_palettes)."""
         try:
             logger.info(f"Generating {num_palettes} color palettes based on logo and theme descriptions")
 
@@ -663,7 +743,7 @@ Design requirements:
                     },
                     {"key": "num_palettes", "optional": True, "initial_value": "8"},
                 ],
-                "prompt": "Generate exactly {num_palettes} professional color palettes for a logo with the following description: {logo_description}. The theme is: {theme_description}. For each palette: - Include exactly 5 colors (primary, secondary, accent, background, and highlight) - Provide the exact hex codes (e.g., #FFFFFF) - Ensure sufficient contrast between elements for accessibility - Make each palette distinctly different from the others Ensure variety across the 7 palettes by including: - At least one monochromatic palette - At least one palette with complementary colors - At least one high-contrast palette - At least one palette with a transparent/white background option",
+                "prompt": "Generate exactly {num_palettes} professional color palettes for a logo with the following description: {logo_description}. The theme is: {theme_description}. For each palette: - Include exactly 5 colors (primary, secondary, accent, background, and highlight) - Provide the exact hex codes (e.g., #FFFFFF) - Ensure sufficient contrast between elements for accessibility - Make each palette distinctly different from the others Ensure variety across the {num_palettes} palettes by including: - At least one monochromatic palette - At least one palette with complementary colors - At least one high-contrast palette - At least one palette with a transparent/white background option",
                 "prompt_guard": [
                     "hate",
                     "sexual_content",
@@ -697,18 +777,17 @@ Design requirements:
             endpoint = f"{self.api_url}/v1/prompt_engine/run"
 
             try:
-                async with httpx.AsyncClient() as client:
-                    response = await client.post(endpoint, headers=self.headers, json=payload, timeout=40.0)
-            except httpx.ConnectError as e:
-                raise JigsawStackConnectionError(
-                    message=f"Failed to connect to JigsawStack API: {str(e)}",
-                    details={"endpoint": endpoint},
-                )
+                response = await self._post("generate_multiple_palettes", endpoint, payload, 40.0)
             except httpx.TimeoutException as e:
                 raise JigsawStackConnectionError(
                     message=f"JigsawStack API timed out: {str(e)}",
                     details={"endpoint": endpoint, "timeout": "40.0"},
                 )
+            except httpx.TransportError as e:
+                raise JigsawStackConnectionError(
+                    message=f"Failed to connect to JigsawStack API: {str(e)}",
+                    details={"endpoint": endpoint},
+                )
 
             logger.info(f"Response status code: {response.status_code}")
 
@@ -721,11 +800,10 @@ Design requirements:
             if response.status_code != 200:
                 error_details = f"Status: {response.status_code}, Response: {response.text}"
                 logger.error(f"Color palette generation API error: {error_details}")
-                # Use fallback palettes instead of failing
-                logger.info("Using default color palettes as fallback")
-                return self._get_default_palettes(
-                    num_palettes,
-                    f"Logo: {logo_description}. Theme: {theme_description}",
+                raise JigsawStackGenerationError(
+                    message=f"Color palette generation failed with status {response.status_code}",
+                    content_type="palette",
+                    details={"status_code": response.status_code},
                 )
 
             # Parse the response
@@ -742,30 +820,29 @@ Design requirements:
                         return self._validate_and_clean_palettes(
                             processed_palettes,
                             num_palettes,
+                            min_palettes,
                             f"Logo: {logo_description}. Theme: {theme_description}",
                         )
-
-                # If we couldn't get proper palettes from the response
-                logger.warning("Invalid response format from JigsawStack API")
-                return self._get_default_palettes(
-                    num_palettes,
-                    f"Logo: {logo_description}. Theme: {theme_description}",
-                )
-
             except Exception as e:
                 logger.error(f"Error processing palette response: {e}")
-                return self._get_default_palettes(
-                    num_palettes,
-                    f"Logo: {logo_description}. Theme: {theme_description}",
+                raise JigsawStackGenerationError(
+                    message=f"Error processing palette response: {str(e)}",
+                    content_type="palette",
                 )
 
-        except (JigsawStackConnectionError, JigsawStackAuthenticationError):
-            # Re-raise the connection and authentication errors
+            # If we couldn't get proper palettes from the response
+            logger.warning("Invalid response format from JigsawStack API")
+            raise JigsawStackGenerationError(message="Invalid response format from JigsawStack API", content_type="palette")
+
+        except JigsawStackError:
+            # Re-raise the connection, authentication and generation errors
             raise
         except Exception as e:
-            # For other errors, use the fallback palettes instead of failing
             logger.error(f"Error generating multiple color palettes: {str(e)}")
-            return self._get_default_palettes(num_palettes, f"Logo: {logo_description}. Theme: {theme_description}")
+            raise JigsawStackGenerationError(
+                message=f"Error generating multiple color palettes: {str(e)}",
+                content_type="palette",
+            )
 
     def _process_palette_colors(self, palette: Dict[str, Any]) -> Dict[str, Any]:
         """Process the color structure from JigsawStack API to create a list of hex colors.
@@ -808,12 +885,13 @@ Design requirements:
 
         return processed_palette
 
-    def _validate_and_clean_palettes(self, palettes: List[Dict[str, Any]], num_palettes: int, prompt: str) -> List[Dict[str, Any]]:
+    def _validate_and_clean_palettes(self, palettes: List[Dict[str, Any]], num_palettes: int, min_palettes: int, prompt: str) -> List[Dict[str, Any]]:
         """Validate and clean palette data to ensure it meets our requirements.
 
         Args:
             palettes: The list of palette dictionaries to validate
             num_palettes: The number of palettes requested
+            min_palettes: The number of palettes to pad to with defaults
             prompt: The original prompt for context
 
         Returns:
@@ -844,12 +922,25 @@ Design requirements:
             valid_palettes.append(clean_palette)
 
         # If we didn't get enough valid palettes, pad with defaults
-        if len(valid_palettes) < num_palettes:
-            default_palettes = self._get_default_palettes(num_palettes - len(valid_palettes), prompt)
+        if len(valid_palettes) < min_palettes:
+            default_palettes = self._get_default_palettes(min_palettes - len(valid_palettes), prompt)
             valid_palettes.extend(default_palettes)
 
         return valid_palettes[:num_palettes]
 
+    def get_default_palettes(self, num_palettes: int, logo_description: str, theme_description: str) -> List[Dict[str, Any]]:
+        """Get the default color palettes returned when palette generation fails.
+
+        Args:
+            num_palettes: Number of palettes to return
+            logo_description: Text description of the logo
+            theme_description: Text description of the desired theme
+
+        Returns:
+            List of default palette dictionaries
+        """
+        return self._get_default_palettes(num_palettes, f"Logo: {logo_description}. Theme: {theme_description}")
+
     def _get_default_palettes(self, num_palettes: int, prompt: str) -> List[Dict[str, Any]]:
         """Generate default color palettes as a fallback.
 
@@ -920,18 +1011,17 @@ Design requirements:
             payload = {"image_url": image_url, "model": model}
 
             try:
-                async with httpx.AsyncClient() as client:
-                    response = await client.post(endpoint, headers=self.headers, json=payload, timeout=60.0)  # Variations can take longer
-            except httpx.ConnectError as e:
-                raise JigsawStackConnectionError(
-                    message=f"Failed to connect to JigsawStack API for variation: {str(e)}",
-                    details={"endpoint": endpoint},
-                )
+                response = await self._post("get_variation", endpoint, payload, 60.0)  # Variations can take longer
             except httpx.TimeoutException as e:
                 raise JigsawStackConnectionError(
                     message=f"JigsawStack API timed out during variation request: {str(e)}",
                     details={"endpoint": endpoint, "timeout": "60.0"},
                 )
+            except httpx.TransportError as e:
+                raise JigsawStackConnectionError(
+                    message=f"Failed to connect to JigsawStack API for variation: {str(e)}",
+                    details={"endpoint": endpoint},
+                )
 
             if response.status_code == 401 or response.status_code == 403:
                 raise JigsawStackAuthenticationError(
@@ -967,8 +1057,7 @@ Design requirements:
 
                 # Download the image
                 try:
-                    async with httpx.AsyncClient() as client:
-                        image_response = await client.get(image_url, timeout=30.0)
+                    image_response = await self._get("get_variation.download", image_url, 30.0)
 
                     if image_response.status_code != 200:
                         error_message = f"Failed to download variation image. Status: {image_response.status_code}"
@@ -982,16 +1071,16 @@ Design requirements:
                         )
 
                     return image_response.content
-                except httpx.ConnectError as e:
-                    raise JigsawStackConnectionError(
-                        message=f"Failed to connect to image URL: {str(e)}",
-                        details={"image_url": image_url},
-                    )
                 except httpx.TimeoutException as e:
                     raise JigsawStackConnectionError(
                         message=f"Timed out downloading image: {str(e)}",
                         details={"image_url": image_url, "timeout": "30.0"},
                     )
+                except httpx.TransportError as e:
+                    raise JigsawStackConnectionError(
+                        message=f"Failed to connect to image URL: {str(e)}",
+                        details={"image_url": image_url},
+                    )
                 except Exception as e:
                     raise JigsawStackGenerationError(
                         message=f"Error downloading variation image: {str(e)}",
@@ -1074,18 +1163,10 @@ Design requirements:
             if "url" in result:
                 image_url = result["url"]
 
-                # Handle file:// URLs (temporary files)
-                if image_url.startswith("file://"):
-                    local_path = image_url[7:]  # Remove 'file://' prefix
-                    with open(local_path, "rb") as f:
-                        image_data = f.read()
-                    return image_data
-
                 # Download from remote URL
-                async with httpx.AsyncClient(timeout=30.0) as client:
-                    response = await client.get(image_url)
-                    response.raise_for_status()
-                    return response.content
+                response = await self._get("generate_image_with_palette.download", image_url, 30.0)
+                response.raise_for_status()
+                return response.content
 
             # If we get here, something went wrong
             raise JigsawStackGenerationError(
@@ -1120,4 +1201,12 @@ def get_jigsawstack_client() -> JigsawStackClient:
     # Mask the API key in logs
     masked_api_key = mask_id(settings.JIGSAWSTACK_API_KEY) if settings.JIGSAWSTACK_API_KEY else "none"
     logger.info(f"Creating JigsawStack client with API key: {masked_api_key}...")
-    return JigsawStackClient(api_key=settings.JIGSAWSTACK_API_KEY, api_url=settings.JIGSAWSTACK_API_URL)
+    return JigsawStackClient(
+        api_key=settings.JIGSAWSTACK_API_KEY,
+        api_url=settings.JIGSAWSTACK_API_URL,
+        coalescer=get_request_coalescer(),
+        retry_engine=get_retry_engine(),
+        hedger=get_request_hedger(),
+        circuit_breaker=get_circuit_breaker(),
+        governor=get_concurrency_governor(),
+    )
@@ -0,0 +1,208 @@
+"""Single-flight coalescing of identical JigsawStack requests.
+
+A double submit or a Pub/Sub redelivery sends the same generation request
+twice, and both calls would be billed and wait on the API. This module lets
+identical requests share one upstream call: within a process through a shared
+task, and across API and worker instances through a Redis lock held by the
+caller making the call and a short-lived result key the others wait on.
+"""
+
+import asyncio
+import base64
+import copy
+import hashlib
+import json
+import logging
+import time
+import uuid
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Delete the lock only if it is still held by the caller
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def _encode_result(result: Any) -> str:
+    """Serialize a result to JSON, with bytes (e.g. image data) as base64."""
+
+    def default(value: Any) -> Any:
+        if isinstance(value, bytes):
+            return {"__bytes__": base64.b64encode(value).decode("ascii")}
+        raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+    return json.dumps(result, default=default)
+
+
+def _decode_result(value: str) -> Any:
+    """Deserialize a result written by _encode_result."""
+
+    def object_hook(obj: Dict[str, Any]) -> Any:
+        if set(obj) == {"__bytes__"}:
+            return base64.b64decode(obj["__bytes__"])
+        return obj
+
+    return json.loads(value, object_hook=object_hook)
+
+
+class RequestCoalescer:
+    """Shares one upstream call between identical in-flight requests."""
+
+    def __init__(
+        self,
+        redis_client: Any = None,
+        lock_ttl_seconds: int = 120,
+        result_ttl_seconds: int = 60,
+        wait_timeout_seconds: float = 120.0,
+        poll_interval_seconds: float = 0.5,
+        max_result_bytes: int = 4 * 1024 * 1024,
+        key_prefix: str = "jigsawstack:flight:",
+    ):
+        """Initialize the coalescer.
+
+        Args:
+            redis_client: Optional synchronous Redis client; without it requests are only coalesced within the process
+            lock_ttl_seconds: Expiry of the lock of the instance making a call, bounding waits on a crashed one
+            result_ttl_seconds: How long a result is kept for requests arriving just after it completed
+            wait_timeout_seconds: Longest wait for another instance's result before calling upstream directly
+            poll_interval_seconds: Interval at which waiting instances check for the result
+            max_result_bytes: Largest encoded result shared through Redis
+            key_prefix: Prefix of the Redis keys
+        """
+        self.redis = redis_client
+        self.lock_ttl_seconds = lock_ttl_seconds
+        self.result_ttl_seconds = result_ttl_seconds
+        self.wait_timeout_seconds = wait_timeout_seconds
+        self.poll_interval_seconds = poll_interval_seconds
+        self.max_result_bytes = max_result_bytes
+        self.key_prefix = key_prefix
+        self._in_flight: Dict[str, "asyncio.Future[Any]"] = {}
+
+    @staticmethod
+    def make_key(operation: str, **params: Any) -> str:
+        """Build the key identifying a request.
+
+        Args:
+            operation: Name of the client method
+            **params: Request parameters
+
+        Returns:
+            Hex digest of the operation and its parameters
+        """
+        encoded = json.dumps(params, sort_keys=True, default=str)
+        return hashlib.sha256(f"{operation}:{encoded}".encode("utf-8")).hexdigest()
+
+    async def run(self, operation: str, params: Dict[str, Any], call: Callable[[], Awaitable[Any]]) -> Any:
+        """Run a request, sharing the upstream call with identical requests in flight.
+
+        Args:
+            operation: Name of the client method, for the key and metrics
+            params: Request parameters
+            call: Coroutine function making the upstream call
+
+        Returns:
+            The result of the call, a copy of it for requests that shared it
+
+        Raises:
+            Exception: Whatever the shared call raised
+        """
+        key = self.make_key(operation, **params)
+        flight = self._in_flight.get(key)
+        if flight is not None:
+            metrics.increment(f"jigsawstack.coalesced.local.{operation}")
+            return copy.deepcopy(await asyncio.shield(flight))
+
+        # The call runs as its own task so a cancelled caller does not cancel it for the others
+        flight = asyncio.ensure_future(self._run_shared(key, operation, call))
+        self._in_flight[key] = flight
+        flight.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(flight)
+
+    async def _run_shared(self, key: str, operation: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Make the call, or wait for another instance making it."""
+        if self.redis is None:
+            return await call()
+
+        lock_key, result_key = f"{self.key_prefix}{key}:lock", f"{self.key_prefix}{key}:result"
+        token = uuid.uuid4().hex
+        started = time.monotonic()
+        while True:
+            try:
+                cached = await asyncio.to_thread(self.redis.get, result_key)
+                if cached is not None:
+                    metrics.increment(f"jigsawstack.coalesced.redis.{operation}")
+                    metrics.observe("jigsawstack.coalesce_wait_seconds", time.monotonic() - started)
+                    return _decode_result(cached)
+                acquired = await asyncio.to_thread(self.redis.set, lock_key, token, nx=True, ex=self.lock_ttl_seconds)
+            except Exception as e:
+                logger.warning(f"Redis unavailable for request coalescing, calling JigsawStack directly: {str(e)}")
+                return await call()
+
+            if acquired:
+                return await self._call_and_publish(lock_key, result_key, token, call)
+
+            if time.monotonic() - started > self.wait_timeout_seconds:
+                metrics.increment(f"jigsawstack.coalesce_wait_timeout.{operation}")
+                logger.warning(f"Timed out waiting for an identical {operation} request on another instance")
+                return await call()
+            await asyncio.sleep(self.poll_interval_seconds)
+
+    async def _call_and_publish(self, lock_key: str, result_key: str, token: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Make the call holding the lock, and publish its result to the waiting instances.
+
+        Errors are not published: the lock is released and a waiting instance
+        makes the call itself.
+        """
+        try:
+            result = await call()
+            try:
+                encoded = _encode_result(result)
+                if len(encoded) <= self.max_result_bytes:
+                    await asyncio.to_thread(self.redis.set, result_key, encoded, ex=self.result_ttl_seconds)
+                else:
+                    logger.info(f"Result of {len(encoded)} bytes is too large to share through Redis")
+            except Exception as e:
+                logger.warning(f"Error publishing coalesced result: {str(e)}")
+            return result
+        finally:
+            try:
+                await asyncio.to_thread(self.redis.eval, _RELEASE_SCRIPT, 1, lock_key, token)
+            except Exception as e:
+                logger.warning(f"Error releasing coalescing lock: {str(e)}")
+
+
+@lru_cache()
+def get_request_coalescer() -> Optional[RequestCoalescer]:
+    """Get the request coalescer for this process.
+
+    Returns:
+        RequestCoalescer with a Redis tier when Redis is configured and
+        reachable, or None if coalescing is disabled
+    """
+    if not settings.JIGSAWSTACK_COALESCING_ENABLED:
+        return None
+
+    redis_client = None
+    if settings.UPSTASH_REDIS_ENDPOINT:
+        # Imported here so the client has no hard Redis dependency
+        from app.core.limiter.redis_store import get_shared_redis_client
+
+        redis_client = get_shared_redis_client()
+        if redis_client is None:
+            logger.warning("Redis unavailable, JigsawStack requests will only be coalesced within this process")
+
+    return RequestCoalescer(
+        redis_client,
+        lock_ttl_seconds=settings.JIGSAWSTACK_COALESCING_LOCK_TTL_SECONDS,
+        result_ttl_seconds=settings.JIGSAWSTACK_COALESCING_RESULT_TTL_SECONDS,
+        wait_timeout_seconds=settings.JIGSAWSTACK_COALESCING_WAIT_TIMEOUT_SECONDS,
+    )
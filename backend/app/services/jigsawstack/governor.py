@@ -0,0 +1,381 @@
+"""Cross-instance concurrency and rate governor for JigsawStack calls.
+
+Every API and worker instance sends its own calls, so a burst of tasks fans
+out into more concurrent requests than the provider accepts, and into 429s
+and retries. The governor caps, for each class of endpoints, the calls in
+flight across all instances (a semaphore) and the calls started per minute
+(a token bucket). Both live in Redis, with an in-process fallback when Redis
+is not configured or fails.
+
+Callers waiting for a slot are served in arrival order: each takes a ticket
+and a slot goes to the oldest waiting ticket. Slots are leased, so an
+instance that dies holding one does not block the others for long.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.exceptions import JigsawStackDeadlineError
+from app.core.metrics import metrics
+from app.services.jigsawstack.retry import remaining_time
+
+logger = logging.getLogger(__name__)
+
+# Class of endpoints each client method belongs to; methods not listed are not governed
+OPERATION_CLASSES = {
+    "generate_image": "image",
+    "refine_image": "image",
+    "get_variation": "image",
+    "generate_multiple_palettes": "text",
+}
+
+# Bounds of the wait time histograms, in seconds
+WAIT_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Take a slot for the oldest waiting tickets, up to the limit.
+# KEYS: holders (token -> lease expiry), waiters (token -> ticket), seen (token -> last poll), ticket counter
+# ARGV: now, limit, token, lease seconds, waiter expiry seconds
+_ACQUIRE_SCRIPT = """
+local now = tonumber(ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+local stale = redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', now - tonumber(ARGV[5]))
+for _, member in ipairs(stale) do
+    redis.call('ZREM', KEYS[2], member)
+    redis.call('ZREM', KEYS[3], member)
+end
+if not redis.call('ZSCORE', KEYS[2], ARGV[3]) then
+    redis.call('ZADD', KEYS[2], redis.call('INCR', KEYS[4]), ARGV[3])
+end
+redis.call('ZADD', KEYS[3], now, ARGV[3])
+local free = tonumber(ARGV[2]) - redis.call('ZCARD', KEYS[1])
+if free > 0 and redis.call('ZRANK', KEYS[2], ARGV[3]) < free then
+    redis.call('ZREM', KEYS[2], ARGV[3])
+    redis.call('ZREM', KEYS[3], ARGV[3])
+    redis.call('ZADD', KEYS[1], now + tonumber(ARGV[4]), ARGV[3])
+    return 1
+end
+return 0
+"""
+
+# Stop waiting for, or give back, a slot
+# KEYS: holders, waiters, seen; ARGV: token
+_RELEASE_SCRIPT = """
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('ZREM', KEYS[2], ARGV[1])
+redis.call('ZREM', KEYS[3], ARGV[1])
+return 1
+"""
+
+# Take a token from a bucket refilled continuously; returns the wait before one is available
+# KEYS: bucket; ARGV: now, tokens per second, capacity
+_TAKE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local capacity = tonumber(ARGV[3])
+local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens'))
+local updated = tonumber(redis.call('HGET', KEYS[1], 'updated'))
+if tokens == nil or updated == nil then
+    tokens = capacity
+    updated = now
+end
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens))
+redis.call('HSET', KEYS[1], 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 60)
+return tostring(wait)
+"""
+
+
+@dataclass(frozen=True)
+class ClassLimits:
+    """Limits of one class of endpoints, across all instances.
+
+    Attributes:
+        concurrency: Calls in flight at once (0 for no limit)
+        rate_per_minute: Calls started per minute (0 for no limit)
+        burst: Calls that can start at once after an idle period, the per-second rate (at least 1) if not set
+    """
+
+    concurrency: int = 0
+    rate_per_minute: float = 0.0
+    burst: Optional[float] = None
+
+    @property
+    def capacity(self) -> float:
+        """Size of the token bucket."""
+        if self.burst is not None:
+            return max(1.0, self.burst)
+        return max(1.0, self.rate_per_minute / 60.0)
+
+
+class _RedisSlots:
+    """Slots and token buckets in Redis, through Lua scripts."""
+
+    def __init__(self, redis_client: Any) -> None:
+        """Initialize with a synchronous Redis client."""
+        self.redis = redis_client
+
+    def try_acquire(self, keys: Tuple[str, str, str, str], token: str, limit: int, lease_seconds: float, waiter_ttl: float) -> bool:
+        """Take a slot if the token is among the oldest waiters and one is free."""
+        return bool(self.redis.eval(_ACQUIRE_SCRIPT, 4, *keys, time.time(), limit, token, lease_seconds, waiter_ttl))
+
+    def release(self, keys: Tuple[str, str, str, str], token: str) -> None:
+        """Give back a slot, or stop waiting for one."""
+        self.redis.eval(_RELEASE_SCRIPT, 3, *keys[:3], token)
+
+    def take(self, key: str, rate_per_second: float, capacity: float) -> float:
+        """Take a token, or get the seconds to wait for one."""
+        return float(self.redis.eval(_TAKE_SCRIPT, 1, key, time.time(), rate_per_second, capacity))
+
+
+class _LocalSlots:
+    """In-process equivalent of _RedisSlots, for when Redis is missing or fails."""
+
+    def __init__(self) -> None:
+        """Initialize with no slots taken."""
+        self._holders: Dict[str, Dict[str, float]] = {}
+        self._waiters: Dict[str, Dict[str, Tuple[int, float]]] = {}
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._tickets = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self, keys: Tuple[str, str, str, str], token: str, limit: int, lease_seconds: float, waiter_ttl: float) -> bool:
+        """Take a slot if the token is among the oldest waiters and one is free."""
+        now = time.time()
+        with self._lock:
+            holders = self._holders.setdefault(keys[0], {})
+            waiters = self._waiters.setdefault(keys[0], {})
+            for member in [member for member, expiry in holders.items() if expiry <= now]:
+                del holders[member]
+            for member in [member for member, (_, seen) in waiters.items() if seen < now - waiter_ttl]:
+                del waiters[member]
+            if token not in waiters:
+                self._tickets += 1
+                waiters[token] = (self._tickets, now)
+            waiters[token] = (waiters[token][0], now)
+
+            free = limit - len(holders)
+            rank = sorted(waiters.values()).index(waiters[token])
+            if free > 0 and rank < free:
+                del waiters[token]
+                holders[token] = now + lease_seconds
+                return True
+            return False
+
+    def release(self, keys: Tuple[str, str, str, str], token: str) -> None:
+        """Give back a slot, or stop waiting for one."""
+        with self._lock:
+            self._holders.get(keys[0], {}).pop(token, None)
+            self._waiters.get(keys[0], {}).pop(token, None)
+
+    def take(self, key: str, rate_per_second: float, capacity: float) -> float:
+        """Take a token, or get the seconds to wait for one."""
+        now = time.time()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + max(0.0, now - updated) * rate_per_second)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate_per_second
+            self._buckets[key] = (tokens, now)
+            return wait
+
+
+class ConcurrencyGovernor:
+    """Limits the JigsawStack calls in flight and started per minute, per class of endpoints."""
+
+    def __init__(
+        self,
+        limits: Dict[str, ClassLimits],
+        redis_client: Any = None,
+        lease_seconds: float = 300.0,
+        max_wait_seconds: float = 120.0,
+        poll_interval_seconds: float = 0.1,
+        key_prefix: str = "jigsawstack:governor:",
+    ):
+        """Initialize the governor.
+
+        Args:
+            limits: Limits of each class of endpoints (see OPERATION_CLASSES)
+            redis_client: Optional synchronous Redis client; without it the limits apply to this process only
+            lease_seconds: Expiry of a slot, bounding how long a crashed instance holds it
+            max_wait_seconds: Longest wait for a slot and a rate token; the task deadline applies too
+            poll_interval_seconds: Interval at which waiting callers check for a free slot
+            key_prefix: Prefix of the Redis keys
+        """
+        self.limits = limits
+        self.redis = redis_client
+        self.lease_seconds = lease_seconds
+        self.max_wait_seconds = max_wait_seconds
+        self.poll_interval_seconds = poll_interval_seconds
+        self.key_prefix = key_prefix
+        self._remote = _RedisSlots(redis_client) if redis_client is not None else None
+        self._local = _LocalSlots()
+
+    async def _run(self, method: str, *args: Any) -> Any:
+        """Run a store operation in Redis, or locally if Redis is missing or fails."""
+        if self._remote is not None:
+            try:
+                return await asyncio.to_thread(getattr(self._remote, method), *args)
+            except Exception as e:
+                metrics.increment("jigsawstack.governor.redis_errors")
+                logger.warning(f"Redis unavailable for the JigsawStack governor, limiting this process only: {str(e)}")
+        function: Callable[..., Any] = getattr(self._local, method)
+        return function(*args)
+
+    def _slot_keys(self, endpoint_class: str) -> Tuple[str, str, str, str]:
+        """Build the Redis keys of a class's semaphore."""
+        base = f"{self.key_prefix}{endpoint_class}"
+        return (f"{base}:holders", f"{base}:waiters", f"{base}:seen", f"{base}:tickets")
+
+    def _wait_deadline(self) -> float:
+        """Get the monotonic time after which waiting callers give up."""
+        wait = self.max_wait_seconds
+        remaining = remaining_time()
+        if remaining is not None:
+            wait = min(wait, remaining)
+        return time.monotonic() + wait
+
+    def _timed_out(self, operation: str, endpoint_class: str) -> JigsawStackDeadlineError:
+        """Build the error of a caller that waited too long, counting it."""
+        metrics.increment(f"jigsawstack.governor.timeouts.{endpoint_class}")
+        return JigsawStackDeadlineError(
+            message=f"Timed out waiting for a JigsawStack {endpoint_class} slot for {operation}",
+            details={"operation": operation, "endpoint_class": endpoint_class},
+        )
+
+    async def _acquire_slot(self, operation: str, endpoint_class: str, limit: int, token: str, deadline: float) -> None:
+        """Wait for a slot of the class's semaphore, in arrival order."""
+        keys = self._slot_keys(endpoint_class)
+        # A waiter that stopped polling (e.g. a crashed instance) loses its place after this long
+        waiter_ttl = max(5.0, self.poll_interval_seconds * 20)
+        while not await self._run("try_acquire", keys, token, limit, self.lease_seconds, waiter_ttl):
+            if time.monotonic() + self.poll_interval_seconds > deadline:
+                await self._run("release", keys, token)
+                raise self._timed_out(operation, endpoint_class)
+            await asyncio.sleep(self.poll_interval_seconds)
+
+    async def _take_token(self, operation: str, endpoint_class: str, limits: ClassLimits, deadline: float) -> None:
+        """Wait for a token of the class's bucket."""
+        key = f"{self.key_prefix}{endpoint_class}:bucket"
+        while True:
+            wait = float(await self._run("take", key, limits.rate_per_minute / 60.0, limits.capacity))
+            if wait <= 0:
+                return
+            if time.monotonic() + wait > deadline:
+                raise self._timed_out(operation, endpoint_class)
+            await asyncio.sleep(wait)
+
+    async def take_token(self, operation: str) -> None:
+        """Wait for a rate token for another attempt of a call holding a slot.
+
+        Args:
+            operation: Name of the client method making the call
+
+        Raises:
+            JigsawStackDeadlineError: If no token is available within the longest wait or the task deadline
+        """
+        endpoint_class = OPERATION_CLASSES.get(operation)
+        limits = self.limits.get(endpoint_class) if endpoint_class is not None else None
+        if endpoint_class is None or limits is None or limits.rate_per_minute <= 0:
+            return
+        started = time.monotonic()
+        await self._take_token(operation, endpoint_class, limits, self._wait_deadline())
+        metrics.observe_histogram(f"jigsawstack.governor.wait_seconds.{endpoint_class}", time.monotonic() - started, WAIT_BUCKETS)
+
+    @asynccontextmanager
+    async def slot(self, operation: str) -> AsyncIterator[None]:
+        """Hold a slot for one call, waiting for the class's limits to allow it.
+
+        The slot's rate token covers the call's first attempt; retries take
+        theirs with take_token.
+
+        Args:
+            operation: Name of the client method making the call
+
+        Raises:
+            JigsawStackDeadlineError: If the limits do not allow the call within the longest wait or the task deadline
+        """
+        endpoint_class = OPERATION_CLASSES.get(operation)
+        limits = self.limits.get(endpoint_class) if endpoint_class is not None else None
+        if endpoint_class is None or limits is None or (limits.concurrency <= 0 and limits.rate_per_minute <= 0):
+            yield
+            return
+
+        token = uuid.uuid4().hex
+        keys = self._slot_keys(endpoint_class)
+        started = time.monotonic()
+        deadline = self._wait_deadline()
+        try:
+            if limits.concurrency > 0:
+                await self._acquire_slot(operation, endpoint_class, limits.concurrency, token, deadline)
+            if limits.rate_per_minute > 0:
+                await self._take_token(operation, endpoint_class, limits, deadline)
+        except BaseException:
+            if limits.concurrency > 0:
+                await asyncio.shield(self._run("release", keys, token))
+            raise
+
+        waited = time.monotonic() - started
+        metrics.observe_histogram(f"jigsawstack.governor.wait_seconds.{endpoint_class}", waited, WAIT_BUCKETS)
+        if waited >= self.poll_interval_seconds:
+            logger.debug(f"Waited {waited:.2f}s for a JigsawStack {endpoint_class} slot for {operation}")
+        try:
+            yield
+        finally:
+            if limits.concurrency > 0:
+                await asyncio.shield(self._run("release", keys, token))
+
+
+@lru_cache()
+def get_concurrency_governor() -> Optional[ConcurrencyGovernor]:
+    """Get the concurrency governor for this process.
+
+    Returns:
+        ConcurrencyGovernor sharing its limits through Redis when Redis is
+        configured and reachable, or None if the governor is disabled
+    """
+    if not settings.JIGSAWSTACK_GOVERNOR_ENABLED:
+        return None
+
+    redis_client = None
+    if settings.UPSTASH_REDIS_ENDPOINT:
+        # Imported here so the client has no hard Redis dependency
+        from app.core.limiter.redis_store import get_shared_redis_client
+
+        redis_client = get_shared_redis_client()
+        if redis_client is None:
+            logger.warning("Redis unavailable, JigsawStack call limits will apply per process")
+
+    limits = {
+        "image": ClassLimits(
+            concurrency=settings.JIGSAWSTACK_GOVERNOR_IMAGE_CONCURRENCY,
+            rate_per_minute=settings.JIGSAWSTACK_GOVERNOR_IMAGE_RATE_PER_MINUTE,
+        ),
+        "text": ClassLimits(
+            concurrency=settings.JIGSAWSTACK_GOVERNOR_TEXT_CONCURRENCY,
+            rate_per_minute=settings.JIGSAWSTACK_GOVERNOR_TEXT_RATE_PER_MINUTE,
+        ),
+    }
+    return ConcurrencyGovernor(
+        limits,
+        redis_client,
+        lease_seconds=settings.JIGSAWSTACK_GOVERNOR_LEASE_SECONDS,
+        max_wait_seconds=settings.JIGSAWSTACK_GOVERNOR_MAX_WAIT_SECONDS,
+    )
@@ -0,0 +1,201 @@
+"""Hedged JigsawStack requests.
+
+Image generation latency has a long tail: most requests finish in seconds,
+a few take over a minute. A hedged request sends a second, identical request
+when the first has not finished by a high percentile of recent latencies,
+uses whichever finishes first and cancels the other. A budget caps the
+extra requests at a share of all requests. The client hedges single attempts,
+inside its governor slot, so the latencies are the provider's, without
+queueing or retry backoff.
+"""
+
+import asyncio
+import logging
+import math
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.services.jigsawstack.retry import RetryBudget
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class LatencyTracker:
+    """Sliding window of the recent latencies of one operation."""
+
+    def __init__(self, window: int = 200):
+        """Initialize an empty window.
+
+        Args:
+            window: Number of recent latencies kept
+        """
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Get the number of latencies in the window."""
+        with self._lock:
+            return len(self._samples)
+
+    def record(self, seconds: float) -> None:
+        """Add a latency, dropping the oldest one when the window is full."""
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, quantile: float) -> Optional[float]:
+        """Get a percentile of the latencies in the window.
+
+        Args:
+            quantile: Percentile as a fraction (e.g. 0.95)
+
+        Returns:
+            The nearest-rank percentile, or None if the window is empty
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, max(0, math.ceil(quantile * len(samples)) - 1))
+        return samples[index]
+
+
+class RequestHedger:
+    """Sends a second request when the first is slower than usual."""
+
+    def __init__(
+        self,
+        percentile: float = 0.95,
+        min_samples: int = 20,
+        window: int = 200,
+        min_delay_seconds: float = 5.0,
+        budget: Optional[RetryBudget] = None,
+    ):
+        """Initialize the hedger.
+
+        Args:
+            percentile: Percentile of recent latencies after which a request is hedged
+            min_samples: Latencies needed before hedging an operation
+            window: Number of recent latencies kept per operation
+            min_delay_seconds: Shortest wait before hedging, whatever the percentile
+            budget: Budget of hedged requests, 5% of requests (after a burst of 5) if not given
+        """
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.window = window
+        self.min_delay_seconds = min_delay_seconds
+        self.budget = budget or RetryBudget(ratio=0.05, max_tokens=5.0)
+        self._trackers: Dict[str, LatencyTracker] = {}
+        self._lock = threading.Lock()
+
+    def tracker(self, operation: str) -> LatencyTracker:
+        """Get the latency tracker of an operation."""
+        with self._lock:
+            if operation not in self._trackers:
+                self._trackers[operation] = LatencyTracker(self.window)
+            return self._trackers[operation]
+
+    def hedge_delay(self, operation: str) -> Optional[float]:
+        """Get how long a request waits before it is hedged.
+
+        Args:
+            operation: Name of the operation
+
+        Returns:
+            Seconds to wait, or None if there are too few latencies to learn from
+        """
+        tracker = self.tracker(operation)
+        if len(tracker) < self.min_samples:
+            return None
+        latency = tracker.percentile(self.percentile)
+        return None if latency is None else max(self.min_delay_seconds, latency)
+
+    async def _timed(self, operation: str, call: Callable[[], Awaitable[T]]) -> T:
+        """Make a call, recording its latency if it succeeds."""
+        started = time.monotonic()
+        result = await call()
+        self.tracker(operation).record(time.monotonic() - started)
+        return result
+
+    async def _hedge(self, operation: str, call: Callable[[], Awaitable[T]], before_hedge: Optional[Callable[[], Awaitable[None]]]) -> T:
+        """Make the hedged call, after before_hedge and without timing it."""
+        if before_hedge is not None:
+            await before_hedge()
+        return await self._timed(operation, call)
+
+    async def run(self, operation: str, call: Callable[[], Awaitable[T]], before_hedge: Optional[Callable[[], Awaitable[None]]] = None) -> T:
+        """Make a call, hedging it if it is slower than usual.
+
+        Args:
+            operation: Name of the operation, for the latencies and metrics
+            call: Coroutine function making the request; called twice when hedging.
+                Its latency is learned, so it should make a single attempt
+            before_hedge: Optional coroutine function awaited before the hedged call
+                (e.g. taking a rate token), not counted in its latency
+
+        Returns:
+            The result of the first call to succeed
+
+        Raises:
+            Exception: The error of the first call, if every call failed
+        """
+        self.budget.record_request()
+        delay = self.hedge_delay(operation)
+        primary = asyncio.ensure_future(self._timed(operation, call))
+        hedge: Optional["asyncio.Future[T]"] = None
+        try:
+            if delay is None:
+                return await primary
+
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done:
+                return primary.result()
+            if not self.budget.try_withdraw():
+                metrics.increment(f"jigsawstack.hedge.budget_exhausted.{operation}")
+                return await primary
+
+            metrics.increment(f"jigsawstack.hedge.sent.{operation}")
+            logger.info(f"JigsawStack {operation} still running after {delay:.1f}s, sending a hedged request")
+            hedge = asyncio.ensure_future(self._hedge(operation, call, before_hedge))
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # The primary wins ties
+                for task in sorted(done, key=lambda task: task is not primary):
+                    if task.exception() is None:
+                        if task is hedge:
+                            metrics.increment(f"jigsawstack.hedge.won.{operation}")
+                        return task.result()
+            # Both failed
+            raise primary.exception() or RuntimeError(f"Hedged {operation} failed")
+        finally:
+            # Cancel the losing request (or both, if this call was cancelled)
+            for request in (primary, hedge):
+                if request is not None and not request.done():
+                    request.cancel()
+
+
+@lru_cache()
+def get_request_hedger() -> Optional[RequestHedger]:
+    """Get the request hedger for this process.
+
+    Returns:
+        RequestHedger configured from settings, or None if hedging is disabled
+    """
+    if not settings.JIGSAWSTACK_HEDGING_ENABLED:
+        return None
+    return RequestHedger(
+        percentile=settings.JIGSAWSTACK_HEDGING_PERCENTILE,
+        min_samples=settings.JIGSAWSTACK_HEDGING_MIN_SAMPLES,
+        min_delay_seconds=settings.JIGSAWSTACK_HEDGING_MIN_DELAY_SECONDS,
+        budget=RetryBudget(
+            ratio=settings.JIGSAWSTACK_HEDGING_BUDGET_RATIO,
+            max_tokens=settings.JIGSAWSTACK_HEDGING_BUDGET_MAX_TOKENS,
+        ),
+    )
@@ -0,0 +1,309 @@
+"""Retry policy for JigsawStack API requests.
+
+Every client method sends its requests through a RetryEngine, which retries
+rate limited (429), unavailable (5xx) and failed (connection, timeout)
+attempts with decorrelated jitter, waits as long as a Retry-After header
+asks, and stops once the time left for the call or the task is too short
+for another attempt. Retries across all requests are limited by a budget so
+an API outage does not turn every request into several.
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, FrozenSet, Iterator, Optional
+
+import httpx
+
+from app.core.config import settings
+from app.core.exceptions import JigsawStackDeadlineError
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Monotonic time by which the current task must be done, if any
+_task_deadline: ContextVar[Optional[float]] = ContextVar("jigsawstack_task_deadline", default=None)
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[None]:
+    """Bound the time JigsawStack calls made in this context may take.
+
+    Scopes nest: the earliest deadline applies. Tasks created inside the
+    scope inherit it.
+
+    Args:
+        seconds: Time from now by which the calls must be done, None for no bound
+    """
+    if seconds is None:
+        yield
+        return
+    deadline = time.monotonic() + seconds
+    current = _task_deadline.get()
+    if current is not None:
+        deadline = min(deadline, current)
+    token = _task_deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _task_deadline.reset(token)
+
+
+def remaining_time() -> Optional[float]:
+    """Get the time left before the deadline of the current scope.
+
+    Returns:
+        Seconds left (negative once passed), or None outside a deadline scope
+    """
+    deadline = _task_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def parse_retry_after(value: Any) -> Optional[float]:
+    """Parse a Retry-After header.
+
+    Args:
+        value: Header value, in delay seconds or as an HTTP date
+
+    Returns:
+        Seconds to wait, or None if the value is missing or invalid
+    """
+    if not isinstance(value, str) or not value.strip():
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at is None or retry_at.tzinfo is None:
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """How JigsawStack requests are retried."""
+
+    max_attempts: int = 3
+    base_delay_seconds: float = 1.0
+    max_delay_seconds: float = 20.0
+    max_retry_after_seconds: float = 60.0
+    call_deadline_seconds: float = 170.0
+    retry_statuses: FrozenSet[int] = frozenset({429, 500, 502, 503, 504})
+
+    @classmethod
+    def from_settings(cls) -> "RetryPolicy":
+        """Read the policy from the application settings.
+
+        Returns:
+            The configured policy
+        """
+        return cls(
+            max_attempts=settings.JIGSAWSTACK_RETRY_MAX_ATTEMPTS,
+            base_delay_seconds=settings.JIGSAWSTACK_RETRY_BASE_DELAY_SECONDS,
+            max_delay_seconds=settings.JIGSAWSTACK_RETRY_MAX_DELAY_SECONDS,
+            max_retry_after_seconds=settings.JIGSAWSTACK_RETRY_MAX_RETRY_AFTER_SECONDS,
+            call_deadline_seconds=settings.JIGSAWSTACK_CALL_DEADLINE_SECONDS,
+        )
+
+
+class RetryBudget:
+    """Token bucket limiting retries to a share of requests.
+
+    Each request deposits `ratio` tokens and each retry withdraws one, so in
+    the long run retries add at most `ratio` calls per request, after an
+    initial allowance of `max_tokens` retries.
+    """
+
+    def __init__(self, ratio: float = 0.2, max_tokens: float = 10.0):
+        """Initialize a full budget.
+
+        Args:
+            ratio: Retries allowed per request
+            max_tokens: Retries that can be saved up for a burst of failures
+        """
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._lock = threading.Lock()
+
+    @property
+    def tokens(self) -> float:
+        """Retries currently available."""
+        with self._lock:
+            return self._tokens
+
+    def record_request(self) -> None:
+        """Deposit the share of a new request."""
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_withdraw(self) -> bool:
+        """Take a token for a retry.
+
+        Returns:
+            Whether the retry is allowed
+        """
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class RetryEngine:
+    """Sends a request with retries under a policy, a budget and deadlines."""
+
+    def __init__(
+        self,
+        policy: Optional[RetryPolicy] = None,
+        budget: Optional[RetryBudget] = None,
+        sleep: Callable[[float], Awaitable[Any]] = asyncio.sleep,
+        rng: Optional[random.Random] = None,
+    ):
+        """Initialize the engine.
+
+        Args:
+            policy: Retry policy, the defaults if not given
+            budget: Retry budget shared by all requests of the engine, a default one if not given
+            sleep: Coroutine function waiting between attempts
+            rng: Random source of the jitter
+        """
+        self.policy = policy or RetryPolicy()
+        self.budget = budget or RetryBudget()
+        self._sleep = sleep
+        self._rng = rng or random.Random()
+
+    def next_delay(self, previous_delay: float) -> float:
+        """Get the delay before the next retry, with decorrelated jitter.
+
+        Args:
+            previous_delay: The previous delay (the base delay before the first retry)
+
+        Returns:
+            Seconds to wait, between the base delay and three times the previous one, capped
+        """
+        base = self.policy.base_delay_seconds
+        return min(self.policy.max_delay_seconds, self._rng.uniform(base, max(base, previous_delay * 3)))
+
+    async def send(
+        self,
+        operation: str,
+        attempt: Callable[[float], Awaitable[httpx.Response]],
+        timeout: float,
+        deadline_seconds: Optional[float] = None,
+        before_retry: Optional[Callable[[], Awaitable[None]]] = None,
+    ) -> httpx.Response:
+        """Send a request, retrying failed attempts.
+
+        Args:
+            operation: Name of the request, for logs and metrics
+            attempt: Coroutine function making one attempt within the given timeout
+            timeout: Longest duration of one attempt
+            deadline_seconds: Time for all attempts, the policy's call deadline by default;
+                the deadline of the current scope applies too
+            before_retry: Optional coroutine function awaited before each retry, outside
+                the attempt's timeout (e.g. taking a rate token)
+
+        Returns:
+            The first response that should not be retried, or the last one when
+            retries are exhausted (its status may be one of the retry statuses)
+
+        Raises:
+            httpx.TransportError: The error of the last attempt, when it failed to get a response
+            JigsawStackDeadlineError: If there is no time left for a first attempt
+        """
+        policy = self.policy
+        deadline = time.monotonic() + (deadline_seconds if deadline_seconds is not None else policy.call_deadline_seconds)
+        task_deadline = _task_deadline.get()
+        if task_deadline is not None:
+            deadline = min(deadline, task_deadline)
+
+        self.budget.record_request()
+        delay = policy.base_delay_seconds
+        attempt_number = 0
+        while True:
+            attempt_number += 1
+            if attempt_number > 1 and before_retry is not None:
+                await before_retry()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                metrics.increment(f"jigsawstack.deadline_exceeded.{operation}")
+                raise JigsawStackDeadlineError(
+                    message=f"No time left for the JigsawStack {operation} request",
+                    details={"operation": operation},
+                )
+
+            attempt_timeout = min(timeout, remaining)
+            response: Optional[httpx.Response] = None
+            error: Optional[httpx.TransportError] = None
+            try:
+                # The httpx timeout bounds each read; this bounds the whole attempt
+                response = await asyncio.wait_for(attempt(attempt_timeout), timeout=attempt_timeout)
+            except asyncio.TimeoutError:
+                error = httpx.TimeoutException(f"{operation} attempt timed out after {attempt_timeout:.1f}s")
+            except httpx.TransportError as e:
+                error = e
+
+            if response is not None and response.status_code not in policy.retry_statuses:
+                return response
+
+            outcome = f"status {response.status_code}" if response is not None else f"{type(error).__name__}: {str(error)}"
+            delay = self.next_delay(delay)
+            retry_after = parse_retry_after(response.headers.get("retry-after")) if response is not None else None
+            if retry_after is not None:
+                if retry_after > policy.max_retry_after_seconds:
+                    logger.warning(f"JigsawStack {operation} asked to retry after {retry_after:.0f}s, over the limit; giving up")
+                    return self._give_up(response, error)
+                delay = max(delay, retry_after)
+
+            if attempt_number >= policy.max_attempts:
+                logger.warning(f"JigsawStack {operation} failed after {attempt_number} attempts ({outcome})")
+                return self._give_up(response, error)
+            if deadline - time.monotonic() <= delay:
+                metrics.increment(f"jigsawstack.retry_deadline_exhausted.{operation}")
+                logger.warning(f"JigsawStack {operation} failed ({outcome}) with no time left to retry")
+                return self._give_up(response, error)
+            if not self.budget.try_withdraw():
+                metrics.increment(f"jigsawstack.retry_budget_exhausted.{operation}")
+                logger.warning(f"JigsawStack {operation} failed ({outcome}), retry budget exhausted")
+                return self._give_up(response, error)
+
+            metrics.increment(f"jigsawstack.retries.{operation}")
+            metrics.observe("jigsawstack.retry_delay_seconds", delay)
+            logger.warning(f"JigsawStack {operation} failed ({outcome}), retrying in {delay:.1f}s (attempt {attempt_number + 1}/{policy.max_attempts})")
+            await self._sleep(delay)
+
+    @staticmethod
+    def _give_up(response: Optional[httpx.Response], error: Optional[httpx.TransportError]) -> httpx.Response:
+        """Return the last response, or raise the error of the last attempt."""
+        if response is not None:
+            return response
+        assert error is not None
+        raise error
+
+
+@lru_cache()
+def get_retry_engine() -> RetryEngine:
+    """Get the retry engine for this process, with its retry budget.
+
+    Returns:
+        RetryEngine configured from settings
+    """
+    return RetryEngine(
+        RetryPolicy.from_settings(),
+        RetryBudget(
+            ratio=settings.JIGSAWSTACK_RETRY_BUDGET_RATIO,
+            max_tokens=settings.JIGSAWSTACK_RETRY_BUDGET_MAX_TOKENS,
+        ),
+    )
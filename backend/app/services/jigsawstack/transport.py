@@ -0,0 +1,105 @@
+"""Size-capped HTTP transport for JigsawStack responses.
+
+Generated images come back as response bodies (or as URLs to download). The
+transport counts the body as it streams in and fails the request as soon as
+it exceeds the limit, so a misbehaving endpoint cannot fill the memory of a
+worker; a Content-Length over the limit fails it before any of the body is read.
+"""
+
+import logging
+from typing import AsyncIterator, Optional, cast
+
+import httpx
+
+from app.core.config import settings
+from app.core.exceptions import JigsawStackResponseTooLargeError
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def get_max_response_bytes() -> int:
+    """Get the configured limit of a JigsawStack response body, in bytes."""
+    return settings.JIGSAWSTACK_MAX_RESPONSE_BYTES
+
+
+def _too_large(url: httpx.URL, max_bytes: int) -> JigsawStackResponseTooLargeError:
+    """Build the error of a response over the limit."""
+    metrics.increment("jigsawstack.responses_too_large")
+    logger.error(f"Response from {url.host}{url.path} exceeds {max_bytes} bytes")
+    return JigsawStackResponseTooLargeError(
+        message=f"JigsawStack response exceeds {max_bytes} bytes",
+        max_bytes=max_bytes,
+        details={"endpoint": f"{url.host}{url.path}"},
+    )
+
+
+class _CappedStream(httpx.AsyncByteStream):
+    """Response body failing once more than a number of bytes were read."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, max_bytes: int, url: httpx.URL):
+        """Wrap a response body.
+
+        Args:
+            stream: The body as received
+            max_bytes: Largest body accepted
+            url: URL of the request, for the error
+        """
+        self._stream = stream
+        self._max_bytes = max_bytes
+        self._url = url
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        """Yield the chunks of the body, failing past the limit."""
+        received = 0
+        async for chunk in self._stream:
+            received += len(chunk)
+            if received > self._max_bytes:
+                raise _too_large(self._url, self._max_bytes)
+            yield chunk
+
+    async def aclose(self) -> None:
+        """Close the wrapped body."""
+        await self._stream.aclose()
+
+
+class CappedTransport(httpx.AsyncBaseTransport):
+    """Transport refusing response bodies larger than a limit."""
+
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None, max_bytes: Optional[int] = None):
+        """Wrap a transport.
+
+        Args:
+            transport: Transport making the requests, a default HTTP transport if not given
+            max_bytes: Largest response body accepted, JIGSAWSTACK_MAX_RESPONSE_BYTES if not given
+        """
+        self._transport = transport or httpx.AsyncHTTPTransport()
+        self.max_bytes = max_bytes if max_bytes is not None else get_max_response_bytes()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        """Make a request, returning a response whose body is capped.
+
+        Args:
+            request: The request
+
+        Returns:
+            The response, its body not read yet
+
+        Raises:
+            JigsawStackResponseTooLargeError: If the response announces a body over the limit
+        """
+        response = await self._transport.handle_async_request(request)
+        length = response.headers.get("content-length", "")
+        if length.isdigit() and int(length) > self.max_bytes:
+            await response.aclose()
+            raise _too_large(request.url, self.max_bytes)
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_CappedStream(cast(httpx.AsyncByteStream, response.stream), self.max_bytes, request.url),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self) -> None:
+        """Close the wrapped transport."""
+        await self._transport.aclose()
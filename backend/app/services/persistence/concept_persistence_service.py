@@ -64,6 +64,7 @@ class ConceptPersistenceService(ConceptPersistenceServiceInterface):
                 - image_path: Path to the generated base image
                 - image_url: URL to the generated base image (optional)
                 - color_palettes: Optional list of color palette dictionaries
+                - export_derivatives: Optional record of the base image's pre-rendered exports
 
         Returns:
             ID of the stored concept
@@ -93,95 +94,130 @@ class ConceptPersistenceService(ConceptPersistenceServiceInterface):
                 "is_anonymous": concept_data.get("is_anonymous", True),
                 "image_url": concept_data.get("image_url", None),  # Use pre-generated URL if provided
             }
+            # Pre-rendered export sizes; only sent when present, so databases without the column keep working
+            if concept_data.get("export_derivatives"):
+                core_concept_data["export_derivatives"] = concept_data["export_derivatives"]
+
+            # Build the variation rows once; they are linked to the concept by the database
+            variations = []
+            for palette in color_palettes or []:
+                palette_path = palette.get("image_path")
+                masked_palette_path = mask_path(palette_path) if palette_path else None
+                self.logger.debug(f"Adding palette variation: {palette.get('name')}, path: {masked_palette_path}")
+
+                variation = {
+                    "palette_name": palette.get("name"),
+                    "colors": palette.get("colors"),
+                    "description": palette.get("description"),
+                    "image_path": palette.get("image_path"),
+                    "image_url": palette.get("image_url"),  # Use pre-generated URL if provided
+                }
+                if palette.get("export_derivatives"):
+                    variation["export_derivatives"] = palette["export_derivatives"]
+                variations.append(variation)
+
+            # Store the concept and its variations in one transaction when the database function is available
+            # Separate inserts are only a fallback for a missing function: after a failed
+            # call the transaction may have committed, and retrying could duplicate the concept
+            try:
+                stored = self.concept_storage.store_concept_with_variations(core_concept_data, variations)
+            except DatabaseTransactionError as e:
+                raise PersistenceError(f"Failed to store concept: {e.message}")
+            if stored:
+                concept_id = str(stored["id"])
+                self.logger.info(f"Stored concept with ID: {mask_id(concept_id)} and {len(stored.get('color_variations') or [])} color variations")
+                return concept_id
 
-            # Store the concept using ConceptStorage component
-            concept = self.concept_storage.store_concept(core_concept_data)
-            if not concept:
-                self.logger.error("Failed to store concept")
-                raise PersistenceError("Failed to store concept")
+            return await self._store_concept_in_steps(core_concept_data, variations)
 
-            concept_id = str(concept["id"])  # Explicit cast to str
-            masked_concept_id = mask_id(concept_id)
-            self.logger.info(f"Stored concept with ID: {masked_concept_id}")
-
-            # Insert color variations if provided
-            if color_palettes:
-                variations = []
-                for palette in color_palettes:
-                    palette_path = palette.get("image_path")
-                    masked_palette_path = mask_path(palette_path) if palette_path else None
-                    self.logger.debug(f"Adding palette variation: {palette.get('name')}, path: {masked_palette_path}")
-
-                    variation = {
-                        "concept_id": concept_id,
-                        "palette_name": palette.get("name"),
-                        "colors": palette.get("colors"),
-                        "description": palette.get("description"),
-                        "image_path": palette.get("image_path"),
-                        "image_url": palette.get("image_url"),  # Use pre-generated URL if provided
-                    }
-
-                    variations.append(variation)
-
-                try:
-                    variations_result = self.concept_storage.store_color_variations(variations)
-                    if not variations_result:
-                        # Color variations storage failed, we need to clean up the concept
-                        self.logger.error(f"Failed to store color variations for concept {masked_concept_id}. Cleaning up...")
-
-                        # Attempt to delete the concept
-                        cleanup_successful = await self._delete_concept(concept_id)
-
-                        # Log cleanup result
-                        if cleanup_successful:
-                            self.logger.info(f"Successfully cleaned up concept {masked_concept_id} after variations storage failure")
-                        else:
-                            self.logger.error(f"Failed to clean up concept {masked_concept_id} after variations storage failure")
-
-                        # Raise an error indicating the transaction failed but cleanup was attempted
-                        cleanup_status = "successful" if cleanup_successful else "failed"
-                        raise DatabaseTransactionError(
-                            message=f"Failed to store color variations. Concept cleanup was {cleanup_status}.",
-                            operation="insert",
-                            table=settings.DB_TABLE_PALETTES,
-                            details={
-                                "concept_id": masked_concept_id,
-                                "cleanup_successful": cleanup_successful,
-                            },
-                        )
-
-                    self.logger.info(f"Stored {len(variations_result)} color variations")
-                except Exception as e:
-                    # Error during variations storage, attempt to clean up the concept
-                    self.logger.error(f"Error storing color variations for concept {masked_concept_id}: {str(e)}. Cleaning up...")
+        except (DatabaseTransactionError, PersistenceError):
+            # Re-raise transaction errors
+            raise
+        except Exception as e:
+            self.logger.error(f"Error in store_concept: {e}")
+            raise PersistenceError(f"Failed to store concept: {str(e)}")
+
+    async def _store_concept_in_steps(self, core_concept_data: Dict[str, Any], variations: List[Dict[str, Any]]) -> str:
+        """Store a concept and its variations with separate inserts.
+
+        Used when the create_concept_with_variations database function is not
+        available; the concept is deleted again if storing the variations fails.
+
+        Args:
+            core_concept_data: Concept fields to insert
+            variations: Color variation fields to insert, without concept_id
+
+        Returns:
+            ID of the stored concept
+
+        Raises:
+            PersistenceError: If storing the concept fails
+            DatabaseTransactionError: If storing the variations fails and cleanup is required
+        """
+        # Store the concept using ConceptStorage component
+        concept = self.concept_storage.store_concept(core_concept_data)
+        if not concept:
+            self.logger.error("Failed to store concept")
+            raise PersistenceError("Failed to store concept")
+
+        concept_id = str(concept["id"])  # Explicit cast to str
+        masked_concept_id = mask_id(concept_id)
+        self.logger.info(f"Stored concept with ID: {masked_concept_id}")
+
+        # Insert color variations if provided
+        if variations:
+            try:
+                variations_result = self.concept_storage.store_color_variations([{**variation, "concept_id": concept_id} for variation in variations])
+                if not variations_result:
+                    # Color variations storage failed, we need to clean up the concept
+                    self.logger.error(f"Failed to store color variations for concept {masked_concept_id}. Cleaning up...")
 
                     # Attempt to delete the concept
                     cleanup_successful = await self._delete_concept(concept_id)
 
-                    # Log cleanup result and re-raise with cleanup information
-                    cleanup_msg = "Cleanup " + ("successful" if cleanup_successful else "failed")
-                    self.logger.info(f"Color variations error cleanup: {cleanup_msg}")
+                    # Log cleanup result
+                    if cleanup_successful:
+                        self.logger.info(f"Successfully cleaned up concept {masked_concept_id} after variations storage failure")
+                    else:
+                        self.logger.error(f"Failed to clean up concept {masked_concept_id} after variations storage failure")
 
-                    # Raise a transaction error that includes original error and cleanup status
+                    # Raise an error indicating the transaction failed but cleanup was attempted
+                    cleanup_status = "successful" if cleanup_successful else "failed"
                     raise DatabaseTransactionError(
-                        message=f"Error storing color variations: {str(e)}. {cleanup_msg}.",
+                        message=f"Failed to store color variations. Concept cleanup was {cleanup_status}.",
                         operation="insert",
                         table=settings.DB_TABLE_PALETTES,
                         details={
                             "concept_id": masked_concept_id,
                             "cleanup_successful": cleanup_successful,
-                            "original_error": str(e),
                         },
                     )
 
-            return concept_id
-
-        except DatabaseTransactionError:
-            # Re-raise transaction errors
-            raise
-        except Exception as e:
-            self.logger.error(f"Error in store_concept: {e}")
-            raise PersistenceError(f"Failed to store concept: {str(e)}")
+                self.logger.info(f"Stored {len(variations_result)} color variations")
+            except Exception as e:
+                # Error during variations storage, attempt to clean up the concept
+                self.logger.error(f"Error storing color variations for concept {masked_concept_id}: {str(e)}. Cleaning up...")
+
+                # Attempt to delete the concept
+                cleanup_successful = await self._delete_concept(concept_id)
+
+                # Log cleanup result and re-raise with cleanup information
+                cleanup_msg = "Cleanup " + ("successful" if cleanup_successful else "failed")
+                self.logger.info(f"Color variations error cleanup: {cleanup_msg}")
+
+                # Raise a transaction error that includes original error and cleanup status
+                raise DatabaseTransactionError(
+                    message=f"Error storing color variations: {str(e)}. {cleanup_msg}.",
+                    operation="insert",
+                    table=settings.DB_TABLE_PALETTES,
+                    details={
+                        "concept_id": masked_concept_id,
+                        "cleanup_successful": cleanup_successful,
+                        "original_error": str(e),
+                    },
+                )
+
+        return concept_id
 
     async def _delete_concept(self, concept_id: str) -> bool:
         """Helper method to delete a concept as part of transaction cleanup.
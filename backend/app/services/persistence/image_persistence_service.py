@@ -12,12 +12,12 @@ from typing import Any, Dict, List, Optional, Tuple, Union
 
 import httpx
 from fastapi import UploadFile
-from PIL import Image
 
 from app.core.config import settings
 from app.core.exceptions import ImageNotFoundError, ImageStorageError
 from app.core.supabase.client import SupabaseClient
 from app.core.supabase.image_storage import ImageStorage
+from app.services.image.limits import check_image_limits
 from app.services.persistence.interface import ImagePersistenceServiceInterface
 from app.utils.security.mask import mask_id, mask_path
 
@@ -79,18 +79,19 @@ class ImagePersistenceService(ImagePersistenceServiceInterface):
             # Default extension - initialize it here to avoid undefined issues
             ext = "png"
 
+            # Reject oversized images from their header before storing them
+            probe = check_image_limits(content)
+
             # Generate a unique file name if not provided
             if not file_name:
                 timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
                 random_id = str(uuid.uuid4())[:8]
 
-                # Try to determine file format from content
-                try:
-                    img = Image.open(BytesIO(content))
-                    if img.format:
-                        ext = img.format.lower()
-                except Exception as e:
-                    self.logger.warning(f"Could not determine image format: {str(e)}, using default: {ext}")
+                # Determine the file format from the image header
+                if probe is not None:
+                    ext = probe.format
+                else:
+                    self.logger.warning(f"Could not determine image format, using default: {ext}")
 
                 file_name = f"{timestamp}_{random_id}.{ext}"
             else:
@@ -145,6 +146,50 @@ class ImagePersistenceService(ImagePersistenceServiceInterface):
             self.logger.error(error_msg)
             raise ImageStorageError(error_msg)
 
+    async def store_image_at_path(
+        self,
+        image_data: bytes,
+        path: str,
+        user_id: str,
+        content_type: str = "image/png",
+        is_palette: bool = False,
+    ) -> str:
+        """Store an image at a given path, replacing any image already there.
+
+        Unlike store_image, no file name is generated and no signed URL is
+        created; used for files derived from a stored image.
+
+        Args:
+            image_data: Image data as bytes
+            path: Storage path, starting with the user ID segment
+            user_id: User ID for access control
+            content_type: Content type of the image
+            is_palette: Whether the image is a palette (uses palette-images bucket)
+
+        Returns:
+            The storage path
+
+        Raises:
+            ImageStorageError: If image storage fails
+        """
+        if not path.startswith(f"{user_id}/"):
+            raise ImageStorageError(f"Image path must start with the user ID: {mask_path(path)}")
+        try:
+            await self.storage.upload_image(
+                image_data=image_data,
+                path=path,
+                content_type=content_type,
+                user_id=user_id,
+                is_palette=is_palette,
+                metadata={"owner_user_id": user_id},
+                upsert=True,
+            )
+            return path
+        except Exception as e:
+            error_msg = f"Failed to store image at {mask_path(path)}: {str(e)}"
+            self.logger.error(error_msg)
+            raise ImageStorageError(error_msg)
+
     async def get_image(self, image_path: str) -> bytes:
         """Retrieve an image from storage.
 
@@ -325,6 +370,20 @@ class ImagePersistenceService(ImagePersistenceServiceInterface):
             self.logger.error(error_msg)
             raise ImageStorageError(error_msg)
 
+    def get_signed_urls(self, paths: List[str], is_palette: bool = False, expiry_seconds: int = settings.SIGNED_URL_EXPIRY_SECONDS) -> Dict[str, str]:
+        """Get signed URLs for several images of one user in a single storage request.
+
+        Args:
+            paths: Paths of the images, all in the same user's folder
+            is_palette: Whether the images are in the palette bucket
+            expiry_seconds: Expiry time in seconds (default: 31 days)
+
+        Returns:
+            Signed URLs by path; images that could not be signed are left out
+        """
+        bucket_name = self.palette_bucket if is_palette else self.concept_bucket
+        return self.storage.create_signed_urls(paths, bucket_name=bucket_name, expires_in=expiry_seconds)
+
     def get_image_url(self, image_path: str, expiration: int = settings.SIGNED_URL_EXPIRY_SECONDS) -> str:
         """Get a URL for an image.
 
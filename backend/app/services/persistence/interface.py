@@ -222,6 +222,32 @@ class ImagePersistenceServiceInterface(abc.ABC):
         """
         pass
 
+    @abc.abstractmethod
+    async def store_image_at_path(
+        self,
+        image_data: bytes,
+        path: str,
+        user_id: str,
+        content_type: str = "image/png",
+        is_palette: bool = False,
+    ) -> str:
+        """Store an image at a given path, replacing any image already there.
+
+        Args:
+            image_data: Image data as bytes
+            path: Storage path, starting with the user ID segment
+            user_id: User ID for the image owner
+            content_type: Content type of the image
+            is_palette: Whether this is a palette image
+
+        Returns:
+            The storage path
+
+        Raises:
+            PersistenceError: If storage fails
+        """
+        pass
+
     @abc.abstractmethod
     async def get_image(self, image_path: str) -> bytes:
         """Get image data by path.
@@ -255,6 +281,20 @@ class ImagePersistenceServiceInterface(abc.ABC):
         """
         pass
 
+    @abc.abstractmethod
+    def get_signed_urls(self, paths: List[str], is_palette: bool = False, expiry_seconds: int = 3600) -> Dict[str, str]:
+        """Get signed URLs for several images of one user at once.
+
+        Args:
+            paths: Paths of the images, all in the same user's folder
+            is_palette: Whether the images are in the palette bucket
+            expiry_seconds: Expiry time in seconds
+
+        Returns:
+            Signed URLs by path; images that could not be signed are left out
+        """
+        pass
+
     @abc.abstractmethod
     def delete_image(self, image_path: str) -> bool:
         """Delete an image by path.
@@ -0,0 +1,264 @@
+"""Task change bus.
+
+This module provides the bus that task status and progress changes are
+published to, so API instances can push them to clients instead of having
+clients poll the tasks table. Redis pub/sub is used when it is configured,
+which also carries changes made by the worker; otherwise an in-process broker
+delivers changes made within the same process.
+"""
+
+import abc
+import asyncio
+import json
+import logging
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.utils.security.mask import mask_id
+
+logger = logging.getLogger(__name__)
+
+# Task row fields that are internal to the worker and never published
+_PRIVATE_TASK_FIELDS = ("checkpoints",)
+
+
+def to_task_event(task: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a task row into the event published on the bus.
+
+    Args:
+        task: Task row as returned by the tasks table
+
+    Returns:
+        Task data without worker-internal fields
+    """
+    return {key: value for key, value in task.items() if key not in _PRIVATE_TASK_FIELDS}
+
+
+class TaskEventSubscription(abc.ABC):
+    """A subscription to the task changes of one user."""
+
+    @abc.abstractmethod
+    async def get(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Wait for the next task change.
+
+        Args:
+            timeout: Maximum number of seconds to wait
+
+        Returns:
+            The task event, or None if nothing arrived before the timeout
+        """
+        pass
+
+
+class TaskEventBus(abc.ABC):
+    """Publishes task changes and fans them out to subscribers."""
+
+    # Whether events published by other processes (e.g. the worker) are delivered
+    shared: bool = False
+
+    @abc.abstractmethod
+    def publish(self, user_id: str, event: Dict[str, Any]) -> None:
+        """Publish a task change for a user.
+
+        Args:
+            user_id: ID of the user who owns the task
+            event: Task event data
+        """
+        pass
+
+    @abc.abstractmethod
+    def subscribe(self, user_id: str) -> Any:
+        """Subscribe to the task changes of a user.
+
+        Args:
+            user_id: ID of the user whose task changes to receive
+
+        Returns:
+            Async context manager yielding a TaskEventSubscription
+        """
+        pass
+
+
+class _QueueSubscription(TaskEventSubscription):
+    """Subscription backed by an asyncio queue."""
+
+    def __init__(self, queue: "asyncio.Queue[Dict[str, Any]]"):
+        self.queue = queue
+
+    async def get(self, timeout: float) -> Optional[Dict[str, Any]]:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class InProcessTaskEventBus(TaskEventBus):
+    """Task change bus that only delivers events within the current process."""
+
+    shared = False
+
+    def __init__(self, max_queue_size: int = 100):
+        """Initialize the in-process bus.
+
+        Args:
+            max_queue_size: Events buffered per subscriber before the oldest is dropped
+        """
+        self.max_queue_size = max_queue_size
+        self._subscribers: Dict[str, Set[Tuple[asyncio.AbstractEventLoop, "asyncio.Queue[Dict[str, Any]]"]]] = {}
+
+    def publish(self, user_id: str, event: Dict[str, Any]) -> None:
+        """Publish a task change to the subscribers of a user.
+
+        Args:
+            user_id: ID of the user who owns the task
+            event: Task event data
+        """
+        for loop, queue in list(self._subscribers.get(user_id, ())):
+            # Subscribers may live on another event loop, so hand the event over thread-safely
+            try:
+                loop.call_soon_threadsafe(self._enqueue, queue, event)
+            except RuntimeError:
+                # The subscriber's loop is closed; it will be removed when it unsubscribes
+                continue
+
+    @staticmethod
+    def _enqueue(queue: "asyncio.Queue[Dict[str, Any]]", event: Dict[str, Any]) -> None:
+        if queue.full():
+            # Slow subscriber: drop the oldest event, the newest state matters most
+            queue.get_nowait()
+        queue.put_nowait(event)
+
+    @asynccontextmanager
+    async def subscribe(self, user_id: str) -> AsyncIterator[TaskEventSubscription]:
+        """Subscribe to the task changes of a user.
+
+        Args:
+            user_id: ID of the user whose task changes to receive
+
+        Yields:
+            Subscription to read events from
+        """
+        queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(maxsize=self.max_queue_size)
+        entry = (asyncio.get_running_loop(), queue)
+        self._subscribers.setdefault(user_id, set()).add(entry)
+        try:
+            yield _QueueSubscription(queue)
+        finally:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers is not None:
+                subscribers.discard(entry)
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+
+class _RedisSubscription(TaskEventSubscription):
+    """Subscription backed by a Redis pub/sub connection."""
+
+    def __init__(self, pubsub: Any):
+        self.pubsub = pubsub
+
+    async def get(self, timeout: float) -> Optional[Dict[str, Any]]:
+        message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        if not message or message.get("type") != "message":
+            return None
+        try:
+            return dict(json.loads(message["data"]))
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Ignoring malformed task event: {str(e)}")
+            return None
+
+
+class RedisTaskEventBus(TaskEventBus):
+    """Task change bus backed by Redis pub/sub, shared by API instances and the worker."""
+
+    shared = True
+
+    def __init__(self, redis_client: Any, async_redis_client: Any, channel_prefix: str = "task_events:"):
+        """Initialize the Redis bus.
+
+        Args:
+            redis_client: Synchronous Redis client used for publishing
+            async_redis_client: asyncio Redis client used for subscriptions
+            channel_prefix: Prefix of the per-user channels
+        """
+        self.redis = redis_client
+        self.async_redis = async_redis_client
+        self.channel_prefix = channel_prefix
+
+    def _channel(self, user_id: str) -> str:
+        return f"{self.channel_prefix}{user_id}"
+
+    def publish(self, user_id: str, event: Dict[str, Any]) -> None:
+        """Publish a task change on the user's channel.
+
+        Args:
+            user_id: ID of the user who owns the task
+            event: Task event data
+        """
+        self.redis.publish(self._channel(user_id), json.dumps(event, default=str))
+
+    @asynccontextmanager
+    async def subscribe(self, user_id: str) -> AsyncIterator[TaskEventSubscription]:
+        """Subscribe to the user's channel.
+
+        Args:
+            user_id: ID of the user whose task changes to receive
+
+        Yields:
+            Subscription to read events from
+        """
+        pubsub = self.async_redis.pubsub()
+        await pubsub.subscribe(self._channel(user_id))
+        try:
+            yield _RedisSubscription(pubsub)
+        finally:
+            try:
+                await pubsub.unsubscribe(self._channel(user_id))
+                await pubsub.aclose()
+            except Exception as e:
+                logger.warning(f"Error closing task event subscription for user {mask_id(user_id)}: {str(e)}")
+
+
+@lru_cache()
+def get_task_event_bus() -> TaskEventBus:
+    """Get the task change bus for this process.
+
+    Returns:
+        RedisTaskEventBus when Redis is configured and reachable, InProcessTaskEventBus otherwise
+    """
+    if settings.TASK_EVENTS_REDIS_ENABLED and settings.UPSTASH_REDIS_ENDPOINT:
+        # Imported here so the in-process bus has no Redis dependency
+        import redis.asyncio
+
+        from app.core.limiter.redis_store import get_redis_url, get_shared_redis_client
+
+        redis_client = get_shared_redis_client()
+        if redis_client is not None:
+            async_redis_client = redis.asyncio.from_url(get_redis_url(), socket_connect_timeout=10, decode_responses=True)
+            logger.info("Using Redis pub/sub for task events")
+            return RedisTaskEventBus(redis_client, async_redis_client)
+        logger.warning("Redis unavailable, task events will only be delivered within this process")
+
+    return InProcessTaskEventBus()
+
+
+def publish_task_events(bus: TaskEventBus, tasks: List[Dict[str, Any]]) -> None:
+    """Publish changed task rows, logging instead of raising on failure.
+
+    Publishing is best effort: subscribers that miss an event resynchronize
+    from the tasks table.
+
+    Args:
+        bus: Bus to publish to
+        tasks: Changed task rows
+    """
+    for task in tasks:
+        user_id = task.get("user_id")
+        if not user_id:
+            continue
+        try:
+            bus.publish(str(user_id), to_task_event(task))
+        except Exception as e:
+            logger.warning(f"Error publishing task event for task {mask_id(str(task.get('id', '')))}: {str(e)}")
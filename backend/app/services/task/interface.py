@@ -1,20 +1,21 @@
 """Interface for task management services."""
 
 import abc
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 
 class TaskServiceInterface(abc.ABC):
     """Interface for services that handle task management."""
 
     @abc.abstractmethod
-    async def create_task(self, user_id: str, task_type: str, metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    async def create_task(self, user_id: str, task_type: str, metadata: Optional[Dict[str, Any]] = None, task_id: Optional[str] = None) -> Dict[str, Any]:
         """Create a new task record.
 
         Args:
             user_id: ID of the user who owns the task
             task_type: Type of task (e.g. 'concept_generation', 'concept_refinement')
             metadata: Optional metadata associated with the task
+            task_id: Optional pre-generated task ID (a new one is generated if omitted)
 
         Returns:
             Task data including the generated task ID
@@ -24,6 +25,24 @@ class TaskServiceInterface(abc.ABC):
         """
         pass
 
+    @abc.abstractmethod
+    async def create_task_if_no_active(self, user_id: str, task_type: str, metadata: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], bool]:
+        """Create a task unless the user already has an active task of the same type.
+
+        Args:
+            user_id: ID of the user who owns the task
+            task_type: Type of task (e.g. 'concept_generation', 'concept_refinement')
+            metadata: Optional metadata associated with the task
+
+        Returns:
+            Tuple of (task data, created), where task data is the existing
+            active task when created is False
+
+        Raises:
+            TaskError: If creation fails
+        """
+        pass
+
     @abc.abstractmethod
     async def update_task_status(
         self,
@@ -99,6 +118,22 @@ class TaskServiceInterface(abc.ABC):
         """
         pass
 
+    @abc.abstractmethod
+    async def get_active_task(self, user_id: str, task_type: str) -> Optional[Dict[str, Any]]:
+        """Get the most recent pending or processing task of a type for a user.
+
+        Args:
+            user_id: ID of the user who owns the task
+            task_type: Type of task to look for
+
+        Returns:
+            Task data if the user has an active task of that type, None otherwise
+
+        Raises:
+            TaskError: If retrieval fails
+        """
+        pass
+
     @abc.abstractmethod
     async def get_task_by_result_id(self, result_id: str, user_id: str) -> Optional[Dict[str, Any]]:
         """Get a task by result ID.
@@ -131,3 +166,56 @@ class TaskServiceInterface(abc.ABC):
             TaskError: If deletion fails
         """
         pass
+
+    @abc.abstractmethod
+    async def save_task_checkpoints(self, task_id: str, checkpoints: Dict[str, Any], progress: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Persist the stage checkpoints of a task.
+
+        Args:
+            task_id: ID of the task to update
+            checkpoints: Completed stage outputs (e.g. stored image path, raw palettes)
+            progress: Optional progress record to write in the same update
+
+        Returns:
+            Updated task data
+
+        Raises:
+            TaskNotFoundError: If task not found
+            TaskError: If update fails
+        """
+        pass
+
+    @abc.abstractmethod
+    async def release_task_for_retry(self, task_id: str, checkpoints: Dict[str, Any], error_message: Optional[str] = None) -> Dict[str, Any]:
+        """Return a processing task to pending so a redelivered message can claim it again.
+
+        Args:
+            task_id: ID of the task to release
+            checkpoints: Stage checkpoints to keep for the next attempt
+            error_message: Optional error message describing the failed attempt
+
+        Returns:
+            Updated task data
+
+        Raises:
+            TaskNotFoundError: If task not found or no longer processing
+            TaskError: If update fails
+        """
+        pass
+
+    @abc.abstractmethod
+    async def update_task_progress(self, task_id: str, progress: Dict[str, Any]) -> Dict[str, Any]:
+        """Record the progress of a running task.
+
+        Args:
+            task_id: ID of the task to update
+            progress: Progress record with the current stage, percent complete and partial results
+
+        Returns:
+            Updated task data
+
+        Raises:
+            TaskNotFoundError: If task not found
+            TaskError: If update fails
+        """
+        pass
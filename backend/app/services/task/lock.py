@@ -0,0 +1,132 @@
+"""Per-user active task lock.
+
+This module provides a Redis lock that records which task a user currently
+has running for each task type. Taking the lock together with task creation
+means a submit only needs the database when the user already has a task in
+flight, and two concurrent submits can never both create a task.
+"""
+
+import logging
+from functools import lru_cache
+from typing import Any, Optional
+
+from app.core.config import settings
+from app.utils.security.mask import mask_id
+
+logger = logging.getLogger(__name__)
+
+# Delete the key only if it still holds the caller's task ID
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# Hand the key to a new task only if it still holds the stale task ID
+_REPLACE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+    return 1
+end
+return 0
+"""
+
+
+class ActiveTaskLock:
+    """Redis lock holding the ID of a user's active task of a given type."""
+
+    def __init__(self, redis_client: Any, ttl_seconds: int, key_prefix: str = "active_task:"):
+        """Initialize the lock.
+
+        Args:
+            redis_client: Synchronous Redis client
+            ttl_seconds: Expiry of the lock, bounding how long a lost release can block a user
+            key_prefix: Prefix of the lock keys
+        """
+        self.redis = redis_client
+        self.ttl_seconds = ttl_seconds
+        self.key_prefix = key_prefix
+
+    def _key(self, user_id: str, task_type: str) -> str:
+        return f"{self.key_prefix}{task_type}:{user_id}"
+
+    @staticmethod
+    def _decode(value: Any) -> Optional[str]:
+        if value is None:
+            return None
+        return value.decode("utf-8") if isinstance(value, bytes) else str(value)
+
+    def acquire(self, user_id: str, task_type: str, task_id: str) -> Optional[str]:
+        """Take the lock for a task that is about to be created.
+
+        Args:
+            user_id: ID of the user submitting the task
+            task_type: Type of the task
+            task_id: ID the new task will be created with
+
+        Returns:
+            None if the lock was taken, otherwise the ID of the task holding it
+        """
+        key = self._key(user_id, task_type)
+        if self.redis.set(key, task_id, nx=True, ex=self.ttl_seconds):
+            return None
+
+        holder = self._decode(self.redis.get(key))
+        if holder is None:
+            # The holder released the lock between SET and GET; try once more
+            if self.redis.set(key, task_id, nx=True, ex=self.ttl_seconds):
+                return None
+            holder = self._decode(self.redis.get(key)) or ""
+        return holder
+
+    def replace(self, user_id: str, task_type: str, stale_task_id: str, task_id: str) -> bool:
+        """Take over a lock whose holder is no longer active.
+
+        Args:
+            user_id: ID of the user submitting the task
+            task_type: Type of the task
+            stale_task_id: ID of the task currently holding the lock
+            task_id: ID the new task will be created with
+
+        Returns:
+            True if the lock now holds task_id
+        """
+        result = self.redis.eval(_REPLACE_SCRIPT, 1, self._key(user_id, task_type), stale_task_id, task_id, self.ttl_seconds)
+        return bool(result)
+
+    def release(self, user_id: str, task_type: str, task_id: str) -> bool:
+        """Release the lock if it is still held by the given task.
+
+        Args:
+            user_id: ID of the user who owns the task
+            task_type: Type of the task
+            task_id: ID of the task releasing the lock
+
+        Returns:
+            True if the lock was released
+        """
+        released = bool(self.redis.eval(_RELEASE_SCRIPT, 1, self._key(user_id, task_type), task_id))
+        if released:
+            logger.debug(f"Released active {task_type} lock of user {mask_id(user_id)}")
+        return released
+
+
+@lru_cache()
+def get_active_task_lock() -> Optional[ActiveTaskLock]:
+    """Get the active task lock for this process.
+
+    Returns:
+        ActiveTaskLock when Redis is configured and reachable, None otherwise
+    """
+    if not settings.TASK_ACTIVE_LOCK_ENABLED or not settings.UPSTASH_REDIS_ENDPOINT:
+        return None
+
+    # Imported here so the task service has no hard Redis dependency
+    from app.core.limiter.redis_store import get_shared_redis_client
+
+    redis_client = get_shared_redis_client()
+    if redis_client is None:
+        logger.warning("Redis unavailable, active tasks will be checked against the tasks table")
+        return None
+    return ActiveTaskLock(redis_client, settings.TASK_ACTIVE_LOCK_TTL_SECONDS)
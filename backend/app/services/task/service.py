@@ -6,12 +6,14 @@ This module provides services for managing background tasks.
 import logging
 import uuid
 from datetime import datetime
-from typing import Any, Dict, List, Optional, cast
+from typing import Any, Dict, List, Optional, Tuple, cast
 
 from app.core.config import settings
-from app.core.constants import TASK_STATUS_PENDING, TASK_STATUS_PROCESSING  # Import the constants
+from app.core.constants import TASK_STATUS_COMPLETED, TASK_STATUS_FAILED, TASK_STATUS_PENDING, TASK_STATUS_PROCESSING  # Import the constants
 from app.core.supabase.client import SupabaseClient
+from app.services.task.events import TaskEventBus, get_task_event_bus, publish_task_events
 from app.services.task.interface import TaskServiceInterface
+from app.services.task.lock import ActiveTaskLock, get_active_task_lock
 from app.utils.security.mask import mask_id
 
 # Custom exceptions
@@ -47,23 +49,69 @@ class TaskNotFoundError(TaskError):
 class TaskService(TaskServiceInterface):
     """Service for managing background tasks."""
 
-    def __init__(self, client: SupabaseClient):
+    def __init__(self, client: SupabaseClient, event_bus: Optional[TaskEventBus] = None, active_task_lock: Optional[ActiveTaskLock] = None):
         """Initialize task service with Supabase client.
 
         Args:
             client: Supabase client for interacting with the database
+            event_bus: Optional bus that task changes are published to
+                (defaults to the process-wide bus)
+            active_task_lock: Optional per-user active task lock
+                (defaults to the process-wide lock, if Redis is configured)
         """
         self.client = client
         self.logger = logging.getLogger("task_service")
         self.tasks_table = settings.DB_TABLE_TASKS
+        self._event_bus = event_bus
+        self._active_task_lock = active_task_lock
+        self._active_task_lock_resolved = active_task_lock is not None
+
+    @property
+    def event_bus(self) -> TaskEventBus:
+        """Get the bus that task changes are published to."""
+        if self._event_bus is None:
+            self._event_bus = get_task_event_bus()
+        return self._event_bus
+
+    @property
+    def active_task_lock(self) -> Optional[ActiveTaskLock]:
+        """Get the per-user active task lock, or None when Redis is not available."""
+        if not self._active_task_lock_resolved:
+            self._active_task_lock = get_active_task_lock()
+            self._active_task_lock_resolved = True
+        return self._active_task_lock
+
+    def _release_active_task_lock(self, task: Dict[str, Any]) -> None:
+        """Release the active task lock held by a task that is no longer active.
 
-    async def create_task(self, user_id: str, task_type: str, metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        Args:
+            task: Task row of the finished or deleted task
+        """
+        lock = self.active_task_lock
+        if lock is None or not task.get("user_id") or not task.get("type"):
+            return
+        try:
+            lock.release(str(task["user_id"]), str(task["type"]), str(task["id"]))
+        except Exception as e:
+            # The lock expires on its own and stale holders are detected on the next submit
+            self.logger.warning(f"Error releasing active task lock for task {mask_id(str(task.get('id', '')))}: {str(e)}")
+
+    def _publish_change(self, task: Dict[str, Any]) -> None:
+        """Publish a changed task row so subscribers don't have to poll for it.
+
+        Args:
+            task: Task row returned by the update
+        """
+        publish_task_events(self.event_bus, [task])
+
+    async def create_task(self, user_id: str, task_type: str, metadata: Optional[Dict[str, Any]] = None, task_id: Optional[str] = None) -> Dict[str, Any]:
         """Create a new task record.
 
         Args:
             user_id: ID of the user who owns the task
             task_type: Type of task (e.g. 'concept_generation', 'concept_refinement')
             metadata: Optional metadata associated with the task
+            task_id: Optional pre-generated task ID (a new one is generated if omitted)
 
         Returns:
             Task data including the generated task ID
@@ -73,7 +121,7 @@ class TaskService(TaskServiceInterface):
         """
         try:
             # Set initial task values
-            task_id = str(uuid.uuid4())
+            task_id = task_id or str(uuid.uuid4())
             now = datetime.utcnow().isoformat()
 
             # Mask user ID for logging
@@ -107,6 +155,7 @@ class TaskService(TaskServiceInterface):
             task = cast(Dict[str, Any], result.data[0])
             masked_task_id = mask_id(task["id"])
             self.logger.info(f"Successfully created task {masked_task_id} of type '{task_type}'")
+            self._publish_change(task)
 
             return task
 
@@ -114,6 +163,82 @@ class TaskService(TaskServiceInterface):
             self.logger.error(f"Error creating task: {str(e)}")
             raise TaskError(f"Failed to create task: {str(e)}")
 
+    async def create_task_if_no_active(self, user_id: str, task_type: str, metadata: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], bool]:
+        """Create a task unless the user already has an active task of the same type.
+
+        With Redis available, the per-user active task lock is taken together
+        with task creation, so the tasks table is only read when the lock is
+        already held and concurrent submits cannot both create a task. Without
+        Redis, a single active task query is made before creating the task.
+
+        Args:
+            user_id: ID of the user who owns the task
+            task_type: Type of task (e.g. 'concept_generation', 'concept_refinement')
+            metadata: Optional metadata associated with the task
+
+        Returns:
+            Tuple of (task data, created), where task data is the existing
+            active task when created is False
+
+        Raises:
+            TaskError: If creation fails
+        """
+        masked_user_id = mask_id(user_id)
+        task_id = str(uuid.uuid4())
+        lock = self.active_task_lock
+        locked = False
+
+        if lock is not None:
+            try:
+                holder_id = lock.acquire(user_id, task_type, task_id)
+                if holder_id is None:
+                    locked = True
+                else:
+                    existing_task = await self._get_task_if_active(holder_id, user_id)
+                    if existing_task is not None:
+                        self.logger.info(f"User {masked_user_id} already has active {task_type} task {mask_id(holder_id)}")
+                        return existing_task, False
+                    # The holder finished without releasing the lock; take it over
+                    locked = lock.replace(user_id, task_type, holder_id, task_id)
+            except Exception as e:
+                self.logger.warning(f"Active task lock unavailable for user {masked_user_id}: {str(e)}, checking the tasks table instead")
+
+        if not locked:
+            try:
+                existing_task = await self.get_active_task(user_id, task_type)
+            except TaskError as e:
+                # Don't block submissions on a failed check
+                self.logger.warning(f"Error checking for existing tasks: {str(e)}")
+                existing_task = None
+            if existing_task is not None:
+                return existing_task, False
+
+        try:
+            task = await self.create_task(user_id=user_id, task_type=task_type, metadata=metadata, task_id=task_id)
+        except Exception:
+            if locked:
+                self._release_active_task_lock({"id": task_id, "user_id": user_id, "type": task_type})
+            raise
+        return task, True
+
+    async def _get_task_if_active(self, task_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        """Get a task if it is still pending or processing.
+
+        Args:
+            task_id: ID of the task
+            user_id: ID of the user who owns the task
+
+        Returns:
+            Task data if the task exists and is active, None otherwise
+        """
+        try:
+            task = await self.get_task(task_id, user_id)
+        except TaskNotFoundError:
+            return None
+        if task.get("status") not in (TASK_STATUS_PENDING, TASK_STATUS_PROCESSING):
+            return None
+        return task
+
     async def update_task_status(
         self,
         task_id: str,
@@ -173,6 +298,9 @@ class TaskService(TaskServiceInterface):
 
             task = cast(Dict[str, Any], result.data[0])
             self.logger.info(f"Successfully updated task {masked_task_id} status to '{status}'")
+            self._publish_change(task)
+            if status in (TASK_STATUS_COMPLETED, TASK_STATUS_FAILED):
+                self._release_active_task_lock(task)
 
             return task
 
@@ -271,6 +399,42 @@ class TaskService(TaskServiceInterface):
             self.logger.error(f"Error getting tasks for user {masked_user_id}: {str(e)}")
             raise TaskError(f"Failed to retrieve tasks: {str(e)}")
 
+    async def get_active_task(self, user_id: str, task_type: str) -> Optional[Dict[str, Any]]:
+        """Get the most recent pending or processing task of a type for a user.
+
+        Args:
+            user_id: ID of the user who owns the task
+            task_type: Type of task to look for
+
+        Returns:
+            Task data if the user has an active task of that type, None otherwise
+
+        Raises:
+            TaskError: If retrieval fails
+        """
+        masked_user_id = mask_id(user_id)
+        try:
+            self.logger.debug(f"Getting active '{task_type}' task for user {masked_user_id}")
+            active_statuses = [TASK_STATUS_PENDING, TASK_STATUS_PROCESSING]
+
+            # One query served by the (user_id, type, status) index
+            try:
+                service_client = self.client.get_service_role_client()
+                query = service_client.table(self.tasks_table).select("*").eq("user_id", user_id).eq("type", task_type).in_("status", active_statuses)
+            except Exception as e:
+                self.logger.warning(f"Failed to use service role client: {str(e)}, falling back to regular client")
+                query = self.client.client.table(self.tasks_table).select("*").eq("user_id", user_id).eq("type", task_type).in_("status", active_statuses)
+
+            result = query.order("created_at", desc=True).limit(1).execute()
+
+            if not result.data:
+                return None
+            return cast(Dict[str, Any], result.data[0])
+
+        except Exception as e:
+            self.logger.error(f"Error getting active task for user {masked_user_id}: {str(e)}")
+            raise TaskError(f"Failed to retrieve active task: {str(e)}")
+
     async def delete_task(self, task_id: str, user_id: str) -> bool:
         """Delete a task.
 
@@ -304,6 +468,7 @@ class TaskService(TaskServiceInterface):
                 raise TaskNotFoundError(task_id)
 
             self.logger.info(f"Successfully deleted task {masked_task_id}")
+            self._release_active_task_lock(cast(Dict[str, Any], result.data[0]))
             return True
 
         except TaskNotFoundError:
@@ -408,7 +573,9 @@ class TaskService(TaskServiceInterface):
                 self.logger.info(f"Successfully claimed task {masked_task_id}")
                 # Return the updated task data
                 if result.data and len(result.data) > 0:
-                    return cast(Dict[str, Any], result.data[0])
+                    claimed_task = cast(Dict[str, Any], result.data[0])
+                    self._publish_change(claimed_task)
+                    return claimed_task
 
                 # If we don't have the task data from the update, fetch it
                 # This should rarely happen with proper returning clause
@@ -422,3 +589,145 @@ class TaskService(TaskServiceInterface):
         except Exception as e:
             self.logger.error(f"Error claiming task {masked_task_id}: {str(e)}")
             raise TaskError(f"Failed to claim task: {str(e)}")
+
+    async def save_task_checkpoints(self, task_id: str, checkpoints: Dict[str, Any], progress: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Persist the stage checkpoints of a task.
+
+        The checkpoints dictionary is written as a whole, so callers should pass
+        the complete set of completed stages rather than a partial update.
+
+        Args:
+            task_id: ID of the task to update
+            checkpoints: Completed stage outputs (e.g. stored image path, raw palettes)
+            progress: Optional progress record to write in the same update
+
+        Returns:
+            Updated task data
+
+        Raises:
+            TaskNotFoundError: If task not found
+            TaskError: If update fails
+        """
+        try:
+            masked_task_id = mask_id(task_id)
+            self.logger.debug(f"Saving checkpoints {list(checkpoints.keys())} for task {masked_task_id}")
+
+            update_data: Dict[str, Any] = {
+                "updated_at": datetime.utcnow().isoformat(),
+                "checkpoints": checkpoints,
+            }
+            if progress is not None:
+                update_data["progress"] = progress
+
+            try:
+                service_client = self.client.get_service_role_client()
+                result = service_client.table(self.tasks_table).update(update_data).eq("id", task_id).execute()
+            except Exception as e:
+                self.logger.warning(f"Failed to use service role client: {str(e)}, falling back to regular client")
+                result = self.client.client.table(self.tasks_table).update(update_data).eq("id", task_id).execute()
+
+            if not result.data or len(result.data) == 0:
+                raise TaskNotFoundError(task_id)
+
+            task = cast(Dict[str, Any], result.data[0])
+            if progress is not None:
+                self._publish_change(task)
+            return task
+
+        except TaskNotFoundError:
+            raise
+        except Exception as e:
+            self.logger.error(f"Error saving checkpoints for task {masked_task_id}: {str(e)}")
+            raise TaskError(f"Failed to save task checkpoints: {str(e)}")
+
+    async def release_task_for_retry(self, task_id: str, checkpoints: Dict[str, Any], error_message: Optional[str] = None) -> Dict[str, Any]:
+        """Return a processing task to pending so a redelivered message can claim it again.
+
+        Args:
+            task_id: ID of the task to release
+            checkpoints: Stage checkpoints to keep for the next attempt
+            error_message: Optional error message describing the failed attempt
+
+        Returns:
+            Updated task data
+
+        Raises:
+            TaskNotFoundError: If task not found or no longer processing
+            TaskError: If update fails
+        """
+        try:
+            masked_task_id = mask_id(task_id)
+            self.logger.debug(f"Releasing task {masked_task_id} for retry")
+
+            update_data: Dict[str, Any] = {
+                "updated_at": datetime.utcnow().isoformat(),
+                "status": TASK_STATUS_PENDING,
+                "checkpoints": checkpoints,
+            }
+            if error_message:
+                update_data["error_message"] = "".join(c if c.isprintable() else " " for c in error_message)
+
+            try:
+                service_client = self.client.get_service_role_client()
+                result = service_client.table(self.tasks_table).update(update_data).eq("id", task_id).eq("status", TASK_STATUS_PROCESSING).execute()
+            except Exception as e:
+                self.logger.warning(f"Failed to use service role client: {str(e)}, falling back to regular client")
+                result = self.client.client.table(self.tasks_table).update(update_data).eq("id", task_id).eq("status", TASK_STATUS_PROCESSING).execute()
+
+            if not result.data or len(result.data) == 0:
+                raise TaskNotFoundError(task_id)
+
+            self.logger.info(f"Released task {masked_task_id} back to pending for retry")
+            task = cast(Dict[str, Any], result.data[0])
+            self._publish_change(task)
+            return task
+
+        except TaskNotFoundError:
+            raise
+        except Exception as e:
+            self.logger.error(f"Error releasing task {masked_task_id}: {str(e)}")
+            raise TaskError(f"Failed to release task for retry: {str(e)}")
+
+    async def update_task_progress(self, task_id: str, progress: Dict[str, Any]) -> Dict[str, Any]:
+        """Record the progress of a running task.
+
+        Args:
+            task_id: ID of the task to update
+            progress: Progress record with the current stage, percent complete and
+                partial results (base image URL, finished variations)
+
+        Returns:
+            Updated task data
+
+        Raises:
+            TaskNotFoundError: If task not found
+            TaskError: If update fails
+        """
+        try:
+            masked_task_id = mask_id(task_id)
+            self.logger.debug(f"Updating task {masked_task_id} progress to stage '{progress.get('stage')}' ({progress.get('percent')}%)")
+
+            update_data: Dict[str, Any] = {
+                "updated_at": datetime.utcnow().isoformat(),
+                "progress": progress,
+            }
+
+            try:
+                service_client = self.client.get_service_role_client()
+                result = service_client.table(self.tasks_table).update(update_data).eq("id", task_id).execute()
+            except Exception as e:
+                self.logger.warning(f"Failed to use service role client: {str(e)}, falling back to regular client")
+                result = self.client.client.table(self.tasks_table).update(update_data).eq("id", task_id).execute()
+
+            if not result.data or len(result.data) == 0:
+                raise TaskNotFoundError(task_id)
+
+            task = cast(Dict[str, Any], result.data[0])
+            self._publish_change(task)
+            return task
+
+        except TaskNotFoundError:
+            raise
+        except Exception as e:
+            self.logger.error(f"Error updating progress for task {masked_task_id}: {str(e)}")
+            raise TaskError(f"Failed to update task progress: {str(e)}")
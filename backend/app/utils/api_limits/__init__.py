@@ -1,6 +1,6 @@
 """API rate limiting utilities for the Concept Visualizer API."""
 
 from .decorators import store_rate_limit_info
-from .endpoints import apply_multiple_rate_limits, apply_rate_limit
+from .endpoints import apply_multiple_rate_limits, apply_rate_limit, refund_applied_rate_limits
 
-__all__ = ["apply_rate_limit", "apply_multiple_rate_limits", "store_rate_limit_info"]
+__all__ = ["apply_rate_limit", "apply_multiple_rate_limits", "store_rate_limit_info", "refund_applied_rate_limits"]
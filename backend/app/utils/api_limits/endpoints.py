@@ -10,6 +10,7 @@ from fastapi import HTTPException, Request
 from slowapi.util import get_remote_address
 
 from app.core.config import settings
+from app.utils.security.mask import mask_id
 
 logger = logging.getLogger(__name__)
 
@@ -186,3 +187,53 @@ async def apply_multiple_rate_limits(req: Request, rate_limits: List[Dict[str, s
 
     # All rate limits passed
     return {"enabled": True, "limited": False, "checked_limits": results}
+
+
+def refund_applied_rate_limits(req: Request, user_id: str) -> int:
+    """Refund the rate limits the middleware charged for a request.
+
+    Used when a request turns out not to consume the limited resource, e.g. a
+    task submission rejected with 409 because a task is already in progress.
+
+    Args:
+        req: FastAPI request object
+        user_id: ID of the user the limits were charged to (for logging)
+
+    Returns:
+        Number of limits successfully refunded
+    """
+    applied_limits = getattr(req.state, "applied_rate_limits_for_refund", [])
+    if not applied_limits:
+        logger.debug(f"No applied rate limits found for user {mask_id(user_id)}. No refund attempted.")
+        return 0
+
+    limiter = getattr(req.app.state, "limiter", None)
+    redis_store_instance: Any = None
+    if limiter is not None and hasattr(getattr(limiter, "_storage", None), "decrement_specific_limit"):
+        redis_store_instance = limiter._storage
+    elif limiter is not None and hasattr(limiter, "_redis_client"):
+        from app.core.limiter.redis_store import RedisStore
+
+        redis_store_instance = RedisStore(limiter._redis_client)
+
+    if redis_store_instance is None:
+        logger.error(f"Could not obtain RedisStore instance to refund rate limits for user {mask_id(user_id)}")
+        return 0
+
+    refunded = 0
+    for limit_to_refund in applied_limits:
+        try:
+            if redis_store_instance.decrement_specific_limit(
+                user_id=limit_to_refund["user_id"],
+                endpoint_rule=limit_to_refund["endpoint_rule"],
+                limit_string_rule=limit_to_refund["limit_string_rule"],
+                amount=limit_to_refund["amount"],
+            ):
+                refunded += 1
+                logger.info(f"Refunded rate limit for {limit_to_refund['endpoint_rule']} for user {mask_id(user_id)}")
+            else:
+                logger.warning(f"Failed to refund rate limit for {limit_to_refund['endpoint_rule']} for user {mask_id(user_id)}")
+        except Exception as e:
+            logger.error(f"Error refunding rate limit for {limit_to_refund['endpoint_rule']} (user: {mask_id(user_id)}): {e}")
+
+    return refunded
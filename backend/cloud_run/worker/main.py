@@ -19,15 +19,23 @@ from cloudevents.http import CloudEvent
 from app.core.config import settings
 from app.core.constants import TASK_STATUS_FAILED, TASK_TYPE_GENERATION, TASK_TYPE_REFINEMENT
 from app.core.supabase.client import SupabaseClient
+from app.services.concept.palette_cache import get_palette_cache
 from app.services.concept.service import ConceptService
+from app.services.export.derivatives import DELIVERY_FORMATS, DERIVATIVE_FORMATS, ExportDerivativeRenderer
+from app.services.export.pool import get_export_process_pool
 from app.services.image.processing_service import ImageProcessingService
 from app.services.image.service import ImageService
+from app.services.jigsawstack.circuit import CircuitState, get_circuit_breaker
 from app.services.jigsawstack.client import JigsawStackClient
+from app.services.jigsawstack.coalescing import get_request_coalescer
+from app.services.jigsawstack.governor import get_concurrency_governor
+from app.services.jigsawstack.hedging import get_request_hedger
+from app.services.jigsawstack.retry import deadline_scope, get_retry_engine
 from app.services.persistence.concept_persistence_service import ConceptPersistenceService
 from app.services.persistence.image_persistence_service import ImagePersistenceService
 from app.services.task.service import TaskService
 
-from .processors.base_processor import BaseTaskProcessor
+from .processors.base_processor import BaseTaskProcessor, TaskRetryError
 from .processors.generation_processor import GenerationTaskProcessor
 from .processors.refinement_processor import RefinementTaskProcessor
 
@@ -62,6 +70,9 @@ logger.info(f"Logging configured at level: {log_level_str}")
 # Type for our services dictionary
 ServicesDict = Dict[str, Any]
 
+# JigsawStack endpoint each task type depends on, for the circuit breaker check
+TASK_OPERATIONS = {TASK_TYPE_GENERATION: "generate_image", TASK_TYPE_REFINEMENT: "refine_image"}
+
 # Global service instances
 SERVICES_GLOBAL: Optional[Dict[str, Any]] = None
 
@@ -99,6 +110,11 @@ def initialize_services_with_retry() -> None:
             _jigsawstack_client_global = JigsawStackClient(
                 api_key=os.environ.get("CONCEPT_JIGSAWSTACK_API_KEY", settings.JIGSAWSTACK_API_KEY),
                 api_url=os.environ.get("CONCEPT_JIGSAWSTACK_API_URL", settings.JIGSAWSTACK_API_URL),
+                coalescer=get_request_coalescer(),
+                retry_engine=get_retry_engine(),
+                hedger=get_request_hedger(),
+                circuit_breaker=get_circuit_breaker(),
+                governor=get_concurrency_governor(),
             )
 
             # Initialize concept service
@@ -107,19 +123,34 @@ def initialize_services_with_retry() -> None:
                 image_service=_image_service_global,
                 concept_persistence_service=_concept_persistence_service_global,
                 image_persistence_service=_image_persistence_service_global,
+                palette_cache=get_palette_cache(),
             )
 
             # Initialize task service
             _task_service_global = TaskService(client=_supabase_client_global)
 
+            # Standard export sizes and browser siblings are only pre-rendered when enabled
+            _export_derivative_renderer_global = None
+            prerender_exports = settings.EXPORT_PRERENDER_ENABLED
+            prerender_delivery = settings.IMAGE_DELIVERY_ENABLED
+            if prerender_exports or prerender_delivery:
+                _export_derivative_renderer_global = ExportDerivativeRenderer(
+                    _image_persistence_service_global,
+                    get_export_process_pool(),
+                    formats=DERIVATIVE_FORMATS if prerender_exports else (),
+                    delivery_formats=DELIVERY_FORMATS if prerender_delivery else (),
+                )
+
             SERVICES_GLOBAL = {
                 "image_service": _image_service_global,
                 "concept_service": _concept_service_global,
                 "concept_persistence_service": _concept_persistence_service_global,
                 "image_persistence_service": _image_persistence_service_global,
                 "task_service": _task_service_global,
+                "export_derivative_renderer": _export_derivative_renderer_global,
                 # Add JigsawStack client if needed directly by tasks
                 "jigsawstack_client": _jigsawstack_client_global,
+                "circuit_breaker": _jigsawstack_client_global.circuit_breaker,
             }
             logger.info(f"Global services initialized successfully on attempt {attempt}")
             return
@@ -161,6 +192,30 @@ def http_endpoint(request: Any) -> Dict[str, str]:
     return {"status": "healthy", "message": "Concept worker is ready to process tasks"}
 
 
+async def defer_while_circuit_open(task_id: str, task_type: Optional[str], services: ServicesDict) -> None:
+    """Leave a task pending while the JigsawStack endpoint it needs is failing.
+
+    The task is not claimed, so it does not use up one of its attempts; Pub/Sub
+    redelivers the message after its retry backoff.
+
+    Args:
+        task_id: ID of the task
+        task_type: Type of the task
+        services: The global services dictionary
+
+    Raises:
+        TaskRetryError: If the endpoint's circuit is open
+    """
+    breaker = services.get("circuit_breaker")
+    operation = TASK_OPERATIONS.get(task_type or "")
+    if breaker is None or operation is None:
+        return
+    status = await breaker.status(operation)
+    if status.state == CircuitState.OPEN:
+        logger.warning(f"[TASK {task_id}] JigsawStack {operation} circuit is open, deferring the task")
+        raise TaskRetryError(f"JigsawStack {operation} is unavailable (retry in {status.retry_after}s), task left pending")
+
+
 async def process_pubsub_message(message: Dict[str, Any], services: ServicesDict) -> None:
     """Process a Pub/Sub message.
 
@@ -233,8 +288,13 @@ async def process_pubsub_message(message: Dict[str, Any], services: ServicesDict
     if processor:
         logger.info(f"[TASK {task_id}] Starting processor execution")
         try:
+            await defer_while_circuit_open(task_id, task_type, services)
             await processor.process()
             logger.info(f"[TASK {task_id}] Processor completed successfully")
+        except TaskRetryError as e:
+            logger.warning(f"[TASK {task_id}] Attempt failed, task released for retry: {e}")
+            # Re-raise so Pub/Sub redelivers the message and the next attempt resumes from checkpoints
+            raise
         except Exception as e:
             logger.error(f"[TASK {task_id}] PROCESSOR ERROR: {e}")
             logger.error(f"[TASK {task_id}] Exception type: {type(e).__name__}")
@@ -301,8 +361,16 @@ def handle_pubsub(cloud_event: CloudEvent) -> None:
             logger.info(f"Processing Pub/Sub message - Task ID: {task_id}, Type: {task_type}")
             logger.debug(f"Full message payload: {message_payload}")
 
-            # Process the message
-            await process_pubsub_message(message_payload, SERVICES_GLOBAL)
+            # Process the message; JigsawStack retries stop in time to finish within the function timeout
+            with deadline_scope(settings.WORKER_TASK_DEADLINE_SECONDS):
+                try:
+                    await process_pubsub_message(message_payload, SERVICES_GLOBAL)
+                finally:
+                    # Background palette cache refreshes would be cancelled with this message's
+                    # event loop, whether or not the message succeeded
+                    palette_cache = get_palette_cache()
+                    if palette_cache is not None:
+                        await palette_cache.wait_for_refreshes()
 
             logger.info(f"Successfully completed processing for task {task_id}")
 
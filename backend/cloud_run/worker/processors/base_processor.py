@@ -9,9 +9,20 @@ import traceback
 from abc import ABC, abstractmethod
 from typing import Any, Dict
 
+from app.core.config import settings
 from app.core.constants import TASK_STATUS_COMPLETED, TASK_STATUS_FAILED
 
 
+class TaskRetryError(Exception):
+    """Raised when a failed task was released for another attempt.
+
+    Propagating this error fails the Cloud Function invocation so Pub/Sub
+    redelivers the message; the next attempt resumes from the saved checkpoints.
+    """
+
+    pass
+
+
 class BaseTaskProcessor(ABC):
     """Abstract base class for task processors.
 
@@ -35,10 +46,16 @@ class BaseTaskProcessor(ABC):
         self.logger = logging.getLogger(self.__class__.__name__)  # Processor-specific logger
         self.task_start_time = time.time()
         self.task_service = services["task_service"]
+        # Stage outputs persisted on the task row, loaded when the task is claimed
+        self.checkpoints: Dict[str, Any] = {}
+        # Progress and partial results shown to clients while the task runs
+        self.progress: Dict[str, Any] = {"stage": None, "percent": 0}
 
     async def _claim_task(self) -> bool:
         """Attempt to claim the task for processing.
 
+        Also loads the checkpoints left by earlier attempts and counts this attempt.
+
         Returns:
             bool: True if the task was successfully claimed, False otherwise
         """
@@ -47,8 +64,80 @@ class BaseTaskProcessor(ABC):
             self.logger.info(f"Task {self.task_id} could not be claimed. Skipping.")
             return False
         self.logger.info(f"[WORKER_TIMING] Task {self.task_id}: Claimed and marked as PROCESSING at {time.time():.2f} ({(time.time() - self.task_start_time):.2f}s elapsed)")
+
+        self.checkpoints = dict(claimed_task.get("checkpoints") or {})
+        self.checkpoints["attempts"] = int(self.checkpoints.get("attempts", 0)) + 1
+        completed_stages = [key for key in self.checkpoints if key != "attempts"]
+        if completed_stages:
+            self.logger.info(f"Task {self.task_id}: Resuming attempt {self.checkpoints['attempts']} with completed stages: {completed_stages}")
         return True
 
+    async def _save_checkpoint(self, **stage_outputs: Any) -> None:
+        """Record completed stage outputs on the task.
+
+        The current progress is written in the same update. A failed write is
+        logged and ignored; the stage will simply be redone on retry.
+
+        Args:
+            **stage_outputs: JSON-serializable outputs keyed by checkpoint name
+        """
+        self.checkpoints.update(stage_outputs)
+        try:
+            await self.task_service.save_task_checkpoints(task_id=self.task_id, checkpoints=self.checkpoints, progress=self.progress)
+            self.logger.debug(f"Task {self.task_id}: Saved checkpoints {list(stage_outputs.keys())}")
+        except Exception as checkpoint_err:
+            self.logger.warning(f"Task {self.task_id}: Error saving checkpoints {list(stage_outputs.keys())}: {str(checkpoint_err)}")
+
+    def _set_progress(self, stage: str, percent: int, **partial_results: Any) -> None:
+        """Update the in-memory progress without writing it.
+
+        Args:
+            stage: Name of the stage now running
+            percent: Estimated completion percentage
+            **partial_results: Partial results to expose (e.g. image_url, variations)
+        """
+        self.progress.update(partial_results)
+        self.progress["stage"] = stage
+        self.progress["percent"] = max(0, min(100, int(percent)))
+
+    async def _report_progress(self, stage: str, percent: int, **partial_results: Any) -> None:
+        """Update the progress and write it to the task.
+
+        Progress is informational, so a failed write is logged and ignored.
+
+        Args:
+            stage: Name of the stage now running
+            percent: Estimated completion percentage
+            **partial_results: Partial results to expose (e.g. image_url, variations)
+        """
+        self._set_progress(stage, percent, **partial_results)
+        try:
+            await self.task_service.update_task_progress(task_id=self.task_id, progress=self.progress)
+        except Exception as progress_err:
+            self.logger.warning(f"Task {self.task_id}: Error updating progress to '{stage}': {str(progress_err)}")
+
+    async def _handle_failure(self, error_message: str) -> None:
+        """Release the task for another attempt, or mark it failed once attempts run out.
+
+        Args:
+            error_message: The error message describing why the attempt failed
+
+        Raises:
+            TaskRetryError: If the task was released for another attempt
+        """
+        attempt = int(self.checkpoints.get("attempts", 1))
+        if attempt < settings.TASK_MAX_ATTEMPTS:
+            try:
+                await self.task_service.release_task_for_retry(task_id=self.task_id, checkpoints=self.checkpoints, error_message=error_message[:1000])
+            except Exception as release_err:
+                self.logger.error(f"Task {self.task_id}: Error releasing task for retry: {str(release_err)}")
+                await self._update_task_failed(error_message)
+                return
+            self.logger.warning(f"Task {self.task_id}: Attempt {attempt}/{settings.TASK_MAX_ATTEMPTS} failed, released for retry: {error_message}")
+            raise TaskRetryError(error_message)
+
+        await self._update_task_failed(error_message)
+
     async def _update_task_failed(self, error_message: str) -> None:
         """Update task status to failed.
 
@@ -5,17 +5,28 @@ This module provides the task processor for concept generation tasks.
 
 import asyncio
 import time
-from typing import Any, Dict, List
+from typing import Any, Awaitable, Dict, List, Optional, Tuple
 
 import httpx
 
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.services.image.harmony import generate_palettes_from_image
 from app.services.jigsawstack.client import JigsawStackError
 
 from ..stages.concept_storage import store_base_image, store_concept
+from ..stages.export_prerender import prerender_exports
 from ..stages.image_preparation import prepare_image_data_from_response
 from ..stages.palette_generation import create_palette_variations, generate_palettes_for_concept
 from .base_processor import BaseTaskProcessor
 
+# Percent complete reported when each stage starts; variations fill the span in between
+GENERATING_IMAGE_PERCENT = 5
+GENERATING_PALETTES_PERCENT = 30
+VARIATIONS_START_PERCENT = 40
+VARIATIONS_PERCENT_SPAN = 50
+STORING_CONCEPT_PERCENT = 95
+
 
 class GenerationTaskProcessor(BaseTaskProcessor):
     """Task processor for concept generation tasks."""
@@ -41,6 +52,8 @@ class GenerationTaskProcessor(BaseTaskProcessor):
         self.image_service = services["image_service"]
         self.image_persistence_service = services["image_persistence_service"]
         self.concept_persistence_service = services["concept_persistence_service"]
+        # Only present when export pre-rendering is enabled
+        self.export_derivative_renderer = services.get("export_derivative_renderer")
 
     async def _generate_base_image(self) -> Dict[str, Any]:
         """Generate the base concept with image.
@@ -85,12 +98,12 @@ class GenerationTaskProcessor(BaseTaskProcessor):
         # Extract the image URL and image data
         image_url = concept_response.get("image_url")
 
-        # Check for valid image_url
-        if not image_url:
-            self.logger.error(f"Failed to get image_url from concept_response: {concept_response}")
+        # Check for a valid image_url, or the image itself when the API returned its bytes
+        if not image_url and not concept_response.get("image_data"):
+            self.logger.error(f"Failed to get image_url from concept_response: {list(concept_response.keys())}")
             raise Exception("Failed to generate base concept: missing image_url in response")
 
-        self.logger.debug(f"Generated base concept with image URL: {image_url}")
+        self.logger.debug(f"Generated base concept with image URL: {image_url or 'none, image in memory'}")
         return dict(concept_response)
 
     async def _store_base_image(self, image_data: bytes) -> tuple:
@@ -114,9 +127,15 @@ class GenerationTaskProcessor(BaseTaskProcessor):
             image_persistence_service=self.image_persistence_service,
         )
 
-    async def _generate_palettes_from_api(self) -> List[Dict[str, Any]]:
+    async def _generate_palettes_from_api(self, image_data: Optional[bytes] = None, local_palettes: Optional[Awaitable[Optional[List[Dict[str, Any]]]]] = None) -> List[Dict[str, Any]]:
         """Generate color palettes for the concept.
 
+        Args:
+            image_data: Base image data, if in memory, for locally derived
+                palettes when the API is slow or unavailable
+            local_palettes: Preview palettes being derived from the base image,
+                used as those local palettes instead of deriving them again
+
         Returns:
             List of color palette dictionaries
 
@@ -124,12 +143,43 @@ class GenerationTaskProcessor(BaseTaskProcessor):
             Exception: If palette generation fails
         """
         return await generate_palettes_for_concept(
-            task_id=self.task_id, theme_desc=self.theme_description, logo_desc=self.logo_description, num=self.num_palettes, concept_service=self.concept_service
+            task_id=self.task_id,
+            theme_desc=self.theme_description,
+            logo_desc=self.logo_description,
+            num=self.num_palettes,
+            concept_service=self.concept_service,
+            base_image=image_data,
+            local_palettes=local_palettes,
         )
 
+    async def _preview_palettes(self, image_data: bytes) -> Optional[List[Dict[str, Any]]]:
+        """Derive palettes locally from the base image and show them until the generated ones are ready.
+
+        Runs alongside palette generation, so the preview is published as soon
+        as it is derived unless the generated palettes came first.
+
+        Args:
+            image_data: Base image data as bytes
+
+        Returns:
+            The preview palettes, or None if they could not be derived
+        """
+        try:
+            palettes = await generate_palettes_from_image(image_data, self.num_palettes, f"{self.logo_description} {self.theme_description}")
+        except Exception as e:
+            self.logger.warning(f"Task {self.task_id}: Error deriving preview palettes: {e}")
+            return None
+        metrics.increment("palettes.preview")
+        if "raw_palettes" not in self.checkpoints:
+            await self._report_progress("generating_palettes", GENERATING_PALETTES_PERCENT, preview_palettes=palettes)
+        return palettes
+
     async def _create_variations(self, image_data: bytes, palettes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Create palette variations for the concept.
 
+        Variations stored by an earlier attempt are reused, and each new one is
+        checkpointed as soon as it is stored.
+
         Args:
             image_data: Image data as bytes
             palettes: List of color palettes
@@ -140,7 +190,64 @@ class GenerationTaskProcessor(BaseTaskProcessor):
         Raises:
             Exception: If creation of variations fails
         """
-        return await create_palette_variations(task_id=self.task_id, image_data=image_data, palettes=palettes, user_id=self.user_id, image_service=self.image_service)
+        completed_variations: Dict[str, Dict[str, Any]] = dict(self.checkpoints.get("variations") or {})
+        total = max(len(palettes), 1)
+        await self._report_progress(
+            "creating_variations", VARIATIONS_START_PERCENT + VARIATIONS_PERCENT_SPAN * len(completed_variations) // total, variations=self._variation_progress(completed_variations)
+        )
+
+        async def _checkpoint_variation(palette_idx: int, variation: Dict[str, Any]) -> None:
+            # Publish each variation as soon as it is stored so clients can show it early
+            completed_variations[str(palette_idx)] = variation
+            self._set_progress(
+                "creating_variations", VARIATIONS_START_PERCENT + VARIATIONS_PERCENT_SPAN * len(completed_variations) // total, variations=self._variation_progress(completed_variations)
+            )
+            await self._save_checkpoint(variations=dict(completed_variations))
+
+        return await create_palette_variations(
+            task_id=self.task_id,
+            image_data=image_data,
+            palettes=palettes,
+            user_id=self.user_id,
+            image_service=self.image_service,
+            completed_variations=completed_variations,
+            on_variation_created=_checkpoint_variation,
+            on_variation_image=self._prerender_variation_exports if self.export_derivative_renderer else None,
+        )
+
+    async def _prerender_variation_exports(self, image_data: bytes, variation: Dict[str, Any]) -> Dict[str, Any]:
+        """Pre-render the standard export sizes of a stored variation.
+
+        Args:
+            image_data: Variation image data as bytes
+            variation: The stored variation
+
+        Returns:
+            Fields to add to the variation
+        """
+        derivatives = await prerender_exports(self.task_id, image_data, variation["image_path"], self.user_id, self.export_derivative_renderer, is_palette=True)
+        return {"export_derivatives": derivatives} if derivatives else {}
+
+    @staticmethod
+    def _variation_progress(completed_variations: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Build the progress entries for the variations finished so far.
+
+        Args:
+            completed_variations: Stored variations keyed by palette index
+
+        Returns:
+            List of variation summaries in palette order
+        """
+        return [
+            {
+                "index": int(key),
+                "name": variation.get("name"),
+                "colors": variation.get("colors") or [],
+                "image_path": variation.get("image_path"),
+                "image_url": variation.get("image_url"),
+            }
+            for key, variation in sorted(completed_variations.items(), key=lambda item: int(item[0]))
+        ]
 
     async def _store_final_concept(self, image_path: str, image_url: str, variations: List[Dict[str, Any]]) -> str:
         """Store the final concept in the database.
@@ -148,7 +255,7 @@ class GenerationTaskProcessor(BaseTaskProcessor):
         Args:
             image_path: Path to the stored image
             image_url: URL of the stored image
-            variations: List of palette variations with URLs
+            variations: List of palette variations with URLs (and their pre-rendered exports)
 
         Returns:
             Concept ID
@@ -166,63 +273,163 @@ class GenerationTaskProcessor(BaseTaskProcessor):
             color_palettes=variations,
             is_anonymous=self.is_anonymous,
             concept_persistence_service=self.concept_persistence_service,
+            export_derivatives=self.checkpoints.get("export_derivatives"),
         )
 
-    async def process(self) -> None:
-        """Process the generation task."""
-        self.logger.info(f"Processing generation task {self.task_id}")
+    async def _store_base_image_stage(self, image_data: bytes) -> Tuple[str, str]:
+        """Store the base image and checkpoint its location.
 
-        # Attempt to claim the task
-        if not await self._claim_task():
-            return
+        Args:
+            image_data: Image data as bytes
 
-        try:
-            # Generate the base concept
-            concept_response = await self._generate_base_image()
+        Returns:
+            Tuple containing image path and URL
+        """
+        image_path, image_url = await self._store_base_image(image_data)
+        # Expose the base image while palettes and variations are still being produced
+        self.progress["image_url"] = image_url
+        await self._save_checkpoint(image_path=image_path, image_url=image_url)
+
+        # Runs while the palettes are still being generated
+        if self.export_derivative_renderer:
+            derivatives = await prerender_exports(self.task_id, image_data, image_path, self.user_id, self.export_derivative_renderer)
+            if derivatives:
+                await self._save_checkpoint(export_derivatives=derivatives)
+        return image_path, image_url
 
-            # Prepare the image data
-            image_data = await prepare_image_data_from_response(self.task_id, concept_response)
+    async def _generate_palettes_stage(self, image_data: Optional[bytes] = None, local_palettes: Optional[Awaitable[Optional[List[Dict[str, Any]]]]] = None) -> List[Dict[str, Any]]:
+        """Generate color palettes and checkpoint them.
 
-            # Concurrently store base image and generate palettes
-            self.logger.info(f"[WORKER_TIMING] Task {self.task_id}: Starting concurrent base image storage and palette generation")
-            concurrent_ops_start_time = time.time()
+        Args:
+            image_data: Base image data, if in memory
+            local_palettes: Preview palettes being derived, used as the local fallback
 
-            store_base_task = asyncio.create_task(self._store_base_image(image_data))
-            generate_palettes_task = asyncio.create_task(self._generate_palettes_from_api())
+        Returns:
+            List of color palette dictionaries
+        """
+        raw_palettes = await self._generate_palettes_from_api(image_data, local_palettes)
+        await self._save_checkpoint(raw_palettes=raw_palettes)
+        return raw_palettes
 
-            # Await both tasks and handle potential exceptions
-            results = await asyncio.gather(store_base_task, generate_palettes_task, return_exceptions=True)
+    @staticmethod
+    async def _from_checkpoint(value: Any) -> Any:
+        """Return a checkpointed stage output in place of running the stage.
 
-            # Unpack results and check for errors
-            store_img_result, raw_palettes_result = results
+        Args:
+            value: Output saved by an earlier attempt
 
-            concurrent_ops_end_time = time.time()
-            self.logger.info(
-                f"[WORKER_TIMING] Task {self.task_id}: Concurrent image store & palette generation finished at {concurrent_ops_end_time:.2f} (Duration: {(concurrent_ops_end_time - concurrent_ops_start_time):.2f}s)"
-            )
+        Returns:
+            The same value
+        """
+        return value
 
-            if isinstance(store_img_result, Exception):
-                self.logger.error(f"Task {self.task_id}: Error during concurrent base image storage: {store_img_result}")
-                raise Exception(f"Storing base image failed: {store_img_result}")
+    async def _load_base_image(self, image_path: str) -> bytes:
+        """Load the base image stored by an earlier attempt.
 
-            image_path, stored_image_url = store_img_result
-            self.logger.info(f"Task {self.task_id}: Base image stored at path: {image_path}")
+        Args:
+            image_path: Storage path of the base image
 
-            if isinstance(raw_palettes_result, Exception):
-                self.logger.error(f"Task {self.task_id}: Error during concurrent palette generation: {raw_palettes_result}")
-                raise Exception(f"Failed to generate color palettes: {raw_palettes_result}")
+        Returns:
+            bytes: The image data
 
-            raw_palettes = raw_palettes_result
+        Raises:
+            Exception: If the image cannot be loaded
+        """
+        try:
+            return bytes(await self.image_persistence_service.get_image(image_path))
+        except Exception as e:
+            raise Exception(f"Loading checkpointed base image failed: {e}")
 
-            # Create palette variations with the image
-            variations = await self._create_variations(image_data, raw_palettes)
+    async def process(self) -> None:
+        """Process the generation task.
 
-            # Store the final concept
-            concept_id = await self._store_final_concept(image_path, stored_image_url, variations)
+        Stages completed by an earlier attempt (base image, palettes, variations,
+        concept record) are read back from the task checkpoints instead of being redone.
+        """
+        self.logger.info(f"Processing generation task {self.task_id}")
+
+        # Attempt to claim the task
+        if not await self._claim_task():
+            return
+
+        try:
+            concept_id = self.checkpoints.get("concept_id")
+            if not concept_id:
+                image_path = self.checkpoints.get("image_path")
+                stored_image_url = self.checkpoints.get("image_url")
+                raw_palettes = self.checkpoints.get("raw_palettes")
+                image_data = None
+
+                if not image_path:
+                    # Generate the base concept
+                    await self._report_progress("generating_image", GENERATING_IMAGE_PERCENT)
+                    concept_response = await self._generate_base_image()
+
+                    # Prepare the image data
+                    image_data = await prepare_image_data_from_response(self.task_id, concept_response)
+
+                # Concurrently store base image and generate palettes, skipping checkpointed stages
+                if image_data is not None or raw_palettes is None:
+                    await self._report_progress("generating_palettes", GENERATING_PALETTES_PERCENT, image_url=stored_image_url)
+                self.logger.info(f"[WORKER_TIMING] Task {self.task_id}: Starting concurrent base image storage and palette generation")
+                concurrent_ops_start_time = time.time()
+
+                # Locally derived palettes, shown until the generated ones are ready and used as their fallback
+                preview_task = None
+                if image_data is not None and raw_palettes is None and settings.PALETTE_PREVIEW_ENABLED:
+                    preview_task = asyncio.create_task(self._preview_palettes(image_data))
+
+                if image_data is not None:
+                    store_base_task = asyncio.create_task(self._store_base_image_stage(image_data))
+                else:
+                    store_base_task = asyncio.create_task(self._from_checkpoint((image_path, stored_image_url)))
+                if raw_palettes is None:
+                    generate_palettes_task = asyncio.create_task(self._generate_palettes_stage(image_data, preview_task))
+                else:
+                    generate_palettes_task = asyncio.create_task(self._from_checkpoint(raw_palettes))
+
+                # Await both tasks and handle potential exceptions
+                results = await asyncio.gather(store_base_task, generate_palettes_task, return_exceptions=True)
+
+                # A preview still being derived is no longer needed
+                if preview_task is not None:
+                    preview_task.cancel()
+                    await asyncio.gather(preview_task, return_exceptions=True)
+
+                # Unpack results and check for errors
+                store_img_result, raw_palettes_result = results
+
+                concurrent_ops_end_time = time.time()
+                self.logger.info(
+                    f"[WORKER_TIMING] Task {self.task_id}: Concurrent image store & palette generation finished at {concurrent_ops_end_time:.2f} (Duration: {(concurrent_ops_end_time - concurrent_ops_start_time):.2f}s)"
+                )
+
+                if isinstance(store_img_result, Exception):
+                    self.logger.error(f"Task {self.task_id}: Error during concurrent base image storage: {store_img_result}")
+                    raise Exception(f"Storing base image failed: {store_img_result}")
+
+                image_path, stored_image_url = store_img_result
+                self.logger.info(f"Task {self.task_id}: Base image stored at path: {image_path}")
+
+                if isinstance(raw_palettes_result, Exception):
+                    self.logger.error(f"Task {self.task_id}: Error during concurrent palette generation: {raw_palettes_result}")
+                    raise Exception(f"Failed to generate color palettes: {raw_palettes_result}")
+
+                raw_palettes = raw_palettes_result
+
+                # Create palette variations with the image
+                if image_data is None and len(self.checkpoints.get("variations") or {}) < len(raw_palettes):
+                    image_data = await self._load_base_image(image_path)
+                variations = await self._create_variations(image_data or b"", raw_palettes)
+
+                # Store the final concept
+                await self._report_progress("storing_concept", STORING_CONCEPT_PERCENT)
+                concept_id = await self._store_final_concept(image_path, stored_image_url, variations)
+                await self._save_checkpoint(concept_id=concept_id)
 
             # Update task status to completed
             await self._update_task_completed(concept_id)
 
         except Exception as e:
-            # Update task status to failed
-            await self._update_task_failed(f"Error in generation task processing: {str(e)}")
+            # Release the task for a resumed attempt, or mark it failed
+            await self._handle_failure(f"Error in generation task processing: {str(e)}")
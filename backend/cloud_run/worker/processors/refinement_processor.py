@@ -5,9 +5,14 @@ This module provides the task processor for concept refinement tasks.
 
 from typing import Any, Dict
 
+from ..stages.export_prerender import prerender_exports
 from ..stages.refinement import download_original_image, refine_concept_image, store_refined_concept, store_refined_image
 from .base_processor import BaseTaskProcessor
 
+# Percent complete reported when each stage starts
+REFINING_IMAGE_PERCENT = 10
+STORING_CONCEPT_PERCENT = 90
+
 
 class RefinementTaskProcessor(BaseTaskProcessor):
     """Task processor for concept refinement tasks."""
@@ -33,6 +38,8 @@ class RefinementTaskProcessor(BaseTaskProcessor):
         self.image_service = services["image_service"]
         self.image_persistence_service = services["image_persistence_service"]
         self.concept_persistence_service = services["concept_persistence_service"]
+        # Only present when export pre-rendering is enabled
+        self.export_derivative_renderer = services.get("export_derivative_renderer")
 
     async def _download_original(self) -> bytes:
         """Download the original image for refinement.
@@ -108,10 +115,15 @@ class RefinementTaskProcessor(BaseTaskProcessor):
             refined_image_url=refined_image_url,
             original_image_url=self.original_image_url,
             concept_persistence_service=self.concept_persistence_service,
+            export_derivatives=self.checkpoints.get("export_derivatives"),
         )
 
     async def process(self) -> None:
-        """Process the refinement task."""
+        """Process the refinement task.
+
+        A refined image or concept record stored by an earlier attempt is read back
+        from the task checkpoints instead of being produced again.
+        """
         self.logger.info(f"Processing refinement task {self.task_id}")
 
         # Attempt to claim the task
@@ -119,19 +131,34 @@ class RefinementTaskProcessor(BaseTaskProcessor):
             return
 
         try:
-            # Refine the image
-            refined_image_data = await self._refine_image()
-
-            # Store the refined image
-            refined_image_path, refined_image_url = await self._store_refined_image(refined_image_data)
-            self.logger.info(f"Task {self.task_id}: Refined image stored at path: {refined_image_path}")
-
-            # Store the refined concept data
-            concept_id = await self._store_refined_concept_data(refined_image_path, refined_image_url)
+            concept_id = self.checkpoints.get("concept_id")
+            if not concept_id:
+                refined_image_path = self.checkpoints.get("refined_image_path")
+                refined_image_url = self.checkpoints.get("refined_image_url")
+
+                if not refined_image_path:
+                    # Refine the image
+                    await self._report_progress("refining_image", REFINING_IMAGE_PERCENT)
+                    refined_image_data = await self._refine_image()
+
+                    # Store the refined image
+                    refined_image_path, refined_image_url = await self._store_refined_image(refined_image_data)
+                    await self._save_checkpoint(refined_image_path=refined_image_path, refined_image_url=refined_image_url)
+
+                    if self.export_derivative_renderer:
+                        derivatives = await prerender_exports(self.task_id, refined_image_data, refined_image_path, self.user_id, self.export_derivative_renderer)
+                        if derivatives:
+                            await self._save_checkpoint(export_derivatives=derivatives)
+                self.logger.info(f"Task {self.task_id}: Refined image stored at path: {refined_image_path}")
+
+                # Store the refined concept data
+                await self._report_progress("storing_concept", STORING_CONCEPT_PERCENT, image_url=refined_image_url)
+                concept_id = await self._store_refined_concept_data(refined_image_path, refined_image_url)
+                await self._save_checkpoint(concept_id=concept_id)
 
             # Update task status to completed
             await self._update_task_completed(concept_id)
 
         except Exception as e:
-            # Update task status to failed
-            await self._update_task_failed(f"Error in refinement task processing: {str(e)}")
+            # Release the task for a resumed attempt, or mark it failed
+            await self._handle_failure(f"Error in refinement task processing: {str(e)}")
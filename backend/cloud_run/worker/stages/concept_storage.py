@@ -5,7 +5,7 @@ This module provides functions for storing concepts in the database.
 
 import logging
 import time
-from typing import Any, Dict, List, Tuple, cast
+from typing import Any, Dict, List, Optional, Tuple, cast
 
 
 async def store_base_image(task_id: str, image_data: bytes, user_id: str, logo_description: str, theme_description: str, image_persistence_service: Any) -> Tuple[str, str]:
@@ -70,6 +70,7 @@ async def store_concept(
     color_palettes: List[Dict[str, Any]],
     is_anonymous: bool,
     concept_persistence_service: Any,
+    export_derivatives: Optional[Dict[str, Dict[str, Any]]] = None,
 ) -> str:
     """Store concept data in the database.
 
@@ -83,6 +84,7 @@ async def store_concept(
         color_palettes: List of color palettes with variation URLs
         is_anonymous: Whether the concept is anonymous
         concept_persistence_service: ConceptPersistenceService instance
+        export_derivatives: Optional record of the base image's pre-rendered exports
 
     Returns:
         Concept ID
@@ -106,6 +108,7 @@ async def store_concept(
                 "color_palettes": color_palettes,
                 "is_anonymous": is_anonymous,
                 "task_id": task_id,  # Link concept to task
+                "export_derivatives": export_derivatives or {},
             }
         )
 
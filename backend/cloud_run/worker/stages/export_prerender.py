@@ -0,0 +1,40 @@
+"""Export pre-render stage for concept generation and refinement tasks.
+
+This module provides the stage that renders the standard export sizes of a
+newly stored image, so later exports of those sizes are a storage read.
+"""
+
+import logging
+import time
+from typing import Any, Dict
+
+
+async def prerender_exports(task_id: str, image_data: bytes, image_path: str, user_id: str, renderer: Any, is_palette: bool = False) -> Dict[str, Dict[str, Any]]:
+    """Render and store the standard export derivatives of an image.
+
+    The stage is best effort: exports of an image without derivatives are
+    rendered on demand, so a failure is logged and an empty record returned.
+
+    Args:
+        task_id: The ID of the task
+        image_data: Image data as bytes
+        image_path: Storage path of the image
+        user_id: User ID
+        renderer: ExportDerivativeRenderer instance
+        is_palette: Whether the image is a palette variation
+
+    Returns:
+        Record of the stored derivatives by key, empty if rendering failed
+    """
+    logger = logging.getLogger("export_prerender")
+
+    prerender_start = time.time()
+    try:
+        derivatives: Dict[str, Dict[str, Any]] = await renderer.prerender(image_data, image_path, user_id, is_palette=is_palette)
+    except Exception as e:
+        logger.warning(f"Task {task_id}: Pre-rendering exports failed, they will be rendered on demand: {e}")
+        return {}
+
+    prerender_end = time.time()
+    logger.info(f"[WORKER_TIMING] Task {task_id}: Pre-rendered {len(derivatives)} exports at {prerender_end:.2f} (Duration: {(prerender_end - prerender_start):.2f}s)")
+    return derivatives
@@ -5,12 +5,20 @@ This module provides functions for generating color palettes for concepts.
 
 import logging
 import time
-from typing import Any, Dict, List, cast
+from typing import Any, Awaitable, Callable, Dict, List, Optional, cast
 
 from app.services.jigsawstack.client import JigsawStackError
 
 
-async def generate_palettes_for_concept(task_id: str, theme_desc: str, logo_desc: str, num: int, concept_service: Any) -> List[Dict[str, Any]]:
+async def generate_palettes_for_concept(
+    task_id: str,
+    theme_desc: str,
+    logo_desc: str,
+    num: int,
+    concept_service: Any,
+    base_image: Optional[bytes] = None,
+    local_palettes: Optional[Awaitable[Optional[List[Dict[str, Any]]]]] = None,
+) -> List[Dict[str, Any]]:
     """Generate color palettes for a concept.
 
     Args:
@@ -19,6 +27,10 @@ async def generate_palettes_for_concept(task_id: str, theme_desc: str, logo_desc
         logo_desc: Logo description for palette generation
         num: Number of palettes to generate
         concept_service: ConceptService instance
+        base_image: Optional base image data, for locally derived palettes
+            when the API is slow or unavailable
+        local_palettes: Optional palettes already being derived from the base
+            image, used as those local palettes instead of deriving them again
 
     Returns:
         List of color palette dictionaries
@@ -35,6 +47,8 @@ async def generate_palettes_for_concept(task_id: str, theme_desc: str, logo_desc
             theme_description=theme_desc,
             logo_description=logo_desc,
             num_palettes=num,
+            base_image=base_image,
+            local_palettes=local_palettes,
         )
     except JigsawStackError as jse:
         logger.error(f"Task {task_id}: JigsawStack API error generating palettes: {jse}")
@@ -60,6 +74,9 @@ async def create_palette_variations(
     palettes: List[Dict[str, Any]],
     user_id: str,
     image_service: Any,
+    completed_variations: Optional[Dict[str, Dict[str, Any]]] = None,
+    on_variation_created: Optional[Callable[[int, Dict[str, Any]], Awaitable[None]]] = None,
+    on_variation_image: Optional[Callable[[bytes, Dict[str, Any]], Awaitable[Dict[str, Any]]]] = None,
 ) -> List[Dict[str, Any]]:
     """Create image variations using the given palettes.
 
@@ -69,27 +86,46 @@ async def create_palette_variations(
         palettes: List of color palettes
         user_id: User ID
         image_service: ImageService instance
+        completed_variations: Variations stored by an earlier attempt, keyed by palette index
+        on_variation_created: Optional coroutine called with (palette index, variation)
+            for each newly stored variation
+        on_variation_image: Optional coroutine called with (variation image bytes, variation);
+            the fields it returns are added to the variation
 
     Returns:
-        List of palette variations with URLs
+        List of palette variations with URLs, in palette order
 
     Raises:
         Exception: If creation of variations fails
     """
     logger = logging.getLogger("variation_creator")
 
+    completed = dict(completed_variations or {})
+    pending_indices = [idx for idx in range(len(palettes)) if str(idx) not in completed]
+
     variation_start = time.time()
-    logger.info(f"Task {task_id}: Creating {len(palettes)} palette variations")
+    logger.info(f"Task {task_id}: Creating {len(pending_indices)} palette variations ({len(completed)} already stored)")
 
-    try:
-        # Use the create_palette_variations method from ImageService
-        palette_variations = await image_service.create_palette_variations(
-            base_image_data=image_data,
-            palettes=palettes,
-            user_id=user_id,
-            blend_strength=0.75,
-        )
+    async def _record_variation(local_idx: int, variation: Dict[str, Any]) -> None:
+        # ImageService reports indices into the pending list; map back to the palette index
+        palette_idx = pending_indices[local_idx]
+        completed[str(palette_idx)] = variation
+        if on_variation_created is not None:
+            await on_variation_created(palette_idx, variation)
 
+    try:
+        if pending_indices:
+            # Use the create_palette_variations method from ImageService
+            await image_service.create_palette_variations(
+                base_image_data=image_data,
+                palettes=[palettes[idx] for idx in pending_indices],
+                user_id=user_id,
+                blend_strength=0.75,
+                on_variation_created=_record_variation,
+                on_variation_image=on_variation_image,
+            )
+
+        palette_variations = [completed[key] for key in sorted(completed, key=int)]
         if not palette_variations:
             raise Exception("Failed to create any palette variations")
 
@@ -5,7 +5,7 @@ This module provides functions for refining concept images.
 
 import logging
 import time
-from typing import Any, Tuple, cast
+from typing import Any, Dict, Optional, Tuple, cast
 
 import httpx
 
@@ -183,6 +183,7 @@ async def store_refined_concept(
     refined_image_url: str,
     original_image_url: str,
     concept_persistence_service: Any,
+    export_derivatives: Optional[Dict[str, Dict[str, Any]]] = None,
 ) -> str:
     """Store refined concept data in the database.
 
@@ -196,6 +197,7 @@ async def store_refined_concept(
         refined_image_url: URL of the stored refined image
         original_image_url: URL of the original image
         concept_persistence_service: ConceptPersistenceService instance
+        export_derivatives: Optional record of the refined image's pre-rendered exports
 
     Returns:
         Concept ID
@@ -221,6 +223,7 @@ async def store_refined_concept(
                 "refinement_prompt": refinement_prompt,
                 "original_image_url": original_image_url,
                 "task_id": task_id,  # Link concept to task
+                "export_derivatives": export_derivatives or {},
             }
         )
 
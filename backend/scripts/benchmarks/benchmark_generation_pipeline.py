@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+"""Generation pipeline benchmark for the Concept Visualizer backend.
+
+This script runs concept generations (image, palettes and palette variations
+through ConceptService.generate_concept_with_palettes) against the local
+JigsawStack emulator, with the given concurrency and emulated API latency
+and errors, and reports throughput, latency percentiles and failures.
+Persistence is mocked; only the API calls and image processing are real.
+
+The emulator is started on a free local port unless --url points at one
+already running (e.g. with other latency or fault settings).
+"""
+
+import argparse
+import asyncio
+import socket
+import statistics
+import threading
+import time
+from typing import List, Optional, Tuple
+from unittest.mock import MagicMock
+
+import uvicorn
+from jigsawstack_emulator import EmulatorConfig, EndpointBehavior, LatencyProfile, create_emulator_app
+
+from app.services.concept.service import ConceptService
+from app.services.image.processing_service import ImageProcessingService
+from app.services.image.service import ImageService
+from app.services.jigsawstack.client import JigsawStackClient
+
+
+def start_emulator(config: EmulatorConfig) -> Tuple[str, uvicorn.Server]:
+    """Serve the emulator on a free local port in a background thread.
+
+    Args:
+        config: Emulator configuration
+
+    Returns:
+        The emulator's URL and server, to stop it with should_exit
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(create_emulator_app(config), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}", server
+
+
+def make_service(api_url: str) -> ConceptService:
+    """Create a concept service calling the API at a URL, with mocked persistence."""
+    client = JigsawStackClient(api_key="benchmark", api_url=api_url)
+    image_service = ImageService(persistence_service=MagicMock(), processing_service=ImageProcessingService())
+    return ConceptService(client, image_service, MagicMock(), MagicMock())
+
+
+async def run(service: ConceptService, tasks: int, concurrency: int, palettes: int) -> Tuple[List[float], int, float]:
+    """Run generations with bounded concurrency.
+
+    Args:
+        service: Concept service to generate with
+        tasks: Number of generations
+        concurrency: Generations in flight at once
+        palettes: Palettes per generation
+
+    Returns:
+        Durations of the successful generations, number of failures and wall time in seconds
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    durations: List[float] = []
+    failures = 0
+
+    async def generate(number: int) -> None:
+        nonlocal failures
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await service.generate_concept_with_palettes(f"Benchmark logo {number}", "Warm autumn colors", num_palettes=palettes)
+                durations.append(time.perf_counter() - started)
+            except Exception:
+                failures += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(generate(number) for number in range(tasks)))
+    return durations, failures, time.perf_counter() - started
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Benchmark the generation pipeline against the JigsawStack emulator")
+    parser.add_argument("--tasks", type=int, default=50, help="Number of generations")
+    parser.add_argument("--concurrency", type=int, default=10, help="Generations in flight at once")
+    parser.add_argument("--palettes", type=int, default=3, help="Palettes per generation")
+    parser.add_argument("--mode", choices=["binary", "url"], default="binary", help="How the emulator returns generated images")
+    parser.add_argument("--image-size", type=int, default=512, help="Width and height of the emulated images")
+    parser.add_argument("--median", type=float, default=2.0, help="Median image generation latency in seconds")
+    parser.add_argument("--p95", type=float, default=6.0, help="95th percentile image generation latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of API requests failing with 429/500/503")
+    parser.add_argument("--url", help="URL of an emulator already running, instead of starting one")
+    return parser.parse_args()
+
+
+def main() -> int:
+    """Run the benchmark and print throughput and latency."""
+    args = parse_args()
+    server: Optional[uvicorn.Server] = None
+    api_url = args.url
+    if not api_url:
+        image = EndpointBehavior(latency=LatencyProfile(args.median, args.p95), error_rate=args.error_rate)
+        text = EndpointBehavior(latency=LatencyProfile(args.median / 4, args.p95 / 4), error_rate=args.error_rate)
+        config = EmulatorConfig(image_mode=args.mode, image_size=args.image_size, endpoints={"image_generation": image, "image_variation": image, "variation": image, "prompt_engine": text})
+        api_url, server = start_emulator(config)
+
+    try:
+        durations, failures, wall = asyncio.run(run(make_service(api_url), args.tasks, args.concurrency, args.palettes))
+    finally:
+        if server is not None:
+            server.should_exit = True
+
+    print(f"{args.tasks} generations, {args.concurrency} at once, against {api_url}")
+    print(f"throughput: {args.tasks / wall:.2f} generations/s ({wall:.1f} s)")
+    if durations:
+        quantiles = statistics.quantiles(durations, n=20, method="inclusive") if len(durations) > 1 else durations * 19
+        print(f"latency: p50 {statistics.median(durations):.2f} s, p95 {quantiles[18]:.2f} s, max {max(durations):.2f} s")
+    print(f"failures: {failures}")
+    return 0 if not failures else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
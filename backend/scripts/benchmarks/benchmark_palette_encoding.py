@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+"""Palette variation encoding benchmark for the Concept Visualizer backend.
+
+This script recolors synthetic logos with several palettes the way palette
+variations are generated, then compares the bytes stored and uploaded per
+generation (and the encode time) for the previous 24-bit PNG, the PNG8-aware
+encoder with and without lossless optimization, and a lossy WebP candidate.
+"""
+
+import argparse
+import random
+import statistics
+import time
+from io import BytesIO
+from typing import Callable, Dict, List, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter
+
+from app.services.image.encoding import encode_png
+from app.services.image.processing import apply_palette_with_masking_optimized, hex_to_bgr
+
+
+def make_logo(size: int, soft_edges: bool, seed: int = 0) -> np.ndarray:
+    """Draw a synthetic logo, optionally with the soft edges of generated concepts.
+
+    Args:
+        size: Width and height in pixels
+        soft_edges: Whether to blur the shapes
+        seed: Random seed for the shapes
+
+    Returns:
+        BGR image array
+    """
+    rng = random.Random(seed)
+    image = Image.new("RGB", (size, size), "white")
+    draw = ImageDraw.Draw(image)
+    for _ in range(8):
+        x, y = rng.randrange(size), rng.randrange(size)
+        radius = rng.randrange(size // 20, size // 4)
+        color = tuple(rng.randrange(256) for _ in range(3))
+        draw.ellipse((x - radius, y - radius, x + radius, y + radius), fill=color)
+    if soft_edges:
+        image = image.filter(ImageFilter.GaussianBlur(radius=max(1, size // 500)))
+    return cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+
+
+def make_palettes(count: int, seed: int = 0) -> List[List[str]]:
+    """Create random five-color palettes.
+
+    Args:
+        count: Number of palettes
+        seed: Random seed
+
+    Returns:
+        Palettes as lists of hex colors
+    """
+    rng = random.Random(seed)
+    return [[f"#{rng.randrange(0x1000000):06x}" for _ in range(5)] for _ in range(count)]
+
+
+def recolor(logo: np.ndarray, palette: List[str], blend_strength: float) -> Image.Image:
+    """Apply a palette like ImageProcessingService.apply_palette, without encoding.
+
+    Args:
+        logo: BGR image array
+        palette: Hex colors
+        blend_strength: How strongly to apply the palette
+
+    Returns:
+        Recolored RGB image
+    """
+    bgr_palette = [hex_to_bgr(color) for color in palette]
+    processed = apply_palette_with_masking_optimized(logo, bgr_palette, k=min(10, len(bgr_palette) * 2))
+    if blend_strength < 1.0:
+        processed = cv2.addWeighted(processed, blend_strength, logo, 1.0 - blend_strength, 0)
+    return Image.fromarray(cv2.cvtColor(processed, cv2.COLOR_BGR2RGB))
+
+
+def encode_rgb_png(image: Image.Image) -> bytes:
+    """Encode the way palette variations were stored before, as a default 24-bit PNG."""
+    output = BytesIO()
+    image.save(output, format="PNG")
+    return output.getvalue()
+
+
+def encode_webp(image: Image.Image) -> bytes:
+    """Encode the lossy WebP candidate."""
+    output = BytesIO()
+    image.save(output, format="WEBP", quality=85, method=4)
+    return output.getvalue()
+
+
+ENCODERS: Dict[str, Callable[[Image.Image], bytes]] = {
+    "rgb png (before)": encode_rgb_png,
+    "png8 auto": lambda image: encode_png(image, optimize=False),
+    "png8 auto+optimize": lambda image: encode_png(image, optimize=True),
+    "webp candidate": encode_webp,
+}
+
+
+def measure(encoder: Callable[[Image.Image], bytes], variations: List[Image.Image]) -> Tuple[int, float]:
+    """Encode every variation of a generation.
+
+    Args:
+        encoder: Function encoding an image to bytes
+        variations: Recolored variations
+
+    Returns:
+        Total encoded bytes and the median encode time in seconds
+    """
+    total = 0
+    durations: List[float] = []
+    for variation in variations:
+        started = time.perf_counter()
+        total += len(encoder(variation))
+        durations.append(time.perf_counter() - started)
+    return total, statistics.median(durations)
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Benchmark palette variation encodings")
+    parser.add_argument("--size", type=int, default=512, help="Logo width and height")
+    parser.add_argument("--palettes", type=int, default=3, help="Variations per generation (recoloring dominates the run time)")
+    parser.add_argument("--blend-strengths", type=float, nargs="+", default=[1.0, 0.75], help="Blend strengths to compare")
+    return parser.parse_args()
+
+
+def main() -> int:
+    """Run the benchmark and print the bytes per generation."""
+    args = parse_args()
+    palettes = make_palettes(args.palettes)
+    print(f"{'logo':>6} {'blend':>6} {'encoding':>20} {'kb/generation':>14} {'median_ms':>10}")
+    for soft_edges in (False, True):
+        logo = make_logo(args.size, soft_edges)
+        for blend_strength in args.blend_strengths:
+            variations = [recolor(logo, palette, blend_strength) for palette in palettes]
+            for name, encoder in ENCODERS.items():
+                total, median = measure(encoder, variations)
+                print(f"{'soft' if soft_edges else 'flat':>6} {blend_strength:>6.2f} {name:>20} {total / 1024:>14.1f} {median * 1000:>10.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+"""Thumbnail benchmark for the Concept Visualizer backend.
+
+This script downscales synthetic PNG and JPEG sources to grid thumbnail
+size and compares a full decode followed by a LANCZOS resize (the path of
+ImageProcessingService.resize_image and exact-size thumbnails) with the
+draft/reduce fast path: median decode+downscale latency, SSIM of the fast
+result against the full one, and the wall time of a batch of complete
+thumbnails through generate_thumbnails.
+"""
+
+import argparse
+import statistics
+import time
+from io import BytesIO
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from app.services.image.conversion import fast_downscale, fit_within, generate_thumbnail, generate_thumbnails
+from app.services.image.optimization import _luminance, structural_similarity
+
+
+def make_source(size: int, format: str) -> bytes:
+    """Draw a gradient logo with shapes and encode it.
+
+    Args:
+        size: Width and height in pixels
+        format: PIL format to encode with (PNG or JPEG)
+
+    Returns:
+        Encoded image bytes
+    """
+    gradient = np.tile(np.linspace(0, 255, size, dtype=np.uint8), (size, 1))
+    image = Image.fromarray(np.dstack([gradient, gradient.T, gradient[::-1]]), mode="RGB")
+    draw = ImageDraw.Draw(image)
+    for index in range(6):
+        offset = index * size // 8
+        draw.ellipse((offset, offset, offset + size // 4, offset + size // 4), fill=(40 * index, 200 - 30 * index, 90))
+    output = BytesIO()
+    image.save(output, format=format, **({"quality": 92} if format == "JPEG" else {}))
+    return output.getvalue()
+
+
+def full_downscale(source: bytes, box: Tuple[int, int]) -> Image.Image:
+    """Decode the whole image and resize it with LANCZOS."""
+    image = Image.open(BytesIO(source))
+    return image.resize(fit_within(image.width, image.height, box), resample=Image.Resampling.LANCZOS)
+
+
+def fast_path_downscale(source: bytes, box: Tuple[int, int]) -> Image.Image:
+    """Downscale with draft decoding and reduce() first."""
+    image = Image.open(BytesIO(source))
+    return fast_downscale(image, fit_within(image.width, image.height, box))
+
+
+def measure(downscale: Callable[[], Image.Image], repeats: int) -> Tuple[Image.Image, float]:
+    """Downscale one source several times.
+
+    Args:
+        downscale: Function decoding and downscaling the source
+        repeats: Number of runs
+
+    Returns:
+        The last result and the median time in seconds
+    """
+    durations: List[float] = []
+    result = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = downscale()
+        durations.append(time.perf_counter() - started)
+    assert result is not None
+    return result, statistics.median(durations)
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Benchmark the fast thumbnail path")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1024, 2048], help="Source widths and heights")
+    parser.add_argument("--thumbnail", type=int, default=256, help="Thumbnail box size (the delivery thumb size)")
+    parser.add_argument("--repeats", type=int, default=5, help="Runs per measurement")
+    parser.add_argument("--batch", type=int, default=24, help="Images per batch (a grid page)")
+    return parser.parse_args()
+
+
+def main() -> int:
+    """Run the benchmark and print latency and quality per source."""
+    args = parse_args()
+    box = (args.thumbnail, args.thumbnail)
+    print(f"{'source':>12} {'full_ms':>8} {'fast_ms':>8} {'speedup':>8} {'ssim':>7}")
+    sources: Dict[str, bytes] = {}
+    for size in args.sizes:
+        for format in ("PNG", "JPEG"):
+            source = make_source(size, format)
+            sources[f"{format.lower()} {size}"] = source
+            full, full_time = measure(lambda: full_downscale(source, box), args.repeats)
+            fast, fast_time = measure(lambda: fast_path_downscale(source, box), args.repeats)
+            ssim = structural_similarity(_luminance(full), _luminance(fast))
+            print(f"{format.lower() + ' ' + str(size):>12} {full_time * 1000:>8.1f} {fast_time * 1000:>8.1f} {full_time / fast_time:>7.1f}x {ssim:>7.4f}")
+
+    batch = [source for source in sources.values() for _ in range(max(1, args.batch // len(sources)))]
+    started = time.perf_counter()
+    for source in batch:
+        generate_thumbnail(source, size=box, preserve_aspect_ratio=False, fast=False)
+    sequential = time.perf_counter() - started
+    started = time.perf_counter()
+    generate_thumbnails(batch, size=box, preserve_aspect_ratio=False)
+    batched = time.perf_counter() - started
+    print(f"\nbatch of {len(batch)} thumbnails: full-decode sequential {sequential * 1000:.0f} ms, fast batched {batched * 1000:.0f} ms ({sequential / batched:.1f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
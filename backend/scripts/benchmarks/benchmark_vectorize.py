@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+"""SVG vectorization benchmark for the Concept Visualizer backend.
+
+This script times SVG traces of synthetic logos at several source sizes,
+comparing the previous temp-file trace with the in-memory trace at different
+trace resolutions (EXPORT_SVG_TRACE_MAX_DIMENSION).
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from io import BytesIO
+from typing import Callable, List, Optional, Tuple
+
+import vtracer
+from PIL import Image, ImageDraw, ImageFilter
+
+from app.services.export.vectorize import trace_image
+
+
+def make_logo(size: int, seed: int = 0) -> bytes:
+    """Draw a synthetic logo with soft edges, similar to generated concepts.
+
+    Args:
+        size: Width and height in pixels
+        seed: Random seed for the shapes
+
+    Returns:
+        PNG bytes
+    """
+    rng = random.Random(seed)
+    image = Image.new("RGB", (size, size), "white")
+    draw = ImageDraw.Draw(image)
+    for _ in range(12):
+        x, y = rng.randrange(size), rng.randrange(size)
+        radius = rng.randrange(size // 20, size // 4)
+        color = tuple(rng.randrange(256) for _ in range(3))
+        if rng.random() < 0.5:
+            draw.ellipse((x - radius, y - radius, x + radius, y + radius), fill=color)
+        else:
+            draw.rectangle((x - radius, y - radius, x + radius, y + radius // 2), fill=color)
+    image = image.filter(ImageFilter.GaussianBlur(radius=max(1, size // 500)))
+    buffer = BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def trace_with_temp_files(image_data: bytes) -> bytes:
+    """Trace the way exports did before the in-memory trace, through temp files.
+
+    Args:
+        image_data: PNG bytes
+
+    Returns:
+        SVG bytes
+    """
+    image = Image.open(BytesIO(image_data))
+    with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as temp_input:
+        input_path = temp_input.name
+    output_path = input_path[:-4] + ".svg"
+    try:
+        image.save(input_path, format="PNG")
+        vtracer.convert_image_to_svg_py(input_path, output_path, colormode="color", hierarchical="stacked", mode="spline", filter_speckle=4, path_precision=3)
+        with open(output_path, "rb") as svg_file:
+            return svg_file.read()
+    finally:
+        for path in (input_path, output_path):
+            if os.path.exists(path):
+                os.unlink(path)
+
+
+def time_trace(trace: Callable[[bytes], bytes], image_data: bytes, repeat: int) -> Tuple[float, int]:
+    """Time a trace function.
+
+    Args:
+        trace: Function tracing PNG bytes to SVG bytes
+        image_data: PNG bytes
+        repeat: Number of runs
+
+    Returns:
+        Median duration in seconds and the SVG size in bytes
+    """
+    durations: List[float] = []
+    svg = b""
+    for _ in range(repeat):
+        started = time.perf_counter()
+        svg = trace(image_data)
+        durations.append(time.perf_counter() - started)
+    return statistics.median(durations), len(svg)
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Benchmark SVG vectorization across image sizes")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 1000, 2000], help="Source image sizes")
+    parser.add_argument("--trace-dimensions", type=int, nargs="+", default=[0, 1000, 500], help="Trace resolutions to compare (0 traces at full size)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement")
+    return parser.parse_args()
+
+
+def main() -> int:
+    """Run the benchmark and print a table of median durations."""
+    args = parse_args()
+    print(f"{'source':>8} {'method':>20} {'median_s':>10} {'svg_kb':>8}")
+    for size in args.sizes:
+        image_data = make_logo(size)
+        duration, svg_size = time_trace(trace_with_temp_files, image_data, args.repeat)
+        print(f"{size:>8} {'temp files':>20} {duration:>10.3f} {svg_size / 1024:>8.1f}")
+        for dimension in args.trace_dimensions:
+            if dimension and dimension >= size:
+                continue
+            max_dimension: Optional[int] = dimension or None
+            duration, svg_size = time_trace(lambda data: trace_image(data, max_dimension=max_dimension), image_data, args.repeat)
+            label = f"in memory @{dimension or size}"
+            print(f"{size:>8} {label:>20} {duration:>10.3f} {svg_size / 1024:>8.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
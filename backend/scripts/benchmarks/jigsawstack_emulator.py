@@ -0,0 +1,351 @@
+"""Local emulator of the JigsawStack API, for load and latency testing.
+
+The emulator is an ASGI app serving the endpoints the client uses, with
+deterministic images and palettes (the same request always gets the same
+result), latency drawn from a configurable distribution and injected
+errors. Point JIGSAWSTACK_API_URL at it to benchmark or soak test the
+generation pipeline without calling (or paying for) the real API:
+
+    uvicorn jigsawstack_emulator:create_emulator_app --factory --app-dir scripts/benchmarks --port 8100
+
+It is benchmark tooling and not part of the application.
+"""
+
+import asyncio
+import colorsys
+import hashlib
+import math
+import os
+import random
+from collections import Counter
+from dataclasses import dataclass, field, replace
+from functools import lru_cache
+from io import BytesIO
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+from PIL import Image, ImageDraw
+
+# Endpoint names, by the path they serve
+ENDPOINTS = {
+    "/v1/ai/image_generation": "image_generation",
+    "/v1/ai/image_variation": "image_variation",
+    "/v1/prompt_engine/run": "prompt_engine",
+    "/v1/stability/variation": "variation",
+}
+
+_PALETTE_ADJECTIVES = ("Coastal", "Ember", "Forest", "Midnight", "Citrus", "Glacier", "Desert", "Neon")
+_PALETTE_NOUNS = ("Breeze", "Glow", "Harmony", "Contrast", "Dawn", "Signal", "Classic", "Pulse")
+_COLOR_KEYS = ("first_color", "second_color", "third_color", "fourth_color", "fifth_color")
+
+
+@dataclass(frozen=True)
+class LatencyProfile:
+    """Log-normal latency distribution of an endpoint.
+
+    Attributes:
+        median_seconds: Median latency (0 for no latency)
+        p95_seconds: 95th percentile latency, the median if lower
+        max_seconds: Upper bound of the sampled latency
+    """
+
+    median_seconds: float = 0.0
+    p95_seconds: float = 0.0
+    max_seconds: float = 300.0
+
+    def sample(self, rng: random.Random) -> float:
+        """Draw a latency.
+
+        Args:
+            rng: Random source
+
+        Returns:
+            Seconds to wait before answering
+        """
+        if self.median_seconds <= 0:
+            return 0.0
+        # 1.645 standard deviations separate the median and the 95th percentile
+        sigma = math.log(max(self.p95_seconds, self.median_seconds) / self.median_seconds) / 1.645
+        return min(self.max_seconds, rng.lognormvariate(math.log(self.median_seconds), sigma))
+
+    @classmethod
+    def parse(cls, value: Optional[str]) -> "LatencyProfile":
+        """Parse a "median,p95" pair of seconds.
+
+        Args:
+            value: The pair, or a single median, or None
+
+        Returns:
+            The profile, no latency if the value is empty
+        """
+        if not value:
+            return cls()
+        parts = [float(part) for part in value.split(",")]
+        return cls(median_seconds=parts[0], p95_seconds=parts[1] if len(parts) > 1 else parts[0])
+
+
+@dataclass(frozen=True)
+class EndpointBehavior:
+    """Latency and faults of one emulated endpoint.
+
+    Attributes:
+        latency: Latency distribution of successful and failed responses
+        error_rate: Share of requests answered with an error status
+        error_statuses: Statuses injected errors are drawn from; 429s carry Retry-After: 1
+        stall_rate: Share of requests that stall for stall_seconds, to trigger client timeouts
+        stall_seconds: Duration of a stall
+    """
+
+    latency: LatencyProfile = field(default_factory=LatencyProfile)
+    error_rate: float = 0.0
+    error_statuses: Tuple[int, ...] = (429, 500, 503)
+    stall_rate: float = 0.0
+    stall_seconds: float = 120.0
+
+
+@dataclass(frozen=True)
+class EmulatorConfig:
+    """Configuration of the emulator.
+
+    Attributes:
+        image_mode: "binary" to return generated images as PNG bodies, "url" to return JSON with an image URL
+        image_size: Width and height of generated images
+        seed: Seed of the latency and fault draws
+        endpoints: Behavior of each endpoint (see ENDPOINTS), no latency or faults if missing
+    """
+
+    image_mode: str = "binary"
+    image_size: int = 512
+    seed: int = 0
+    endpoints: Dict[str, EndpointBehavior] = field(default_factory=dict)
+
+    def behavior(self, endpoint: str) -> EndpointBehavior:
+        """Get the behavior of an endpoint."""
+        return self.endpoints.get(endpoint, EndpointBehavior())
+
+    @classmethod
+    def from_env(cls) -> "EmulatorConfig":
+        """Read the configuration from JIGSAWSTACK_EMULATOR_* environment variables.
+
+        IMAGE_LATENCY and TEXT_LATENCY are "median,p95" seconds for the image
+        endpoints and the prompt engine; ERROR_RATE, ERROR_STATUSES (comma
+        separated), STALL_RATE and STALL_SECONDS apply to all of them.
+
+        Returns:
+            The configuration
+        """
+
+        def env(name: str, default: str = "") -> str:
+            return os.environ.get(f"JIGSAWSTACK_EMULATOR_{name}", default)
+
+        faults: Dict[str, Any] = {
+            "error_rate": float(env("ERROR_RATE", "0")),
+            "stall_rate": float(env("STALL_RATE", "0")),
+            "stall_seconds": float(env("STALL_SECONDS", "120")),
+        }
+        if env("ERROR_STATUSES"):
+            faults["error_statuses"] = tuple(int(status) for status in env("ERROR_STATUSES").split(","))
+        image = EndpointBehavior(latency=LatencyProfile.parse(env("IMAGE_LATENCY")), **faults)
+        text = replace(image, latency=LatencyProfile.parse(env("TEXT_LATENCY")))
+        return cls(
+            image_mode=env("IMAGE_MODE", "binary"),
+            image_size=int(env("IMAGE_SIZE", "512")),
+            seed=int(env("SEED", "0")),
+            endpoints={"image_generation": image, "image_variation": image, "variation": image, "prompt_engine": text},
+        )
+
+
+def _digest(*parts: Any) -> str:
+    """Hash request parameters into a stable ID."""
+    return hashlib.sha256("\x1f".join(str(part) for part in parts).encode("utf-8")).hexdigest()[:32]
+
+
+def _color(seed: bytes, index: int) -> Tuple[int, int, int]:
+    """Derive a saturated color from a seed."""
+    hue = seed[index % len(seed)] / 255.0
+    saturation = 0.45 + seed[(index + 7) % len(seed)] / 255.0 * 0.5
+    value = 0.35 + seed[(index + 13) % len(seed)] / 255.0 * 0.6
+    red, green, blue = colorsys.hsv_to_rgb(hue, saturation, value)
+    return int(red * 255), int(green * 255), int(blue * 255)
+
+
+@lru_cache(maxsize=256)
+def render_image(image_id: str, size: int) -> bytes:
+    """Draw a deterministic logo-like PNG for an image ID.
+
+    Args:
+        image_id: ID the shapes and colors are derived from
+        size: Width and height in pixels
+
+    Returns:
+        PNG bytes
+    """
+    seed = hashlib.sha256(image_id.encode("utf-8")).digest()
+    image = Image.new("RGB", (size, size), (250, 250, 250))
+    draw = ImageDraw.Draw(image)
+    for index in range(4):
+        left = seed[index] / 255.0 * size * 0.5
+        top = seed[index + 4] / 255.0 * size * 0.5
+        extent = size * (0.25 + seed[index + 8] / 255.0 * 0.25)
+        box = (left, top, left + extent, top + extent)
+        if seed[index + 12] % 2:
+            draw.ellipse(box, fill=_color(seed, index))
+        else:
+            draw.rectangle(box, fill=_color(seed, index))
+    output = BytesIO()
+    image.save(output, format="PNG")
+    return output.getvalue()
+
+
+def make_palettes(logo_description: str, theme_description: str, count: int) -> list:
+    """Derive deterministic palettes in the prompt engine's response format.
+
+    Args:
+        logo_description: Logo description of the request
+        theme_description: Theme description of the request
+        count: Number of palettes
+
+    Returns:
+        Palettes with a name, five colors and a description
+    """
+    palettes = []
+    for number in range(count):
+        seed = hashlib.sha256(_digest(logo_description, theme_description, number).encode("utf-8")).digest()
+        colors = {key: "#{:02X}{:02X}{:02X}".format(*_color(seed, index * 3)) for index, key in enumerate(_COLOR_KEYS)}
+        palettes.append(
+            {
+                "name": f"{_PALETTE_ADJECTIVES[seed[0] % len(_PALETTE_ADJECTIVES)]} {_PALETTE_NOUNS[seed[1] % len(_PALETTE_NOUNS)]}",
+                "colors": [colors],
+                "description": f"Emulated palette {number + 1} for the theme: {theme_description}",
+            }
+        )
+    return palettes
+
+
+class JigsawStackEmulator:
+    """Answers emulated JigsawStack requests and counts them."""
+
+    def __init__(self, config: EmulatorConfig):
+        """Initialize the emulator.
+
+        Args:
+            config: Emulator configuration
+        """
+        self.config = config
+        self.requests: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._rng = random.Random(config.seed)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the request counts since the emulator started."""
+        return {
+            "requests": dict(self.requests),
+            "errors": dict(self.errors),
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+        }
+
+    async def handle(self, endpoint: str, request: Request, respond: Callable[[Dict[str, Any], Request], Awaitable[Response]]) -> Response:
+        """Answer a request, applying the endpoint's latency and faults.
+
+        Args:
+            endpoint: Name of the endpoint (see ENDPOINTS)
+            request: The request
+            respond: Coroutine function building the successful response from the JSON body
+
+        Returns:
+            The response
+        """
+        self.requests[endpoint] += 1
+        if not (request.headers.get("x-api-key") or request.headers.get("authorization")):
+            self.errors[endpoint] += 1
+            return JSONResponse({"success": False, "message": "Missing API key"}, status_code=401)
+
+        behavior = self.config.behavior(endpoint)
+        # Draw everything up front so concurrent requests do not change the sequence
+        latency = behavior.latency.sample(self._rng)
+        stall = self._rng.random() < behavior.stall_rate
+        error_status = self._rng.choice(behavior.error_statuses) if behavior.error_statuses and self._rng.random() < behavior.error_rate else None
+
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(behavior.stall_seconds if stall else latency)
+            if error_status is not None:
+                self.errors[endpoint] += 1
+                headers = {"Retry-After": "1"} if error_status == 429 else None
+                return JSONResponse({"success": False, "message": f"Emulated error {error_status}"}, status_code=error_status, headers=headers)
+            try:
+                body = await request.json()
+            except ValueError:
+                self.errors[endpoint] += 1
+                return JSONResponse({"success": False, "message": "Invalid JSON body"}, status_code=400)
+            return await respond(body if isinstance(body, dict) else {}, request)
+        finally:
+            self.in_flight -= 1
+
+    def image_url(self, request: Request, image_id: str) -> str:
+        """Build the URL the emulator serves an image at."""
+        return f"{str(request.base_url).rstrip('/')}/images/{image_id}.png"
+
+    async def image_generation(self, body: Dict[str, Any], request: Request) -> Response:
+        """Answer an image generation request."""
+        image_id = _digest("generation", body.get("prompt"), body.get("aspect_ratio"))
+        if self.config.image_mode == "url":
+            return JSONResponse({"success": True, "id": image_id, "url": self.image_url(request, image_id)})
+        return Response(render_image(image_id, self.config.image_size), media_type="image/png")
+
+    async def image_variation(self, body: Dict[str, Any], request: Request) -> Response:
+        """Answer an image refinement request, always with the PNG body."""
+        image_id = _digest("refinement", body.get("prompt"), body.get("image_url"), body.get("strength"))
+        return Response(render_image(image_id, self.config.image_size), media_type="image/png")
+
+    async def prompt_engine(self, body: Dict[str, Any], request: Request) -> Response:
+        """Answer a palette generation request."""
+        values = body.get("input_values") or {}
+        try:
+            count = max(1, min(20, int(values.get("num_palettes", 7))))
+        except (TypeError, ValueError):
+            count = 7
+        palettes = make_palettes(str(values.get("logo_description", "")), str(values.get("theme_description", "")), count)
+        return JSONResponse({"success": True, "result": palettes})
+
+    async def variation(self, body: Dict[str, Any], request: Request) -> Response:
+        """Answer a variation request with the URL of the variation."""
+        image_id = _digest("variation", body.get("image_url"), body.get("model"))
+        return JSONResponse({"success": True, "image_url": self.image_url(request, image_id)})
+
+
+def create_emulator_app(config: Optional[EmulatorConfig] = None) -> FastAPI:
+    """Create the emulator app.
+
+    Args:
+        config: Emulator configuration, read from the environment if not given
+
+    Returns:
+        ASGI app serving the emulated endpoints, the generated images and /_emulator/stats
+    """
+    emulator = JigsawStackEmulator(config or EmulatorConfig.from_env())
+    app = FastAPI(title="JigsawStack emulator", docs_url=None, redoc_url=None, openapi_url=None)
+    app.state.emulator = emulator
+
+    for path, endpoint in ENDPOINTS.items():
+
+        async def route(request: Request, endpoint: str = endpoint) -> Response:
+            return await emulator.handle(endpoint, request, getattr(emulator, endpoint))
+
+        app.add_api_route(path, route, methods=["POST"], include_in_schema=False)
+
+    @app.get("/images/{image_id}.png", include_in_schema=False)
+    async def image(image_id: str) -> Response:
+        emulator.requests["images"] += 1
+        return Response(render_image(image_id, emulator.config.image_size), media_type="image/png")
+
+    @app.get("/_emulator/stats", include_in_schema=False)
+    async def stats() -> Dict[str, Any]:
+        return emulator.stats()
+
+    return app
@@ -7,7 +7,8 @@ CREATE TABLE concepts_dev (
   theme_description TEXT NOT NULL,
   image_path TEXT NOT NULL, -- Path to image in Supabase Storage
   image_url TEXT, -- Can be Null
-  is_anonymous BOOLEAN DEFAULT TRUE -- Flag to identify concepts from anonymous users
+  is_anonymous BOOLEAN DEFAULT TRUE, -- Flag to identify concepts from anonymous users
+  export_derivatives JSONB DEFAULT '{}'::jsonb -- Pre-rendered export sizes by key (e.g. "small.png")
 );
 
 -- Color variations table
@@ -18,7 +19,8 @@ CREATE TABLE color_variations_dev (
   colors JSONB NOT NULL, -- Array of hex codes
   description TEXT,
   image_path TEXT NOT NULL, -- Path to image in Supabase Storage
-  image_url TEXT
+  image_url TEXT,
+  export_derivatives JSONB DEFAULT '{}'::jsonb -- Pre-rendered export sizes by key (e.g. "small.png")
 );
 
 -- Tasks table
@@ -31,7 +33,9 @@ CREATE TABLE tasks_dev (
   status TEXT NOT NULL, -- 'pending', 'processing', 'completed', 'failed'
   result_id UUID, -- Reference to the result (e.g., concept_id)
   error_message TEXT, -- Error message if task failed
-  metadata JSONB DEFAULT '{}'::jsonb -- Additional task-specific metadata
+  metadata JSONB DEFAULT '{}'::jsonb, -- Additional task-specific metadata
+  checkpoints JSONB DEFAULT '{}'::jsonb, -- Completed stage outputs for resuming failed attempts
+  progress JSONB DEFAULT '{}'::jsonb -- Current stage, percent complete and partial results
 );
 
 
@@ -40,6 +44,7 @@ CREATE INDEX concepts_dev_user_id_idx ON concepts_dev(user_id);
 CREATE INDEX color_variations_dev_concept_id_idx ON color_variations_dev(concept_id);
 CREATE INDEX tasks_dev_user_id_idx ON tasks_dev(user_id);
 CREATE INDEX tasks_dev_status_idx ON tasks_dev(status);
+CREATE INDEX tasks_dev_user_type_status_idx ON tasks_dev(user_id, type, status);
 CREATE INDEX tasks_dev_type_idx ON tasks_dev(type);
 CREATE INDEX tasks_dev_result_id_idx ON tasks_dev(result_id);
 
@@ -200,3 +205,54 @@ USING (
   bucket_id = 'palette-images-dev' AND
   (storage.foldername(name))[1] = auth.uid()::text
 );
+
+-- Concept creation RPC: inserts a concept and its color variations in one transaction
+CREATE OR REPLACE FUNCTION public.create_concept_with_variations(
+  p_concepts_table text,
+  p_variations_table text,
+  p_concept jsonb,
+  p_variations jsonb DEFAULT '[]'::jsonb
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+SET search_path = public
+AS $$
+DECLARE
+  _concept jsonb;
+  _variations jsonb;
+BEGIN
+  IF p_concepts_table !~ '^concepts(_[a-z0-9]+)?$' OR p_variations_table !~ '^(color_variations|palettes)(_[a-z0-9]+)?$' THEN
+    RAISE EXCEPTION 'Unsupported table names: %, %', p_concepts_table, p_variations_table;
+  END IF;
+
+  EXECUTE format(
+    'INSERT INTO %1$I (user_id, logo_description, theme_description, image_path, image_url, is_anonymous, export_derivatives)
+     SELECT c.user_id, c.logo_description, c.theme_description, c.image_path, c.image_url, COALESCE(c.is_anonymous, TRUE),
+            COALESCE(c.export_derivatives, ''{}''::jsonb)
+     FROM jsonb_populate_record(NULL::%1$I, $1) AS c
+     RETURNING to_jsonb(%1$I.*)',
+    p_concepts_table
+  )
+  INTO _concept
+  USING p_concept;
+
+  EXECUTE format(
+    'WITH inserted AS (
+       INSERT INTO %1$I (concept_id, palette_name, colors, description, image_path, image_url, export_derivatives)
+       SELECT ($2)::uuid, v.palette_name, v.colors, v.description, v.image_path, v.image_url, COALESCE(v.export_derivatives, ''{}''::jsonb)
+       FROM jsonb_populate_recordset(NULL::%1$I, $1) AS v
+       RETURNING *
+     )
+     SELECT COALESCE(jsonb_agg(to_jsonb(inserted.*)), ''[]''::jsonb) FROM inserted',
+    p_variations_table
+  )
+  INTO _variations
+  USING COALESCE(p_variations, '[]'::jsonb), _concept->>'id';
+
+  RETURN _concept || jsonb_build_object('color_variations', _variations);
+END;
+$$;
+
+-- Only the backend (service role) creates concepts through this function
+REVOKE ALL ON FUNCTION public.create_concept_with_variations(text, text, jsonb, jsonb) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.create_concept_with_variations(text, text, jsonb, jsonb) TO service_role;
@@ -0,0 +1,9 @@
+-- Migration: Add stage checkpoints to tasks table
+-- Workers persist completed stage outputs (stored image path, raw palettes,
+-- finished palette variations) so a redelivered task resumes instead of restarting.
+
+-- Add checkpoints column to tasks table
+ALTER TABLE tasks ADD COLUMN checkpoints JSONB DEFAULT '{}'::jsonb;
+
+-- Comment the new column
+COMMENT ON COLUMN tasks.checkpoints IS 'Completed stage outputs used to resume the task after a failed attempt';
@@ -0,0 +1,9 @@
+-- Migration: Add progress to tasks table
+-- Workers record the running stage, percent complete and partial results
+-- (base image URL, finished palette variations) while a task is processing.
+
+-- Add progress column to tasks table
+ALTER TABLE tasks ADD COLUMN progress JSONB DEFAULT '{}'::jsonb;
+
+-- Comment the new column
+COMMENT ON COLUMN tasks.progress IS 'Current stage, percent complete and partial results of a running task';
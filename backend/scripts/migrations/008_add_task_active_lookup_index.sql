@@ -0,0 +1,5 @@
+-- Migration: Add active task lookup index to tasks table
+-- Task submission checks for a pending or processing task of the same type
+-- with a single (user_id, type, status IN (...)) query.
+
+CREATE INDEX IF NOT EXISTS tasks_user_type_status_idx ON tasks(user_id, type, status);
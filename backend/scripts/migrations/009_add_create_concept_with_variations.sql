@@ -0,0 +1,57 @@
+-- Migration: Add create_concept_with_variations function
+-- Inserts a concept and all of its palette variations in one transaction and
+-- returns the concept row with its variations under "color_variations".
+-- Replaces the separate concept and variation inserts (and the compensating
+-- delete when the second insert failed) with a single RPC round trip.
+--
+-- Table names are parameters because each environment uses suffixed tables
+-- (e.g. concepts_dev / color_variations_dev); they are validated before use.
+
+CREATE OR REPLACE FUNCTION public.create_concept_with_variations(
+  p_concepts_table text,
+  p_variations_table text,
+  p_concept jsonb,
+  p_variations jsonb DEFAULT '[]'::jsonb
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+SET search_path = public
+AS $$
+DECLARE
+  _concept jsonb;
+  _variations jsonb;
+BEGIN
+  IF p_concepts_table !~ '^concepts(_[a-z0-9]+)?$' OR p_variations_table !~ '^(color_variations|palettes)(_[a-z0-9]+)?$' THEN
+    RAISE EXCEPTION 'Unsupported table names: %, %', p_concepts_table, p_variations_table;
+  END IF;
+
+  EXECUTE format(
+    'INSERT INTO %1$I (user_id, logo_description, theme_description, image_path, image_url, is_anonymous)
+     SELECT c.user_id, c.logo_description, c.theme_description, c.image_path, c.image_url, COALESCE(c.is_anonymous, TRUE)
+     FROM jsonb_populate_record(NULL::%1$I, $1) AS c
+     RETURNING to_jsonb(%1$I.*)',
+    p_concepts_table
+  )
+  INTO _concept
+  USING p_concept;
+
+  EXECUTE format(
+    'WITH inserted AS (
+       INSERT INTO %1$I (concept_id, palette_name, colors, description, image_path, image_url)
+       SELECT ($2)::uuid, v.palette_name, v.colors, v.description, v.image_path, v.image_url
+       FROM jsonb_populate_recordset(NULL::%1$I, $1) AS v
+       RETURNING *
+     )
+     SELECT COALESCE(jsonb_agg(to_jsonb(inserted.*)), ''[]''::jsonb) FROM inserted',
+    p_variations_table
+  )
+  INTO _variations
+  USING COALESCE(p_variations, '[]'::jsonb), _concept->>'id';
+
+  RETURN _concept || jsonb_build_object('color_variations', _variations);
+END;
+$$;
+
+-- Only the backend (service role) creates concepts through this function
+REVOKE ALL ON FUNCTION public.create_concept_with_variations(text, text, jsonb, jsonb) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.create_concept_with_variations(text, text, jsonb, jsonb) TO service_role;
@@ -0,0 +1,57 @@
+-- Migration: Add export_derivatives to concepts and color_variations
+-- Records the export sizes pre-rendered when an image is generated, keyed by
+-- "<size>.<format>" (e.g. {"small.png": {"path": "...", "bytes": 12345}}).
+-- The derivatives live at deterministic storage paths next to the original,
+-- so exports find them without reading this column.
+--
+-- Also redefines create_concept_with_variations (migration 009) to insert the
+-- new column.
+
+ALTER TABLE concepts ADD COLUMN IF NOT EXISTS export_derivatives JSONB DEFAULT '{}'::jsonb;
+ALTER TABLE color_variations ADD COLUMN IF NOT EXISTS export_derivatives JSONB DEFAULT '{}'::jsonb;
+
+CREATE OR REPLACE FUNCTION public.create_concept_with_variations(
+  p_concepts_table text,
+  p_variations_table text,
+  p_concept jsonb,
+  p_variations jsonb DEFAULT '[]'::jsonb
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+SET search_path = public
+AS $$
+DECLARE
+  _concept jsonb;
+  _variations jsonb;
+BEGIN
+  IF p_concepts_table !~ '^concepts(_[a-z0-9]+)?$' OR p_variations_table !~ '^(color_variations|palettes)(_[a-z0-9]+)?$' THEN
+    RAISE EXCEPTION 'Unsupported table names: %, %', p_concepts_table, p_variations_table;
+  END IF;
+
+  EXECUTE format(
+    'INSERT INTO %1$I (user_id, logo_description, theme_description, image_path, image_url, is_anonymous, export_derivatives)
+     SELECT c.user_id, c.logo_description, c.theme_description, c.image_path, c.image_url, COALESCE(c.is_anonymous, TRUE),
+            COALESCE(c.export_derivatives, ''{}''::jsonb)
+     FROM jsonb_populate_record(NULL::%1$I, $1) AS c
+     RETURNING to_jsonb(%1$I.*)',
+    p_concepts_table
+  )
+  INTO _concept
+  USING p_concept;
+
+  EXECUTE format(
+    'WITH inserted AS (
+       INSERT INTO %1$I (concept_id, palette_name, colors, description, image_path, image_url, export_derivatives)
+       SELECT ($2)::uuid, v.palette_name, v.colors, v.description, v.image_path, v.image_url, COALESCE(v.export_derivatives, ''{}''::jsonb)
+       FROM jsonb_populate_recordset(NULL::%1$I, $1) AS v
+       RETURNING *
+     )
+     SELECT COALESCE(jsonb_agg(to_jsonb(inserted.*)), ''[]''::jsonb) FROM inserted',
+    p_variations_table
+  )
+  INTO _variations
+  USING COALESCE(p_variations, '[]'::jsonb), _concept->>'id';
+
+  RETURN _concept || jsonb_build_object('color_variations', _variations);
+END;
+$$;
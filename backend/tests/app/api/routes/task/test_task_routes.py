@@ -0,0 +1,58 @@
+"""Tests for the task API routes."""
+
+from typing import Any, Dict
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.dependencies import CommonDependencies
+from app.api.routes.task.routes import router
+
+TASK_ID = "task-123"
+PREVIEW_PALETTES = [
+    {"name": "Complementary Red", "colors": ["#C83C1E", "#E8A08F", "#1EA2C8", "#0E5166", "#FBF8F7"], "description": "Derived from the logo's dominant colors"},
+]
+
+
+@pytest.fixture
+def task() -> Dict[str, Any]:
+    """Create a running generation task with partial results."""
+    return {
+        "id": TASK_ID,
+        "status": "processing",
+        "type": "concept_generation",
+        "metadata": {},
+        "progress": {
+            "stage": "generating_palettes",
+            "percent": 30,
+            "image_url": "https://example.com/base.png",
+            "variations": [],
+            "preview_palettes": PREVIEW_PALETTES,
+        },
+    }
+
+
+@pytest.fixture
+def client(task: Dict[str, Any]) -> TestClient:
+    """Create a client for the task routes, authenticated as the task's user."""
+    commons = MagicMock()
+    commons.user_id = "user-456"
+    commons.task_service.get_task = AsyncMock(return_value=task)
+
+    app = FastAPI()
+    app.include_router(router, prefix="/api/tasks")
+    app.dependency_overrides[CommonDependencies] = lambda: commons
+    return TestClient(app)
+
+
+def test_get_task_includes_preview_palettes(client: TestClient) -> None:
+    """Test the preview palettes of a running task survive the task response."""
+    response = client.get(f"/api/tasks/{TASK_ID}")
+
+    assert response.status_code == 200
+    progress = response.json()["progress"]
+    assert progress["stage"] == "generating_palettes"
+    assert progress["preview_palettes"] == PREVIEW_PALETTES
+    assert response.json()["image_url"] == "https://example.com/base.png"
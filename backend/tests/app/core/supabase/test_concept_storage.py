@@ -1,9 +1,14 @@
 """Tests for ConceptStorage in the Supabase module."""
 
+import os
+import uuid
+from pathlib import Path
+from typing import Any, Iterator
 from unittest.mock import MagicMock, patch
 
 import pytest
 
+from app.core.exceptions import DatabaseTransactionError
 from app.core.supabase.concept_storage import ConceptStorage
 
 
@@ -473,6 +478,178 @@ class TestGetConceptDetail:
             assert mock_get.call_count == 2
 
 
+class TestStoreConceptWithVariations:
+    """Tests for the store_concept_with_variations method."""
+
+    def test_store_concept_with_variations_success(self, concept_storage: ConceptStorage) -> None:
+        """Test that the concept and variations are sent in one function call."""
+        stored = {"id": "concept-123", "color_variations": [{"id": "var-1", "concept_id": "concept-123"}]}
+        with patch("requests.post") as mock_post:
+            mock_post.return_value = MagicMock(status_code=200, json=MagicMock(return_value=stored))
+
+            result = concept_storage.store_concept_with_variations(
+                {"id": "ignored", "user_id": "user-123", "image_path": "user-123/image.png"},
+                [{"id": "ignored", "concept_id": "ignored", "palette_name": "Blue", "colors": ["#0000FF"], "image_path": "user-123/p.png"}],
+            )
+
+        assert result == stored
+        assert mock_post.call_count == 1
+        assert mock_post.call_args[0][0].endswith("/rest/v1/rpc/create_concept_with_variations")
+        payload = mock_post.call_args[1]["json"]
+        assert payload["p_concept"] == {"user_id": "user-123", "image_path": "user-123/image.png"}
+        assert payload["p_variations"] == [{"palette_name": "Blue", "colors": ["#0000FF"], "image_path": "user-123/p.png"}]
+
+    def test_store_concept_with_variations_function_missing(self, concept_storage: ConceptStorage) -> None:
+        """Test that a missing database function is detected once and then skipped."""
+        with patch("requests.post") as mock_post:
+            mock_post.return_value = MagicMock(status_code=404, text='{"code":"PGRST202"}')
+
+            assert concept_storage.store_concept_with_variations({"user_id": "user-123"}, []) is None
+            assert concept_storage.store_concept_with_variations({"user_id": "user-123"}, []) is None
+
+        assert mock_post.call_count == 1
+        assert concept_storage.create_concept_function_available is False
+
+    def test_store_concept_with_variations_server_error(self, concept_storage: ConceptStorage) -> None:
+        """Test that a failed call raises instead of falling back, and the function stays in use."""
+        with patch("requests.post") as mock_post:
+            mock_post.return_value = MagicMock(status_code=500, text='{"code":"23505","message":"duplicate key"}')
+
+            with pytest.raises(DatabaseTransactionError):
+                concept_storage.store_concept_with_variations({"user_id": "user-123"}, [])
+
+        assert concept_storage.create_concept_function_available is True
+
+    def test_store_concept_with_variations_timeout(self, concept_storage: ConceptStorage) -> None:
+        """Test that a call failing after it was sent (e.g. a timeout) raises, as it may have committed."""
+        with patch("requests.post", side_effect=TimeoutError("read timed out")):
+            with pytest.raises(DatabaseTransactionError):
+                concept_storage.store_concept_with_variations({"user_id": "user-123"}, [])
+
+
+MIGRATIONS_DIR = Path(__file__).parents[4] / "scripts" / "migrations"
+
+# Migrations defining create_concept_with_variations, applied in order (010 redefines it)
+CONCEPT_FUNCTION_MIGRATIONS = [
+    MIGRATIONS_DIR / "009_add_create_concept_with_variations.sql",
+    MIGRATIONS_DIR / "010_add_export_derivatives.sql",
+]
+
+# Minimal concept tables (and the Supabase roles the migrations grant to). The
+# concepts and color_variations tables 010 alters are created empty if missing,
+# as on a plain Postgres; the test tables have the columns after 010.
+TEST_SCHEMA = """
+DO $$ BEGIN
+  IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'service_role') THEN CREATE ROLE service_role; END IF;
+  IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'anon') THEN CREATE ROLE anon; END IF;
+  IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'authenticated') THEN CREATE ROLE authenticated; END IF;
+END $$;
+CREATE TABLE IF NOT EXISTS concepts (id UUID PRIMARY KEY DEFAULT gen_random_uuid());
+CREATE TABLE IF NOT EXISTS color_variations (id UUID PRIMARY KEY DEFAULT gen_random_uuid());
+DROP TABLE IF EXISTS color_variations_test, concepts_test;
+CREATE TABLE concepts_test (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+  user_id UUID NOT NULL,
+  logo_description TEXT NOT NULL,
+  theme_description TEXT NOT NULL,
+  image_path TEXT NOT NULL,
+  image_url TEXT,
+  is_anonymous BOOLEAN DEFAULT TRUE,
+  export_derivatives JSONB DEFAULT '{}'::jsonb
+);
+CREATE TABLE color_variations_test (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  concept_id UUID REFERENCES concepts_test(id) NOT NULL,
+  palette_name TEXT NOT NULL,
+  colors JSONB NOT NULL,
+  description TEXT,
+  image_path TEXT NOT NULL,
+  image_url TEXT,
+  export_derivatives JSONB DEFAULT '{}'::jsonb
+);
+"""
+
+
+@pytest.mark.skipif(not os.environ.get("CONCEPT_TEST_DATABASE_URL"), reason="CONCEPT_TEST_DATABASE_URL not set")
+class TestCreateConceptWithVariationsFunction:
+    """Runs the create_concept_with_variations function against a local Postgres.
+
+    Set CONCEPT_TEST_DATABASE_URL to a disposable Postgres database (e.g. a
+    `supabase start` or plain postgres container) and install psycopg to run
+    these tests.
+    """
+
+    @pytest.fixture
+    def connection(self) -> Iterator[Any]:
+        """Connect to the test database with minimal concept tables and the function installed."""
+        psycopg = pytest.importorskip("psycopg")
+        with psycopg.connect(os.environ["CONCEPT_TEST_DATABASE_URL"], autocommit=True) as conn:
+            conn.execute(TEST_SCHEMA)
+            for migration in CONCEPT_FUNCTION_MIGRATIONS:
+                conn.execute(migration.read_text())
+            yield conn
+            conn.execute("DROP TABLE IF EXISTS color_variations_test, concepts_test")
+
+    def _call(self, conn: Any, concept: dict, variations: list) -> Any:
+        from psycopg.types.json import Jsonb
+
+        row = conn.execute(
+            "SELECT public.create_concept_with_variations('concepts_test', 'color_variations_test', %s, %s)",
+            (Jsonb(concept), Jsonb(variations)),
+        ).fetchone()
+        return row[0]
+
+    def test_inserts_concept_and_variations(self, connection: Any) -> None:
+        """Test that the concept and its variations are returned together."""
+        concept = {"user_id": str(uuid.uuid4()), "logo_description": "logo", "theme_description": "theme", "image_path": "u/base.png"}
+        variations = [
+            {"palette_name": "Blue", "colors": ["#0000FF"], "image_path": "u/blue.png"},
+            {"palette_name": "Red", "colors": ["#FF0000"], "image_path": "u/red.png", "description": "warm"},
+        ]
+
+        result = self._call(connection, concept, variations)
+
+        assert result["is_anonymous"] is True
+        assert sorted(v["palette_name"] for v in result["color_variations"]) == ["Blue", "Red"]
+        assert all(v["concept_id"] == result["id"] for v in result["color_variations"])
+
+    def test_inserts_export_derivatives(self, connection: Any) -> None:
+        """Test that export derivatives are stored with the concept and its variations."""
+        derivatives = {"small.png": {"path": "u/base/small.png", "bytes": 1234}}
+        concept = {"user_id": str(uuid.uuid4()), "logo_description": "logo", "theme_description": "theme", "image_path": "u/base.png", "export_derivatives": derivatives}
+        variations = [
+            {"palette_name": "Blue", "colors": ["#0000FF"], "image_path": "u/blue.png", "export_derivatives": {"small.png": {"path": "u/blue/small.png", "bytes": 567}}},
+            {"palette_name": "Red", "colors": ["#FF0000"], "image_path": "u/red.png"},
+        ]
+
+        result = self._call(connection, concept, variations)
+
+        assert result["export_derivatives"] == derivatives
+        by_name = {v["palette_name"]: v for v in result["color_variations"]}
+        assert by_name["Blue"]["export_derivatives"] == {"small.png": {"path": "u/blue/small.png", "bytes": 567}}
+        assert by_name["Red"]["export_derivatives"] == {}
+        stored = connection.execute("SELECT export_derivatives FROM concepts_test WHERE id = %s", (result["id"],)).fetchone()[0]
+        assert stored == derivatives
+
+    def test_rolls_back_concept_when_a_variation_fails(self, connection: Any) -> None:
+        """Test that a failing variation leaves no concept behind."""
+        psycopg = pytest.importorskip("psycopg")
+        concept = {"user_id": str(uuid.uuid4()), "logo_description": "logo", "theme_description": "theme", "image_path": "u/base.png"}
+
+        with pytest.raises(psycopg.errors.NotNullViolation):
+            self._call(connection, concept, [{"palette_name": "Blue", "colors": ["#0000FF"]}])
+
+        assert connection.execute("SELECT count(*) FROM concepts_test").fetchone()[0] == 0
+
+    def test_rejects_unknown_tables(self, connection: Any) -> None:
+        """Test that only concept and variation tables can be targeted."""
+        psycopg = pytest.importorskip("psycopg")
+
+        with pytest.raises(psycopg.errors.RaiseException):
+            connection.execute("SELECT public.create_concept_with_variations('tasks', 'color_variations_test', '{}'::jsonb)")
+
+
 class TestDeleteAllConcepts:
     """Tests for the delete_all_concepts method."""
 
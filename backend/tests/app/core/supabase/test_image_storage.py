@@ -755,3 +755,37 @@ class TestCreateSignedUrl:
 
                 # Assert
                 assert result is None
+
+
+class TestCreateSignedUrls:
+    """Tests for the create_signed_urls method."""
+
+    def test_create_signed_urls_single_request(self, image_storage: ImageStorage) -> None:
+        """Test that all paths are signed in one request and failed entries are left out."""
+        paths = ["user-123/a/export_thumb.webp", "user-123/a/export_small.webp", "user-123/missing.webp"]
+
+        with patch("app.core.supabase.image_storage.create_supabase_jwt", return_value="fake-jwt-token"):
+            mock_response = MagicMock()
+            mock_response.status_code = 200
+            mock_response.json.return_value = [
+                {"path": paths[0], "signedURL": "/object/sign/palettes/a/export_thumb.webp?token=1", "error": None},
+                {"path": paths[1], "signedURL": "https://example.supabase.co/storage/v1/object/sign/palettes/b?token=2", "error": None},
+                {"path": paths[2], "signedURL": None, "error": "Either the object does not exist or you do not have access to it"},
+            ]
+            with patch("requests.post", return_value=mock_response) as mock_post:
+                result = image_storage.create_signed_urls(paths, "palettes", 3600)
+
+        mock_post.assert_called_once()
+        assert mock_post.call_args[0][0] == "https://example.supabase.co/storage/v1/object/sign/palettes"
+        assert mock_post.call_args.kwargs["json"] == {"expiresIn": 3600, "paths": paths}
+        assert result == {
+            paths[0]: "https://example.supabase.co/storage/v1/object/sign/palettes/a/export_thumb.webp?token=1",
+            paths[1]: "https://example.supabase.co/storage/v1/object/sign/palettes/b?token=2",
+        }
+
+    def test_create_signed_urls_rejects_mixed_users(self, image_storage: ImageStorage) -> None:
+        """Test that a batch spanning several users is not signed."""
+        with patch("requests.post") as mock_post:
+            assert image_storage.create_signed_urls(["user-1/a.png", "user-2/b.png"], "concepts") == {}
+
+        mock_post.assert_not_called()
@@ -0,0 +1,36 @@
+"""Tests for the in-process metrics registry."""
+
+from app.core.metrics import MetricsRegistry
+
+
+def test_counters_and_timings() -> None:
+    """Test that counters add up and timings keep count, total and max."""
+    registry = MetricsRegistry()
+
+    registry.increment("cache.hit")
+    registry.increment("cache.hit", 2)
+    registry.observe("wait_seconds", 0.5)
+    registry.observe("wait_seconds", 1.5)
+
+    assert registry.get_counter("cache.hit") == 3
+    assert registry.get_counter("cache.miss") == 0
+    assert registry.snapshot() == {
+        "counters": {"cache.hit": 3},
+        "timings": {"wait_seconds": {"count": 2, "total": 2.0, "max": 1.5}},
+        "histograms": {},
+    }
+
+    registry.reset()
+    assert registry.snapshot() == {"counters": {}, "timings": {}, "histograms": {}}
+
+
+def test_histograms() -> None:
+    """Test that histogram buckets count the observations up to their bound."""
+    registry = MetricsRegistry()
+
+    for value in (0.2, 1.0, 3.0, 500.0):
+        registry.observe_histogram("latency_seconds", value, buckets=(1.0, 5.0))
+
+    assert registry.get_histogram("latency_seconds") == {"buckets": {"1": 2, "5": 3, "+Inf": 4}, "count": 4, "total": 504.2}
+    assert registry.get_histogram("other") == {}
+    assert registry.snapshot()["histograms"]["latency_seconds"]["count"] == 4
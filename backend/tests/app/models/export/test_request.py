@@ -162,3 +162,43 @@ class TestExportRequest:
             storage_bucket="concept-images",
         )
         assert request.target_size == "original"
+
+    def test_optimization_constraints(self) -> None:
+        """Test that byte budgets and quality floors are accepted for raster exports."""
+        request = ExportRequest(
+            image_identifier="user-123/concepts/logo.png",
+            target_format="jpg",
+            target_size="small",
+            svg_params=None,
+            storage_bucket="concept-images",
+            max_bytes=50_000,
+            min_quality=0.95,
+            allow_format_change=True,
+        )
+        assert request.max_bytes == 50_000
+        assert request.min_quality == 0.95
+        assert request.allow_format_change is True
+
+    def test_optimization_constraints_rejected_for_svg(self) -> None:
+        """Test that SVG exports cannot carry a byte budget."""
+        with pytest.raises(ValidationError):
+            ExportRequest(
+                image_identifier="user-123/concepts/logo.png",
+                target_format="svg",
+                target_size="original",
+                svg_params=None,
+                storage_bucket="concept-images",
+                max_bytes=50_000,
+            )
+
+    def test_invalid_min_quality(self) -> None:
+        """Test that quality floors above 1 are rejected."""
+        with pytest.raises(ValidationError):
+            ExportRequest(
+                image_identifier="user-123/concepts/logo.png",
+                target_format="png",
+                target_size="original",
+                svg_params=None,
+                storage_bucket="concept-images",
+                min_quality=1.5,
+            )
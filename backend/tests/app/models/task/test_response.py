@@ -2,7 +2,10 @@
 
 from typing import Any, Dict
 
-from app.models.task.response import TaskResponse
+import pytest
+from pydantic import ValidationError
+
+from app.models.task.response import TaskProgress, TaskResponse
 
 
 class TestTaskResponse:
@@ -140,3 +143,29 @@ class TestTaskResponse:
         assert original_concept.get("id") == "concept-789"
         assert refinement_options.get("preserve_aspects") == ["colors", "layout"]
         assert user_preferences.get("style") == "modern"
+
+    def test_processing_task_response_with_progress(self) -> None:
+        """Test a running task carries progress and partial variations."""
+        response = TaskResponse(
+            task_id="task-123",
+            status="processing",
+            type="concept_generation",
+            message="Task is processing",
+            image_url="https://example.com/base.png",
+            progress=TaskProgress(
+                stage="creating_variations",
+                percent=55,
+                image_url="https://example.com/base.png",
+                variations=[{"index": 0, "name": "Ocean", "colors": ["#003366"], "image_url": "https://example.com/v0.png"}],
+            ),
+        )
+        assert response.progress is not None
+        assert response.progress.stage == "creating_variations"
+        assert response.progress.percent == 55
+        assert response.progress.variations[0].name == "Ocean"
+        assert response.progress.variations[0].image_path is None
+
+    def test_progress_percent_out_of_range(self) -> None:
+        """Test progress percent must stay within 0-100."""
+        with pytest.raises(ValidationError):
+            TaskProgress(stage="storing_concept", percent=120)
@@ -4,8 +4,8 @@ This module tests the ConceptService class, mocking out all external dependencie
 to verify correct calls and data flow.
 """
 
-import unittest
-from typing import Any, cast
+from pathlib import Path
+from typing import Any
 from unittest.mock import AsyncMock, patch
 
 import pytest
@@ -19,18 +19,6 @@ BASE64_IMAGE_DATA = "SGVsbG8sIHRoaXMgaXMgYSB0ZXN0IGJhc2U2NCBzdHJpbmcu"
 
 
 # Helper functions for download tests
-async def mock_download_image_file_helper(self: Any, image_url: str, mock_exists: AsyncMock, mock_open: AsyncMock) -> bytes:
-    """Helper function for mock_download_image in the file test."""
-    if image_url.startswith("file://"):
-        file_path = image_url[7:]  # Remove file:// prefix
-        mock_exists(file_path)  # Ensure mock_exists is called with the file path
-        if mock_exists.return_value:
-            with mock_open(file_path, "rb") as f:
-                file_content = f.read()
-                return cast(bytes, file_content)
-    return b""
-
-
 async def mock_download_image_error_helper(self: Any, image_url: str) -> bytes | None:
     """Helper function for mock_download_image in the error test."""
     if image_url == "https://example.com/error.png":
@@ -221,6 +209,17 @@ class TestConceptService:
         assert result["logo_description"] == logo_prompt
         assert result["theme_description"] == theme_prompt
 
+    @pytest.mark.asyncio
+    async def test_generate_concept_binary_response_kept_in_memory(self, concept_service: ConceptService, mock_client: AsyncMock) -> None:
+        """Test image bytes returned by the API are passed on without a download."""
+        mock_client.generate_image.return_value = {"id": "resp123", "binary_data": b"\x89PNG generated"}
+
+        result = await concept_service.generate_concept("a red car", "modern", user_id="user-123", skip_persistence=True)
+
+        assert result["image_data"] == b"\x89PNG generated"
+        assert result["image_url"] is None
+        concept_service._download_image.assert_not_called()  # type: ignore[attr-defined]
+
     @pytest.mark.asyncio
     async def test_generate_concept_error_handling(self, concept_service: ConceptService, mock_client: AsyncMock) -> None:
         """Test error handling when generating a concept."""
@@ -410,45 +409,24 @@ class TestConceptService:
         assert result == b"image_from_url"
 
     @pytest.mark.asyncio
-    @patch("os.path.exists")
-    @patch(
-        "builtins.open",
-        new_callable=unittest.mock.mock_open,
-        read_data=b"image_from_file",
-    )
-    async def test_download_image_file(self, mock_open: AsyncMock, mock_exists: AsyncMock, concept_service: ConceptService) -> None:
-        """Test _download_image with a file path."""
-        # Simplified approach: directly mock the method and test the call path
-        mock_download = AsyncMock(return_value=b"image_from_file")
-        setattr(concept_service, "_download_image", mock_download)
-
-        # Setup mock for exists to return True
-        mock_exists.return_value = True
-
-        # Create a method to test file handling that uses the mocks
-        async def handle_file_url(url: str) -> bytes:
-            """Test helper that mimics what the real method would do."""
-            if url.startswith("file://"):
-                file_path = url[7:]  # Remove file:// prefix
-                exists = mock_exists(file_path)
-                if exists:
-                    with mock_open(file_path, "rb") as f:
-                        file_content = f.read()
-                        return cast(bytes, file_content)
-            return b""
-
-        # Set up our download mock to use the test helper
-        mock_download.side_effect = handle_file_url
-
-        # Call the method with a file:// URL
-        file_path = "/path/to/image.png"
-        file_url = f"file://{file_path}"
-        result = await concept_service._download_image(file_url)
+    async def test_download_image_does_not_read_local_files(self, concept_service: ConceptService, tmp_path: Path) -> None:
+        """Test a file:// URL is not read from, or deleted on, the local disk."""
+        local_file = tmp_path / "image.png"
+        local_file.write_bytes(b"local image")
 
-        # Verify the result
-        mock_exists.assert_called_once_with(file_path)
-        mock_open.assert_called_once_with(file_path, "rb")
-        assert result == b"image_from_file"
+        # The fixture replaces _download_image, so call the real method
+        with pytest.raises(IOError):
+            await ConceptService._download_image(concept_service, f"file://{local_file}")
+
+        assert local_file.read_bytes() == b"local image"
+
+    @pytest.mark.asyncio
+    async def test_apply_palette_to_concept_requires_user(self, concept_service: ConceptService) -> None:
+        """Test a recolored image is not written to a temporary file without a user to store it for."""
+        concept_service.image_service.apply_palette_to_image.return_value = b"recolored"  # type: ignore[attr-defined]
+
+        with pytest.raises(ConceptError):
+            await concept_service.apply_palette_to_concept("https://example.com/image.png", ["#112233"])
 
     @pytest.mark.asyncio
     @patch("httpx.AsyncClient")
@@ -4,13 +4,19 @@ This module tests the PaletteGenerator class which is responsible for
 generating color palettes.
 """
 
-from unittest.mock import AsyncMock
+import asyncio
+from typing import Any, Dict, List
+from unittest.mock import AsyncMock, patch
 
+import httpx
 import pytest
 
-from app.core.exceptions import ConceptError, JigsawStackError
+from app.core.exceptions import ConceptError, JigsawStackCircuitOpenError, JigsawStackError, JigsawStackGenerationError
+from app.core.metrics import metrics
 from app.services.concept.palette import PaletteGenerator
+from app.services.concept.palette_cache import PaletteCache
 from app.services.jigsawstack.client import JigsawStackClient
+from app.services.jigsawstack.retry import RetryEngine, RetryPolicy
 
 
 class TestPaletteGenerator:
@@ -78,11 +84,13 @@ class TestPaletteGenerator:
             num_palettes=num_palettes,
         )
 
-        # Verify correct call was made to generate_multiple_palettes
+        # Verify correct call was made to generate_multiple_palettes, with the extra candidates
         mock_client.generate_multiple_palettes.assert_called_once_with(
             logo_description=logo_description,
             theme_description=theme_description,
-            num_palettes=num_palettes,
+            num_palettes=num_palettes + generator.extra_candidates,
+            min_palettes=0,
+            use_defaults=False,
         )
 
         # Verify the result
@@ -119,12 +127,25 @@ class TestPaletteGenerator:
         mock_client.generate_multiple_palettes.assert_called_once_with(
             logo_description="",
             theme_description=theme_description,
-            num_palettes=num_palettes,
+            num_palettes=num_palettes + generator.extra_candidates,
+            min_palettes=0,
+            use_defaults=False,
         )
 
         # Verify the result is still as expected
         assert len(result) == 3
 
+    @pytest.mark.asyncio
+    async def test_generate_palettes_cached(self, mock_client: AsyncMock) -> None:
+        """Test that a resubmitted description pair is served from the palette cache."""
+        generator = PaletteGenerator(mock_client, cache=PaletteCache())
+
+        first = await generator.generate_palettes(theme_description="Modern, sleek, blue theme", logo_description="A tech logo")
+        second = await generator.generate_palettes(theme_description="  modern, SLEEK,  blue theme ", logo_description="a tech logo")
+
+        mock_client.generate_multiple_palettes.assert_called_once()
+        assert second == first
+
     @pytest.mark.asyncio
     async def test_generate_palettes_jigsawstack_error(self, generator: PaletteGenerator, mock_client: AsyncMock) -> None:
         """Test generate_palettes with JigsawStackError."""
@@ -135,6 +156,134 @@ class TestPaletteGenerator:
         with pytest.raises(JigsawStackError):
             await generator.generate_palettes(theme_description="A theme", logo_description="A logo")
 
+    @pytest.mark.asyncio
+    async def test_generate_palettes_keeps_best_candidates(self, mock_client: AsyncMock) -> None:
+        """Test extra candidates are requested and the lowest contrast ones dropped."""
+        flat = {"name": "Flat Gray", "colors": ["#777777", "#787878", "#797979", "#7A7A7A", "#7B7B7B"], "description": "Low contrast"}
+        mock_client.generate_multiple_palettes.return_value = [flat] + mock_client.generate_multiple_palettes.return_value
+        generator = PaletteGenerator(mock_client, extra_candidates=1)
+
+        result = await generator.generate_palettes(theme_description="A theme", num_palettes=3)
+
+        assert mock_client.generate_multiple_palettes.call_args.kwargs["num_palettes"] == 4
+        assert len(result) == 3
+        assert flat not in result
+
+    @pytest.mark.asyncio
+    async def test_generate_palettes_over_budget_falls_back(self, mock_client: AsyncMock) -> None:
+        """Test local palettes are returned when the API is over its budget, and the late call cancelled."""
+        cancelled = asyncio.Event()
+
+        async def slow_palettes(**kwargs: Any) -> List[Dict[str, Any]]:
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+            return []
+
+        mock_client.generate_multiple_palettes.side_effect = slow_palettes
+        generator = PaletteGenerator(mock_client, cache=PaletteCache(), latency_budget_seconds=0.05)
+
+        fallback = await generator.generate_palettes(theme_description="Forest green", logo_description="A fox", num_palettes=3)
+
+        assert len(fallback) == 3
+        assert fallback[0]["name"] == "Complementary Green"
+        assert cancelled.is_set()
+
+    @pytest.mark.asyncio
+    async def test_generate_palettes_unavailable_falls_back(self, generator: PaletteGenerator, mock_client: AsyncMock) -> None:
+        """Test local palettes are returned when the API is unavailable, unless the fallback is disabled."""
+        mock_client.generate_multiple_palettes.side_effect = JigsawStackCircuitOpenError("Circuit open")
+
+        palettes = await generator.generate_palettes(theme_description="A theme", num_palettes=2)
+
+        assert len(palettes) == 2
+        with pytest.raises(JigsawStackCircuitOpenError):
+            await PaletteGenerator(mock_client, local_fallback=False).generate_palettes(theme_description="A theme")
+
+    @pytest.mark.asyncio
+    async def test_generate_palettes_fallback_reuses_local_palettes(self, generator: PaletteGenerator, mock_client: AsyncMock) -> None:
+        """Test the fallback returns palettes already being derived instead of deriving them again."""
+        mock_client.generate_multiple_palettes.side_effect = JigsawStackCircuitOpenError("Circuit open")
+        preview = [{"name": "Preview", "colors": ["#112233", "#FFFFFF"], "description": "From the preview"}]
+
+        async def derived() -> List[Dict[str, Any]]:
+            return preview
+
+        with patch("app.services.concept.palette.generate_palettes_from_image") as mock_from_image:
+            palettes = await generator.generate_palettes(theme_description="A theme", num_palettes=1, base_image=b"image", local_palettes=derived())
+
+        assert palettes == preview
+        mock_from_image.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_generate_palettes_failed_generation_uses_image_palettes(self, generator: PaletteGenerator, mock_client: AsyncMock) -> None:
+        """Test palettes derived from the base image are returned when the API answers with an error."""
+        mock_client.generate_multiple_palettes.side_effect = JigsawStackGenerationError("Status 503", content_type="palette")
+        derived = [{"name": "From the image", "colors": ["#112233", "#FFFFFF"], "description": "Derived"}]
+
+        with patch("app.services.concept.palette.generate_palettes_from_image", AsyncMock(return_value=derived)) as mock_from_image:
+            palettes = await generator.generate_palettes(theme_description="A theme", num_palettes=1, base_image=b"image")
+
+        assert palettes == derived
+        mock_from_image.assert_awaited_once()
+        assert mock_from_image.call_args.args[:2] == (b"image", 1)
+        assert metrics.get_counter("palettes.local_fallback.failed") >= 1
+
+    @pytest.mark.asyncio
+    async def test_generate_palettes_failed_generation_without_local_fallback(self, mock_client: AsyncMock) -> None:
+        """Test the client's default palettes are returned when the API fails and the local fallback is disabled."""
+        mock_client.generate_multiple_palettes.side_effect = JigsawStackGenerationError("Status 503", content_type="palette")
+        defaults = [{"name": "Primary Palette", "colors": ["#4F46E5"], "description": "Default"}]
+        mock_client.get_default_palettes.return_value = defaults
+
+        palettes = await PaletteGenerator(mock_client, local_fallback=False).generate_palettes(theme_description="A theme", logo_description="A logo", num_palettes=1)
+
+        assert palettes == defaults
+        mock_client.get_default_palettes.assert_called_once_with(1, "A logo", "A theme")
+
+    @pytest.mark.asyncio
+    async def test_generate_palettes_pads_short_answer_after_ranking(self, mock_client: AsyncMock) -> None:
+        """Test a short answer is filled in with local palettes placed after the returned ones."""
+        returned = mock_client.generate_multiple_palettes.return_value[:2]
+        mock_client.generate_multiple_palettes.return_value = returned
+        generator = PaletteGenerator(mock_client, local_fallback=True, extra_candidates=2)
+
+        palettes = await generator.generate_palettes(theme_description="Forest green", num_palettes=3)
+
+        assert len(palettes) == 3
+        assert palettes[:2] == returned
+
+    @pytest.mark.asyncio
+    async def test_generate_palettes_does_not_cache_failed_answers(self) -> None:
+        """Test a failed answer is not cached, so the next request reaches the API again."""
+        answers = [
+            httpx.Response(503, text="Service unavailable"),
+            httpx.Response(200, json={"success": True, "result": [{"name": "Ocean", "colors": ["#003366", "#FFFFFF"], "description": "Blues"}]}),
+        ]
+        requests: List[httpx.Request] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            return answers[len(requests) - 1]
+
+        client = JigsawStackClient(
+            api_key="key",
+            api_url="https://api.example.com",
+            retry_engine=RetryEngine(RetryPolicy(max_attempts=1)),
+            transport=httpx.MockTransport(handler),
+            max_response_bytes=1024 * 1024,
+        )
+        generator = PaletteGenerator(client, cache=PaletteCache(), local_fallback=False, extra_candidates=0)
+
+        first = await generator.generate_palettes(theme_description="ocean", logo_description="logo", num_palettes=1)
+        second = await generator.generate_palettes(theme_description="ocean", logo_description="logo", num_palettes=1)
+
+        assert len(requests) == 2
+        assert first[0]["name"] == "Primary Palette"
+        assert second[0]["name"] == "Ocean"
+
     @pytest.mark.asyncio
     async def test_generate_palettes_generic_error(self, generator: PaletteGenerator, mock_client: AsyncMock) -> None:
         """Test generate_palettes with a generic error."""
@@ -0,0 +1,153 @@
+"""Tests for the palette response cache."""
+
+import asyncio
+import copy
+import json
+from typing import Any, Dict, List
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.core.metrics import metrics
+from app.services.concept.palette_cache import PaletteCache, normalize_description
+
+PALETTES: List[Dict[str, Any]] = [{"name": "Ocean", "colors": ["#003366", "#336699", "#6699CC", "#99CCFF", "#FFFFFF"], "description": "Calm blues"}]
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics() -> None:
+    """Start each test with empty metrics."""
+    metrics.reset()
+
+
+class FakeRedis:
+    """In-memory stand-in for the synchronous Redis client."""
+
+    def __init__(self) -> None:
+        """Initialize an empty store."""
+        self.values: Dict[str, str] = {}
+        self.expiries: Dict[str, int] = {}
+
+    def get(self, key: str) -> Any:
+        """Get a value."""
+        return self.values.get(key)
+
+    def set(self, key: str, value: str, ex: int) -> bool:
+        """Set a value with an expiry."""
+        self.values[key] = value
+        self.expiries[key] = ex
+        return True
+
+
+def test_normalize_description() -> None:
+    """Test that case and whitespace are folded, and stop words only stripped on request."""
+    assert normalize_description("  A Modern\tTech   LOGO ") == "a modern tech logo"
+    assert normalize_description("A modern, minimal logo for the brand!", strip_stop_words=True) == "modern minimal logo brand"
+
+
+def test_make_key() -> None:
+    """Test that keys ignore case and whitespace but not the number of palettes."""
+    cache = PaletteCache()
+
+    key = cache.make_key("Tech Logo", "Blue  theme", 7)
+
+    assert key == cache.make_key(" tech logo", "BLUE theme ", 7)
+    assert key != cache.make_key("tech logo", "blue theme", 5)
+    assert key != cache.make_key("the tech logo", "blue theme", 7)
+    assert PaletteCache(strip_stop_words=True).make_key("the tech logo", "a blue theme.", 7) == PaletteCache(strip_stop_words=True).make_key("tech logo", "blue theme", 7)
+
+
+@pytest.mark.asyncio
+async def test_miss_then_hit() -> None:
+    """Test that palettes are generated once and returned as copies afterwards."""
+    cache = PaletteCache()
+    generate = AsyncMock(side_effect=lambda: copy.deepcopy(PALETTES))
+
+    first = await cache.get_or_generate("logo", "theme", 1, generate)
+    first[0]["name"] = "Changed by the caller"
+    second = await cache.get_or_generate("Logo", "Theme", 1, generate)
+
+    generate.assert_awaited_once()
+    assert second == PALETTES
+    assert metrics.get_counter("palette_cache.miss") == 1
+    assert metrics.get_counter("palette_cache.hit.local") == 1
+
+
+@pytest.mark.asyncio
+async def test_redis_tier_is_shared() -> None:
+    """Test that an entry written by one instance is served to another through Redis."""
+    redis_client = FakeRedis()
+    writer, reader = PaletteCache(redis_client, ttl_seconds=60, stale_seconds=30), PaletteCache(redis_client)
+
+    await writer.get_or_generate("logo", "theme", 1, AsyncMock(return_value=PALETTES))
+    generate = AsyncMock()
+    result = await reader.get_or_generate("logo", "theme", 1, generate)
+
+    generate.assert_not_called()
+    assert result == PALETTES
+    assert metrics.get_counter("palette_cache.hit.redis") == 1
+    assert list(redis_client.expiries.values()) == [90]
+    assert json.loads(next(iter(redis_client.values.values())))["palettes"] == PALETTES
+
+
+@pytest.mark.asyncio
+async def test_stale_entry_served_while_refreshing_once() -> None:
+    """Test that stale entries are returned at once and refreshed by a single background call."""
+    cache = PaletteCache(ttl_seconds=60, stale_seconds=60)
+    key = cache.make_key("logo", "theme", 1)
+    refreshed = [{**PALETTES[0], "name": "Refreshed"}]
+    generate = AsyncMock(return_value=refreshed)
+
+    with patch("app.services.concept.palette_cache.time.time", return_value=1000.0):
+        await cache.put(key, PALETTES)
+    with patch("app.services.concept.palette_cache.time.time", return_value=1090.0):
+        results = await asyncio.gather(*(cache.get_or_generate("logo", "theme", 1, generate) for _ in range(3)))
+        await cache.wait_for_refreshes()
+        after = await cache.get_or_generate("logo", "theme", 1, generate)
+
+    assert results == [PALETTES] * 3
+    generate.assert_awaited_once()
+    assert after == refreshed
+    assert metrics.get_counter("palette_cache.stale.local") == 3
+    assert metrics.get_counter("palette_cache.refreshed") == 1
+
+
+@pytest.mark.asyncio
+async def test_expired_entry_is_regenerated() -> None:
+    """Test that entries past the stale grace period are treated as misses."""
+    cache = PaletteCache(ttl_seconds=60, stale_seconds=60)
+    generate = AsyncMock(return_value=PALETTES)
+
+    with patch("app.services.concept.palette_cache.time.time", return_value=1000.0):
+        await cache.get_or_generate("logo", "theme", 1, generate)
+    with patch("app.services.concept.palette_cache.time.time", return_value=1121.0):
+        await cache.get_or_generate("logo", "theme", 1, generate)
+
+    assert generate.await_count == 2
+    assert metrics.get_counter("palette_cache.miss") == 2
+
+
+@pytest.mark.asyncio
+async def test_redis_errors_fall_back_to_generation() -> None:
+    """Test that Redis failures are logged and the palettes still generated."""
+    redis_client = MagicMock()
+    redis_client.get.side_effect = ConnectionError("Redis down")
+    redis_client.set.side_effect = ConnectionError("Redis down")
+    generate = AsyncMock(return_value=PALETTES)
+
+    result = await PaletteCache(redis_client).get_or_generate("logo", "theme", 1, generate)
+
+    assert result == PALETTES
+    generate.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_empty_results_are_not_cached() -> None:
+    """Test that an empty response is not cached."""
+    cache = PaletteCache()
+    generate = AsyncMock(return_value=[])
+
+    await cache.get_or_generate("logo", "theme", 1, generate)
+    await cache.get_or_generate("logo", "theme", 1, generate)
+
+    assert generate.await_count == 2
@@ -0,0 +1,70 @@
+"""Tests for pre-rendered export derivatives."""
+
+from io import BytesIO
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from PIL import Image
+
+from app.services.export.derivatives import ExportDerivativeRenderer, derivative_path, fit_size, render_derivative_grids, render_export_derivatives
+from app.services.export.pool import ExportProcessPool
+
+
+@pytest.fixture
+def wide_png() -> bytes:
+    """Create a transparent 400x200 PNG."""
+    buffer = BytesIO()
+    Image.new("RGBA", (400, 200), (255, 0, 0, 128)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_derivative_path() -> None:
+    """Test that derivatives are stored next to the original image."""
+    assert derivative_path("user-1/20240101_abc.png", "small", "jpg") == "user-1/20240101_abc/export_small.jpg"
+
+
+def test_render_export_derivatives(wide_png: bytes) -> None:
+    """Test that every size and format is rendered with the export fit."""
+    rendered = render_export_derivatives(wide_png, {"small": 100, "medium": 300}, ("png", "jpg"))
+
+    assert set(rendered) == {"small.png", "small.jpg", "medium.png", "medium.jpg"}
+    with Image.open(BytesIO(rendered["small.png"])) as image:
+        # A single-color image is written as lossless PNG8
+        assert (image.format, image.size, image.mode) == ("PNG", (100, 50), "P")
+        assert image.convert("RGBA").getpixel((0, 0)) == (255, 0, 0, 128)
+    with Image.open(BytesIO(rendered["medium.jpg"])) as image:
+        assert (image.format, image.size, image.mode) == ("JPEG", (300, 150), "RGB")
+
+
+def test_fit_size() -> None:
+    """Test that the longest side becomes the box size."""
+    assert fit_size(400, 200, 100) == (100, 50)
+    assert fit_size(200, 400, 100) == (50, 100)
+    assert fit_size(300, 300, 1000) == (1000, 1000)
+
+
+def test_render_derivative_grids_renders_delivery_formats(wide_png: bytes) -> None:
+    """Test that the browser siblings are rendered alongside the export sizes."""
+    rendered = render_derivative_grids(wide_png, [({"small": 100}, ("png",)), ({"thumb": 50, "small": 100}, ("webp", "png"))])
+
+    assert set(rendered) == {"small.png", "thumb.webp", "thumb.png", "small.webp"}
+    with Image.open(BytesIO(rendered["thumb.webp"])) as image:
+        assert (image.format, image.size) == ("WEBP", (50, 25))
+
+
+@pytest.mark.asyncio
+async def test_prerender_uploads_derivatives(wide_png: bytes) -> None:
+    """Test that the renderer uploads each derivative and returns their record."""
+    persistence = MagicMock()
+    persistence.store_image_at_path = AsyncMock(side_effect=lambda image_data, path, **kwargs: path)
+    renderer = ExportDerivativeRenderer(persistence, ExportProcessPool(max_workers=0, timeout_seconds=30), sizes={"small": 100}, formats=("png", "jpg"))
+
+    record = await renderer.prerender(wide_png, "user-1/logo.png", "user-1", is_palette=True)
+
+    assert set(record) == {"small.png", "small.jpg"}
+    assert record["small.jpg"]["path"] == "user-1/logo/export_small.jpg"
+    assert record["small.jpg"]["bytes"] > 0
+    assert (record["small.jpg"]["width"], record["small.jpg"]["height"]) == (100, 50)
+    calls = {call.kwargs["path"]: call.kwargs for call in persistence.store_image_at_path.await_args_list}
+    assert calls["user-1/logo/export_small.jpg"]["content_type"] == "image/jpeg"
+    assert calls["user-1/logo/export_small.png"]["is_palette"] is True
@@ -0,0 +1,210 @@
+"""Tests for the export result cache.
+
+This module tests the disk and bucket tiers of the export cache and how
+lookups move between them.
+"""
+
+import os
+import time
+from pathlib import Path
+from typing import Dict, Optional
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.core.metrics import metrics
+from app.services.export.cache import CacheHit, DiskExportCacheTier, ExportCache, ExportCacheTier
+
+
+class FakeBucketTier(ExportCacheTier):
+    """Bucket tier kept in a dictionary."""
+
+    name = "bucket"
+
+    def __init__(self) -> None:
+        self.objects: Dict[str, bytes] = {}
+
+    def get(self, key: str) -> Optional[CacheHit]:
+        data = self.objects.get(key)
+        return CacheHit(tier=self.name, size=len(data), data=data) if data is not None else None
+
+    def put(self, key: str, data: bytes) -> None:
+        self.objects[key] = data
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics() -> None:
+    """Start every test with empty metrics."""
+    metrics.reset()
+
+
+@pytest.fixture
+def disk_tier(tmp_path: Path) -> DiskExportCacheTier:
+    """Create a disk tier of 100 bytes with a one hour TTL."""
+    return DiskExportCacheTier(str(tmp_path), max_bytes=100, ttl_seconds=3600)
+
+
+class TestCacheKey:
+    """Tests for ExportCache.make_key."""
+
+    def test_key_depends_on_source_and_parameters(self) -> None:
+        """Test that the key changes with the source content and each parameter."""
+        key = ExportCache.make_key(b"source", format="png", size="small", svg_params=None)
+
+        assert key == ExportCache.make_key(b"source", size="small", format="png", svg_params=None)
+        assert key != ExportCache.make_key(b"other", format="png", size="small", svg_params=None)
+        assert key != ExportCache.make_key(b"source", format="jpg", size="small", svg_params=None)
+        assert key != ExportCache.make_key(b"source", format="png", size="small", svg_params={"mode": "color"})
+
+
+class TestDiskExportCacheTier:
+    """Tests for the disk tier."""
+
+    def test_put_then_get_streams_file(self, disk_tier: DiskExportCacheTier) -> None:
+        """Test that a stored export is returned as an open file."""
+        disk_tier.put("key1", b"exported")
+
+        hit = disk_tier.get("key1")
+
+        assert hit is not None
+        assert hit.file is not None
+        assert hit.size == 8
+        assert b"".join(hit.iter_chunks(chunk_size=3)) == b"exported"
+        assert hit.file.closed
+
+    def test_expired_entry_is_removed(self, disk_tier: DiskExportCacheTier, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Test that an entry older than the TTL is not served."""
+        disk_tier.put("key1", b"exported")
+        future = time.time() + 7200
+        monkeypatch.setattr("app.services.export.cache.time.time", lambda: future)
+
+        assert disk_tier.get("key1") is None
+        assert not os.path.exists(os.path.join(disk_tier.directory, "key1.bin"))
+        assert disk_tier.total_bytes == 0
+
+    def test_evicts_least_recently_used_over_budget(self, disk_tier: DiskExportCacheTier) -> None:
+        """Test that the least recently used entries are evicted when over max_bytes."""
+        disk_tier.put("a", b"x" * 40)
+        disk_tier.put("b", b"x" * 40)
+        hit = disk_tier.get("a")  # "a" is now more recent than "b"
+        assert hit is not None
+        hit.read()
+
+        disk_tier.put("c", b"x" * 40)
+
+        assert disk_tier.get("b") is None
+        assert disk_tier.get("a") is not None
+        assert disk_tier.get("c") is not None
+        assert disk_tier.total_bytes == 80
+        assert metrics.get_counter("export_cache.evicted.disk") == 1
+
+    def test_put_expires_old_entries_without_stat(self, disk_tier: DiskExportCacheTier, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Test that writes expire entries from their recorded write times."""
+        disk_tier.put("old", b"x" * 10)
+        disk_tier.put("fresh", b"x" * 10)
+        future = time.time() + 7200
+        monkeypatch.setattr("app.services.export.cache.time.time", lambda: future)
+
+        with patch("app.services.export.cache.os.stat", side_effect=AssertionError("entries should not be stat'ed")):
+            disk_tier.put("new", b"x" * 10)
+
+        assert disk_tier.total_bytes == 10
+        assert not os.path.exists(os.path.join(disk_tier.directory, "old.bin"))
+        assert not os.path.exists(os.path.join(disk_tier.directory, "fresh.bin"))
+        assert metrics.get_counter("export_cache.expired.disk") == 2
+
+    def test_expiry_uses_recorded_write_time(self, disk_tier: DiskExportCacheTier) -> None:
+        """Test that reads expire entries by the same write time as writes do."""
+        disk_tier.put("key1", b"exported")
+        old = time.time() - 7200
+        os.utime(os.path.join(disk_tier.directory, "key1.bin"), (old, old))
+
+        assert disk_tier.get("key1") is not None
+
+    def test_file_from_another_process_is_counted(self, disk_tier: DiskExportCacheTier) -> None:
+        """Test that a file written by another process counts towards the budget once read."""
+        disk_tier.put("a", b"x" * 40)
+        with open(os.path.join(disk_tier.directory, "shared.bin"), "wb") as shared:
+            shared.write(b"x" * 30)
+
+        hit = disk_tier.get("shared")
+        assert hit is not None
+        hit.read()
+        assert disk_tier.total_bytes == 70
+
+        disk_tier.put("b", b"x" * 40)
+
+        # "a", the least recently used, was evicted to fit "b"
+        assert disk_tier.total_bytes == 70
+        assert disk_tier.get("a") is None
+        on_disk = sum(os.path.getsize(os.path.join(disk_tier.directory, name)) for name in os.listdir(disk_tier.directory))
+        assert disk_tier.total_bytes == on_disk
+
+    def test_open_file_survives_eviction(self, disk_tier: DiskExportCacheTier) -> None:
+        """Test that a response streaming an entry is not cut off by its eviction."""
+        disk_tier.put("a", b"a" * 60)
+        hit = disk_tier.get("a")
+        assert hit is not None
+
+        disk_tier.put("b", b"b" * 60)
+
+        assert hit.read() == b"a" * 60
+
+    def test_indexes_existing_files(self, tmp_path: Path) -> None:
+        """Test that files left by an earlier process count towards the budget."""
+        DiskExportCacheTier(str(tmp_path), max_bytes=100, ttl_seconds=3600).put("a", b"x" * 70)
+
+        tier = DiskExportCacheTier(str(tmp_path), max_bytes=100, ttl_seconds=3600)
+        tier.put("b", b"x" * 70)
+
+        assert tier.get("a") is None
+        assert tier.get("b") is not None
+
+
+class TestExportCache:
+    """Tests for lookups across tiers."""
+
+    @pytest.mark.asyncio
+    async def test_miss_then_disk_hit(self, disk_tier: DiskExportCacheTier) -> None:
+        """Test that a stored export is served from disk and counted."""
+        cache = ExportCache(disk=disk_tier)
+
+        assert await cache.get("key1") is None
+        await cache.put("key1", b"exported")
+        hit = await cache.get("key1")
+
+        assert hit is not None
+        assert hit.tier == "disk"
+        assert hit.read() == b"exported"
+        assert metrics.get_counter("export_cache.miss") == 1
+        assert metrics.get_counter("export_cache.hit.disk") == 1
+
+    @pytest.mark.asyncio
+    async def test_bucket_hit_fills_disk(self, disk_tier: DiskExportCacheTier) -> None:
+        """Test that an export found in the bucket is copied to the disk tier."""
+        bucket = FakeBucketTier()
+        bucket.objects["key1"] = b"shared"
+        cache = ExportCache(disk=disk_tier, bucket=bucket)
+
+        hit = await cache.get("key1")
+        assert hit is not None
+        assert hit.tier == "bucket"
+        assert hit.data == b"shared"
+
+        hit = await cache.get("key1")
+        assert hit is not None
+        assert hit.tier == "disk"
+        assert metrics.get_counter("export_cache.hit.bucket") == 1
+
+    @pytest.mark.asyncio
+    async def test_tier_errors_are_not_raised(self, disk_tier: DiskExportCacheTier) -> None:
+        """Test that a failing tier is treated as a miss."""
+        bucket = MagicMock(spec=ExportCacheTier)
+        bucket.name = "bucket"
+        bucket.get.side_effect = RuntimeError("storage down")
+        bucket.put.side_effect = RuntimeError("storage down")
+        cache = ExportCache(disk=disk_tier, bucket=bucket)
+
+        await cache.put("key1", b"exported")
+        assert await cache.get("missing") is None
+        assert (await cache.get("key1")) is not None
@@ -4,12 +4,21 @@ This module tests the ExportService class which is responsible for
 exporting images in different formats and sizes.
 """
 
+import asyncio
+import io
+import json
+import zipfile
+from pathlib import Path
 from typing import Dict, Literal
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
+from PIL import Image
 
+from app.core.exceptions import ResourceNotFoundError
+from app.services.export.cache import DiskExportCacheTier, ExportCache
 from app.services.export.service import ExportError, ExportService
+from app.services.persistence.concept_persistence_service import NotFoundError
 
 
 class TestExportService:
@@ -220,3 +229,165 @@ class TestExportService:
 
         # Verify the error message - using 'in' for partial matching
         assert "Processing error" in str(excinfo.value)
+
+    @pytest.mark.asyncio
+    async def test_export_image_served_from_cache(self, mock_image_service: AsyncMock, mock_processing_service: AsyncMock, tmp_path: Path) -> None:
+        """Test that repeating an export streams the cached result instead of processing again."""
+        cache = ExportCache(disk=DiskExportCacheTier(str(tmp_path), max_bytes=1024, ttl_seconds=3600))
+        export_service = ExportService(image_service=mock_image_service, processing_service=mock_processing_service, export_cache=cache)
+
+        first = await export_service.export_image("user-1/logo.png", "jpg", size={"width": 500, "height": 500})
+        second = await export_service.export_image("user-1/logo.png", "jpg", size={"width": 500, "height": 500})
+        other_size = await export_service.export_image("user-1/logo.png", "jpg", size={"width": 1000, "height": 1000})
+
+        assert first["data"] == b"converted_image_data"
+        assert "data" not in second
+        assert b"".join(second["stream"]) == b"converted_image_data"
+        assert (second["filename"], second["content_type"]) == ("logo.jpg", "image/jpeg")
+        assert "data" in other_size
+        assert mock_processing_service.convert_to_format.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_export_image_served_from_prerendered_derivative(self, mock_image_service: AsyncMock, mock_processing_service: AsyncMock) -> None:
+        """Test that a standard size export reads the derivative stored at generation time."""
+        mock_image_service.get_image_async = AsyncMock(return_value=b"prerendered")
+        export_service = ExportService(image_service=mock_image_service, processing_service=mock_processing_service, export_cache=ExportCache())
+
+        with patch("app.services.export.service.settings") as mock_settings:
+            mock_settings.EXPORT_PRERENDER_ENABLED = True
+            result = await export_service.export_image("user-1/logo.png", "jpg", size={"width": 500, "height": 500})
+
+        mock_image_service.get_image_async.assert_awaited_once_with("user-1/logo/export_small.jpg")
+        mock_processing_service.process_image.assert_not_called()
+        assert result["data"] == b"prerendered"
+        assert (result["filename"], result["content_type"]) == ("logo.jpg", "image/jpeg")
+
+    @pytest.mark.asyncio
+    async def test_export_image_without_derivative_falls_back(self, mock_image_service: AsyncMock, mock_processing_service: AsyncMock) -> None:
+        """Test that images without derivatives are exported on demand."""
+        mock_image_service.get_image_async = AsyncMock(side_effect=lambda path: b"image_data" if path == "user-1/logo.png" else None)
+        export_service = ExportService(image_service=mock_image_service, processing_service=mock_processing_service, export_cache=ExportCache())
+
+        with patch("app.services.export.service.settings") as mock_settings:
+            mock_settings.EXPORT_PRERENDER_ENABLED = True
+            result = await export_service.export_image("user-1/logo.png", "png", size={"width": 1000, "height": 1000})
+
+        assert result["data"] == b"converted_image_data"
+        mock_processing_service.process_image.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_export_image_with_byte_budget(self, mock_image_service: AsyncMock, mock_processing_service: AsyncMock, tmp_path: Path) -> None:
+        """Test that a budgeted export runs the optimize operation and reports the chosen format."""
+        webp = io.BytesIO()
+        Image.new("RGB", (8, 8), "red").save(webp, format="WEBP")
+        mock_processing_service.process_image = AsyncMock(return_value=webp.getvalue())
+        cache = ExportCache(disk=DiskExportCacheTier(str(tmp_path), max_bytes=1024 * 1024, ttl_seconds=3600))
+        export_service = ExportService(image_service=mock_image_service, processing_service=mock_processing_service, export_cache=cache)
+
+        with patch("app.services.export.service.settings") as mock_settings:
+            mock_settings.EXPORT_PRERENDER_ENABLED = True
+            result = await export_service.export_image("user-1/logo.png", "png", size={"width": 500, "height": 500}, max_bytes=20000, allow_format_change=True)
+            cached = await export_service.export_image("user-1/logo.png", "png", size={"width": 500, "height": 500}, max_bytes=20000, allow_format_change=True)
+
+        operation = mock_processing_service.process_image.call_args[0][1][0]
+        assert operation == {"type": "optimize", "max_bytes": 20000, "min_quality": None, "formats": ["webp", "jpeg", "png"], "max_width": 500, "max_height": 500}
+        mock_processing_service.process_image.assert_awaited_once()
+        mock_processing_service.convert_to_format.assert_not_called()
+        for export in (result, cached):
+            assert export["data"] == webp.getvalue()
+            assert (export["filename"], export["content_type"], export["format"]) == ("logo.webp", "image/webp", "webp")
+
+
+class TestConceptPackageExport:
+    """Tests for the streaming concept package export."""
+
+    @pytest.fixture
+    def concept(self) -> Dict:
+        """Concept detail with two palette variations."""
+        return {
+            "id": "concept-123",
+            "logo_description": "logo",
+            "theme_description": "theme",
+            "image_path": "user-1/base.png",
+            "color_variations": [
+                {"palette_name": "Ocean Blue", "colors": ["#0000FF", "#00AAFF"], "image_path": "user-1/palette-1.png"},
+                {"palette_name": "Sunset", "colors": ["#FF8800"], "image_path": "user-1/palette-2.png"},
+            ],
+        }
+
+    @pytest.fixture
+    def export_service(self, concept: Dict) -> ExportService:
+        """Create an ExportService whose sources and conversions are mocked."""
+        image_service = MagicMock(spec=["get_image_async", "get_image_data"])
+        image_service.get_image_data = AsyncMock(side_effect=lambda path, is_palette=False: f"source:{path}".encode())
+        processing_service = AsyncMock()
+        processing_service.convert_to_format = MagicMock(side_effect=lambda data, target_format, quality: data + f":{target_format}".encode())
+        persistence = AsyncMock()
+        persistence.get_concept_detail = AsyncMock(return_value=concept)
+        return ExportService(image_service=image_service, processing_service=processing_service, concept_persistence_service=persistence)
+
+    @staticmethod
+    async def _collect(package: Dict) -> bytes:
+        chunks = [chunk async for chunk in package["stream"]]
+        assert len(chunks) > 1  # Entries are written out as they finish
+        return b"".join(chunks)
+
+    @pytest.mark.asyncio
+    async def test_package_contains_all_entries(self, export_service: ExportService) -> None:
+        """Test that every image, format and swatch ends up in the archive."""
+        package = await export_service.export_concept_package("concept-123", "user-1", ["png", "jpg"])
+        archive = zipfile.ZipFile(io.BytesIO(await self._collect(package)))
+
+        assert package["content_type"] == "application/zip"
+        assert sorted(archive.namelist()) == [
+            "concept/base.jpg",
+            "concept/base.png",
+            "manifest.json",
+            "palettes/01_ocean-blue.png",
+            "palettes/02_sunset.png",
+            "variations/01_ocean-blue.jpg",
+            "variations/01_ocean-blue.png",
+            "variations/02_sunset.jpg",
+            "variations/02_sunset.png",
+        ]
+        assert archive.read("variations/02_sunset.jpg") == b"source:user-1/palette-2.png:jpeg"
+        assert json.loads(archive.read("manifest.json"))["palettes"][0]["colors"] == ["#0000FF", "#00AAFF"]
+
+        # Each source image is downloaded once, however many formats it is exported in
+        assert export_service.image_service.get_image_data.await_count == 3
+
+    @pytest.mark.asyncio
+    async def test_package_bounds_concurrent_entries(self, export_service: ExportService) -> None:
+        """Test that no more than EXPORT_PACKAGE_CONCURRENCY entries are in flight."""
+        active = 0
+        peak = 0
+
+        async def slow_source(path: str, is_palette: bool = False) -> bytes:
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            return b"source"
+
+        export_service.image_service.get_image_data = AsyncMock(side_effect=slow_source)
+        with patch("app.services.export.service.settings") as mock_settings:
+            mock_settings.EXPORT_PACKAGE_CONCURRENCY = 2
+            package = await export_service.export_concept_package("concept-123", "user-1", ["png"], include_palettes=False)
+            await self._collect(package)
+
+        assert peak == 2
+
+    @pytest.mark.asyncio
+    async def test_package_concept_not_found(self, export_service: ExportService) -> None:
+        """Test that a missing concept fails before anything is streamed."""
+        export_service.concept_persistence_service.get_concept_detail.side_effect = NotFoundError("missing")  # type: ignore[union-attr]
+
+        with pytest.raises(ResourceNotFoundError):
+            await export_service.export_concept_package("concept-404", "user-1", ["png"])
+
+    @pytest.mark.asyncio
+    async def test_package_rejects_unknown_format(self, export_service: ExportService) -> None:
+        """Test that unsupported formats are rejected."""
+        with pytest.raises(ExportError):
+            await export_service.export_concept_package("concept-123", "user-1", ["gif"])
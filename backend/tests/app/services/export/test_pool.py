@@ -0,0 +1,60 @@
+"""Tests for the export process pool."""
+
+import os
+import time
+
+import pytest
+
+from app.services.export.pool import ExportJobTimeoutError, ExportProcessPool
+
+
+def _pid(_: int) -> int:
+    """Return the ID of the process the job runs in."""
+    return os.getpid()
+
+
+def _sleep(seconds: float) -> float:
+    """Sleep for the given duration."""
+    time.sleep(seconds)
+    return seconds
+
+
+class TestExportProcessPool:
+    """Tests for ExportProcessPool."""
+
+    @pytest.mark.asyncio
+    async def test_run_in_worker_process(self) -> None:
+        """Test that a job runs in another process."""
+        pool = ExportProcessPool(max_workers=1, timeout_seconds=30)
+        try:
+            pid = await pool.run(_pid, 0)
+        finally:
+            pool.shutdown()
+
+        assert pid != os.getpid()
+
+    @pytest.mark.asyncio
+    async def test_run_in_thread(self) -> None:
+        """Test that max_workers=0 runs jobs without a process pool."""
+        pool = ExportProcessPool(max_workers=0, timeout_seconds=30)
+
+        assert await pool.run(_pid, 0) == os.getpid()
+        assert pool._executor is None
+
+    @pytest.mark.asyncio
+    async def test_timeout_terminates_workers(self) -> None:
+        """Test that a job over the timeout fails and the pool is replaced."""
+        pool = ExportProcessPool(max_workers=1, timeout_seconds=0.5)
+        try:
+            executor = pool._get_executor()
+            started = time.monotonic()
+            with pytest.raises(ExportJobTimeoutError):
+                await pool.run(_sleep, 30)
+            assert time.monotonic() - started < 5
+            assert pool._executor is None
+
+            # The next job gets a fresh pool
+            assert await pool.run(_sleep, 0, timeout=30) == 0
+            assert pool._executor is not executor
+        finally:
+            pool.shutdown()
@@ -0,0 +1,86 @@
+"""Tests for SVG vectorization.
+
+This module tests the in-memory trace and the vectorizer that runs it in the export pool.
+"""
+
+import time
+from io import BytesIO
+from unittest.mock import patch
+
+import pytest
+from PIL import Image, ImageDraw
+
+from app.services.export.pool import ExportProcessPool
+from app.services.export.vectorize import SvgVectorizer, VectorizationTimeoutError, trace_image
+
+
+def _slow_trace(image_data: bytes, mode: str, filter_speckle: int, max_dimension: int) -> bytes:
+    """Stand-in for trace_image that never finishes in time."""
+    time.sleep(2)
+    return b""
+
+
+@pytest.fixture
+def logo_png() -> bytes:
+    """Create a 200x100 PNG with a red circle on white."""
+    image = Image.new("RGB", (200, 100), "white")
+    ImageDraw.Draw(image).ellipse((50, 10, 130, 90), fill="red")
+    buffer = BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class TestTraceImage:
+    """Tests for trace_image."""
+
+    def test_color_trace(self, logo_png: bytes) -> None:
+        """Test that a color trace returns an SVG the size of the source."""
+        svg = trace_image(logo_png)
+
+        assert b'width="200" height="100"' in svg
+        assert b"<path" in svg
+        assert b"viewBox" not in svg
+
+    def test_binary_trace(self, logo_png: bytes) -> None:
+        """Test that non-color modes trace the grayscale image."""
+        svg = trace_image(logo_png, mode="bw")
+
+        assert b"<svg" in svg
+        assert b"<path" in svg
+
+    def test_downscaled_trace_keeps_source_size(self, logo_png: bytes) -> None:
+        """Test that a downscaled trace is scaled back up with a viewBox."""
+        svg = trace_image(logo_png, max_dimension=50)
+
+        assert b'width="200" height="100" viewBox="0 0 50 25"' in svg
+
+
+class TestSvgVectorizer:
+    """Tests for SvgVectorizer."""
+
+    @pytest.mark.asyncio
+    async def test_vectorize_in_worker_process(self, logo_png: bytes) -> None:
+        """Test that a trace runs in the export process pool."""
+        pool = ExportProcessPool(max_workers=1, timeout_seconds=30)
+        try:
+            svg = await SvgVectorizer(pool).vectorize(logo_png)
+        finally:
+            pool.shutdown()
+
+        assert b"<path" in svg
+
+    @pytest.mark.asyncio
+    async def test_vectorize_applies_max_dimension(self, logo_png: bytes) -> None:
+        """Test that the vectorizer downscales before tracing."""
+        svg = await SvgVectorizer(ExportProcessPool(max_workers=0, timeout_seconds=30), max_dimension=50).vectorize(logo_png)
+
+        assert b'viewBox="0 0 50 25"' in svg
+
+    @pytest.mark.asyncio
+    async def test_timeout_raises_vectorization_timeout(self, logo_png: bytes) -> None:
+        """Test that a pool timeout surfaces as a VectorizationTimeoutError."""
+        vectorizer = SvgVectorizer(ExportProcessPool(max_workers=0, timeout_seconds=0.2))
+
+        with patch("app.services.export.vectorize.trace_image", _slow_trace):
+            with pytest.raises(VectorizationTimeoutError):
+                await vectorizer.vectorize(logo_png)
@@ -0,0 +1,48 @@
+"""Tests for palette contrast scoring."""
+
+import numpy as np
+
+from app.services.image.contrast import contrast_matrix, palettes_to_rgb, rank_palettes, relative_luminance, score_palettes
+
+
+def test_contrast_ratios_match_wcag() -> None:
+    """Test contrast ratios of known color pairs."""
+    rgb, valid = palettes_to_rgb([["#000000", "#FFFFFF", "#777777"]])
+    ratios = contrast_matrix(relative_luminance(rgb))[0]
+
+    assert valid.all()
+    assert np.isclose(ratios[0, 1], 21.0)
+    assert np.isclose(ratios[1, 2], 4.48, atol=0.01)
+    assert np.allclose(np.diag(ratios), 1.0)
+
+
+def test_invalid_colors_masked() -> None:
+    """Test entries that are not hex codes are ignored, and short codes expanded."""
+    rgb, valid = palettes_to_rgb([["#FFF", "not a color", None], ["#000000"]])
+
+    assert valid.tolist() == [[True, False, False], [True, False, False]]
+    assert np.allclose(rgb[0, 0], 1.0)
+
+
+def test_scores_prefer_contrast_and_distinct_colors() -> None:
+    """Test a readable palette outscores a flat one, and degenerate palettes score 0."""
+    readable = {"colors": ["#1E1B4B", "#4F46E5", "#C4B5FD", "#F5F3FF", "#EF4444"]}
+    flat = {"colors": ["#777777", "#787878", "#797979"]}
+    single = {"colors": ["#FFFFFF"]}
+
+    scores = score_palettes([readable, flat, single, {"colors": []}])
+
+    assert scores[0].score > 0.8
+    assert scores[1].score < 0.2
+    assert scores[1].min_delta_e < 1.0
+    assert scores[2].score == 0.0
+    assert scores[3].score == 0.0
+
+
+def test_rank_palettes_keeps_best_in_order() -> None:
+    """Test ranking keeps the best palettes, with ties in their original order."""
+    first = {"name": "First", "colors": ["#000000", "#FFFFFF"]}
+    flat = {"name": "Flat", "colors": ["#777777", "#787878"]}
+    second = {"name": "Second", "colors": ["#000000", "#FFFFFF"]}
+
+    assert [palette["name"] for palette in rank_palettes([flat, first, second], 2)] == ["First", "Second"]
@@ -8,10 +8,21 @@ from io import BytesIO
 from typing import Any
 from unittest.mock import MagicMock, patch
 
+import numpy as np
 import pytest
-from PIL import Image
+from PIL import Image, ImageDraw
 
-from app.services.image.conversion import ConversionError, convert_image_format, detect_image_format, generate_thumbnail, get_image_metadata, optimize_image
+from app.services.image.conversion import (
+    ConversionError,
+    convert_image_format,
+    detect_image_format,
+    fast_downscale,
+    fit_within,
+    generate_thumbnail,
+    generate_thumbnails,
+    get_image_metadata,
+    optimize_image,
+)
 
 
 @pytest.fixture
@@ -54,58 +65,44 @@ class TestDetectImageFormat:
         result = detect_image_format(sample_jpg_bytes)
         assert result == "jpg"
 
-    @patch("imghdr.what")
-    def test_detect_webp_format(self, mock_imghdr_what: MagicMock) -> None:
-        """Test detection of WebP format."""
-        # Setup: imghdr returns webp
-        mock_imghdr_what.return_value = "webp"
+    @pytest.mark.parametrize("format, expected", [("WEBP", "webp"), ("GIF", "gif"), ("AVIF", "avif")])
+    def test_detect_format_from_header(self, format: str, expected: str) -> None:
+        """Test detection of other formats from their header."""
+        img_bytes = BytesIO()
+        Image.new("RGB", (20, 10), color="green").save(img_bytes, format=format)
 
-        # Execute
-        result = detect_image_format(b"test_data")
-
-        # Verify
-        assert result == "webp"
-        mock_imghdr_what.assert_called_once()
-
-    @patch("imghdr.what")
-    def test_detect_gif_format(self, mock_imghdr_what: MagicMock) -> None:
-        """Test detection of GIF format."""
-        # Setup: imghdr returns gif
-        mock_imghdr_what.return_value = "gif"
-
-        # Execute
-        result = detect_image_format(b"test_data")
+        with patch("PIL.Image.open") as mock_pil_open:
+            result = detect_image_format(img_bytes.getvalue())
 
-        # Verify
-        assert result == "gif"
-        mock_imghdr_what.assert_called_once()
+        assert result == expected
+        mock_pil_open.assert_not_called()
 
-    @patch("imghdr.what")
+    @patch("app.services.image.conversion.probe_image")
     @patch("PIL.Image.open")
-    def test_fallback_to_pil(self, mock_pil_open: MagicMock, mock_imghdr_what: MagicMock, sample_png_bytes: bytes) -> None:
-        """Test fallback to PIL when imghdr fails."""
-        # Setup: imghdr fails to detect format
-        mock_imghdr_what.return_value = None
+    def test_fallback_to_pil(self, mock_pil_open: MagicMock, mock_probe: MagicMock, sample_png_bytes: bytes) -> None:
+        """Test fallback to PIL when the header is not recognized."""
+        # Setup: the probe fails to recognize the format
+        mock_probe.return_value = None
 
         # Setup: PIL detects format
         mock_img = MagicMock()
-        mock_img.format = "PNG"
+        mock_img.format = "BMP"
         mock_pil_open.return_value = mock_img
 
         # Execute
         result = detect_image_format(sample_png_bytes)
 
         # Verify
-        assert result == "png"
-        mock_imghdr_what.assert_called_once()
+        assert result == "bmp"
+        mock_probe.assert_called_once()
         mock_pil_open.assert_called_once()
 
-    @patch("imghdr.what")
+    @patch("app.services.image.conversion.probe_image")
     @patch("PIL.Image.open")
-    def test_fallback_to_default(self, mock_pil_open: MagicMock, mock_imghdr_what: MagicMock, sample_png_bytes: bytes) -> None:
+    def test_fallback_to_default(self, mock_pil_open: MagicMock, mock_probe: MagicMock, sample_png_bytes: bytes) -> None:
         """Test fallback to default format when all detection methods fail."""
-        # Setup: both imghdr and PIL fail
-        mock_imghdr_what.return_value = None
+        # Setup: both the probe and PIL fail
+        mock_probe.return_value = None
         mock_img = MagicMock()
         mock_img.format = None
         mock_pil_open.return_value = mock_img
@@ -116,11 +113,11 @@ class TestDetectImageFormat:
         # Verify
         assert result == "png"  # Default is PNG
 
-    @patch("imghdr.what")
-    def test_exception_handling(self, mock_imghdr_what: MagicMock, sample_png_bytes: bytes) -> None:
+    @patch("app.services.image.conversion.probe_image")
+    def test_exception_handling(self, mock_probe: MagicMock, sample_png_bytes: bytes) -> None:
         """Test error handling when exceptions occur during detection."""
         # Setup
-        mock_imghdr_what.side_effect = Exception("Test error")
+        mock_probe.side_effect = Exception("Test error")
 
         # Execute and verify
         with pytest.raises(ConversionError) as excinfo:
@@ -129,35 +126,19 @@ class TestDetectImageFormat:
         assert "Failed to detect image format" in str(excinfo.value)
         assert "Test error" in str(excinfo.value)
 
-    @patch("imghdr.what")
     @patch("PIL.Image.open")
-    def test_pil_exception_handling(self, mock_pil_open: MagicMock, mock_imghdr_what: MagicMock, sample_png_bytes: bytes) -> None:
+    def test_pil_exception_handling(self, mock_pil_open: MagicMock) -> None:
         """Test error handling when PIL throws an exception."""
-        # Setup: imghdr fails, and PIL raises exception
-        mock_imghdr_what.return_value = None
+        # Setup: the probe does not recognize the data, and PIL raises exception
         mock_pil_open.side_effect = Exception("PIL error")
 
         # Execute and verify
         with pytest.raises(ConversionError) as excinfo:
-            detect_image_format(sample_png_bytes)
+            detect_image_format(b"test_data")
 
         assert "Failed to detect image format" in str(excinfo.value)
         assert "PIL error" in str(excinfo.value)
 
-    @patch("imghdr.what")
-    @patch("PIL.Image.open")
-    def test_normalize_jpeg_format(self, mock_pil_open: MagicMock, mock_imghdr_what: MagicMock) -> None:
-        """Test that 'jpeg' is normalized to 'jpg'."""
-        # Setup: imghdr returns jpeg
-        mock_imghdr_what.return_value = "jpeg"
-
-        # Execute
-        result = detect_image_format(b"test_data")
-
-        # Verify
-        assert result == "jpg"  # Should normalize to jpg
-        mock_imghdr_what.assert_called_once()
-
 
 class TestConvertImageFormat:
     """Tests for the convert_image_format function."""
@@ -318,6 +299,69 @@ class TestGenerateThumbnail:
         assert "Failed to generate thumbnail" in str(excinfo.value)
 
 
+def _detailed_image_bytes(size: int, format: str) -> bytes:
+    """Create a gradient image with shapes, large enough to be reduced."""
+    gradient = np.tile(np.linspace(0, 255, size, dtype=np.uint8), (size, 1))
+    img = Image.fromarray(np.dstack([gradient, gradient.T, gradient[::-1]]), mode="RGB")
+    draw = ImageDraw.Draw(img)
+    draw.ellipse((size // 8, size // 8, size // 2, size // 2), fill=(200, 10, 30))
+    draw.rectangle((size // 2, size // 3, size - size // 10, size - size // 10), fill=(0, 120, 255))
+    img_bytes = BytesIO()
+    img.save(img_bytes, format=format)
+    return img_bytes.getvalue()
+
+
+class TestFastThumbnails:
+    """Tests for the draft/reduce thumbnail path."""
+
+    @pytest.mark.parametrize("format", ["PNG", "JPEG"])
+    def test_fast_thumbnail_matches_full_decode(self, format: str) -> None:
+        """Test that the fast path gives the same size and a near-identical thumbnail."""
+        source = _detailed_image_bytes(1024, format)
+
+        fast = Image.open(BytesIO(generate_thumbnail(source, size=(128, 128), format="png")))
+        full = Image.open(BytesIO(generate_thumbnail(source, size=(128, 128), format="png", fast=False)))
+
+        assert fast.size == full.size == (128, 128)
+        difference = np.abs(np.asarray(fast.convert("RGB"), dtype=np.int16) - np.asarray(full.convert("RGB"), dtype=np.int16))
+        assert difference.mean() < 3
+
+    def test_fast_downscale_uses_draft_and_reduce(self) -> None:
+        """Test that a JPEG is draft-decoded and then reduced before the final resample."""
+        img = Image.open(BytesIO(_detailed_image_bytes(2048, "JPEG")))
+
+        with patch.object(Image.Image, "reduce", autospec=True, side_effect=Image.Image.reduce) as mock_reduce:
+            result = fast_downscale(img, (100, 100))
+
+        # Draft decoding picks the 1/8 scale (256px), still at least twice the target
+        assert img.size == (256, 256)
+        mock_reduce.assert_not_called()
+        assert result.size == (100, 100)
+
+        png = Image.open(BytesIO(_detailed_image_bytes(1024, "PNG")))
+        with patch.object(Image.Image, "reduce", autospec=True, side_effect=Image.Image.reduce) as mock_reduce:
+            result = fast_downscale(png, (100, 100))
+
+        mock_reduce.assert_called_once_with(png, 5)
+        assert result.size == (100, 100)
+
+    def test_fit_within(self) -> None:
+        """Test that images are scaled down to fit a box and never up."""
+        assert fit_within(1000, 500, (100, 100)) == (100, 50)
+        assert fit_within(500, 1000, (100, 100)) == (50, 100)
+        assert fit_within(50, 20, (100, 100)) == (50, 20)
+
+    def test_generate_thumbnails_batch(self, sample_png_bytes: bytes, sample_jpg_bytes: bytes) -> None:
+        """Test that a batch keeps the input order and marks failures as None."""
+        results = generate_thumbnails([sample_png_bytes, b"invalid_image_data", sample_jpg_bytes], size=(40, 40), format="png", max_workers=2)
+
+        assert results[1] is None
+        for thumbnail in (results[0], results[2]):
+            assert thumbnail is not None
+            assert Image.open(BytesIO(thumbnail)).size == (40, 40)
+        assert generate_thumbnails([]) == []
+
+
 class TestGetImageMetadata:
     """Tests for the get_image_metadata function."""
 
@@ -336,47 +380,35 @@ class TestGetImageMetadata:
         assert metadata["format"] == "PNG"
         assert metadata["mode"] == "RGB"
 
-    @patch("PIL.Image.open")
-    def test_metadata_with_exif(self, mock_pil_open: MagicMock, sample_jpg_bytes: bytes) -> None:
+    def test_metadata_with_exif(self) -> None:
         """Test extracting EXIF metadata from a JPEG image."""
-        # Setup: Create a mock image with EXIF data
-        mock_img = MagicMock()
-        mock_img.format = "JPEG"
-        mock_img.width = 100
-        mock_img.height = 100
-        mock_img.mode = "RGB"
-
-        # Mock the _getexif method on the image
-        mock_exif = {
-            0x010F: "Manufacturer",
-            0x0110: "Model",
-            0x0112: 1,  # Orientation
-        }
-        mock_img._getexif = MagicMock(return_value=mock_exif)
-
-        # Return our mock image when PIL.Image.open is called
-        mock_pil_open.return_value = mock_img
+        # Setup: a JPEG with make, model and capture date
+        exif = Image.Exif()
+        exif[0x010F] = "Manufacturer"
+        exif[0x0110] = "Model"
+        exif.get_ifd(0x8769)[36867] = "2024:01:01 12:00:00"
+        img_bytes = BytesIO()
+        Image.new("RGB", (120, 80), color="blue").save(img_bytes, format="JPEG", exif=exif.tobytes())
 
         # Execute
-        metadata = get_image_metadata(sample_jpg_bytes)
+        metadata = get_image_metadata(img_bytes.getvalue())
 
         # Verify
-        assert "width" in metadata
-        assert "height" in metadata
-        assert "format" in metadata
-        assert "exif" in metadata
-        assert metadata["width"] == 100
-        assert metadata["height"] == 100
+        assert metadata["width"] == 120
+        assert metadata["height"] == 80
         assert metadata["format"] == "JPEG"
-        assert "Manufacturer" in metadata["exif"].values()
-        assert "Model" in metadata["exif"].values()
-
-        # Check if orientation is in exif with the right key
-        # The implementation may map EXIF IDs to human-readable names
-        if "orientation" in metadata["exif"]:
-            assert metadata["exif"]["orientation"] == 1
-        elif "Orientation" in metadata["exif"]:
-            assert metadata["exif"]["Orientation"] == 1
+        assert metadata["has_alpha"] is False
+        assert metadata["exif"] == {"make": "Manufacturer", "model": "Model", "date_taken": "2024:01:01 12:00:00"}
+
+    @patch("PIL.Image.open")
+    def test_metadata_reads_header_only(self, mock_pil_open: MagicMock, sample_png_with_alpha_bytes: bytes) -> None:
+        """Test that metadata of a probed format never opens the image with PIL."""
+        metadata = get_image_metadata(sample_png_with_alpha_bytes)
+
+        mock_pil_open.assert_not_called()
+        assert metadata["mode"] == "RGBA"
+        assert metadata["has_alpha"] is True
+        assert metadata["aspect_ratio"] == 1.0
 
     def test_metadata_error(self) -> None:
         """Test error handling in get_image_metadata."""
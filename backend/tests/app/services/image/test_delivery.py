@@ -0,0 +1,57 @@
+"""Tests for responsive image delivery."""
+
+from typing import Any, Dict, List
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.services.image.delivery import attach_image_sources, negotiate_image_format
+
+
+def _derivatives(prefix: str, formats: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Build an export_derivatives record with the delivery sizes of the given formats."""
+    widths = {"thumb": 256, "small": 500, "medium": 1000}
+    return {f"{size}.{fmt}": {"path": f"{prefix}/export_{size}.{fmt}", "bytes": 1, "width": width, "height": width} for size, width in widths.items() for fmt in formats}
+
+
+@pytest.mark.parametrize(
+    "accept, expected",
+    [
+        ("image/avif,image/webp,image/apng,image/*,*/*;q=0.8", "avif"),
+        ("image/webp,*/*", "webp"),
+        ("image/avif;q=0.5, image/webp", "webp"),
+        ("application/json, text/plain, */*", "png"),
+        (None, "png"),
+    ],
+)
+def test_negotiate_image_format(accept: str, expected: str) -> None:
+    """Test that modern formats are only chosen when listed explicitly."""
+    assert negotiate_image_format(accept, ("avif", "webp", "png")) == expected
+
+
+def test_attach_image_sources() -> None:
+    """Test that concepts and variations get srcsets signed in one request per bucket."""
+    concepts = [
+        {
+            "id": "c1",
+            "export_derivatives": _derivatives("user-1/base", ["webp", "png"]),
+            "color_variations": [
+                {"palette_name": "Ocean", "export_derivatives": _derivatives("user-1/ocean", ["png"])},
+                {"palette_name": "Old", "export_derivatives": {}},
+            ],
+        }
+    ]
+    persistence = MagicMock()
+    persistence.get_signed_urls.side_effect = lambda paths, is_palette=False: {path: f"https://cdn.example.com/{path}" for path in paths}
+
+    fmt = attach_image_sources(concepts, "image/webp,*/*", persistence)
+
+    assert fmt == "webp"
+    assert persistence.get_signed_urls.call_count == 2
+    sources = concepts[0]["image_sources"]
+    assert (sources["format"], sources["content_type"]) == ("webp", "image/webp")
+    assert sources["srcset"].split(", ")[0] == "https://cdn.example.com/user-1/base/export_thumb.webp 256w"
+    assert list(sources["urls"]) == ["thumb", "small", "medium"]
+    # Variations without WebP siblings fall back to PNG, and old ones get none
+    assert concepts[0]["color_variations"][0]["image_sources"]["format"] == "png"
+    assert "image_sources" not in concepts[0]["color_variations"][1]
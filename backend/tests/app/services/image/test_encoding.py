@@ -0,0 +1,45 @@
+"""Tests for the output encoding of generated images."""
+
+from io import BytesIO
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from app.services.image.encoding import encode_png, palettize
+
+
+def _flat_logo(mode: str = "RGB") -> Image.Image:
+    """Draw a flat two-shape logo."""
+    image = Image.new(mode, (300, 200), (255, 255, 255, 0) if mode == "RGBA" else (255, 255, 255))
+    draw = ImageDraw.Draw(image)
+    draw.ellipse((10, 10, 150, 150), fill=(200, 10, 30, 255) if mode == "RGBA" else (200, 10, 30))
+    draw.rectangle((160, 20, 290, 180), fill=(0, 120, 255, 128) if mode == "RGBA" else (0, 120, 255))
+    return image
+
+
+def _noise() -> Image.Image:
+    """Create an image with far more than 256 colors."""
+    return Image.fromarray(np.random.default_rng(0).integers(0, 256, (64, 64, 3), dtype=np.uint8), mode="RGB")
+
+
+@pytest.mark.parametrize("mode", ["RGB", "RGBA"])
+def test_encode_png_writes_lossless_png8(mode: str) -> None:
+    """Test that a low-color image is stored as PNG8 with identical pixels."""
+    image = _flat_logo(mode)
+
+    encoded = encode_png(image)
+
+    with Image.open(BytesIO(encoded)) as decoded:
+        assert decoded.mode == "P"
+        assert np.array_equal(np.asarray(decoded.convert(mode)), np.asarray(image))
+    full_color = BytesIO()
+    image.save(full_color, format="PNG")
+    assert len(encoded) < len(full_color.getvalue())
+
+
+def test_encode_png_keeps_full_color_images() -> None:
+    """Test that an image with more than 256 colors stays RGB."""
+    assert palettize(_noise()) is None
+    with Image.open(BytesIO(encode_png(_noise()))) as decoded:
+        assert decoded.mode == "RGB"
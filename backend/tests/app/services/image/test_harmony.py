@@ -0,0 +1,71 @@
+"""Tests for the local color palette engine."""
+
+from io import BytesIO
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.services.image.harmony import SCHEMES, generate_local_palettes, generate_palettes_from_image, hex_to_rgb, lab_to_srgb, parse_theme, srgb_to_lab
+
+
+def test_lab_round_trip() -> None:
+    """Test colors converted to CIELAB and back are unchanged."""
+    rgb = np.random.default_rng(0).random((100, 3))
+
+    assert np.allclose(lab_to_srgb(srgb_to_lab(rgb)), rgb, atol=1e-6)
+
+
+def test_palettes_cycle_schemes() -> None:
+    """Test palettes have five valid colors and cycle through the schemes."""
+    palettes = generate_local_palettes(7, ["#E8501A"])
+
+    assert len(palettes) == 7
+    assert [palette["name"].split()[0] for palette in palettes[:5]] == ["Complementary", "Analogous", "Triadic", "Monochrome", "High"]
+    for palette in palettes:
+        assert len(palette["colors"]) == 5
+        assert all(len(code) == 7 and code.startswith("#") for code in palette["colors"])
+        assert palette["description"]
+    assert len(SCHEMES) == 5
+
+
+def test_palettes_built_on_chromatic_base_color() -> None:
+    """Test neutral colors are skipped and the first chromatic one is the base."""
+    palettes = generate_local_palettes(1, ["#FFFFFF", "#101010", "#1E6FD9"])
+
+    assert palettes[0]["name"] == "Complementary Blue"
+    assert "logo's dominant colors" in palettes[0]["description"]
+
+
+def test_theme_keywords_shape_palettes() -> None:
+    """Test hues named by the theme become base colors and moods shift lightness."""
+    hues, bias = parse_theme("A dark forest theme")
+    plain = generate_local_palettes(1, theme_description="forest")
+    dark = generate_local_palettes(1, theme_description="dark forest")
+
+    assert hues == [145]
+    assert bias.lightness < 0
+    assert plain[0]["name"] == "Complementary Green"
+    assert srgb_to_lab(hex_to_rgb(dark[0]["colors"]))[:, 0].mean() < srgb_to_lab(hex_to_rgb(plain[0]["colors"]))[:, 0].mean()
+
+
+def test_default_base_color_without_hues() -> None:
+    """Test a default base color is used when nothing names a hue."""
+    palettes = generate_local_palettes(2, ["#FFFFFF"], "a clean theme")
+
+    assert palettes[0]["colors"][0] == "#4F46E5"
+    assert "default base color" in palettes[1]["description"]
+
+
+@pytest.mark.asyncio
+async def test_palettes_from_image() -> None:
+    """Test palettes are derived from the dominant colors of an image."""
+    image = Image.new("RGB", (512, 512), "white")
+    image.paste((30, 160, 60), (100, 100, 400, 400))
+    buffer = BytesIO()
+    image.save(buffer, format="PNG")
+
+    palettes = await generate_palettes_from_image(buffer.getvalue(), 3)
+
+    assert len(palettes) == 3
+    assert palettes[0]["name"] == "Complementary Green"
@@ -88,7 +88,7 @@ class TestImageProcessingService:
         result = await image_processing_service.process_image(sample_image_bytes, operations)
 
         # Verify
-        mock_resize.assert_called_once_with(sample_image_bytes, width=200, height=200, maintain_aspect_ratio=True)
+        mock_resize.assert_called_once_with(sample_image_bytes, width=200, height=200, maintain_aspect_ratio=True, fast=False)
         assert result == b"resized_image_data"
 
     @patch("app.services.image.processing_service.ImageProcessingService.generate_thumbnail")
@@ -125,6 +125,20 @@ class TestImageProcessingService:
         mock_optimize.assert_called_once_with(sample_image_bytes, quality=80, max_size=(800, 600))
         assert result == b"optimized_image_data"
 
+    @patch("app.services.image.processing_service.optimize_image")
+    async def test_process_image_optimize_to_target(self, mock_optimize: MagicMock, image_processing_service: ImageProcessingService, sample_image_bytes: bytes) -> None:
+        """Test process_image with an optimize operation carrying a byte budget and quality floor."""
+        # Setup
+        mock_optimize.return_value = b"budgeted_image_data"
+
+        # Execute
+        operations = [{"type": "optimize", "max_width": 500, "max_height": 500, "max_bytes": 20000, "min_quality": 0.95, "formats": ["webp", "png"]}]
+        result = await image_processing_service.process_image(sample_image_bytes, operations)
+
+        # Verify
+        mock_optimize.assert_called_once_with(sample_image_bytes, quality=85, max_size=(500, 500), max_bytes=20000, min_quality=0.95, formats=["webp", "png"])
+        assert result == b"budgeted_image_data"
+
     @patch("app.services.image.processing_service.ImageProcessingService.apply_palette")
     async def test_process_image_apply_palette(self, mock_apply: MagicMock, image_processing_service: ImageProcessingService, sample_image_bytes: bytes) -> None:
         """Test process_image with apply_palette operation."""
@@ -242,14 +256,14 @@ class TestImageProcessingService:
 
     @patch("httpx.AsyncClient")
     @patch("PIL.Image.open")
-    async def test_resize_image_from_url(self, mock_pil_open: MagicMock, MockAsyncClient: MagicMock, image_processing_service: ImageProcessingService) -> None:
+    async def test_resize_image_from_url(self, mock_pil_open: MagicMock, MockAsyncClient: MagicMock, image_processing_service: ImageProcessingService, sample_image_bytes: bytes) -> None:
         """Test resize_image with URL input."""
         # Setup
         mock_client = AsyncMock()
         MockAsyncClient.return_value.__aenter__.return_value = mock_client
 
         mock_response = AsyncMock()
-        mock_response.content = b"image_data_from_url"
+        mock_response.content = sample_image_bytes
         mock_client.get.return_value = mock_response
 
         mock_img = MagicMock()
@@ -299,6 +313,26 @@ class TestImageProcessingService:
         # Verify the return value matches our mock
         assert result == b"thumbnail_data"
 
+    async def test_generate_thumbnails_batch(self, image_processing_service: ImageProcessingService, sample_image_bytes: bytes) -> None:
+        """Test generating thumbnails of several images in one call."""
+        results = await image_processing_service.generate_thumbnails([sample_image_bytes, b"invalid_image", sample_image_bytes], width=32, height=32)
+
+        assert results[1] is None
+        for thumbnail in (results[0], results[2]):
+            assert thumbnail is not None
+            assert Image.open(BytesIO(thumbnail)).size == (32, 32)
+
+    async def test_resize_image_fast(self, image_processing_service: ImageProcessingService) -> None:
+        """Test resize_image on the draft/reduce fast path."""
+        source = BytesIO()
+        Image.new("RGB", (1200, 600), color="blue").save(source, format="JPEG")
+
+        result = await image_processing_service.resize_image(source.getvalue(), width=100, maintain_aspect_ratio=True, fast=True)
+
+        resized = Image.open(BytesIO(result))
+        assert resized.size == (100, 50)
+        assert resized.format == "JPEG"
+
     @patch("app.services.image.processing_service.extract_dominant_colors")
     async def test_extract_color_palette(self, mock_extract: MagicMock, image_processing_service: ImageProcessingService, sample_image_bytes: bytes) -> None:
         """Test extract_color_palette method."""
@@ -434,7 +468,7 @@ class TestImageProcessingService:
             mock_from_array.return_value = mock_img
 
             # Setup the save method to add bytes to the output
-            def mock_save(output: BytesIO, format: str) -> None:
+            def mock_save(output: BytesIO, format: str, **kwargs: Any) -> None:
                 output.write(b"palette_applied_image")
 
             mock_img.save.side_effect = mock_save
@@ -471,7 +505,7 @@ class TestImageProcessingService:
                 mock_from_array.return_value = mock_img
 
                 # Setup the save method to add bytes to the output
-                def mock_save(output: BytesIO, format: str) -> None:
+                def mock_save(output: BytesIO, format: str, **kwargs: Any) -> None:
                     output.write(b"palette_applied_from_url")
 
                 mock_img.save.side_effect = mock_save
@@ -507,7 +541,7 @@ class TestImageProcessingService:
                 mock_from_array.return_value = mock_img
 
                 # Setup the save method to add bytes to the output
-                def mock_save(output: BytesIO, format: str) -> None:
+                def mock_save(output: BytesIO, format: str, **kwargs: Any) -> None:
                     output.write(f"result_with_blend_{blend_strength}".encode())
 
                 mock_img.save.side_effect = mock_save
@@ -674,7 +708,7 @@ class TestImageProcessingService:
         result = await image_processing_service.process_image(sample_image_bytes, operations)
 
         # Verify each step was called in order with the right inputs
-        mock_resize.assert_called_once_with(sample_image_bytes, width=800, height=600, maintain_aspect_ratio=True)
+        mock_resize.assert_called_once_with(sample_image_bytes, width=800, height=600, maintain_aspect_ratio=True, fast=False)
 
         mock_optimize.assert_called_once_with(b"resized_data", quality=90, max_size=(1200, 1200))  # Input from resize step
 
@@ -0,0 +1,107 @@
+"""Tests for image size limits."""
+
+from io import BytesIO
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+
+from app.core.metrics import metrics
+from app.services.image.limits import ImageLimitError, ImageLimits, check_image_limits, estimate_decoded_bytes, open_image, processing_size
+
+LIMITS = ImageLimits(max_bytes=1024 * 1024, max_pixels=4_000_000, max_decoded_bytes=8 * 1024 * 1024, processing_max_pixels=256 * 256)
+
+
+def _png_header(width: int, height: int, color_type: int = 2) -> bytes:
+    """Build a PNG signature and IHDR chunk without any pixel data."""
+    return b"\x89PNG\r\n\x1a\n" + b"\x00\x00\x00\rIHDR" + width.to_bytes(4, "big") + height.to_bytes(4, "big") + bytes([8, color_type, 0, 0, 0]) + b"\x00" * 4
+
+
+def _encode(size: tuple, format: str = "PNG", mode: str = "RGB") -> bytes:
+    """Encode a blank image."""
+    output = BytesIO()
+    Image.new(mode, size, color="red" if mode == "RGB" else 0).save(output, format=format)
+    return output.getvalue()
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics() -> None:
+    """Start each test with empty metrics."""
+    metrics.reset()
+
+
+def test_check_within_limits_returns_header() -> None:
+    """Test that an image within the limits returns its header."""
+    header = check_image_limits(_encode((300, 200)), LIMITS)
+
+    assert header is not None
+    assert (header.format, header.width, header.height) == ("png", 300, 200)
+
+
+@pytest.mark.parametrize(
+    "data, limit",
+    [
+        (b"\x00" * (1024 * 1024 + 1), "bytes"),
+        (_png_header(5000, 5000), "pixels"),
+        # 1900x1500 fits the pixel limit, but decodes to over 8 MB as RGB (4 bytes per pixel)
+        (_png_header(1900, 1500), "memory"),
+    ],
+)
+def test_check_rejects_from_header(data: bytes, limit: str) -> None:
+    """Test that oversized images are rejected without being decoded."""
+    with patch("PIL.Image.open") as mock_open:
+        with pytest.raises(ImageLimitError) as excinfo:
+            check_image_limits(data, LIMITS)
+
+    assert excinfo.value.limit == limit
+    mock_open.assert_not_called()
+    assert metrics.get_counter(f"image_limits.rejected.{limit}") == 1
+
+
+def test_check_counts_grayscale_at_one_byte_per_pixel() -> None:
+    """Test that the decoded size depends on the mode."""
+    assert check_image_limits(_png_header(1900, 1500, color_type=0), LIMITS) is not None
+    assert estimate_decoded_bytes(100, 100, "L") == 10_000
+    assert estimate_decoded_bytes(100, 100, "I;16") == 20_000
+    assert estimate_decoded_bytes(100, 100, "RGB") == 40_000
+
+
+def test_check_ignores_non_images() -> None:
+    """Test that data that is not an image is left to the decoder to reject."""
+    assert check_image_limits(b"not an image", LIMITS) is None
+
+
+def test_check_falls_back_to_pil_header() -> None:
+    """Test that formats the probe does not parse are checked from PIL's header."""
+    with pytest.raises(ImageLimitError) as excinfo:
+        check_image_limits(_encode((50, 50), format="BMP"), ImageLimits(max_pixels=2000))
+
+    assert excinfo.value.limit == "pixels"
+
+
+def test_processing_size_keeps_aspect_ratio() -> None:
+    """Test that the processing size fits the pixel budget with the same aspect ratio."""
+    assert processing_size(200, 100, LIMITS) is None
+
+    width, height = processing_size(1024, 512, LIMITS) or (0, 0)
+
+    assert width * height <= LIMITS.processing_max_pixels
+    assert (width, height) == (362, 181)
+
+
+@pytest.mark.parametrize("format", ["PNG", "JPEG"])
+def test_open_image_downscales_to_processing_resolution(format: str) -> None:
+    """Test that large images are downscaled once decoded and counted."""
+    img = open_image(_encode((1024, 512), format=format), LIMITS)
+
+    assert img.size == (362, 181)
+    assert metrics.get_counter("image_limits.downscaled") == 1
+
+
+def test_open_image_leaves_small_images_untouched() -> None:
+    """Test that images within the processing resolution are returned as opened."""
+    img = open_image(_encode((128, 64)), LIMITS)
+
+    assert img.size == (128, 64)
+    assert img.format == "PNG"
+    assert metrics.get_counter("image_limits.downscaled") == 0
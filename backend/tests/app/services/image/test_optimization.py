@@ -0,0 +1,117 @@
+"""Tests for the constraint-driven image optimization search."""
+
+from io import BytesIO
+from typing import Tuple
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw, ImageFilter
+
+from app.services.image.conversion import optimize_image
+from app.services.image.optimization import _luminance, search_optimized_encoding, structural_similarity
+
+
+def _logo(size: int = 256, mode: str = "RGB") -> Image.Image:
+    """Draw a soft-edged logo with a gradient background."""
+    gradient = np.tile(np.linspace(0, 255, size, dtype=np.uint8), (size, 1))
+    image = Image.fromarray(np.dstack([gradient, gradient[::-1], np.full_like(gradient, 128)]), mode="RGB")
+    draw = ImageDraw.Draw(image)
+    draw.ellipse((size // 8, size // 8, size // 2, size // 2), fill=(200, 10, 30))
+    draw.rectangle((size // 2, size // 3, size - 10, size - 10), fill=(0, 120, 255))
+    image = image.filter(ImageFilter.GaussianBlur(radius=1))
+    if mode == "RGBA":
+        image.putalpha(255)
+        image.putpixel((0, 0), (0, 0, 0, 0))
+    return image
+
+
+def _decoded_ssim(image: Image.Image, data: bytes) -> Tuple[str, float]:
+    """Decode an encoding and measure its SSIM against the image."""
+    with Image.open(BytesIO(data)) as decoded:
+        return str(decoded.format), structural_similarity(_luminance(image), _luminance(decoded))
+
+
+def test_structural_similarity_is_one_for_identical_images() -> None:
+    """Test that identical images have an SSIM of 1."""
+    luminance = _luminance(_logo())
+
+    assert structural_similarity(luminance, luminance) == pytest.approx(1.0)
+
+
+def test_quality_floor_returns_smallest_encoding_reaching_it() -> None:
+    """Test that the quality floor is met by a smaller output than a high fixed quality."""
+    image = _logo()
+    high_quality = BytesIO()
+    image.save(high_quality, format="JPEG", quality=95)
+
+    result = search_optimized_encoding(image, min_ssim=0.95, formats=["jpeg"])
+
+    assert result.constraints_met
+    assert result.format == "jpeg"
+    assert result.size < len(high_quality.getvalue())
+    fmt, ssim = _decoded_ssim(image, result.data)
+    assert fmt == "JPEG"
+    assert ssim >= 0.95
+    # A lower quality would miss the floor
+    lower = search_optimized_encoding(image, min_ssim=0.999, formats=["jpeg"])
+    assert lower.setting > result.setting
+
+
+def test_byte_budget_returns_best_encoding_that_fits() -> None:
+    """Test that a byte budget is met with the highest setting that fits."""
+    image = _logo()
+
+    result = search_optimized_encoding(image, max_bytes=4000, formats=["webp", "jpeg"])
+
+    assert result.constraints_met
+    assert result.size <= 4000
+    assert result.format in ("webp", "jpeg")
+    roomier = search_optimized_encoding(image, max_bytes=8000, formats=[result.format])
+    assert roomier.setting >= result.setting
+
+
+def test_png_searches_palette_sizes() -> None:
+    """Test that PNG candidates are quantized to the smallest palette meeting the floor."""
+    image = _logo()
+
+    result = search_optimized_encoding(image, min_ssim=0.9, formats=["png"])
+
+    assert result.format == "png"
+    assert result.setting != 0
+    with Image.open(BytesIO(result.data)) as decoded:
+        assert decoded.mode == "P"
+
+
+def test_unmet_constraints_return_smallest_attempt() -> None:
+    """Test that an impossible budget returns the smallest encoding tried, flagged as unmet."""
+    result = search_optimized_encoding(_logo(), max_bytes=10, min_ssim=0.99, formats=["webp", "png"])
+
+    assert not result.constraints_met
+    assert result.size > 10
+
+
+def test_transparent_images_skip_jpeg_unless_requested_alone() -> None:
+    """Test that JPEG is only used for a transparent image when it is the only format."""
+    image = _logo(mode="RGBA")
+
+    assert search_optimized_encoding(image, min_ssim=0.9, formats=["jpeg", "png"]).format == "png"
+    assert search_optimized_encoding(image, min_ssim=0.9, formats=["jpeg"]).format == "jpeg"
+
+
+def test_search_requires_a_constraint() -> None:
+    """Test that the search refuses to run without a budget or floor."""
+    with pytest.raises(ValueError):
+        search_optimized_encoding(_logo())
+
+
+def test_optimize_image_target_mode_resizes_and_meets_budget() -> None:
+    """Test optimize_image with a byte budget and a maximum size."""
+    output = BytesIO()
+    _logo(512).save(output, format="PNG")
+
+    result = optimize_image(output.getvalue(), max_size=(128, 128), max_bytes=3000, formats=["webp"])
+
+    assert len(result) <= 3000
+    with Image.open(BytesIO(result)) as decoded:
+        assert decoded.format == "WEBP"
+        assert decoded.size == (128, 128)
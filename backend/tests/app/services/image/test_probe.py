@@ -0,0 +1,84 @@
+"""Tests for header-only image probing."""
+
+from io import BytesIO
+from typing import Any
+
+import pytest
+from PIL import Image
+
+from app.services.image.probe import probe_image
+
+
+def _encode(mode: str, format: str, size: tuple = (321, 123), **options: Any) -> bytes:
+    """Encode a blank image."""
+    output = BytesIO()
+    Image.new(mode, size).save(output, format=format, **options)
+    return output.getvalue()
+
+
+@pytest.mark.parametrize(
+    "mode, format, options, expected",
+    [
+        ("RGB", "PNG", {}, ("png", "RGB", False)),
+        ("RGBA", "PNG", {}, ("png", "RGBA", True)),
+        ("L", "PNG", {}, ("png", "L", False)),
+        ("LA", "PNG", {}, ("png", "LA", True)),
+        ("P", "PNG", {}, ("png", "P", False)),
+        ("P", "PNG", {"transparency": 0}, ("png", "P", True)),
+        ("RGB", "JPEG", {}, ("jpeg", "RGB", False)),
+        ("L", "JPEG", {}, ("jpeg", "L", False)),
+        ("CMYK", "JPEG", {}, ("jpeg", "CMYK", False)),
+        ("RGB", "JPEG", {"progressive": True}, ("jpeg", "RGB", False)),
+        ("RGB", "WEBP", {}, ("webp", "RGB", False)),
+        ("RGBA", "WEBP", {}, ("webp", "RGBA", True)),
+        ("RGB", "WEBP", {"lossless": True}, ("webp", "RGB", False)),
+        ("RGBA", "WEBP", {"lossless": True}, ("webp", "RGBA", True)),
+        ("P", "GIF", {}, ("gif", "P", False)),
+        ("P", "GIF", {"transparency": 0}, ("gif", "P", True)),
+        ("RGB", "AVIF", {}, ("avif", "RGB", False)),
+        ("RGBA", "AVIF", {}, ("avif", "RGBA", True)),
+    ],
+)
+def test_probe_matches_pil(mode: str, format: str, options: dict, expected: tuple) -> None:
+    """Test that the header gives the same format, size and alpha as opening the image."""
+    data = _encode(mode, format, **options)
+
+    probe = probe_image(data)
+
+    assert probe is not None
+    assert (probe.format, probe.mode, probe.has_alpha) == expected
+    with Image.open(BytesIO(data)) as image:
+        assert (probe.width, probe.height) == image.size
+
+
+def test_probe_reads_jpeg_exif_before_frame() -> None:
+    """Test that the EXIF segment preceding the frame header is returned."""
+    exif = Image.Exif()
+    exif[0x010F] = "Manufacturer"
+    data = _encode("RGB", "JPEG", size=(5, 7), exif=exif.tobytes())
+
+    probe = probe_image(data)
+
+    assert probe is not None
+    assert (probe.width, probe.height) == (5, 7)
+    assert probe.exif is not None
+    loaded = Image.Exif()
+    loaded.load(probe.exif)
+    assert loaded[0x010F] == "Manufacturer"
+
+
+def test_probe_only_needs_the_header() -> None:
+    """Test that a truncated body still probes, and a truncated header does not."""
+    data = _encode("RGBA", "PNG", size=(800, 600))
+
+    probe = probe_image(data[:64])
+
+    assert probe is not None
+    assert (probe.format, probe.width, probe.height, probe.content_type) == ("png", 800, 600, "image/png")
+    assert probe_image(data[:20]) is None
+
+
+@pytest.mark.parametrize("data", [b"", b"hello world", b"\xff\xd8\xff\xda\x00\x02", b"RIFF\x00\x00\x00\x00WEBPVP8 "])
+def test_probe_rejects_unknown_or_broken_headers(data: bytes) -> None:
+    """Test that unrecognized or broken data returns None instead of raising."""
+    assert probe_image(data) is None
@@ -0,0 +1,118 @@
+"""Fixtures for the JigsawStack client tests, including a local fake of the API."""
+
+import asyncio
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import httpx
+import pytest
+
+from app.services.jigsawstack.client import JigsawStackClient
+from app.services.jigsawstack.retry import RetryBudget, RetryEngine, RetryPolicy
+
+FAKE_API_URL = "https://fake.jigsawstack.test"
+
+# Smallest valid PNG (1x1, RGBA)
+FAKE_PNG = bytes.fromhex("89504e470d0a1a0a0000000d49484452000000010000000108060000001f15c4890000000d49444154789c6360606060000000050001a5f645400000000049454e44ae426082")
+
+
+@dataclass
+class Fault:
+    """A fault injected into one request to the fake API.
+
+    The request waits for `delay`, then fails with `error` if set, returns
+    `status` with `headers` if set, or succeeds.
+    """
+
+    status: Optional[int] = None
+    headers: Dict[str, str] = field(default_factory=dict)
+    delay: float = 0.0
+    error: Optional[Exception] = None
+
+
+class FakeJigsawStackAPI:
+    """Local fake of the JigsawStack endpoints used by the client, with scripted faults."""
+
+    def __init__(self) -> None:
+        """Initialize with no faults."""
+        self.faults: Dict[str, List[Fault]] = defaultdict(list)
+        self.requests: List[httpx.Request] = []
+
+    def inject(
+        self,
+        path: str,
+        status: Optional[int] = None,
+        headers: Optional[Dict[str, str]] = None,
+        delay: float = 0.0,
+        error: Optional[Exception] = None,
+        times: int = 1,
+    ) -> None:
+        """Queue a fault for the next requests to a path (see Fault)."""
+        self.faults[path].extend(Fault(status, headers or {}, delay, error) for _ in range(times))
+
+    def count(self, path: str) -> int:
+        """Count the requests made to a path."""
+        return sum(1 for request in self.requests if request.url.path == path)
+
+    @property
+    def transport(self) -> httpx.MockTransport:
+        """Transport routing client requests to the fake."""
+        return httpx.MockTransport(self.handle)
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        """Answer a request, applying the next fault queued for its path."""
+        self.requests.append(request)
+        queue = self.faults.get(request.url.path)
+        if queue:
+            fault = queue.pop(0)
+            if fault.delay:
+                await asyncio.sleep(fault.delay)
+            if fault.error is not None:
+                raise fault.error
+            if fault.status is not None:
+                return httpx.Response(fault.status, headers=fault.headers, json={"success": False, "message": "Injected fault"})
+        return self._success(request)
+
+    def _success(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if path in ("/v1/ai/image_generation", "/v1/ai/image_variation") or path.startswith("/images/"):
+            return httpx.Response(200, headers={"content-type": "image/png"}, content=FAKE_PNG)
+        if path == "/v1/prompt_engine/run":
+            palette = {"name": "Fake Palette", "colors": [{"first_color": "#112233", "second_color": "#445566"}], "description": "From the fake API"}
+            return httpx.Response(200, json={"success": True, "result": [palette]})
+        if path == "/v1/stability/variation":
+            return httpx.Response(200, json={"success": True, "image_url": f"{FAKE_API_URL}/images/variation.png"})
+        return httpx.Response(404, json={"success": False, "message": "Not found"})
+
+
+class RecordingSleep:
+    """Sleep replacement recording the requested delays without waiting."""
+
+    def __init__(self) -> None:
+        """Initialize with no delays."""
+        self.delays: List[float] = []
+
+    async def __call__(self, delay: float) -> None:
+        """Record a delay."""
+        self.delays.append(delay)
+        await asyncio.sleep(0)
+
+
+@pytest.fixture
+def fake_api() -> FakeJigsawStackAPI:
+    """Create a fake JigsawStack API."""
+    return FakeJigsawStackAPI()
+
+
+@pytest.fixture
+def recording_sleep() -> RecordingSleep:
+    """Create a sleep replacement recording the retry delays."""
+    return RecordingSleep()
+
+
+@pytest.fixture
+def fake_client(fake_api: FakeJigsawStackAPI, recording_sleep: RecordingSleep) -> JigsawStackClient:
+    """Create a client talking to the fake API, with the default retry policy."""
+    retry_engine = RetryEngine(RetryPolicy(), RetryBudget(), sleep=recording_sleep)
+    return JigsawStackClient(api_key="test_api_key", api_url=FAKE_API_URL, retry_engine=retry_engine, transport=fake_api.transport)
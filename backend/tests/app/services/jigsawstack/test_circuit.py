@@ -0,0 +1,214 @@
+"""Tests for the JigsawStack circuit breaker."""
+
+import asyncio
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import pytest
+
+from app.core.exceptions import JigsawStackCircuitOpenError, JigsawStackConnectionError
+from app.core.metrics import metrics
+from app.services.jigsawstack.circuit import CircuitBreaker, CircuitState, CircuitStatus, _LocalStore, check_provider_availability
+
+IMAGE_GENERATION = "/v1/ai/image_generation"
+IMAGE_REFINEMENT = "/v1/ai/image_variation"
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics() -> None:
+    """Start every test with empty metrics."""
+    metrics.reset()
+
+
+async def fail(breaker: CircuitBreaker, times: int, operation: str = "generate_image") -> None:
+    """Record failed calls."""
+    for _ in range(times):
+        await breaker.record_failure(operation)
+
+
+@pytest.mark.asyncio
+async def test_opens_after_consecutive_failures() -> None:
+    """Test the circuit opens at the threshold and a success resets the count."""
+    breaker = CircuitBreaker(failure_threshold=3, open_seconds=30)
+
+    await fail(breaker, 2)
+    await breaker.record_success("generate_image")
+    await fail(breaker, 2)
+    assert (await breaker.status("generate_image")).state == CircuitState.CLOSED
+
+    await fail(breaker, 1)
+    status = await breaker.status("generate_image")
+    assert status.state == CircuitState.OPEN
+    assert 1 <= (status.retry_after or 0) <= 30
+    assert metrics.get_counter("jigsawstack.circuit.opened.generate_image") == 1
+
+    with pytest.raises(JigsawStackCircuitOpenError) as excinfo:
+        await breaker.before_call("generate_image")
+    assert excinfo.value.retry_after == status.retry_after
+    # Circuits are per endpoint
+    assert (await breaker.status("refine_image")).state == CircuitState.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_half_open_lets_one_probe_through() -> None:
+    """Test a half-open circuit admits one probe, closed by its success."""
+    breaker = CircuitBreaker(failure_threshold=1, open_seconds=1)
+    await fail(breaker, 1)
+    await asyncio.sleep(1.1)
+
+    assert (await breaker.status("generate_image")).state == CircuitState.HALF_OPEN
+    assert await breaker.before_call("generate_image") is True
+    with pytest.raises(JigsawStackCircuitOpenError):
+        await breaker.before_call("generate_image")
+
+    await breaker.record_success("generate_image", probe=True)
+    assert (await breaker.status("generate_image")).state == CircuitState.CLOSED
+    assert await breaker.before_call("generate_image") is False
+
+
+@pytest.mark.asyncio
+async def test_failed_probe_reopens() -> None:
+    """Test a failed probe opens the circuit again."""
+    breaker = CircuitBreaker(failure_threshold=1, open_seconds=1)
+    await fail(breaker, 1)
+    await asyncio.sleep(1.1)
+
+    probe = await breaker.before_call("generate_image")
+    await breaker.record_failure("generate_image", probe)
+
+    assert (await breaker.status("generate_image")).state == CircuitState.OPEN
+    assert metrics.get_counter("jigsawstack.circuit.opened.generate_image") == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_probe_frees_its_slot() -> None:
+    """Test a probe cancelled mid-call, as a hedged call that lost its race, lets the next probe through."""
+    breaker = CircuitBreaker(failure_threshold=1, open_seconds=1)
+    await fail(breaker, 1)
+    await asyncio.sleep(1.1)
+    started = asyncio.Event()
+
+    async def send() -> httpx.Response:
+        started.set()
+        await asyncio.sleep(10)
+        return httpx.Response(200)
+
+    probe = asyncio.create_task(breaker.call("generate_image", send, failure_statuses={500}))
+    await started.wait()
+    probe.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await probe
+
+    assert await breaker.before_call("generate_image") is True
+
+
+@pytest.mark.asyncio
+async def test_state_shared_across_instances() -> None:
+    """Test breakers on the same Redis see each other's failures."""
+    # The local store implements the Redis commands the breaker uses
+    redis = _LocalStore()
+    api, worker = CircuitBreaker(redis, failure_threshold=2), CircuitBreaker(redis, failure_threshold=2)
+
+    await fail(api, 1)
+    await fail(worker, 1)
+
+    assert (await api.status("generate_image")).state == CircuitState.OPEN
+    with pytest.raises(JigsawStackCircuitOpenError):
+        await worker.before_call("generate_image")
+
+
+@pytest.mark.asyncio
+async def test_falls_back_to_local_state_when_redis_fails() -> None:
+    """Test Redis errors fall back to the in-process state."""
+    redis = MagicMock()
+    redis.ttl.side_effect = ConnectionError("Redis down")
+    redis.incr.side_effect = ConnectionError("Redis down")
+    breaker = CircuitBreaker(redis, failure_threshold=1)
+
+    await fail(breaker, 1)
+
+    assert (await breaker.status("generate_image")).state == CircuitState.OPEN
+    assert metrics.get_counter("jigsawstack.circuit.redis_errors") == 2
+
+
+@pytest.mark.asyncio
+async def test_client_fails_fast_while_open(fake_client: Any, fake_api: Any) -> None:
+    """Test the client stops calling a failing endpoint until it recovers."""
+    fake_client.circuit_breaker = CircuitBreaker(failure_threshold=2, open_seconds=1)
+    fake_api.inject(IMAGE_GENERATION, status=503, times=6)
+
+    for _ in range(2):
+        with pytest.raises(JigsawStackConnectionError):
+            await fake_client.generate_image("A logo")
+    assert fake_api.count(IMAGE_GENERATION) == 6
+
+    # Open: no request is made
+    with pytest.raises(JigsawStackCircuitOpenError):
+        await fake_client.generate_image("A logo")
+    assert fake_api.count(IMAGE_GENERATION) == 6
+    # Other endpoints are not affected
+    assert (await fake_client.refine_image("Brighter", "https://example.com/logo.png")).startswith(b"\x89PNG")
+
+    # Half-open: the probe succeeds and closes the circuit
+    await asyncio.sleep(1.1)
+    result = await fake_client.generate_image("A logo")
+    assert result["binary_data"].startswith(b"\x89PNG")
+    assert (await fake_client.circuit_breaker.status("generate_image")).state == CircuitState.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_client_counts_connection_failures(fake_client: Any, fake_api: Any) -> None:
+    """Test calls failing to connect count as failures, retried attempts only once."""
+    fake_client.circuit_breaker = CircuitBreaker(failure_threshold=1)
+    fake_api.inject(IMAGE_REFINEMENT, error=httpx.ConnectError("Connection refused"), times=3)
+
+    with pytest.raises(JigsawStackConnectionError):
+        await fake_client.refine_image("Brighter", "https://example.com/logo.png")
+
+    assert (await fake_client.circuit_breaker.status("refine_image")).state == CircuitState.OPEN
+
+
+class TestCheckProviderAvailability:
+    """Tests for the check_provider_availability function."""
+
+    @staticmethod
+    def breaker(state: CircuitState, retry_after: int = 0) -> MagicMock:
+        """Create a circuit breaker mock reporting a state."""
+        breaker = MagicMock()
+        breaker.status = AsyncMock(return_value=CircuitStatus(state, retry_after or None))
+        return breaker
+
+    @pytest.mark.asyncio
+    @patch("app.services.jigsawstack.circuit.get_circuit_breaker")
+    async def test_closed_circuit(self, mock_get_breaker: MagicMock) -> None:
+        """Test tasks are accepted normally while the circuit is closed."""
+        mock_get_breaker.return_value = self.breaker(CircuitState.CLOSED)
+
+        assert await check_provider_availability("user-123", "generate_image") is None
+
+    @pytest.mark.asyncio
+    @patch("app.services.jigsawstack.circuit.settings")
+    @patch("app.services.jigsawstack.circuit.get_circuit_breaker")
+    async def test_open_circuit_queues(self, mock_get_breaker: MagicMock, mock_settings: MagicMock) -> None:
+        """Test tasks are accepted as queued while the circuit is open."""
+        mock_settings.JIGSAWSTACK_CIRCUIT_OPEN_ACTION = "queue"
+        mock_get_breaker.return_value = self.breaker(CircuitState.OPEN, 20)
+
+        message = await check_provider_availability("user-123", "generate_image")
+
+        assert message is not None and "queued" in message
+        mock_get_breaker.return_value.status.assert_awaited_once_with("generate_image")
+
+    @pytest.mark.asyncio
+    @patch("app.services.jigsawstack.circuit.settings")
+    @patch("app.services.jigsawstack.circuit.get_circuit_breaker")
+    async def test_open_circuit_refuses(self, mock_get_breaker: MagicMock, mock_settings: MagicMock) -> None:
+        """Test tasks are refused with the time until the endpoint is tried again, when configured."""
+        mock_settings.JIGSAWSTACK_CIRCUIT_OPEN_ACTION = "refuse"
+        mock_get_breaker.return_value = self.breaker(CircuitState.OPEN, 20)
+
+        with pytest.raises(JigsawStackCircuitOpenError) as excinfo:
+            await check_provider_availability("user-123", "refine_image")
+
+        assert excinfo.value.retry_after == 20
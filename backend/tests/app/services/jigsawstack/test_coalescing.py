@@ -0,0 +1,208 @@
+"""Tests for single-flight coalescing of JigsawStack requests."""
+
+import asyncio
+from typing import Any, Dict, Optional
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.core.metrics import metrics
+from app.services.jigsawstack.client import JigsawStackClient
+from app.services.jigsawstack.coalescing import RequestCoalescer, _decode_result, _encode_result
+
+
+class FakeRedis:
+    """In-memory stand-in for the synchronous Redis client (SET NX/EX, GET and the release script)."""
+
+    def __init__(self) -> None:
+        """Initialize an empty store."""
+        self.values: Dict[str, Any] = {}
+
+    def get(self, key: str) -> Optional[Any]:
+        """Get a value."""
+        return self.values.get(key)
+
+    def set(self, key: str, value: Any, nx: bool = False, ex: Optional[int] = None) -> bool:
+        """Set a value, only if absent with nx."""
+        if nx and key in self.values:
+            return False
+        self.values[key] = value
+        return True
+
+    def eval(self, script: str, num_keys: int, key: str, token: str) -> int:
+        """Run the release script: delete the key if it holds the token."""
+        if self.values.get(key) == token:
+            del self.values[key]
+            return 1
+        return 0
+
+
+class SlowCall:
+    """Upstream call that waits until released, counting invocations."""
+
+    def __init__(self, result: Any = None, error: Optional[Exception] = None) -> None:
+        """Initialize the call."""
+        self.result = result if result is not None else {"url": "https://example.com/image.png", "binary_data": b"\x89PNG"}
+        self.error = error
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self) -> Any:
+        """Wait for the release, then return the result or raise the error."""
+        self.calls += 1
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics() -> None:
+    """Start each test with empty metrics."""
+    metrics.reset()
+
+
+def test_encode_result_round_trips_bytes() -> None:
+    """Test that results with image bytes survive the Redis encoding."""
+    result = {"url": "u", "binary_data": b"\x00\xff", "nested": [{"data": b"abc"}]}
+
+    assert _decode_result(_encode_result(result)) == result
+
+
+@pytest.mark.asyncio
+async def test_identical_requests_share_one_call() -> None:
+    """Test that concurrent identical requests in a process share one call and get copies of its result."""
+    coalescer = RequestCoalescer()
+    call = SlowCall()
+
+    tasks = [asyncio.create_task(coalescer.run("generate_image", {"prompt": "logo"}, call)) for _ in range(3)]
+    await asyncio.sleep(0)
+    call.release.set()
+    results = await asyncio.gather(*tasks)
+
+    assert call.calls == 1
+    assert all(result == call.result for result in results)
+    assert results[1] is not results[2]
+    assert metrics.get_counter("jigsawstack.coalesced.local.generate_image") == 2
+    assert coalescer._in_flight == {}
+
+
+@pytest.mark.asyncio
+async def test_different_requests_are_not_coalesced() -> None:
+    """Test that requests with different parameters make their own calls."""
+    coalescer = RequestCoalescer()
+    call = AsyncMock(return_value=[])
+
+    await asyncio.gather(coalescer.run("generate_multiple_palettes", {"num_palettes": 5}, call), coalescer.run("generate_multiple_palettes", {"num_palettes": 7}, call))
+
+    assert call.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_errors_are_shared_and_not_remembered() -> None:
+    """Test that every waiting request gets the error, and the next request calls again."""
+    coalescer = RequestCoalescer()
+    call = SlowCall(error=RuntimeError("upstream failed"))
+
+    tasks = [asyncio.create_task(coalescer.run("generate_image", {"prompt": "logo"}, call)) for _ in range(2)]
+    await asyncio.sleep(0)
+    call.release.set()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    call.error = None
+    assert await coalescer.run("generate_image", {"prompt": "logo"}, call) == call.result
+    assert call.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_shared_call() -> None:
+    """Test that the call continues for the other requests when the first caller is cancelled."""
+    coalescer = RequestCoalescer()
+    call = SlowCall()
+
+    first = asyncio.create_task(coalescer.run("generate_image", {"prompt": "logo"}, call))
+    await asyncio.sleep(0)
+    second = asyncio.create_task(coalescer.run("generate_image", {"prompt": "logo"}, call))
+    await asyncio.sleep(0)
+    first.cancel()
+    call.release.set()
+
+    assert await second == call.result
+    assert call.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_instances_share_one_call_through_redis() -> None:
+    """Test that an identical request on another instance waits for the result instead of calling."""
+    redis_client = FakeRedis()
+    leader, follower = RequestCoalescer(redis_client, poll_interval_seconds=0.01), RequestCoalescer(redis_client, poll_interval_seconds=0.01)
+    leader_call, follower_call = SlowCall(), SlowCall()
+
+    leading = asyncio.create_task(leader.run("generate_image", {"prompt": "logo"}, leader_call))
+    await asyncio.sleep(0.02)
+    following = asyncio.create_task(follower.run("generate_image", {"prompt": "logo"}, follower_call))
+    await asyncio.sleep(0.02)
+    leader_call.release.set()
+
+    assert await leading == leader_call.result
+    assert await following == leader_call.result
+    assert follower_call.calls == 0
+    assert metrics.get_counter("jigsawstack.coalesced.redis.generate_image") == 1
+    # The lock is released, the result kept for late duplicates
+    assert [key.rsplit(":", 1)[1] for key in redis_client.values] == ["result"]
+
+
+@pytest.mark.asyncio
+async def test_leader_failure_lets_a_waiting_instance_call() -> None:
+    """Test that a failed call is not shared across instances: a waiting instance calls itself."""
+    redis_client = FakeRedis()
+    leader, follower = RequestCoalescer(redis_client, poll_interval_seconds=0.01), RequestCoalescer(redis_client, poll_interval_seconds=0.01)
+    leader_call = SlowCall(error=RuntimeError("upstream failed"))
+    follower_call = AsyncMock(return_value={"url": "u"})
+
+    leading = asyncio.create_task(leader.run("generate_image", {"prompt": "logo"}, leader_call))
+    await asyncio.sleep(0.02)
+    following = asyncio.create_task(follower.run("generate_image", {"prompt": "logo"}, follower_call))
+    await asyncio.sleep(0.02)
+    leader_call.release.set()
+
+    with pytest.raises(RuntimeError):
+        await leading
+    assert await following == {"url": "u"}
+    follower_call.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_wait_timeout_calls_directly() -> None:
+    """Test that a request stops waiting on a lock that is never released."""
+    redis_client = FakeRedis()
+    coalescer = RequestCoalescer(redis_client, wait_timeout_seconds=0.05, poll_interval_seconds=0.01)
+    redis_client.values[f"jigsawstack:flight:{coalescer.make_key('generate_image', prompt='logo')}:lock"] = "other-instance"
+    call = AsyncMock(return_value={"url": "u"})
+
+    assert await coalescer.run("generate_image", {"prompt": "logo"}, call) == {"url": "u"}
+    assert metrics.get_counter("jigsawstack.coalesce_wait_timeout.generate_image") == 1
+
+
+@pytest.mark.asyncio
+async def test_redis_errors_call_directly() -> None:
+    """Test that requests still go through when Redis fails."""
+    redis_client = MagicMock()
+    redis_client.get.side_effect = ConnectionError("Redis down")
+    call = AsyncMock(return_value={"url": "u"})
+
+    assert await RequestCoalescer(redis_client).run("generate_image", {"prompt": "logo"}, call) == {"url": "u"}
+
+
+@pytest.mark.asyncio
+async def test_client_coalesces_palette_requests() -> None:
+    """Test that the client routes palette requests through the coalescer."""
+    client = JigsawStackClient(api_key="key", api_url="https://api.example.com", coalescer=RequestCoalescer())
+    palettes = [{"name": "Ocean", "colors": ["#003366"], "description": "Blue"}]
+
+    with patch.object(client, "_generate_multiple_palettes", AsyncMock(return_value=palettes)) as mock_generate:
+        results = await asyncio.gather(*(client.generate_multiple_palettes("logo", "theme", 5) for _ in range(2)))
+
+    mock_generate.assert_awaited_once_with("logo", "theme", 5, 5)
+    assert results == [palettes, palettes]
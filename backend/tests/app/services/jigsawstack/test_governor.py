@@ -0,0 +1,214 @@
+"""Tests for the JigsawStack concurrency and rate governor."""
+
+import asyncio
+import time
+from typing import Any, List
+from unittest.mock import MagicMock, patch
+
+import httpx
+import pytest
+
+from app.core.exceptions import JigsawStackDeadlineError
+from app.core.metrics import metrics
+from app.services.jigsawstack.client import JigsawStackClient
+from app.services.jigsawstack.governor import ClassLimits, ConcurrencyGovernor, _LocalSlots
+from app.services.jigsawstack.retry import RetryEngine, RetryPolicy
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics() -> None:
+    """Start every test with empty metrics."""
+    metrics.reset()
+
+
+def make_governor(concurrency: int = 0, rate_per_minute: float = 0.0, **kwargs: Any) -> ConcurrencyGovernor:
+    """Create a governor limiting the image class, polling quickly."""
+    kwargs.setdefault("poll_interval_seconds", 0.01)
+    return ConcurrencyGovernor({"image": ClassLimits(concurrency=concurrency, rate_per_minute=rate_per_minute)}, **kwargs)
+
+
+class InFlight:
+    """Counts the calls holding a slot at once."""
+
+    def __init__(self) -> None:
+        """Initialize with no calls."""
+        self.current = 0
+        self.peak = 0
+
+    async def call(self, governor: ConcurrencyGovernor, duration: float = 0.05) -> None:
+        """Hold a slot for a while."""
+        async with governor.slot("generate_image"):
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+            await asyncio.sleep(duration)
+            self.current -= 1
+
+
+@pytest.mark.asyncio
+async def test_limits_calls_in_flight() -> None:
+    """Test no more calls than the limit hold a slot at once."""
+    governor = make_governor(concurrency=2)
+    in_flight = InFlight()
+
+    await asyncio.gather(*(in_flight.call(governor) for _ in range(6)))
+
+    assert in_flight.peak == 2
+    assert metrics.get_histogram("jigsawstack.governor.wait_seconds.image")["count"] == 6
+
+
+@pytest.mark.asyncio
+async def test_waiters_served_in_arrival_order() -> None:
+    """Test slots go to waiting callers in the order they arrived."""
+    governor = make_governor(concurrency=1)
+    order: List[str] = []
+    release = asyncio.Event()
+
+    async def holder() -> None:
+        async with governor.slot("generate_image"):
+            await release.wait()
+
+    async def waiter(name: str) -> None:
+        async with governor.slot("refine_image"):
+            order.append(name)
+
+    held = asyncio.ensure_future(holder())
+    await asyncio.sleep(0.02)
+    waiters = []
+    for name in ("first", "second", "third"):
+        waiters.append(asyncio.ensure_future(waiter(name)))
+        await asyncio.sleep(0.02)
+    release.set()
+    await asyncio.gather(held, *waiters)
+
+    assert order == ["first", "second", "third"]
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_spaces_calls() -> None:
+    """Test calls beyond the bucket wait for tokens to refill."""
+    # 10 per second, 1 at once
+    governor = ConcurrencyGovernor({"image": ClassLimits(rate_per_minute=600.0, burst=1)})
+    started = time.monotonic()
+
+    for _ in range(3):
+        async with governor.slot("generate_image"):
+            pass
+
+    assert time.monotonic() - started >= 0.18
+
+
+@pytest.mark.asyncio
+async def test_retries_take_rate_tokens() -> None:
+    """Test each retry of a call holding a slot takes another rate token."""
+    # 10 per second, 1 at once
+    governor = ConcurrencyGovernor({"text": ClassLimits(concurrency=1, rate_per_minute=600.0, burst=1)}, poll_interval_seconds=0.01)
+    answers = [
+        httpx.Response(429),
+        httpx.Response(200, json={"success": True, "result": [{"name": "Ocean", "colors": ["#003366", "#FFFFFF"], "description": "Blues"}]}),
+    ]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return answers.pop(0)
+
+    client = JigsawStackClient(
+        api_key="key",
+        api_url="https://api.example.com",
+        retry_engine=RetryEngine(RetryPolicy(base_delay_seconds=0.001, max_delay_seconds=0.001)),
+        transport=httpx.MockTransport(handler),
+        governor=governor,
+        max_response_bytes=1024 * 1024,
+    )
+    started = time.monotonic()
+
+    with patch.object(governor._local, "take", wraps=governor._local.take) as take:
+        palettes = await client.generate_multiple_palettes("A logo", "Blue", num_palettes=1)
+
+    assert palettes[0]["name"] == "Ocean"
+    assert take.call_count >= 2
+    # The retry waited for the bucket to refill rather than reusing the first token
+    assert time.monotonic() - started >= 0.09
+
+
+@pytest.mark.asyncio
+async def test_wait_timeout_gives_up_place() -> None:
+    """Test a caller waiting too long fails and leaves the queue."""
+    governor = make_governor(concurrency=1, max_wait_seconds=0.1)
+    release = asyncio.Event()
+
+    async def holder() -> None:
+        async with governor.slot("generate_image"):
+            await release.wait()
+
+    held = asyncio.ensure_future(holder())
+    await asyncio.sleep(0.02)
+    with pytest.raises(JigsawStackDeadlineError):
+        async with governor.slot("generate_image"):
+            pass
+    assert metrics.get_counter("jigsawstack.governor.timeouts.image") == 1
+
+    release.set()
+    await held
+    # The caller that gave up does not hold back the next one
+    async with governor.slot("generate_image"):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_ungoverned_operations_not_limited() -> None:
+    """Test operations without a class or limits are not governed."""
+    governor = make_governor(concurrency=1)
+    in_flight = InFlight()
+
+    async def call() -> None:
+        async with governor.slot("generate_multiple_palettes"):
+            in_flight.current += 1
+            in_flight.peak = max(in_flight.peak, in_flight.current)
+            await asyncio.sleep(0.02)
+            in_flight.current -= 1
+
+    await asyncio.gather(call(), call())
+
+    assert in_flight.peak == 2
+
+
+@pytest.mark.asyncio
+async def test_limits_shared_across_instances() -> None:
+    """Test governors on the same store share the limit."""
+    shared = _LocalSlots()
+    api, worker = make_governor(concurrency=1), make_governor(concurrency=1)
+    # Stands in for the Redis store both instances use
+    api._remote = worker._remote = shared  # type: ignore[assignment]
+    in_flight = InFlight()
+
+    await asyncio.gather(in_flight.call(api), in_flight.call(worker), in_flight.call(api))
+
+    assert in_flight.peak == 1
+
+
+@pytest.mark.asyncio
+async def test_falls_back_to_process_limits_when_redis_fails() -> None:
+    """Test Redis errors fall back to limits within the process."""
+    redis = MagicMock()
+    redis.eval.side_effect = ConnectionError("Redis down")
+    governor = make_governor(concurrency=1, redis_client=redis)
+    in_flight = InFlight()
+
+    await asyncio.gather(in_flight.call(governor), in_flight.call(governor))
+
+    assert in_flight.peak == 1
+    assert metrics.get_counter("jigsawstack.governor.redis_errors") > 0
+
+
+@pytest.mark.asyncio
+async def test_client_calls_governed(fake_client: Any, fake_api: Any) -> None:
+    """Test the client holds a slot for each API call."""
+    fake_client.governor = make_governor(concurrency=1)
+    fake_api.inject("/v1/ai/image_generation", delay=0.1, times=2)
+
+    started = time.monotonic()
+    results = await asyncio.gather(fake_client.generate_image("A logo"), fake_client.generate_image("Another logo"))
+
+    assert all(result["binary_data"].startswith(b"\x89PNG") for result in results)
+    # The second call waited for the first
+    assert time.monotonic() - started >= 0.2
+    assert metrics.get_histogram("jigsawstack.governor.wait_seconds.image")["count"] == 2
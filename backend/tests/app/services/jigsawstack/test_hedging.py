@@ -0,0 +1,182 @@
+"""Tests for hedged JigsawStack requests."""
+
+import asyncio
+import time
+from typing import Any, List
+
+import pytest
+
+from app.core.metrics import metrics
+from app.services.jigsawstack.governor import ClassLimits, ConcurrencyGovernor
+from app.services.jigsawstack.hedging import LatencyTracker, RequestHedger
+from app.services.jigsawstack.retry import RetryBudget
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics() -> None:
+    """Start every test with empty metrics."""
+    metrics.reset()
+
+
+def make_hedger(latency: float = 0.05, budget: float = 5.0) -> RequestHedger:
+    """Create a hedger that has learned a constant latency."""
+    hedger = RequestHedger(percentile=0.95, min_samples=5, min_delay_seconds=0.0, budget=RetryBudget(ratio=0.0, max_tokens=budget))
+    for _ in range(5):
+        hedger.tracker("generate_image").record(latency)
+    return hedger
+
+
+def test_latency_tracker_percentile() -> None:
+    """Test nearest-rank percentiles over the sliding window."""
+    tracker = LatencyTracker(window=100)
+    assert tracker.percentile(0.95) is None
+
+    for value in range(1, 201):
+        tracker.record(float(value))
+
+    # Only the last 100 values (101-200) are kept
+    assert len(tracker) == 100
+    assert tracker.percentile(0.95) == 195.0
+    assert tracker.percentile(0.5) == 150.0
+
+
+def test_hedge_delay() -> None:
+    """Test hedging waits for enough samples and respects the minimum delay."""
+    hedger = RequestHedger(percentile=0.9, min_samples=3, min_delay_seconds=2.0)
+    assert hedger.hedge_delay("generate_image") is None
+
+    for value in (1.0, 1.0, 10.0):
+        hedger.tracker("generate_image").record(value)
+    assert hedger.hedge_delay("generate_image") == 10.0
+
+    hedger.min_delay_seconds = 20.0
+    assert hedger.hedge_delay("generate_image") == 20.0
+
+
+@pytest.mark.asyncio
+async def test_fast_request_not_hedged() -> None:
+    """Test requests finishing before the percentile are sent once."""
+    hedger = make_hedger(latency=1.0)
+    calls: List[int] = []
+
+    async def call() -> str:
+        calls.append(1)
+        return "image"
+
+    assert await hedger.run("generate_image", call) == "image"
+    assert len(calls) == 1
+    assert metrics.get_counter("jigsawstack.hedge.sent.generate_image") == 0
+
+
+@pytest.mark.asyncio
+async def test_slow_request_hedged_and_loser_cancelled() -> None:
+    """Test a slow request is hedged, the faster response used and the slow one cancelled."""
+    hedger = make_hedger()
+    cancelled = asyncio.Event()
+    calls: List[int] = []
+
+    async def call() -> str:
+        calls.append(1)
+        if len(calls) == 1:
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+            return "slow"
+        return "fast"
+
+    started = time.monotonic()
+    assert await hedger.run("generate_image", call) == "fast"
+
+    assert time.monotonic() - started < 1
+    await asyncio.wait_for(cancelled.wait(), timeout=1)
+    assert metrics.get_counter("jigsawstack.hedge.sent.generate_image") == 1
+    assert metrics.get_counter("jigsawstack.hedge.won.generate_image") == 1
+
+
+@pytest.mark.asyncio
+async def test_hedge_used_when_primary_fails() -> None:
+    """Test the hedged response is used when the first request fails after it was sent."""
+    hedger = make_hedger()
+    calls: List[int] = []
+
+    async def call() -> str:
+        calls.append(1)
+        if len(calls) == 1:
+            await asyncio.sleep(0.1)
+            raise RuntimeError("Upstream error")
+        await asyncio.sleep(0.2)
+        return "hedged"
+
+    assert await hedger.run("generate_image", call) == "hedged"
+
+
+@pytest.mark.asyncio
+async def test_both_failing_raises_primary_error() -> None:
+    """Test the first request's error is raised when every request fails."""
+    hedger = make_hedger()
+    calls: List[int] = []
+
+    async def call() -> str:
+        calls.append(1)
+        number = len(calls)
+        await asyncio.sleep(0.1 if number == 1 else 0.2)
+        raise RuntimeError(f"Error {number}")
+
+    with pytest.raises(RuntimeError, match="Error 1"):
+        await hedger.run("generate_image", call)
+
+
+@pytest.mark.asyncio
+async def test_hedge_budget_exhausted() -> None:
+    """Test slow requests are not hedged once the budget is spent."""
+    hedger = make_hedger(budget=0.0)
+    calls: List[int] = []
+
+    async def call() -> str:
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return "image"
+
+    assert await hedger.run("generate_image", call) == "image"
+    assert len(calls) == 1
+    assert metrics.get_counter("jigsawstack.hedge.budget_exhausted.generate_image") == 1
+
+
+@pytest.mark.asyncio
+async def test_client_hedges_slow_generation(fake_client: Any, fake_api: Any) -> None:
+    """Test the client hedges a slow image generation against the fake API."""
+    fake_client.hedger = make_hedger()
+    fake_api.inject("/v1/ai/image_generation", delay=10.0)
+
+    started = time.monotonic()
+    result = await fake_client.generate_image("A logo")
+
+    assert time.monotonic() - started < 5
+    assert result["binary_data"].startswith(b"\x89PNG")
+    assert fake_api.count("/v1/ai/image_generation") == 2
+    assert metrics.get_counter("jigsawstack.hedge.won.generate_image") == 1
+    # Only the completed request has a latency
+    assert metrics.get_histogram("jigsawstack.latency_seconds.generate_image")["count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_client_hedges_attempts_inside_governor_slot(fake_client: Any, fake_api: Any) -> None:
+    """Test a hedge shares the primary's slot, and only attempt latencies are learned."""
+    # One call in flight, and 10 calls per second, so the second generation queues for its token
+    fake_client.governor = ConcurrencyGovernor({"image": ClassLimits(concurrency=1, rate_per_minute=600.0, burst=1)}, poll_interval_seconds=0.01)
+    fake_client.hedger = make_hedger()
+
+    await fake_client.generate_image("A logo")
+    fake_api.inject("/v1/ai/image_generation", delay=10.0)
+    started = time.monotonic()
+    result = await fake_client.generate_image("A logo")
+
+    # The hedge did not wait for the slot the primary holds
+    assert time.monotonic() - started < 5
+    assert result["binary_data"].startswith(b"\x89PNG")
+    assert fake_api.count("/v1/ai/image_generation") == 3
+    # The learned latencies are the fast attempts, without the 0.1s waits for rate tokens
+    slowest = fake_client.hedger.tracker("generate_image").percentile(1.0)
+    assert slowest is not None and slowest < 0.09
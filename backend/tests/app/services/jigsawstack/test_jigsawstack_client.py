@@ -9,6 +9,7 @@ import pytest
 
 from app.core.exceptions import JigsawStackAuthenticationError, JigsawStackConnectionError, JigsawStackGenerationError
 from app.services.jigsawstack.client import JigsawStackClient
+from app.services.jigsawstack.retry import RetryEngine, RetryPolicy
 
 
 class TestJigsawStackClient:
@@ -21,7 +22,9 @@ class TestJigsawStackClient:
         Returns:
             A JigsawStackClient for testing
         """
-        return JigsawStackClient(api_key="test_api_key", api_url="https://api.example.com")
+        # Retries back off for milliseconds rather than seconds
+        retry_engine = RetryEngine(RetryPolicy(base_delay_seconds=0.01, max_delay_seconds=0.01))
+        return JigsawStackClient(api_key="test_api_key", api_url="https://api.example.com", retry_engine=retry_engine)
 
     @pytest.fixture
     def mock_httpx_client(self) -> AsyncMock:
@@ -296,8 +299,8 @@ class TestJigsawStackClient:
                         num_palettes=2,
                     )
 
-                    # Verify API was called (but failed)
-                    mock_client.__aenter__.return_value.post.assert_called_once()
+                    # Verify API was called and retried (but failed)
+                    assert mock_client.__aenter__.return_value.post.call_count == client.retry_engine.policy.max_attempts
 
                     # Verify result has the expected structure from our mocked defaults
                     assert len(result) == 2
@@ -361,6 +364,42 @@ class TestJigsawStackClient:
                 assert len(result) == 1
                 assert result[0]["name"] == "Fallback Palette"
 
+    @pytest.mark.asyncio
+    async def test_generate_multiple_palettes_pads_short_answer_to_minimum(self, client: JigsawStackClient) -> None:
+        """Test a short answer is padded with default palettes only up to min_palettes."""
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = {
+            "success": True,
+            "result": [
+                {"name": "Ocean", "colors": ["#003366", "#336699", "#6699CC", "#99CCFF", "#FFFFFF"], "description": "Blues"},
+                {"name": "Forest", "colors": ["#0B3D0B", "#2E7D32", "#66BB6A", "#C8E6C9", "#FFFFFF"], "description": "Greens"},
+            ],
+        }
+
+        with patch.object(client, "_post", AsyncMock(return_value=mock_response)) as mock_post:
+            result = await client.generate_multiple_palettes(logo_description="A logo", theme_description="Nature", num_palettes=5, min_palettes=3)
+
+        payload = mock_post.call_args.args[2]
+        assert "variety across the {num_palettes} palettes" in payload["prompt"]
+        assert payload["input_values"]["num_palettes"] == "5"
+        assert [palette["name"] for palette in result[:2]] == ["Ocean", "Forest"]
+        assert len(result) == 3
+
+    @pytest.mark.asyncio
+    async def test_generate_multiple_palettes_raises_without_defaults(self, client: JigsawStackClient) -> None:
+        """Test an error answer raises instead of returning default palettes when defaults are not used."""
+        mock_response = MagicMock()
+        mock_response.status_code = 503
+        mock_response.text = "Service unavailable"
+
+        with patch.object(client, "_post", AsyncMock(return_value=mock_response)):
+            with pytest.raises(JigsawStackGenerationError):
+                await client.generate_multiple_palettes(logo_description="A logo", theme_description="Nature", num_palettes=2, use_defaults=False)
+            palettes = await client.generate_multiple_palettes(logo_description="A logo", theme_description="Nature", num_palettes=2)
+
+        assert [palette["name"] for palette in palettes] == ["Primary Palette", "Accent Palette"]
+
     @pytest.mark.asyncio
     async def test_generate_image_with_palette_success(self, client: JigsawStackClient) -> None:
         """Test successful generation of image with palette."""
@@ -0,0 +1,209 @@
+"""Tests for the JigsawStack retry engine, against the local fake API."""
+
+import asyncio
+import random
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from typing import Any
+from unittest.mock import MagicMock
+
+import httpx
+import pytest
+
+from app.core.exceptions import JigsawStackAuthenticationError, JigsawStackConnectionError, JigsawStackDeadlineError, JigsawStackGenerationError
+from app.core.metrics import metrics
+from app.services.jigsawstack.retry import RetryBudget, RetryEngine, RetryPolicy, deadline_scope, parse_retry_after, remaining_time
+
+IMAGE_GENERATION = "/v1/ai/image_generation"
+IMAGE_REFINEMENT = "/v1/ai/image_variation"
+PROMPT_ENGINE = "/v1/prompt_engine/run"
+VARIATION = "/v1/stability/variation"
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics() -> None:
+    """Start every test with empty metrics."""
+    metrics.reset()
+
+
+def test_parse_retry_after() -> None:
+    """Test Retry-After values in seconds, as dates and invalid."""
+    assert parse_retry_after("5") == 5.0
+    assert parse_retry_after("0.5") == 0.5
+    retry_at = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 28 <= (parse_retry_after(retry_at) or 0) <= 30
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+    assert parse_retry_after(MagicMock()) is None
+
+
+def test_next_delay_decorrelated_jitter() -> None:
+    """Test delays stay between the base and three times the previous delay, capped."""
+    engine = RetryEngine(RetryPolicy(base_delay_seconds=1.0, max_delay_seconds=5.0), rng=random.Random(42))
+    delay = 1.0
+    for _ in range(50):
+        previous, delay = delay, engine.next_delay(delay)
+        assert 1.0 <= delay <= min(5.0, previous * 3)
+
+
+def test_retry_budget() -> None:
+    """Test retries are withdrawn from the budget and refilled by requests."""
+    budget = RetryBudget(ratio=0.5, max_tokens=1.0)
+    assert budget.try_withdraw() is True
+    assert budget.try_withdraw() is False
+    budget.record_request()
+    budget.record_request()
+    assert budget.try_withdraw() is True
+
+
+def test_deadline_scope_nesting() -> None:
+    """Test nested scopes keep the earliest deadline."""
+    assert remaining_time() is None
+    with deadline_scope(10):
+        with deadline_scope(100):
+            remaining = remaining_time()
+            assert remaining is not None and remaining <= 10
+        with deadline_scope(1):
+            remaining = remaining_time()
+            assert remaining is not None and remaining <= 1
+    assert remaining_time() is None
+
+
+@pytest.mark.asyncio
+async def test_retry_after_honored(fake_client: Any, fake_api: Any, recording_sleep: Any) -> None:
+    """Test a 429 is retried after the delay of its Retry-After header."""
+    fake_api.inject(IMAGE_GENERATION, status=429, headers={"Retry-After": "7"})
+
+    result = await fake_client.generate_image("A logo")
+
+    assert result["binary_data"].startswith(b"\x89PNG")
+    assert fake_api.count(IMAGE_GENERATION) == 2
+    assert recording_sleep.delays[0] >= 7
+    assert metrics.get_counter("jigsawstack.retries.generate_image") == 1
+
+
+@pytest.mark.asyncio
+async def test_retry_after_over_limit_not_retried(fake_client: Any, fake_api: Any) -> None:
+    """Test a Retry-After longer than the limit fails without waiting."""
+    fake_api.inject(IMAGE_GENERATION, status=429, headers={"Retry-After": "3600"})
+
+    with pytest.raises(JigsawStackConnectionError):
+        await fake_client.generate_image("A logo")
+
+    assert fake_api.count(IMAGE_GENERATION) == 1
+
+
+@pytest.mark.asyncio
+async def test_refine_image_retries_server_errors(fake_client: Any, fake_api: Any, recording_sleep: Any) -> None:
+    """Test refine_image retries 5xx responses."""
+    fake_api.inject(IMAGE_REFINEMENT, status=503, times=2)
+
+    result = await fake_client.refine_image("Brighter", "https://example.com/logo.png")
+
+    assert result.startswith(b"\x89PNG")
+    assert fake_api.count(IMAGE_REFINEMENT) == 3
+    assert len(recording_sleep.delays) == 2
+
+
+@pytest.mark.asyncio
+async def test_generate_image_exhausts_attempts(fake_client: Any, fake_api: Any) -> None:
+    """Test persistent 5xx responses fail after the maximum attempts."""
+    fake_api.inject(IMAGE_GENERATION, status=500, times=5)
+
+    with pytest.raises(JigsawStackConnectionError) as excinfo:
+        await fake_client.generate_image("A logo")
+
+    assert "Maximum retries" in str(excinfo.value)
+    assert fake_api.count(IMAGE_GENERATION) == 3
+
+
+@pytest.mark.asyncio
+async def test_authentication_error_not_retried(fake_client: Any, fake_api: Any) -> None:
+    """Test 401 responses are not retried."""
+    fake_api.inject(IMAGE_GENERATION, status=401)
+
+    with pytest.raises(JigsawStackAuthenticationError):
+        await fake_client.generate_image("A logo")
+
+    assert fake_api.count(IMAGE_GENERATION) == 1
+
+
+@pytest.mark.asyncio
+async def test_palettes_retry_connection_errors(fake_client: Any, fake_api: Any) -> None:
+    """Test generate_multiple_palettes retries failed connections."""
+    fake_api.inject(PROMPT_ENGINE, error=httpx.ConnectError("Connection refused"))
+
+    palettes = await fake_client.generate_multiple_palettes("A logo", "Blue", num_palettes=1)
+
+    assert palettes[0]["name"] == "Fake Palette"
+    assert fake_api.count(PROMPT_ENGINE) == 2
+
+
+@pytest.mark.asyncio
+async def test_get_variation_retries_request_and_download(fake_client: Any, fake_api: Any) -> None:
+    """Test get_variation retries both the variation request and the image download."""
+    fake_api.inject(VARIATION, status=502)
+    fake_api.inject("/images/variation.png", status=429)
+
+    result = await fake_client.get_variation("https://example.com/logo.png")
+
+    assert result.startswith(b"\x89PNG")
+    assert fake_api.count(VARIATION) == 2
+    assert fake_api.count("/images/variation.png") == 2
+
+
+@pytest.mark.asyncio
+async def test_slow_attempt_bounded_by_task_deadline(fake_client: Any, fake_api: Any) -> None:
+    """Test an attempt slower than the time left in the task is cut off, without retrying."""
+    fake_api.inject(IMAGE_GENERATION, delay=5.0)
+
+    with deadline_scope(0.2):
+        with pytest.raises(JigsawStackConnectionError) as excinfo:
+            await fake_client.generate_image("A logo")
+
+    assert "timed out" in str(excinfo.value)
+    assert fake_api.count(IMAGE_GENERATION) == 1
+    assert metrics.get_counter("jigsawstack.retry_deadline_exhausted.generate_image") == 1
+
+
+@pytest.mark.asyncio
+async def test_slow_attempt_retried_within_call_deadline(fake_api: Any) -> None:
+    """Test a timed out attempt is retried when the call deadline leaves time for it."""
+    fake_api.inject(IMAGE_GENERATION, delay=5.0)
+    engine = RetryEngine(RetryPolicy(base_delay_seconds=0.01, max_delay_seconds=0.01))
+
+    async def attempt(timeout: float) -> httpx.Response:
+        async with httpx.AsyncClient(transport=fake_api.transport) as client:
+            return await client.post(f"https://fake.jigsawstack.test{IMAGE_GENERATION}")
+
+    response = await engine.send("generate_image", attempt, timeout=0.1, deadline_seconds=2.0)
+
+    assert response.status_code == 200
+    assert fake_api.count(IMAGE_GENERATION) == 2
+
+
+@pytest.mark.asyncio
+async def test_expired_deadline_makes_no_request(fake_client: Any, fake_api: Any) -> None:
+    """Test no request is made once the task deadline has passed."""
+    with deadline_scope(0.01):
+        await asyncio.sleep(0.02)
+        with pytest.raises(JigsawStackDeadlineError):
+            await fake_client.refine_image("Brighter", "https://example.com/logo.png")
+
+    assert fake_api.count(IMAGE_REFINEMENT) == 0
+
+
+@pytest.mark.asyncio
+async def test_retry_budget_exhausted(fake_client: Any, fake_api: Any) -> None:
+    """Test retries stop once the budget is spent."""
+    fake_client.retry_engine.budget = RetryBudget(ratio=0.0, max_tokens=1.0)
+    fake_api.inject(IMAGE_REFINEMENT, status=503, times=4)
+
+    with pytest.raises(JigsawStackGenerationError):
+        await fake_client.refine_image("Brighter", "https://example.com/logo.png")
+    with pytest.raises(JigsawStackGenerationError):
+        await fake_client.refine_image("Brighter", "https://example.com/logo.png")
+
+    # The first call retried once, the second could not retry
+    assert fake_api.count(IMAGE_REFINEMENT) == 3
+    assert metrics.get_counter("jigsawstack.retry_budget_exhausted.refine_image") == 2
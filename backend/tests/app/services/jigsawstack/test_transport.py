@@ -0,0 +1,78 @@
+"""Tests for the size-capped JigsawStack transport."""
+
+import os
+import tempfile
+from typing import Any, AsyncIterator
+
+import httpx
+import pytest
+
+from app.core.exceptions import JigsawStackResponseTooLargeError
+from app.core.metrics import metrics
+from app.services.jigsawstack.transport import CappedTransport
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics() -> None:
+    """Start every test with empty metrics."""
+    metrics.reset()
+
+
+async def chunks(count: int, size: int) -> AsyncIterator[bytes]:
+    """Stream a body of unknown length."""
+    for _ in range(count):
+        yield b"x" * size
+
+
+def serve(response: httpx.Response) -> CappedTransport:
+    """Create a capped transport answering every request with a response."""
+    return CappedTransport(httpx.MockTransport(lambda request: response), max_bytes=1000)
+
+
+@pytest.mark.asyncio
+async def test_body_within_limit_read() -> None:
+    """Test bodies up to the limit are read whole."""
+    async with httpx.AsyncClient(transport=serve(httpx.Response(200, content=chunks(10, 100)))) as client:
+        response = await client.get("https://fake.jigsawstack.test/image.png")
+
+    assert len(response.content) == 1000
+
+
+@pytest.mark.asyncio
+async def test_streamed_body_over_limit_fails() -> None:
+    """Test a body without a length fails once it grows past the limit."""
+    async with httpx.AsyncClient(transport=serve(httpx.Response(200, content=chunks(20, 100)))) as client:
+        with pytest.raises(JigsawStackResponseTooLargeError) as excinfo:
+            await client.get("https://fake.jigsawstack.test/image.png")
+
+    assert excinfo.value.max_bytes == 1000
+    assert metrics.get_counter("jigsawstack.responses_too_large") == 1
+
+
+@pytest.mark.asyncio
+async def test_announced_length_over_limit_fails() -> None:
+    """Test a Content-Length over the limit fails before the body is read."""
+    async with httpx.AsyncClient(transport=serve(httpx.Response(200, content=b"x" * 1001))) as client:
+        with pytest.raises(JigsawStackResponseTooLargeError):
+            await client.get("https://fake.jigsawstack.test/image.png")
+
+
+@pytest.mark.asyncio
+async def test_client_caps_responses(fake_client: Any, fake_api: Any) -> None:
+    """Test the client fails calls whose response is over its limit."""
+    fake_client.max_response_bytes = 10
+
+    with pytest.raises(JigsawStackResponseTooLargeError):
+        await fake_client.generate_image("A logo")
+
+
+@pytest.mark.asyncio
+async def test_binary_image_kept_in_memory(fake_client: Any, monkeypatch: pytest.MonkeyPatch, tmp_path: Any) -> None:
+    """Test a binary image is returned as bytes, with no temporary file."""
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+
+    result = await fake_client.generate_image("A logo")
+
+    assert result["binary_data"].startswith(b"\x89PNG")
+    assert "url" not in result
+    assert os.listdir(tmp_path) == []
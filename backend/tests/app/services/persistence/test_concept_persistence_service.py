@@ -29,6 +29,8 @@ class TestConceptPersistenceService:
         # Set up synchronous mocks
         storage.store_concept = MagicMock(return_value={"id": "concept-123"})
         storage.store_color_variations = MagicMock(return_value=[{"id": "var-1"}, {"id": "var-2"}])
+        # The transactional database function is unavailable unless a test says otherwise
+        storage.store_concept_with_variations = MagicMock(return_value=None)
         storage.get_concept_detail = MagicMock()  # Will be set in tests
         storage.get_recent_concepts = MagicMock()  # Will be set in tests
         storage.get_variations_by_concept_ids = MagicMock()  # Will be set in tests
@@ -103,6 +105,39 @@ class TestConceptPersistenceService:
         # Verify the concept ID is returned
         assert concept_id == "concept-123"
 
+    @pytest.mark.asyncio
+    async def test_store_concept_single_transaction(self, service: ConceptPersistenceService, mock_concept_storage: MagicMock) -> None:
+        """Test that the concept and variations are stored with one database function call."""
+        mock_concept_storage.store_concept_with_variations.return_value = {"id": "concept-456", "color_variations": [{"id": "var-1"}]}
+        concept_data: Dict[str, Any] = {
+            "user_id": "user-123",
+            "logo_description": "A modern tech logo",
+            "theme_description": "Blue and minimalist theme",
+            "image_path": "user-123/image.png",
+            "color_palettes": [{"name": "Blue Palette", "colors": ["#0000FF"], "image_path": "user-123/palette1.png"}],
+        }
+
+        concept_id = await service.store_concept(concept_data)
+
+        assert concept_id == "concept-456"
+        core_data, variations = mock_concept_storage.store_concept_with_variations.call_args[0]
+        assert core_data["image_path"] == "user-123/image.png"
+        assert variations == [{"palette_name": "Blue Palette", "colors": ["#0000FF"], "description": None, "image_path": "user-123/palette1.png", "image_url": None}]
+        mock_concept_storage.store_concept.assert_not_called()
+        mock_concept_storage.store_color_variations.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_store_concept_transaction_failure_not_retried(self, service: ConceptPersistenceService, mock_concept_storage: MagicMock) -> None:
+        """Test that a failed transactional call raises without falling back to separate inserts."""
+        mock_concept_storage.store_concept_with_variations.side_effect = DatabaseTransactionError("Concept creation function failed with status 500")
+        concept_data: Dict[str, Any] = {"user_id": "user-123", "image_path": "user-123/image.png", "color_palettes": []}
+
+        with pytest.raises(PersistenceError):
+            await service.store_concept(concept_data)
+
+        mock_concept_storage.store_concept.assert_not_called()
+        mock_concept_storage.store_color_variations.assert_not_called()
+
     @pytest.mark.asyncio
     async def test_store_concept_no_color_palettes(self, service: ConceptPersistenceService, mock_concept_storage: MagicMock) -> None:
         """Test concept storage without color palettes."""
@@ -14,6 +14,7 @@ from PIL import Image
 from app.core.config import settings
 from app.core.exceptions import ImageNotFoundError, ImageStorageError
 from app.core.supabase.image_storage import ImageStorage
+from app.services.image.probe import ImageProbe
 from app.services.persistence.image_persistence_service import ImagePersistenceService
 
 
@@ -107,11 +108,8 @@ class TestImagePersistenceService:
                     mock_now.strftime.return_value = "20230101000000"
                     mock_datetime.now.return_value = mock_now
 
-                    # Create a mock Image
-                    with patch("app.services.persistence.image_persistence_service.Image") as mock_image:
-                        mock_img = MagicMock()
-                        mock_img.format = "PNG"
-                        mock_image.open.return_value = mock_img
+                    # Probe the image header
+                    with patch("app.services.persistence.image_persistence_service.check_image_limits", return_value=ImageProbe("png", 100, 100, False)):
 
                         # Call the service method with await
                         path, url = await service.store_image(
@@ -151,11 +149,8 @@ class TestImagePersistenceService:
                 mock_now.strftime.return_value = "20230101000000"
                 mock_datetime.now.return_value = mock_now
 
-                # Create a mock Image
-                with patch("app.services.persistence.image_persistence_service.Image") as mock_image:
-                    mock_img = MagicMock()
-                    mock_img.format = "PNG"
-                    mock_image.open.return_value = mock_img
+                # Probe the image header
+                with patch("app.services.persistence.image_persistence_service.check_image_limits", return_value=ImageProbe("png", 100, 100, False)):
 
                     # Call the service method with await
                     path, url = await service.store_image(image_data=sample_image_bytes, user_id="user-123")
@@ -177,11 +172,8 @@ class TestImagePersistenceService:
                 mock_now.strftime.return_value = "20230101000000"
                 mock_datetime.now.return_value = mock_now
 
-                # Create a mock Image
-                with patch("app.services.persistence.image_persistence_service.Image") as mock_image:
-                    mock_img = MagicMock()
-                    mock_img.format = "PNG"
-                    mock_image.open.return_value = mock_img
+                # Probe the image header
+                with patch("app.services.persistence.image_persistence_service.check_image_limits", return_value=ImageProbe("png", 100, 100, False)):
 
                     # Call the service method with is_palette=True and await
                     path, url = await service.store_image(
@@ -194,6 +186,18 @@ class TestImagePersistenceService:
         args, kwargs = mock_image_storage.upload_image.call_args
         assert kwargs["is_palette"] is True
 
+    @pytest.mark.asyncio
+    async def test_store_image_rejects_oversized_header(self, service: ImagePersistenceService, mock_image_storage: MagicMock) -> None:
+        """Test that an image over the pixel limit is rejected from its header and not uploaded."""
+        # PNG header declaring 100000x100000 pixels, without any pixel data
+        header = b"\x89PNG\r\n\x1a\n" + b"\x00\x00\x00\rIHDR" + (100000).to_bytes(4, "big") * 2 + b"\x08\x02\x00\x00\x00" + b"\x00" * 4
+
+        with pytest.raises(ImageStorageError) as excinfo:
+            await service.store_image(image_data=header, user_id="user-123")
+
+        assert "exceeds the limit" in str(excinfo.value)
+        mock_image_storage.upload_image.assert_not_called()
+
     @pytest.mark.asyncio
     async def test_store_image_bytesio(self, service: ImagePersistenceService, mock_image_storage: MagicMock) -> None:
         """Test storing image from BytesIO."""
@@ -210,11 +214,8 @@ class TestImagePersistenceService:
                 mock_now.strftime.return_value = "20230101000000"
                 mock_datetime.now.return_value = mock_now
 
-                # Create a mock Image
-                with patch("app.services.persistence.image_persistence_service.Image") as mock_image:
-                    mock_img = MagicMock()
-                    mock_img.format = "JPEG"
-                    mock_image.open.return_value = mock_img
+                # Probe the image header
+                with patch("app.services.persistence.image_persistence_service.check_image_limits", return_value=ImageProbe("jpeg", 100, 100, False)):
 
                     # Call the service method with await
                     path, url = await service.store_image(image_data=bytes_io, user_id="user-123")
@@ -236,11 +237,8 @@ class TestImagePersistenceService:
                 mock_now.strftime.return_value = "20230101000000"
                 mock_datetime.now.return_value = mock_now
 
-                # Create a mock Image
-                with patch("app.services.persistence.image_persistence_service.Image") as mock_image:
-                    mock_img = MagicMock()
-                    mock_img.format = "JPEG"
-                    mock_image.open.return_value = mock_img
+                # Probe the image header
+                with patch("app.services.persistence.image_persistence_service.check_image_limits", return_value=ImageProbe("jpeg", 100, 100, False)):
 
                     # Call the service method with await
                     path, url = await service.store_image(image_data=sample_upload_file, user_id="user-123")
@@ -272,6 +270,26 @@ class TestImagePersistenceService:
         with pytest.raises(ImageStorageError):
             await service.store_image(image_data=sample_image_bytes, user_id="user-123")
 
+    @pytest.mark.asyncio
+    async def test_store_image_at_path(self, service: ImagePersistenceService, mock_image_storage: MagicMock, sample_image_bytes: bytes) -> None:
+        """Test storing an image at a given path, replacing any existing file."""
+        path = await service.store_image_at_path(sample_image_bytes, "user-123/logo/export_small.jpg", "user-123", content_type="image/jpeg", is_palette=True)
+
+        assert path == "user-123/logo/export_small.jpg"
+        kwargs = mock_image_storage.upload_image.call_args.kwargs
+        assert kwargs["path"] == path
+        assert kwargs["content_type"] == "image/jpeg"
+        assert kwargs["is_palette"] is True
+        assert kwargs["upsert"] is True
+
+    @pytest.mark.asyncio
+    async def test_store_image_at_path_rejects_other_user(self, service: ImagePersistenceService, mock_image_storage: MagicMock, sample_image_bytes: bytes) -> None:
+        """Test that a path outside the user's folder is rejected."""
+        with pytest.raises(ImageStorageError):
+            await service.store_image_at_path(sample_image_bytes, "user-456/logo/export_small.jpg", "user-123")
+
+        mock_image_storage.upload_image.assert_not_called()
+
     @pytest.mark.asyncio
     async def test_store_image_metadata_handling(self, service: ImagePersistenceService, mock_image_storage: MagicMock, sample_image_bytes: bytes) -> None:
         """Test metadata handling when storing image."""
@@ -293,10 +311,7 @@ class TestImagePersistenceService:
                 mock_now.strftime.return_value = "20230101000000"
                 mock_datetime.now.return_value = mock_now
 
-                with patch("app.services.persistence.image_persistence_service.Image") as mock_image:
-                    mock_img = MagicMock()
-                    mock_img.format = "PNG"
-                    mock_image.open.return_value = mock_img
+                with patch("app.services.persistence.image_persistence_service.check_image_limits", return_value=ImageProbe("png", 100, 100, False)):
 
                     # Call the service method with metadata and await
                     path, url = await service.store_image(
@@ -338,11 +353,8 @@ class TestImagePersistenceService:
                     mock_now.strftime.return_value = "20230101000000"
                     mock_datetime.now.return_value = mock_now
 
-                    # Create a mock Image with the specified format
-                    with patch("app.services.persistence.image_persistence_service.Image") as mock_image:
-                        mock_img = MagicMock()
-                        mock_img.format = test_case["format"]
-                        mock_image.open.return_value = mock_img
+                    # Probe the specified format
+                    with patch("app.services.persistence.image_persistence_service.check_image_limits", return_value=ImageProbe(test_case["format"].lower(), 100, 100, False)):
 
                         # Call the service method with await
                         path, url = await service.store_image(image_data=b"test_image_data", user_id="user-123")
@@ -364,10 +376,7 @@ class TestImagePersistenceService:
                 mock_now.strftime.return_value = "20230101000000"
                 mock_datetime.now.return_value = mock_now
 
-                with patch("app.services.persistence.image_persistence_service.Image") as mock_image:
-                    mock_img = MagicMock()
-                    mock_img.format = "PNG"
-                    mock_image.open.return_value = mock_img
+                with patch("app.services.persistence.image_persistence_service.check_image_limits", return_value=ImageProbe("png", 100, 100, False)):
 
                     # Call with all parameters and await
                     path, url = await service.store_image(
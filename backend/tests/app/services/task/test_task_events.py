@@ -0,0 +1,118 @@
+"""Tests for the task change bus."""
+
+import asyncio
+import json
+import uuid
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.services.task.events import InProcessTaskEventBus, RedisTaskEventBus, publish_task_events, to_task_event
+from app.services.task.service import TaskService
+
+
+def test_to_task_event_strips_checkpoints() -> None:
+    """Test worker checkpoints are not published."""
+    event = to_task_event({"id": "task-1", "status": "processing", "checkpoints": {"attempts": 1}, "progress": {"percent": 40}})
+
+    assert event == {"id": "task-1", "status": "processing", "progress": {"percent": 40}}
+
+
+@pytest.mark.asyncio
+async def test_in_process_bus_delivers_to_user_subscribers() -> None:
+    """Test events reach only the subscribers of the task owner."""
+    bus = InProcessTaskEventBus()
+
+    async with bus.subscribe("user-1") as own, bus.subscribe("user-2") as other:
+        bus.publish("user-1", {"id": "task-1", "status": "completed"})
+
+        assert await own.get(timeout=1) == {"id": "task-1", "status": "completed"}
+        assert await other.get(timeout=0.05) is None
+
+
+@pytest.mark.asyncio
+async def test_in_process_bus_drops_oldest_event_when_full() -> None:
+    """Test a slow subscriber keeps the most recent events."""
+    bus = InProcessTaskEventBus(max_queue_size=2)
+
+    async with bus.subscribe("user-1") as subscription:
+        for percent in (10, 20, 30):
+            bus.publish("user-1", {"id": "task-1", "percent": percent})
+        await asyncio.sleep(0)
+
+        assert (await subscription.get(timeout=1))["percent"] == 20
+        assert (await subscription.get(timeout=1))["percent"] == 30
+
+
+@pytest.mark.asyncio
+async def test_in_process_bus_unsubscribes_on_exit() -> None:
+    """Test closing a subscription removes it from the bus."""
+    bus = InProcessTaskEventBus()
+
+    async with bus.subscribe("user-1"):
+        pass
+
+    assert bus._subscribers == {}
+    bus.publish("user-1", {"id": "task-1"})
+
+
+def test_redis_bus_publishes_on_user_channel() -> None:
+    """Test the Redis bus publishes JSON on the per-user channel."""
+    redis_client = MagicMock()
+    bus = RedisTaskEventBus(redis_client, MagicMock())
+
+    bus.publish("user-1", {"id": "task-1", "status": "processing"})
+
+    channel, payload = redis_client.publish.call_args[0]
+    assert channel == "task_events:user-1"
+    assert json.loads(payload) == {"id": "task-1", "status": "processing"}
+
+
+@pytest.mark.asyncio
+async def test_redis_bus_subscription_decodes_messages() -> None:
+    """Test Redis subscriptions decode published messages and skip malformed ones."""
+    pubsub = MagicMock()
+    pubsub.subscribe = AsyncMock()
+    pubsub.unsubscribe = AsyncMock()
+    pubsub.aclose = AsyncMock()
+    pubsub.get_message = AsyncMock(side_effect=[{"type": "message", "data": '{"id": "task-1"}'}, {"type": "message", "data": "not json"}, None])
+    async_redis_client = MagicMock()
+    async_redis_client.pubsub.return_value = pubsub
+    bus = RedisTaskEventBus(MagicMock(), async_redis_client)
+
+    async with bus.subscribe("user-1") as subscription:
+        assert await subscription.get(timeout=1) == {"id": "task-1"}
+        assert await subscription.get(timeout=1) is None
+        assert await subscription.get(timeout=1) is None
+
+    pubsub.subscribe.assert_awaited_once_with("task_events:user-1")
+    pubsub.unsubscribe.assert_awaited_once_with("task_events:user-1")
+
+
+def test_publish_task_events_ignores_bus_errors() -> None:
+    """Test publishing failures never propagate to the task update."""
+    bus = MagicMock()
+    bus.publish.side_effect = Exception("redis down")
+
+    publish_task_events(bus, [{"id": "task-1", "user_id": "user-1"}, {"id": "task-2"}])
+
+    bus.publish.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_update_task_status_publishes_change() -> None:
+    """Test TaskService publishes status changes on the bus."""
+    task_id = str(uuid.uuid4())
+    user_id = str(uuid.uuid4())
+    client = MagicMock()
+    mock_response = MagicMock()
+    mock_response.data = [{"id": task_id, "user_id": user_id, "status": "completed", "checkpoints": {"attempts": 1}}]
+    service_client = client.get_service_role_client.return_value
+    service_client.table.return_value.update.return_value.eq.return_value.execute = MagicMock(return_value=mock_response)
+    bus = InProcessTaskEventBus()
+    task_service = TaskService(client, event_bus=bus)
+
+    async with bus.subscribe(user_id) as subscription:
+        await task_service.update_task_status(task_id, "completed", result_id="concept-1")
+
+        assert await subscription.get(timeout=1) == {"id": task_id, "user_id": user_id, "status": "completed"}
@@ -0,0 +1,156 @@
+"""Tests for the per-user active task lock."""
+
+import uuid
+from typing import Any, Dict, Optional
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.services.task import lock as lock_module
+from app.services.task.events import InProcessTaskEventBus
+from app.services.task.lock import ActiveTaskLock
+from app.services.task.service import TaskService
+
+
+class FakeRedis:
+    """In-memory stand-in for the Redis commands used by the lock."""
+
+    def __init__(self) -> None:
+        self.values: Dict[str, str] = {}
+
+    def set(self, key: str, value: str, nx: bool = False, ex: Optional[int] = None) -> Optional[bool]:
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+
+    def get(self, key: str) -> Optional[bytes]:
+        value = self.values.get(key)
+        return value.encode("utf-8") if value is not None else None
+
+    def eval(self, script: str, numkeys: int, key: str, *args: Any) -> int:
+        if self.values.get(key) != args[0]:
+            return 0
+        if script == lock_module._RELEASE_SCRIPT:
+            del self.values[key]
+        else:
+            self.values[key] = args[1]
+        return 1
+
+
+@pytest.fixture
+def fake_redis() -> FakeRedis:
+    """Create an empty fake Redis."""
+    return FakeRedis()
+
+
+@pytest.fixture
+def active_task_lock(fake_redis: FakeRedis) -> ActiveTaskLock:
+    """Create a lock backed by the fake Redis."""
+    return ActiveTaskLock(fake_redis, ttl_seconds=60)
+
+
+def make_task_service(tasks: Dict[str, Dict[str, Any]], active_task_lock: ActiveTaskLock) -> TaskService:
+    """Create a TaskService whose table calls are served from a dict of task rows."""
+    client = MagicMock()
+    table = client.get_service_role_client.return_value.table.return_value
+
+    def insert(task_data: Dict[str, Any]) -> MagicMock:
+        tasks[task_data["id"]] = dict(task_data)
+        chain = MagicMock()
+        chain.execute.return_value = MagicMock(data=[dict(task_data)])
+        return chain
+
+    def select_task(task_id: str) -> MagicMock:
+        chain = MagicMock()
+        chain.eq.return_value.execute.return_value = MagicMock(data=[tasks[task_id]] if task_id in tasks else [])
+        return chain
+
+    table.insert.side_effect = insert
+    table.select.return_value.eq.side_effect = lambda column, value: select_task(value)
+    return TaskService(client, event_bus=InProcessTaskEventBus(), active_task_lock=active_task_lock)
+
+
+def test_acquire_and_release(active_task_lock: ActiveTaskLock) -> None:
+    """Test that the lock is exclusive per user and task type."""
+    assert active_task_lock.acquire("user-1", "concept_generation", "task-1") is None
+    assert active_task_lock.acquire("user-1", "concept_generation", "task-2") == "task-1"
+    assert active_task_lock.acquire("user-1", "concept_refinement", "task-3") is None
+    assert active_task_lock.acquire("user-2", "concept_generation", "task-4") is None
+
+    # Only the holder can release the lock
+    assert active_task_lock.release("user-1", "concept_generation", "task-2") is False
+    assert active_task_lock.release("user-1", "concept_generation", "task-1") is True
+    assert active_task_lock.acquire("user-1", "concept_generation", "task-2") is None
+
+
+def test_replace_requires_current_holder(active_task_lock: ActiveTaskLock) -> None:
+    """Test that a stale lock can only be taken over from its current holder."""
+    active_task_lock.acquire("user-1", "concept_generation", "task-1")
+
+    assert active_task_lock.replace("user-1", "concept_generation", "task-0", "task-2") is False
+    assert active_task_lock.replace("user-1", "concept_generation", "task-1", "task-2") is True
+    assert active_task_lock.acquire("user-1", "concept_generation", "task-3") == "task-2"
+
+
+@pytest.mark.asyncio
+async def test_create_task_if_no_active_skips_table_when_lock_taken(active_task_lock: ActiveTaskLock) -> None:
+    """Test that a free lock creates the task without querying for active tasks."""
+    tasks: Dict[str, Dict[str, Any]] = {}
+    task_service = make_task_service(tasks, active_task_lock)
+    user_id = str(uuid.uuid4())
+
+    task, created = await task_service.create_task_if_no_active(user_id, "concept_generation", {"prompt": "a"})
+
+    assert created is True
+    assert task["id"] in tasks
+    task_service.client.get_service_role_client.return_value.table.return_value.select.assert_not_called()
+    assert active_task_lock.acquire(user_id, "concept_generation", "other") == task["id"]
+
+
+@pytest.mark.asyncio
+async def test_create_task_if_no_active_returns_active_holder(active_task_lock: ActiveTaskLock) -> None:
+    """Test that a second submit returns the task holding the lock."""
+    tasks: Dict[str, Dict[str, Any]] = {}
+    task_service = make_task_service(tasks, active_task_lock)
+    user_id = str(uuid.uuid4())
+
+    first, _ = await task_service.create_task_if_no_active(user_id, "concept_generation")
+    second, created = await task_service.create_task_if_no_active(user_id, "concept_generation")
+
+    assert created is False
+    assert second["id"] == first["id"]
+    assert len(tasks) == 1
+
+
+@pytest.mark.asyncio
+async def test_create_task_if_no_active_takes_over_stale_lock(active_task_lock: ActiveTaskLock) -> None:
+    """Test that a lock held by a finished task is taken over."""
+    tasks: Dict[str, Dict[str, Any]] = {}
+    task_service = make_task_service(tasks, active_task_lock)
+    user_id = str(uuid.uuid4())
+
+    first, _ = await task_service.create_task_if_no_active(user_id, "concept_generation")
+    # The task finished, but its release never reached Redis
+    tasks[first["id"]]["status"] = "completed"
+
+    second, created = await task_service.create_task_if_no_active(user_id, "concept_generation")
+
+    assert created is True
+    assert second["id"] != first["id"]
+    assert active_task_lock.acquire(user_id, "concept_generation", "other") == second["id"]
+
+
+@pytest.mark.asyncio
+async def test_update_task_status_releases_lock_on_completion(active_task_lock: ActiveTaskLock) -> None:
+    """Test that finishing a task releases its lock."""
+    user_id = str(uuid.uuid4())
+    task_service = make_task_service({}, active_task_lock)
+    active_task_lock.acquire(user_id, "concept_generation", "task-1")
+
+    update_chain = task_service.client.get_service_role_client.return_value.table.return_value.update.return_value
+    update_chain.eq.return_value.execute.return_value = MagicMock(data=[{"id": "task-1", "user_id": user_id, "type": "concept_generation", "status": "completed"}])
+
+    await task_service.update_task_status("task-1", "completed", result_id="concept-1")
+
+    assert active_task_lock.acquire(user_id, "concept_generation", "task-2") is None
@@ -5,6 +5,7 @@ from unittest.mock import MagicMock
 
 import pytest
 
+from app.services.task.events import InProcessTaskEventBus
 from app.services.task.service import TaskError, TaskNotFoundError, TaskService
 
 
@@ -19,7 +20,7 @@ def mock_supabase_client() -> MagicMock:
 @pytest.fixture
 def task_service(mock_supabase_client: MagicMock) -> TaskService:
     """Create a TaskService with a mock client for testing."""
-    return TaskService(mock_supabase_client)
+    return TaskService(mock_supabase_client, event_bus=InProcessTaskEventBus())
 
 
 @pytest.mark.asyncio
@@ -617,3 +618,144 @@ async def test_get_task_by_result_id_not_found(task_service: TaskService, mock_s
     assert result is None
     mock_supabase_client.get_service_role_client.assert_called_once()
     service_client.table.assert_called_once_with(task_service.tasks_table)
+
+
+@pytest.mark.asyncio
+async def test_save_task_checkpoints_success(task_service: TaskService, mock_supabase_client: MagicMock) -> None:
+    """Test saving stage checkpoints on a task."""
+    # Arrange
+    task_id = str(uuid.uuid4())
+    checkpoints = {"attempts": 1, "image_path": "user/base.png"}
+
+    mock_response = MagicMock()
+    mock_response.data = [{"id": task_id, "checkpoints": checkpoints}]
+
+    service_client = mock_supabase_client.get_service_role_client.return_value
+    update_chain = service_client.table.return_value.update
+    update_chain.return_value.eq.return_value.execute = MagicMock(return_value=mock_response)
+
+    # Act
+    result = await task_service.save_task_checkpoints(task_id, checkpoints)
+
+    # Assert
+    assert result["checkpoints"] == checkpoints
+    update_data = update_chain.call_args[0][0]
+    assert update_data["checkpoints"] == checkpoints
+    update_chain.return_value.eq.assert_called_once_with("id", task_id)
+
+
+@pytest.mark.asyncio
+async def test_release_task_for_retry_only_releases_processing_task(task_service: TaskService, mock_supabase_client: MagicMock) -> None:
+    """Test releasing a task resets it to pending while guarding on processing status."""
+    # Arrange
+    task_id = str(uuid.uuid4())
+    checkpoints = {"attempts": 1, "raw_palettes": []}
+
+    mock_response = MagicMock()
+    mock_response.data = [{"id": task_id, "status": "pending"}]
+
+    service_client = mock_supabase_client.get_service_role_client.return_value
+    update_chain = service_client.table.return_value.update
+    eq2_chain = update_chain.return_value.eq.return_value.eq
+    eq2_chain.return_value.execute = MagicMock(return_value=mock_response)
+
+    # Act
+    result = await task_service.release_task_for_retry(task_id, checkpoints, error_message="boom\n")
+
+    # Assert
+    assert result["status"] == "pending"
+    update_data = update_chain.call_args[0][0]
+    assert update_data["status"] == "pending"
+    assert update_data["checkpoints"] == checkpoints
+    assert update_data["error_message"] == "boom "
+    eq2_chain.assert_called_once_with("status", "processing")
+
+
+@pytest.mark.asyncio
+async def test_release_task_for_retry_not_processing(task_service: TaskService, mock_supabase_client: MagicMock) -> None:
+    """Test releasing a task that is no longer processing raises TaskNotFoundError."""
+    # Arrange
+    task_id = str(uuid.uuid4())
+
+    mock_response = MagicMock()
+    mock_response.data = []
+
+    service_client = mock_supabase_client.get_service_role_client.return_value
+    update_chain = service_client.table.return_value.update
+    update_chain.return_value.eq.return_value.eq.return_value.execute = MagicMock(return_value=mock_response)
+
+    # Act / Assert
+    with pytest.raises(TaskNotFoundError):
+        await task_service.release_task_for_retry(task_id, {"attempts": 1})
+
+
+@pytest.mark.asyncio
+async def test_update_task_progress_success(task_service: TaskService, mock_supabase_client: MagicMock) -> None:
+    """Test recording task progress with partial results."""
+    # Arrange
+    task_id = str(uuid.uuid4())
+    progress = {"stage": "creating_variations", "percent": 60, "image_url": "https://example.com/base.png", "variations": []}
+
+    mock_response = MagicMock()
+    mock_response.data = [{"id": task_id, "progress": progress}]
+
+    service_client = mock_supabase_client.get_service_role_client.return_value
+    update_chain = service_client.table.return_value.update
+    update_chain.return_value.eq.return_value.execute = MagicMock(return_value=mock_response)
+
+    # Act
+    result = await task_service.update_task_progress(task_id, progress)
+
+    # Assert
+    assert result["progress"] == progress
+    assert update_chain.call_args[0][0]["progress"] == progress
+
+
+@pytest.mark.asyncio
+async def test_update_task_progress_not_found(task_service: TaskService, mock_supabase_client: MagicMock) -> None:
+    """Test recording progress for a missing task raises TaskNotFoundError."""
+    # Arrange
+    mock_response = MagicMock()
+    mock_response.data = []
+
+    service_client = mock_supabase_client.get_service_role_client.return_value
+    service_client.table.return_value.update.return_value.eq.return_value.execute = MagicMock(return_value=mock_response)
+
+    # Act / Assert
+    with pytest.raises(TaskNotFoundError):
+        await task_service.update_task_progress(str(uuid.uuid4()), {"stage": "generating_image", "percent": 5})
+
+
+@pytest.mark.asyncio
+async def test_get_active_task_uses_single_query(task_service: TaskService, mock_supabase_client: MagicMock) -> None:
+    """Test that active tasks are looked up with one status IN query."""
+    user_id = str(uuid.uuid4())
+    task_data = {"id": str(uuid.uuid4()), "user_id": user_id, "type": "concept_generation", "status": "processing"}
+
+    service_client = mock_supabase_client.get_service_role_client.return_value
+    type_chain = service_client.table.return_value.select.return_value.eq.return_value.eq.return_value
+    type_chain.in_.return_value.order.return_value.limit.return_value.execute.return_value = MagicMock(data=[task_data])
+
+    result = await task_service.get_active_task(user_id, "concept_generation")
+
+    assert result == task_data
+    type_chain.in_.assert_called_once_with("status", ["pending", "processing"])
+    type_chain.in_.return_value.order.return_value.limit.assert_called_once_with(1)
+
+
+@pytest.mark.asyncio
+async def test_create_task_if_no_active_without_lock(task_service: TaskService, mock_supabase_client: MagicMock) -> None:
+    """Test that an existing active task is returned instead of creating a new one."""
+    task_service._active_task_lock_resolved = True
+    user_id = str(uuid.uuid4())
+    existing = {"id": str(uuid.uuid4()), "user_id": user_id, "type": "concept_generation", "status": "pending"}
+
+    service_client = mock_supabase_client.get_service_role_client.return_value
+    type_chain = service_client.table.return_value.select.return_value.eq.return_value.eq.return_value
+    type_chain.in_.return_value.order.return_value.limit.return_value.execute.return_value = MagicMock(data=[existing])
+
+    task, created = await task_service.create_task_if_no_active(user_id, "concept_generation")
+
+    assert created is False
+    assert task == existing
+    service_client.table.return_value.insert.assert_not_called()
@@ -0,0 +1,369 @@
+"""Tests for resuming concept generation tasks from stage checkpoints."""
+
+import asyncio
+import copy
+from io import BytesIO
+from typing import Any, Dict, Generator, List, Optional
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from PIL import Image
+
+from cloud_run.worker.processors.base_processor import TaskRetryError
+from cloud_run.worker.processors.generation_processor import GenerationTaskProcessor
+
+TASK_ID = "task-123"
+USER_ID = "user-456"
+PALETTES = [{"name": f"Palette {idx}", "colors": ["#000000", "#FFFFFF"], "description": "test"} for idx in range(3)]
+
+
+class FakeTaskService:
+    """In-memory task service that keeps the task row across processor instances."""
+
+    def __init__(self) -> None:
+        """Initialize with a single pending task."""
+        self.task: Dict[str, Any] = {"id": TASK_ID, "user_id": USER_ID, "status": "pending", "checkpoints": {}, "progress": {}}
+        self.progress_history: List[Dict[str, Any]] = []
+
+    async def claim_task_if_pending(self, task_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        if self.task["status"] != "pending":
+            return None
+        self.task["status"] = "processing"
+        return copy.deepcopy(self.task)
+
+    async def save_task_checkpoints(self, task_id: str, checkpoints: Dict[str, Any], progress: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        self.task["checkpoints"] = copy.deepcopy(checkpoints)
+        if progress is not None:
+            await self.update_task_progress(task_id, progress)
+        return copy.deepcopy(self.task)
+
+    async def update_task_progress(self, task_id: str, progress: Dict[str, Any]) -> Dict[str, Any]:
+        self.task["progress"] = copy.deepcopy(progress)
+        self.progress_history.append(copy.deepcopy(progress))
+        return copy.deepcopy(self.task)
+
+    async def release_task_for_retry(self, task_id: str, checkpoints: Dict[str, Any], error_message: Optional[str] = None) -> Dict[str, Any]:
+        self.task.update(status="pending", checkpoints=copy.deepcopy(checkpoints), error_message=error_message)
+        return copy.deepcopy(self.task)
+
+    async def update_task_status(self, task_id: str, status: str, result_id: Optional[str] = None, error_message: Optional[str] = None) -> Dict[str, Any]:
+        self.task.update(status=status, result_id=result_id, error_message=error_message)
+        return copy.deepcopy(self.task)
+
+
+class FakeImageService:
+    """Image service that stores variations one by one and can fail after a number of them."""
+
+    def __init__(self, fail_after: Optional[int] = None) -> None:
+        """Initialize the fake.
+
+        Args:
+            fail_after: Number of variations to store before raising
+        """
+        self.fail_after = fail_after
+        self.processed: List[str] = []
+
+    async def create_palette_variations(
+        self,
+        base_image_data: bytes,
+        palettes: List[Dict[str, Any]],
+        user_id: str,
+        blend_strength: float = 0.75,
+        on_variation_created: Any = None,
+        on_variation_image: Any = None,
+    ) -> List[Dict[str, Any]]:
+        variations = []
+        for idx, palette in enumerate(palettes):
+            if self.fail_after is not None and len(self.processed) >= self.fail_after:
+                raise Exception("worker killed")
+            variation = {"name": palette["name"], "colors": palette["colors"], "image_path": f"palettes/{palette['name']}.png", "image_url": "https://example.com/v.png"}
+            self.processed.append(palette["name"])
+            if on_variation_image is not None:
+                variation.update(await on_variation_image(b"variation-image", variation))
+            variations.append(variation)
+            if on_variation_created is not None:
+                await on_variation_created(idx, variation)
+        return variations
+
+
+@pytest.fixture(autouse=True)
+def max_attempts() -> Generator[None, None, None]:
+    """Allow three attempts per task."""
+    with patch("cloud_run.worker.processors.base_processor.settings") as mock_settings:
+        mock_settings.TASK_MAX_ATTEMPTS = 3
+        yield
+
+
+@pytest.fixture
+def task_service() -> FakeTaskService:
+    """Create the shared in-memory task service."""
+    return FakeTaskService()
+
+
+def make_services(task_service: FakeTaskService, image_service: Optional[FakeImageService] = None) -> Dict[str, Any]:
+    """Build the service dictionary passed to the processor."""
+    concept_service = MagicMock()
+    concept_service.generate_concept = AsyncMock(return_value={"image_url": "https://example.com/base.png", "image_data": b"base-image"})
+    concept_service.generate_color_palettes = AsyncMock(return_value=copy.deepcopy(PALETTES))
+
+    image_persistence_service = MagicMock()
+    image_persistence_service.store_image = AsyncMock(return_value=("user-456/base.png", "https://example.com/signed/base.png"))
+    image_persistence_service.get_image = AsyncMock(return_value=b"base-image")
+
+    concept_persistence_service = MagicMock()
+    concept_persistence_service.store_concept = AsyncMock(return_value="concept-789")
+
+    return {
+        "task_service": task_service,
+        "concept_service": concept_service,
+        "image_service": image_service or FakeImageService(),
+        "image_persistence_service": image_persistence_service,
+        "concept_persistence_service": concept_persistence_service,
+    }
+
+
+def make_processor(services: Dict[str, Any]) -> GenerationTaskProcessor:
+    """Create a generation processor for the shared task."""
+    payload = {"logo_description": "a fox", "theme_description": "forest", "num_palettes": len(PALETTES)}
+    return GenerationTaskProcessor(TASK_ID, USER_ID, payload, services)
+
+
+@pytest.mark.asyncio
+async def test_uninterrupted_run_completes(task_service: FakeTaskService) -> None:
+    """Test a run without failures stores every stage and completes the task."""
+    services = make_services(task_service)
+
+    await make_processor(services).process()
+
+    assert task_service.task["status"] == "completed"
+    assert task_service.task["result_id"] == "concept-789"
+    checkpoints = task_service.task["checkpoints"]
+    assert checkpoints["image_path"] == "user-456/base.png"
+    assert checkpoints["raw_palettes"] == PALETTES
+    assert sorted(checkpoints["variations"]) == ["0", "1", "2"]
+    assert checkpoints["concept_id"] == "concept-789"
+
+
+@pytest.mark.asyncio
+async def test_resume_after_palette_generation_failure(task_service: FakeTaskService) -> None:
+    """Test a retry after palette generation failed reuses the stored base image."""
+    first = make_services(task_service)
+    first["concept_service"].generate_color_palettes.side_effect = Exception("worker killed")
+
+    with pytest.raises(TaskRetryError):
+        await make_processor(first).process()
+
+    assert task_service.task["status"] == "pending"
+    assert task_service.task["checkpoints"]["image_path"] == "user-456/base.png"
+    assert "raw_palettes" not in task_service.task["checkpoints"]
+
+    second = make_services(task_service)
+    await make_processor(second).process()
+
+    second["concept_service"].generate_concept.assert_not_called()
+    second["image_persistence_service"].store_image.assert_not_called()
+    second["image_persistence_service"].get_image.assert_awaited_once_with("user-456/base.png")
+    second["concept_service"].generate_color_palettes.assert_awaited_once()
+    assert task_service.task["status"] == "completed"
+
+
+@pytest.mark.asyncio
+async def test_resume_after_base_image_storage_failure(task_service: FakeTaskService) -> None:
+    """Test a retry after storing the base image failed keeps the generated palettes."""
+    first = make_services(task_service)
+    first["image_persistence_service"].store_image.side_effect = Exception("worker killed")
+
+    with pytest.raises(TaskRetryError):
+        await make_processor(first).process()
+
+    assert task_service.task["checkpoints"]["raw_palettes"] == PALETTES
+    assert "image_path" not in task_service.task["checkpoints"]
+
+    second = make_services(task_service)
+    await make_processor(second).process()
+
+    second["concept_service"].generate_concept.assert_awaited_once()
+    second["concept_service"].generate_color_palettes.assert_not_called()
+    assert task_service.task["status"] == "completed"
+
+
+@pytest.mark.asyncio
+async def test_resume_mid_variations_only_processes_remaining(task_service: FakeTaskService) -> None:
+    """Test a retry after some variations were stored only creates the missing ones."""
+    first_image_service = FakeImageService(fail_after=1)
+    with pytest.raises(TaskRetryError):
+        await make_processor(make_services(task_service, first_image_service)).process()
+
+    assert first_image_service.processed == ["Palette 0"]
+    assert list(task_service.task["checkpoints"]["variations"]) == ["0"]
+
+    second_image_service = FakeImageService()
+    second = make_services(task_service, second_image_service)
+    await make_processor(second).process()
+
+    assert second_image_service.processed == ["Palette 1", "Palette 2"]
+    second["concept_service"].generate_concept.assert_not_called()
+    second["concept_service"].generate_color_palettes.assert_not_called()
+    stored = second["concept_persistence_service"].store_concept.call_args[0][0]
+    assert [variation["name"] for variation in stored["color_palettes"]] == ["Palette 0", "Palette 1", "Palette 2"]
+    assert task_service.task["status"] == "completed"
+
+
+@pytest.mark.asyncio
+async def test_resume_after_concept_storage_failure(task_service: FakeTaskService) -> None:
+    """Test a retry after storing the concept failed regenerates nothing."""
+    first = make_services(task_service)
+    first["concept_persistence_service"].store_concept.side_effect = Exception("worker killed")
+
+    with pytest.raises(TaskRetryError):
+        await make_processor(first).process()
+
+    second_image_service = FakeImageService()
+    second = make_services(task_service, second_image_service)
+    await make_processor(second).process()
+
+    second["concept_service"].generate_concept.assert_not_called()
+    second["concept_service"].generate_color_palettes.assert_not_called()
+    second["image_persistence_service"].get_image.assert_not_called()
+    assert second_image_service.processed == []
+    second["concept_persistence_service"].store_concept.assert_awaited_once()
+    assert task_service.task["status"] == "completed"
+
+
+@pytest.mark.asyncio
+async def test_resume_after_completion_update_failure(task_service: FakeTaskService) -> None:
+    """Test a retry after the concept was stored only marks the task completed."""
+    first = make_services(task_service)
+    with patch.object(task_service, "update_task_status", AsyncMock(side_effect=Exception("worker killed"))):
+        with pytest.raises(TaskRetryError):
+            await make_processor(first).process()
+
+    second = make_services(task_service)
+    await make_processor(second).process()
+
+    second["concept_persistence_service"].store_concept.assert_not_called()
+    assert task_service.task["status"] == "completed"
+    assert task_service.task["result_id"] == "concept-789"
+
+
+@pytest.mark.asyncio
+async def test_task_marked_failed_when_attempts_exhausted(task_service: FakeTaskService) -> None:
+    """Test the last allowed attempt marks the task failed instead of retrying."""
+    for _ in range(2):
+        services = make_services(task_service)
+        services["concept_service"].generate_concept.side_effect = Exception("worker killed")
+        with pytest.raises(TaskRetryError):
+            await make_processor(services).process()
+
+    services = make_services(task_service)
+    services["concept_service"].generate_concept.side_effect = Exception("worker killed")
+    await make_processor(services).process()
+
+    assert task_service.task["status"] == "failed"
+    assert "worker killed" in task_service.task["error_message"]
+
+
+@pytest.mark.asyncio
+async def test_progress_publishes_base_image_and_each_variation(task_service: FakeTaskService) -> None:
+    """Test progress exposes the base image and every variation as it is stored."""
+    await make_processor(make_services(task_service)).process()
+
+    stages = [progress["stage"] for progress in task_service.progress_history]
+    assert stages[0] == "generating_image"
+    assert stages[-1] == "storing_concept"
+
+    percents = [progress["percent"] for progress in task_service.progress_history]
+    assert percents == sorted(percents)
+
+    variation_counts = [len(progress.get("variations", [])) for progress in task_service.progress_history if progress["stage"] == "creating_variations"]
+    assert variation_counts == [0, 1, 2, 3]
+
+    first_with_variation = next(progress for progress in task_service.progress_history if progress.get("variations"))
+    assert first_with_variation["image_url"] == "https://example.com/signed/base.png"
+    assert first_with_variation["variations"][0] == {
+        "index": 0,
+        "name": "Palette 0",
+        "colors": ["#000000", "#FFFFFF"],
+        "image_path": "palettes/Palette 0.png",
+        "image_url": "https://example.com/v.png",
+    }
+
+
+@pytest.mark.asyncio
+async def test_export_derivatives_prerendered_and_stored(task_service: FakeTaskService) -> None:
+    """Test the base image and each variation get their export sizes pre-rendered."""
+    services = make_services(task_service)
+    renderer = MagicMock()
+    renderer.prerender = AsyncMock(side_effect=lambda image_data, image_path, user_id, is_palette=False: {"small.png": {"path": f"{image_path}/export_small.png", "bytes": 1}})
+    services["export_derivative_renderer"] = renderer
+
+    await make_processor(services).process()
+
+    assert task_service.task["status"] == "completed"
+    assert renderer.prerender.await_count == 1 + len(PALETTES)
+    stored = services["concept_persistence_service"].store_concept.call_args[0][0]
+    assert stored["export_derivatives"] == {"small.png": {"path": "user-456/base.png/export_small.png", "bytes": 1}}
+    assert all(variation["export_derivatives"] for variation in stored["color_palettes"])
+
+
+@pytest.mark.asyncio
+async def test_prerender_failure_does_not_fail_task(task_service: FakeTaskService) -> None:
+    """Test that a failed pre-render leaves the concept without derivatives."""
+    services = make_services(task_service)
+    renderer = MagicMock()
+    renderer.prerender = AsyncMock(side_effect=Exception("pool stopped"))
+    services["export_derivative_renderer"] = renderer
+
+    await make_processor(services).process()
+
+    assert task_service.task["status"] == "completed"
+    stored = services["concept_persistence_service"].store_concept.call_args[0][0]
+    assert stored["export_derivatives"] == {}
+
+
+def make_logo_image() -> bytes:
+    """Create a base image with one dominant color."""
+    image = Image.new("RGB", (256, 256), "white")
+    image.paste((200, 60, 30), (64, 64, 192, 192))
+    buffer = BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.mark.asyncio
+async def test_preview_palettes_reported_while_generating(task_service: FakeTaskService) -> None:
+    """Test palettes derived from the base image are exposed while the generated ones are pending, and passed as the fallback."""
+    image_data = make_logo_image()
+    services = make_services(task_service)
+    services["concept_service"].generate_concept.return_value = {"image_url": None, "image_data": image_data}
+
+    async def slow_palettes(**kwargs: Any) -> List[Dict[str, Any]]:
+        # The generated palettes arrive after the preview
+        await kwargs["local_palettes"]
+        return copy.deepcopy(PALETTES)
+
+    services["concept_service"].generate_color_palettes.side_effect = slow_palettes
+
+    await make_processor(services).process()
+
+    previews = [progress["preview_palettes"] for progress in task_service.progress_history if progress.get("preview_palettes")]
+    assert previews and len(previews[0]) == len(PALETTES)
+    assert task_service.task["checkpoints"]["raw_palettes"] == PALETTES
+    assert services["concept_service"].generate_color_palettes.call_args.kwargs["base_image"] == image_data
+
+
+@pytest.mark.asyncio
+async def test_preview_palettes_not_reported_after_generated_ones(task_service: FakeTaskService) -> None:
+    """Test no preview is published once the generated palettes are ready."""
+    services = make_services(task_service)
+    services["concept_service"].generate_concept.return_value = {"image_url": None, "image_data": make_logo_image()}
+
+    async def slow_preview(*args: Any) -> List[Dict[str, Any]]:
+        await asyncio.sleep(0.1)
+        return copy.deepcopy(PALETTES)
+
+    with patch("cloud_run.worker.processors.generation_processor.generate_palettes_from_image", side_effect=slow_preview):
+        await make_processor(services).process()
+
+    assert task_service.task["status"] == "completed"
+    assert not any(progress.get("preview_palettes") for progress in task_service.progress_history)
@@ -0,0 +1,136 @@
+"""Tests for resuming concept refinement tasks from stage checkpoints."""
+
+import copy
+from typing import Any, Dict, Generator, List, Optional
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from cloud_run.worker.processors.base_processor import TaskRetryError
+from cloud_run.worker.processors.refinement_processor import RefinementTaskProcessor
+
+TASK_ID = "task-123"
+USER_ID = "user-456"
+
+
+class FakeTaskService:
+    """In-memory task service that keeps the task row across processor instances."""
+
+    def __init__(self) -> None:
+        """Initialize with a single pending task."""
+        self.task: Dict[str, Any] = {"id": TASK_ID, "user_id": USER_ID, "status": "pending", "checkpoints": {}, "progress": {}}
+        self.progress_history: List[Dict[str, Any]] = []
+
+    async def claim_task_if_pending(self, task_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        if self.task["status"] != "pending":
+            return None
+        self.task["status"] = "processing"
+        return copy.deepcopy(self.task)
+
+    async def save_task_checkpoints(self, task_id: str, checkpoints: Dict[str, Any], progress: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        self.task["checkpoints"] = copy.deepcopy(checkpoints)
+        if progress is not None:
+            await self.update_task_progress(task_id, progress)
+        return copy.deepcopy(self.task)
+
+    async def update_task_progress(self, task_id: str, progress: Dict[str, Any]) -> Dict[str, Any]:
+        self.task["progress"] = copy.deepcopy(progress)
+        self.progress_history.append(copy.deepcopy(progress))
+        return copy.deepcopy(self.task)
+
+    async def release_task_for_retry(self, task_id: str, checkpoints: Dict[str, Any], error_message: Optional[str] = None) -> Dict[str, Any]:
+        self.task.update(status="pending", checkpoints=copy.deepcopy(checkpoints), error_message=error_message)
+        return copy.deepcopy(self.task)
+
+    async def update_task_status(self, task_id: str, status: str, result_id: Optional[str] = None, error_message: Optional[str] = None) -> Dict[str, Any]:
+        self.task.update(status=status, result_id=result_id, error_message=error_message)
+        return copy.deepcopy(self.task)
+
+
+@pytest.fixture(autouse=True)
+def max_attempts() -> Generator[None, None, None]:
+    """Allow three attempts per task."""
+    with patch("cloud_run.worker.processors.base_processor.settings") as mock_settings:
+        mock_settings.TASK_MAX_ATTEMPTS = 3
+        yield
+
+
+def make_processor(task_service: FakeTaskService) -> RefinementTaskProcessor:
+    """Create a refinement processor with mocked services."""
+    concept_service = MagicMock()
+    concept_service.refine_concept = AsyncMock(return_value={"image_data": b"refined-image"})
+
+    image_persistence_service = MagicMock()
+    image_persistence_service.store_image = AsyncMock(return_value=("user-456/refined.png", "https://example.com/signed/refined.png"))
+
+    concept_persistence_service = MagicMock()
+    concept_persistence_service.store_concept = AsyncMock(return_value="concept-789")
+
+    services = {
+        "task_service": task_service,
+        "concept_service": concept_service,
+        "image_service": MagicMock(),
+        "image_persistence_service": image_persistence_service,
+        "concept_persistence_service": concept_persistence_service,
+    }
+    payload = {"refinement_prompt": "more blue", "original_image_url": "https://example.com/original.png", "logo_description": "a fox", "theme_description": "forest"}
+    return RefinementTaskProcessor(TASK_ID, USER_ID, payload, services)
+
+
+@pytest.mark.asyncio
+async def test_resume_after_refine_failure() -> None:
+    """Test a retry after refinement failed runs every stage again."""
+    task_service = FakeTaskService()
+    first = make_processor(task_service)
+    first.concept_service.refine_concept.side_effect = Exception("worker killed")
+
+    with pytest.raises(TaskRetryError):
+        await first.process()
+
+    assert task_service.task["status"] == "pending"
+    assert task_service.task["checkpoints"] == {"attempts": 1}
+
+    second = make_processor(task_service)
+    await second.process()
+
+    second.concept_service.refine_concept.assert_awaited_once()
+    assert task_service.task["status"] == "completed"
+
+
+@pytest.mark.asyncio
+async def test_resume_after_concept_storage_failure_skips_refinement() -> None:
+    """Test a retry after storing the concept failed reuses the stored refined image."""
+    task_service = FakeTaskService()
+    first = make_processor(task_service)
+    first.concept_persistence_service.store_concept.side_effect = Exception("worker killed")
+
+    with pytest.raises(TaskRetryError):
+        await first.process()
+
+    assert task_service.task["checkpoints"]["refined_image_path"] == "user-456/refined.png"
+
+    second = make_processor(task_service)
+    await second.process()
+
+    second.concept_service.refine_concept.assert_not_called()
+    second.image_persistence_service.store_image.assert_not_called()
+    stored = second.concept_persistence_service.store_concept.call_args[0][0]
+    assert stored["image_path"] == "user-456/refined.png"
+    assert task_service.task["status"] == "completed"
+    assert task_service.task["result_id"] == "concept-789"
+
+
+@pytest.mark.asyncio
+async def test_refinement_marked_failed_when_attempts_exhausted() -> None:
+    """Test the last allowed attempt marks the refinement task failed."""
+    task_service = FakeTaskService()
+    for attempt in range(3):
+        processor = make_processor(task_service)
+        processor.concept_service.refine_concept.side_effect = Exception("worker killed")
+        if attempt < 2:
+            with pytest.raises(TaskRetryError):
+                await processor.process()
+        else:
+            await processor.process()
+
+    assert task_service.task["status"] == "failed"
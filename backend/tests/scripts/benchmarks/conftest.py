@@ -0,0 +1,9 @@
+"""Make the benchmark scripts importable the way they import each other."""
+
+import sys
+from pathlib import Path
+
+BENCHMARKS_DIR = Path(__file__).resolve().parents[3] / "scripts" / "benchmarks"
+
+if str(BENCHMARKS_DIR) not in sys.path:
+    sys.path.insert(0, str(BENCHMARKS_DIR))
@@ -0,0 +1,67 @@
+"""Smoke tests for the JigsawStack emulator used by the benchmarks."""
+
+import random
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from jigsawstack_emulator import EmulatorConfig, EndpointBehavior, LatencyProfile, create_emulator_app
+
+EMULATOR_URL = "https://emulator.jigsawstack.test"
+
+
+def make_client(app: FastAPI) -> httpx.AsyncClient:
+    """Create an HTTP client talking to an emulator app in this process."""
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url=EMULATOR_URL, headers={"x-api-key": "test_api_key"})
+
+
+@pytest.mark.asyncio
+async def test_output_is_deterministic() -> None:
+    """Test the same request always gets the same image and palettes."""
+    async with make_client(create_emulator_app(EmulatorConfig(image_size=32))) as client:
+        first = await client.post("/v1/ai/image_generation", json={"prompt": "A fox logo"})
+        again = await client.post("/v1/ai/image_generation", json={"prompt": "A fox logo"})
+        other = await client.post("/v1/ai/image_generation", json={"prompt": "An owl logo"})
+        palette_request = {"input_values": {"logo_description": "A fox logo", "theme_description": "Autumn forest", "num_palettes": 5}}
+        palettes = (await client.post("/v1/prompt_engine/run", json=palette_request)).json()
+        palettes_again = (await client.post("/v1/prompt_engine/run", json=palette_request)).json()
+
+    assert first.content.startswith(b"\x89PNG")
+    assert first.content == again.content
+    assert first.content != other.content
+    assert len(palettes["result"]) == 5
+    assert palettes == palettes_again
+
+
+@pytest.mark.asyncio
+async def test_injected_errors() -> None:
+    """Test injected errors are answered with their status, and 429s with Retry-After."""
+    config = EmulatorConfig(endpoints={"image_generation": EndpointBehavior(error_rate=1.0, error_statuses=(429,))})
+    app = create_emulator_app(config)
+    async with make_client(app) as client:
+        response = await client.post("/v1/ai/image_generation", json={"prompt": "A fox logo"})
+        unauthenticated = await client.post("/v1/ai/image_generation", json={"prompt": "A fox logo"}, headers={"x-api-key": ""})
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+    assert unauthenticated.status_code == 401
+    assert app.state.emulator.stats()["errors"]["image_generation"] == 2
+
+
+@pytest.mark.asyncio
+async def test_latency_profile() -> None:
+    """Test responses wait for the configured latency, and sampled latencies follow the profile."""
+    config = EmulatorConfig(image_size=32, endpoints={"image_generation": EndpointBehavior(latency=LatencyProfile(0.1, 0.1))})
+    async with make_client(create_emulator_app(config)) as client:
+        started = time.monotonic()
+        await client.post("/v1/ai/image_generation", json={"prompt": "A fox logo"})
+
+    assert time.monotonic() - started >= 0.1
+
+    profile = LatencyProfile.parse("1.0,3.0")
+    rng = random.Random(1)
+    samples = sorted(profile.sample(rng) for _ in range(4000))
+    assert samples[2000] == pytest.approx(1.0, rel=0.1)
+    assert samples[3800] == pytest.approx(3.0, rel=0.15)
+    assert LatencyProfile.parse("").sample(rng) == 0.0
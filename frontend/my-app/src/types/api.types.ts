@@ -25,6 +25,37 @@ export interface ApiResponse<T> {
  */
 export type TaskStatus = "pending" | "processing" | "completed" | "failed";
 
+/**
+ * Palette variation finished while its task is still running
+ */
+export interface TaskVariationProgress {
+  index: number;
+  name?: string;
+  colors: string[];
+  image_path?: string;
+  image_url?: string;
+}
+
+/**
+ * Palette derived locally from the base image, shown until the generated ones are ready
+ */
+export interface TaskPalettePreview {
+  name?: string;
+  colors: string[];
+  description?: string;
+}
+
+/**
+ * Progress and partial results of a running task
+ */
+export interface TaskProgress {
+  stage?: string;
+  percent: number;
+  image_url?: string;
+  variations: TaskVariationProgress[];
+  preview_palettes: TaskPalettePreview[];
+}
+
 /**
  * Task response model
  */
@@ -35,6 +66,8 @@ export interface TaskResponse {
   type: "generate_concept" | "refine_concept";
   result_id?: string;
   error_message?: string;
+  image_url?: string;
+  progress?: TaskProgress;
   created_at: string;
   updated_at: string;
 }